@@ -10,10 +10,9 @@ class CategoriaClienteAdmin(admin.ModelAdmin):
 
     # Lógica SaaS para Categorias
     def get_queryset(self, request):
-        qs = super().get_queryset(request)
         if request.user.is_superuser:
-            return qs
-        return qs.filter(empresa=request.user.empresa)
+            return self.model.objects.sem_escopo()  # o superusuário enxerga todas as empresas
+        return super().get_queryset(request)
 
     def save_model(self, request, obj, form, change):
         if not obj.empresa_id:
@@ -70,7 +69,6 @@ class CadastroAdmin(admin.ModelAdmin):
         super().save_model(request, obj, form, change)
     
     def get_queryset(self, request):
-        qs = super().get_queryset(request)
         if request.user.is_superuser:
-            return qs
-        return qs.filter(empresa=request.user.empresa)
\ No newline at end of file
+            return self.model.objects.sem_escopo()  # o superusuário enxerga todas as empresas
+        return super().get_queryset(request)
\ No newline at end of file
@@ -0,0 +1,79 @@
+"""
+Busca de clientes/fornecedores pelas colunas normalizadas do Cadastro.
+
+`busca` guarda nome, razão social e e-mail sem acentos, em minúsculas e separados
+por um espaço; `documento_busca` guarda só os dígitos do CPF/CNPJ. As duas têm
+índice com a empresa, então buscas por prefixo não varrem a tabela inteira. Cada palavra
+de `busca` também tem uma linha em PalavraCadastro, indexada por (empresa, palavra), para
+achar o começo de qualquer palavra do nome, da razão social ou do e-mail.
+"""
+import re
+import unicodedata
+
+from django.db.models import Case, IntegerField, Q, Value, When
+
+TAMANHO_BUSCA = 500
+TAMANHO_PALAVRA = 40
+
+_NAO_ALFANUMERICO = re.compile(r'[^0-9a-z]+')
+_NAO_DIGITO = re.compile(r'\D+')
+
+# Abaixo disso os dígitos do termo não são tratados como documento (ex: "Loja 2")
+MINIMO_DIGITOS_DOCUMENTO = 3
+
+
+def normalizar_texto(*partes):
+    """'José  da SILVA', 'jose@x.com' -> 'jose da silva jose x com'"""
+    texto = ' '.join(parte for parte in partes if parte)
+    texto = unicodedata.normalize('NFKD', texto).encode('ascii', 'ignore').decode('ascii').lower()
+    return _NAO_ALFANUMERICO.sub(' ', texto).strip()[:TAMANHO_BUSCA]
+
+
+def somente_digitos(valor):
+    return _NAO_DIGITO.sub('', valor or '')
+
+
+def separar_palavras(busca):
+    """'joao da silva joao x com' -> ['com', 'da', 'joao', 'silva', 'x'] (sem repetir, cortadas em TAMANHO_PALAVRA)"""
+    return sorted({palavra[:TAMANHO_PALAVRA] for palavra in busca.split()})
+
+
+def buscar_cadastros(qs, termo, empresa):
+    """
+    Filtra `qs` (cadastros da `empresa`) pelo termo digitado e ordena por relevância:
+    0 documento igual, 1 nome começando pelo termo, 2 todas as palavras do termo como começo de
+    palavra do nome, da razão social ou do e-mail, 3 trecho no meio.
+
+    As três primeiras usam índices: (empresa, busca) e (empresa, documento_busca) no Cadastro e
+    (empresa, palavra) em PalavraCadastro. O trecho no meio ('lva' em 'Silva') só sai com
+    LIKE '%termo%', que varre os cadastros da empresa; por isso é o plano B, usado apenas
+    quando as buscas indexadas não acham nada.
+    """
+    from .models import PalavraCadastro  # models importa este módulo
+
+    texto = normalizar_texto(termo)
+    digitos = somente_digitos(termo)
+    documento = len(digitos) >= MINIMO_DIGITOS_DOCUMENTO
+
+    filtro, relevancia = Q(pk__in=[]), []
+    if texto:
+        palavras = Q()
+        for palavra in separar_palavras(texto):
+            palavras &= Q(pk__in=PalavraCadastro.objects.filter(
+                empresa=empresa, palavra__startswith=palavra,
+            ).values('cadastro_id'))
+        filtro = Q(busca__startswith=texto) | palavras
+        relevancia = [When(busca__startswith=texto, then=Value(1)), When(palavras, then=Value(2))]
+    if documento:
+        filtro |= Q(documento_busca__startswith=digitos)
+        relevancia.insert(0, When(documento_busca=digitos, then=Value(0)))
+
+    encontrados = qs.filter(filtro)
+    if texto and not encontrados.exists():
+        encontrados = qs.filter(busca__contains=texto)
+
+    return (
+        encontrados
+        .annotate(relevancia=Case(*relevancia, default=Value(3), output_field=IntegerField()))
+        .order_by('relevancia', 'nome')
+    )
@@ -0,0 +1,53 @@
+"""
+CPF e CNPJ: dígitos verificadores e formatação.
+Só aritmética sobre os dígitos, sem consultar o banco (servem para validar milhares de linhas de uma vez).
+"""
+from .busca import somente_digitos
+
+
+def _digito(digitos, pesos):
+    resto = sum(int(d) * p for d, p in zip(digitos, pesos)) % 11
+    return '0' if resto < 2 else str(11 - resto)
+
+
+def cpf_valido(digitos):
+    if len(digitos) != 11 or digitos == digitos[0] * 11:
+        return False
+    primeiro = _digito(digitos[:9], range(10, 1, -1))
+    segundo = _digito(digitos[:9] + primeiro, range(11, 1, -1))
+    return digitos[9:] == primeiro + segundo
+
+
+_PESOS_CNPJ = [5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2]
+
+
+def cnpj_valido(digitos):
+    if len(digitos) != 14 or digitos == digitos[0] * 14:
+        return False
+    primeiro = _digito(digitos[:12], _PESOS_CNPJ)
+    segundo = _digito(digitos[:12] + primeiro, [6] + _PESOS_CNPJ)
+    return digitos[12:] == primeiro + segundo
+
+
+def formatar_documento(digitos):
+    """'12345678909' -> '123.456.789-09'; '11222333000181' -> '11.222.333/0001-81'"""
+    if len(digitos) == 11:
+        return f'{digitos[:3]}.{digitos[3:6]}.{digitos[6:9]}-{digitos[9:]}'
+    if len(digitos) == 14:
+        return f'{digitos[:2]}.{digitos[2:5]}.{digitos[5:8]}/{digitos[8:12]}-{digitos[12:]}'
+    return digitos
+
+
+def validar_documento(texto):
+    """
+    (dígitos, 'PF' ou 'PJ') de um CPF/CNPJ com ou sem pontuação.
+    ValueError com a mensagem para o usuário se o número não fecha.
+    """
+    digitos = somente_digitos(texto)
+    if len(digitos) == 11 and cpf_valido(digitos):
+        return digitos, 'PF'
+    if len(digitos) == 14 and cnpj_valido(digitos):
+        return digitos, 'PJ'
+    if len(digitos) in (11, 14):
+        raise ValueError(f"{'CPF' if len(digitos) == 11 else 'CNPJ'} inválido (dígito verificador não confere).")
+    raise ValueError("CPF/CNPJ deve ter 11 ou 14 dígitos.")
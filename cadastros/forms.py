@@ -67,4 +67,16 @@ class CadastroForm(forms.ModelForm):
             
             if existe:
                 raise forms.ValidationError("Este Nº de Registro já existe.")
-        return num
\ No newline at end of file
+        return num
+
+
+class ImportacaoCadastrosForm(forms.Form):
+    """Arquivo CSV de clientes/fornecedores (ver cadastros/importacao.py para as colunas aceitas)"""
+    arquivo = forms.FileField(label="Arquivo CSV")
+    delimitador = forms.ChoiceField(choices=[(';', 'Ponto e vírgula (;)'), (',', 'Vírgula (,)')], initial=';')
+    codificacao = forms.ChoiceField(choices=[('utf-8-sig', 'UTF-8'), ('cp1252', 'Windows (ANSI)')], label="Codificação")
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        for field in self.fields.values():
+            field.widget.attrs['class'] = 'w-full px-3 py-2 border border-gray-300 rounded-md focus:outline-none focus:ring-2 focus:ring-blue-500 transition-colors'
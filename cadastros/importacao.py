@@ -0,0 +1,262 @@
+"""
+Importação de clientes/fornecedores a partir de um CSV (implantação de uma empresa nova).
+
+O arquivo é lido linha a linha. Os documentos (e nº de registro) que a empresa já tem são
+carregados numa consulta só, no início; cada linha é validada em memória (dígitos do
+CPF/CNPJ, e-mail, datas, tamanhos) e checada contra esse conjunto, que também pega
+repetições dentro do próprio arquivo. As válidas entram em lotes com bulk_create; as
+inválidas vão para um relatório CSV (core.importacao.RelatorioErros) com o motivo.
+"""
+import csv
+from dataclasses import dataclass, field
+from datetime import datetime
+
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import models, transaction
+
+from core.importacao import ErroImportacao, RelatorioErros, blocos_texto, linhas
+
+from .busca import normalizar_texto
+from .documentos import formatar_documento, validar_documento
+from .models import Cadastro, CategoriaCliente, PalavraCadastro
+
+TAMANHO_LOTE = 1000
+
+# Cabeçalho do CSV (normalizado, ver normalizar_texto) -> campo do Cadastro.
+# Os nomes dos campos também valem (ex: "cpf_cnpj", "data_nascimento").
+COLUNAS = {
+    'nome': 'nome', 'nome fantasia': 'nome', 'nome completo': 'nome',
+    'cpf cnpj': 'cpf_cnpj', 'cpf': 'cpf_cnpj', 'cnpj': 'cpf_cnpj', 'documento': 'cpf_cnpj',
+    'tipo pessoa': 'tipo_pessoa', 'tipo': 'tipo_pessoa',
+    'razao social': 'razao_social',
+    'rg': 'rg',
+    'inscricao estadual': 'inscricao_estadual', 'ie': 'inscricao_estadual',
+    'registro': 'num_registro', 'n registro': 'num_registro', 'num registro': 'num_registro',
+    'nascimento': 'data_nascimento', 'data nascimento': 'data_nascimento', 'fundacao': 'data_nascimento',
+    'email': 'email', 'e mail': 'email',
+    'celular': 'celular', 'telefone': 'telefone_fixo', 'telefone fixo': 'telefone_fixo',
+    'cep': 'cep', 'endereco': 'endereco', 'bairro': 'bairro', 'cidade': 'cidade', 'uf': 'uf',
+    'categoria': 'categoria',
+    'situacao': 'situacao',
+    'observacoes': 'observacoes',
+}
+
+FORMATOS_DATA = ['%d/%m/%Y', '%Y-%m-%d', '%d/%m/%y']
+
+_SITUACOES = {normalizar_texto(rotulo): valor for valor, rotulo in Cadastro.STATUS_CHOICES}
+_SITUACOES.update({normalizar_texto(valor): valor for valor, _ in Cadastro.STATUS_CHOICES})
+
+
+@dataclass
+class ResultadoImportacao:
+    importados: int = 0
+    categorias_criadas: int = 0
+    erros: int = 0
+    primeiros_erros: list = field(default_factory=list)  # (linha, motivo) para mostrar na tela
+    relatorio: str = ''  # nome no storage do CSV de erros ('' se não houve erro)
+
+
+def _mapear_colunas(cabecalho):
+    """Posição de cada campo no CSV; cabeçalhos desconhecidos são ignorados"""
+    posicoes = {}
+    for indice, nome in enumerate(cabecalho):
+        chave = normalizar_texto(nome)
+        campo = COLUNAS.get(chave) or COLUNAS.get(chave.replace(' ', '')) or chave.replace(' ', '_')
+        if campo in COLUNAS.values() and campo not in posicoes:
+            posicoes[campo] = indice
+    faltando = [rotulo for campo, rotulo in [('nome', 'Nome'), ('cpf_cnpj', 'CPF/CNPJ')] if campo not in posicoes]
+    if faltando:
+        raise ErroImportacao(f"Colunas obrigatórias ausentes: {', '.join(faltando)} (cabeçalho: {'; '.join(cabecalho)}).")
+    return posicoes
+
+
+def _data(texto):
+    for formato in FORMATOS_DATA:
+        try:
+            return datetime.strptime(texto, formato).date()
+        except ValueError:
+            continue
+    raise ValueError(f"Data inválida '{texto}' (use DD/MM/AAAA).")
+
+
+class _Validador:
+    """Valida as linhas contra o que a empresa já tem (carregado uma vez) e o que já passou no arquivo"""
+
+    def __init__(self, empresa, papel):
+        self.empresa = empresa
+        self.papel = papel
+        self.documentos = {}  # dígitos -> 0 (já no banco) ou nº da linha do arquivo
+        self.registros = {}
+        for documento, registro in Cadastro.objects.filter(empresa=empresa).values_list('documento_busca', 'num_registro'):
+            self.documentos[documento] = 0
+            if registro is not None:
+                self.registros[registro] = 0
+        # Campos gravados como vieram (tipo, situação, documento e UF têm validação própria)
+        self.tamanhos = {
+            campo.name: (campo.max_length, campo.verbose_name) for campo in Cadastro._meta.fields
+            if isinstance(campo, models.CharField) and campo.name not in ('tipo_pessoa', 'situacao', 'cpf_cnpj', 'uf')
+        }
+
+    def _repetido(self, conjunto, chave, rotulo):
+        linha = conjunto.get(chave)
+        if linha is None:
+            return None
+        return f"{rotulo} já cadastrado." if linha == 0 else f"{rotulo} repetido no arquivo (linha {linha})."
+
+    def validar(self, numero, dados):
+        """Cadastro pronto para o bulk_create (categoria ainda pelo nome) ou ValueError com todos os problemas da linha"""
+        erros = []
+        cadastro = Cadastro(empresa=self.empresa, papel=self.papel)
+
+        for campo, valor in dados.items():
+            if campo in self.tamanhos and len(valor) > self.tamanhos[campo][0]:
+                erros.append(f"{self.tamanhos[campo][1]} com mais de {self.tamanhos[campo][0]} caracteres.")
+
+        if not dados.get('nome'):
+            erros.append("Nome em branco.")
+        cadastro.nome = dados.get('nome', '')
+
+        digitos = None
+        try:
+            digitos, tipo_pessoa = validar_documento(dados.get('cpf_cnpj', ''))
+            cadastro.cpf_cnpj = formatar_documento(digitos)
+            cadastro.tipo_pessoa = tipo_pessoa
+            repetido = self._repetido(self.documentos, digitos, 'CPF/CNPJ')
+            if repetido:
+                erros.append(repetido)
+        except ValueError as erro:
+            erros.append(str(erro))
+
+        tipo_informado = normalizar_texto(dados.get('tipo_pessoa', ''))
+        if tipo_informado:
+            # 'PF', 'F', 'Pessoa Física'... / 'PJ', 'J', 'Pessoa Jurídica'...
+            if tipo_informado in ('pf', 'f') or 'fisica' in tipo_informado:
+                informado = 'PF'
+            elif tipo_informado in ('pj', 'j') or 'juridica' in tipo_informado:
+                informado = 'PJ'
+            else:
+                informado = None
+                erros.append(f"Tipo de pessoa inválido '{dados['tipo_pessoa']}' (PF ou PJ).")
+            if informado and digitos and informado != cadastro.tipo_pessoa:
+                erros.append(f"Tipo de pessoa {informado} não combina com o documento ({cadastro.tipo_pessoa}).")
+
+        if dados.get('email'):
+            try:
+                validate_email(dados['email'])
+                cadastro.email = dados['email'].lower()
+            except ValidationError:
+                erros.append(f"E-mail inválido '{dados['email']}'.")
+
+        if dados.get('data_nascimento'):
+            try:
+                cadastro.data_nascimento = _data(dados['data_nascimento'])
+            except ValueError as erro:
+                erros.append(str(erro))
+
+        registro = None
+        if dados.get('num_registro'):
+            if dados['num_registro'].isdigit():
+                registro = int(dados['num_registro'])
+                repetido = self._repetido(self.registros, registro, 'Nº de registro')
+                if repetido:
+                    erros.append(repetido)
+                cadastro.num_registro = registro
+            else:
+                erros.append(f"Nº de registro inválido '{dados['num_registro']}'.")
+
+        if dados.get('situacao'):
+            situacao = _SITUACOES.get(normalizar_texto(dados['situacao']))
+            if situacao:
+                cadastro.situacao = situacao
+            else:
+                erros.append(f"Situação inválida '{dados['situacao']}' (Ativo ou Inativo).")
+
+        if dados.get('uf') and len(dados['uf']) != 2:
+            erros.append(f"UF inválida '{dados['uf']}'.")
+
+        if erros:
+            raise ValueError(' '.join(erros))
+
+        for campo in ('razao_social', 'rg', 'inscricao_estadual'):
+            setattr(cadastro, campo, dados.get(campo) or None)
+        for campo in ('celular', 'telefone_fixo', 'cep', 'endereco', 'bairro', 'cidade', 'observacoes'):
+            setattr(cadastro, campo, dados.get(campo, ''))
+        cadastro.uf = dados.get('uf', '').upper()
+        # Fornecedores não têm categoria
+        cadastro.nome_categoria = dados.get('categoria', '') if self.papel != 'FOR' else ''
+
+        self.documentos[digitos] = numero
+        if registro is not None:
+            self.registros[registro] = numero
+        return cadastro
+
+
+def _gravar_lote(empresa, lote, categorias, resultado):
+    """Cria as categorias novas do lote e grava os cadastros (algumas consultas por lote, não por linha)"""
+    novas = {
+        normalizar_texto(cadastro.nome_categoria): cadastro.nome_categoria.strip()
+        for cadastro in lote
+        if cadastro.nome_categoria and normalizar_texto(cadastro.nome_categoria) not in categorias
+    }
+    if novas:
+        CategoriaCliente.objects.bulk_create([CategoriaCliente(empresa=empresa, nome=nome) for nome in novas.values()])
+        # O MySQL não devolve os ids do bulk_create: relê pelo nome
+        for id_, nome in CategoriaCliente.objects.filter(empresa=empresa, nome__in=novas.values()).values_list('id', 'nome'):
+            categorias.setdefault(normalizar_texto(nome), id_)
+        resultado.categorias_criadas += len(novas)
+
+    for cadastro in lote:
+        if cadastro.nome_categoria:
+            cadastro.categoria_id = categorias[normalizar_texto(cadastro.nome_categoria)]
+        cadastro.atualizar_busca()
+    Cadastro.objects.bulk_create(lote, batch_size=len(lote))
+    resultado.importados += len(lote)
+
+
+def importar_csv(empresa, arquivo, papel, delimitador=';', codificacao='utf-8-sig', tamanho_lote=TAMANHO_LOTE):
+    """
+    Importa o CSV de clientes (papel 'CLI') ou fornecedores ('FOR') para a empresa.
+    Linhas inválidas não impedem as outras; ficam no relatório de erros (ResultadoImportacao.relatorio).
+    """
+    leitor = csv.reader(linhas(blocos_texto(arquivo, codificacao)), delimiter=delimitador)
+    cabecalho = next(leitor, None)
+    if not cabecalho:
+        raise ErroImportacao("Arquivo vazio.")
+    posicoes = _mapear_colunas(cabecalho)
+
+    resultado = ResultadoImportacao()
+    relatorio = RelatorioErros(cabecalho)
+    with transaction.atomic():
+        validador = _Validador(empresa, papel)
+        categorias = {
+            normalizar_texto(nome): id_
+            for id_, nome in CategoriaCliente.objects.filter(empresa=empresa).values_list('id', 'nome')
+        }
+        lote = []
+        for valores in leitor:
+            if not any(valor.strip() for valor in valores):
+                continue
+            numero = leitor.line_num
+            dados = {
+                campo: valores[indice].strip()
+                for campo, indice in posicoes.items()
+                if indice < len(valores) and valores[indice].strip()
+            }
+            try:
+                lote.append(validador.validar(numero, dados))
+            except ValueError as erro:
+                relatorio.adicionar(numero, str(erro), valores)
+                continue
+            if len(lote) >= tamanho_lote:
+                _gravar_lote(empresa, lote, categorias, resultado)
+                lote = []
+        if lote:
+            _gravar_lote(empresa, lote, categorias, resultado)
+        # O bulk_create não passa pelo save(): as palavras da busca saem numa passada só
+        PalavraCadastro.objects.indexar_pendentes(empresa.id)
+
+    resultado.erros = relatorio.quantidade
+    resultado.primeiros_erros = relatorio.primeiros
+    resultado.relatorio = relatorio.salvar(empresa.id)
+    return resultado
@@ -0,0 +1,79 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+
+from cadastros.busca import buscar_cadastros
+from cadastros.models import Cadastro, PalavraCadastro
+from core.models import Empresa
+
+NOMES = ['João', 'José', 'Maria', 'Ana', 'Antônio', 'Francisco', 'Cecília', 'Luís', 'Márcia', 'Gonçalo']
+SOBRENOMES = ['Silva', 'Souza', 'Oliveira', 'Conceição', 'Araújo', 'Gonçalves', 'Ribeiro', 'Simões', 'Lopes', 'Pereira']
+
+
+def formatar_cpf(numero):
+    digitos = f'{numero:011d}'
+    return f'{digitos[:3]}.{digitos[3:6]}.{digitos[6:9]}-{digitos[9:]}'
+
+
+class Command(BaseCommand):
+    help = (
+        "Mede a busca de clientes/fornecedores numa empresa temporária com muitos cadastros, "
+        "comparando o icontains antigo com as colunas normalizadas. Tudo é desfeito no final."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--quantidade', type=int, default=100_000, help="Cadastros na empresa de teste (padrão: 100000)")
+        parser.add_argument('--repeticoes', type=int, default=5, help="Execuções de cada busca (vale a mediana)")
+
+    def handle(self, *args, **options):
+        quantidade = options['quantidade']
+        aleatorio = random.Random(42)
+
+        with transaction.atomic():
+            empresa = Empresa.objects.create(nome='Benchmark busca', cnpj=f'BENCH-{time.time_ns()}'[:20])
+            self.stdout.write(f"Criando {quantidade} cadastros...")
+            for inicio in range(0, quantidade, 5000):
+                lote = []
+                for i in range(inicio, min(inicio + 5000, quantidade)):
+                    nome = f'{aleatorio.choice(NOMES)} {aleatorio.choice(SOBRENOMES)} {aleatorio.choice(SOBRENOMES)}'
+                    cadastro = Cadastro(
+                        empresa=empresa, nome=nome, cpf_cnpj=formatar_cpf(i),
+                        email=f'cliente{i}@exemplo.com.br', papel=['CLI', 'FOR', 'AMB'][i % 3],
+                    )
+                    cadastro.atualizar_busca()
+                    lote.append(cadastro)
+                Cadastro.objects.bulk_create(lote)
+            PalavraCadastro.objects.indexar_pendentes(empresa.id)
+
+            base = Cadastro.objects.filter(empresa=empresa)
+            alvo = formatar_cpf(quantidade // 2)
+            termos = ['silva', 'Conceicao', 'maria sou', 'exemplo', alvo, alvo.replace('.', '').replace('-', ''), 'cliente99', 'lveira']
+
+            self.stdout.write(f"{'termo':<20} {'icontains (ms)':>15} {'normalizada (ms)':>17} {'linhas':>14}")
+            for termo in termos:
+                antigo = base.filter(
+                    Q(nome__icontains=termo) | Q(cpf_cnpj__icontains=termo)
+                    | Q(email__icontains=termo) | Q(razao_social__icontains=termo)
+                )
+                novo = buscar_cadastros(base, termo, empresa)
+                tempo_antigo, linhas_antigo = self.medir(antigo, options['repeticoes'])
+                tempo_novo, linhas_novo = self.medir(novo, options['repeticoes'])
+                self.stdout.write(
+                    f"{termo:<20} {tempo_antigo:>15.1f} {tempo_novo:>17.1f} {linhas_antigo:>6} / {linhas_novo:<6}"
+                )
+
+            transaction.set_rollback(True)
+        self.stdout.write(self.style.SUCCESS("Dados de teste descartados."))
+
+    def medir(self, qs, repeticoes):
+        """Mediana em ms da primeira página (50 linhas, como a tela) e o total de linhas encontradas"""
+        tempos = []
+        for _ in range(repeticoes):
+            inicio = time.perf_counter()
+            list(qs[:50])
+            tempos.append((time.perf_counter() - inicio) * 1000)
+        return statistics.median(tempos), qs.count()
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-17 19:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cadastros', '0002_remove_cadastro_rg_ie_cadastro_inscricao_estadual_and_more'),
+        ('core', '0003_parametrosistema'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='cadastro',
+            index=models.Index(fields=['empresa', 'papel', 'situacao', 'nome'], name='cad_emp_papel_sit_nome_idx'),
+        ),
+    ]
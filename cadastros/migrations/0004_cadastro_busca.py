@@ -0,0 +1,52 @@
+# Generated by Django 5.2.8 on 2026-10-17 19:41
+
+from django.db import migrations, models
+
+from cadastros.busca import normalizar_texto, somente_digitos
+
+
+def preencher_busca(apps, schema_editor):
+    Cadastro = apps.get_model('cadastros', 'Cadastro')
+    ultimo_id = 0
+    while True:
+        lote = list(
+            Cadastro.objects.filter(id__gt=ultimo_id).order_by('id')
+            .only('id', 'nome', 'razao_social', 'email', 'cpf_cnpj')[:2000]
+        )
+        if not lote:
+            break
+        for cadastro in lote:
+            cadastro.busca = normalizar_texto(cadastro.nome, cadastro.razao_social, cadastro.email)
+            cadastro.documento_busca = somente_digitos(cadastro.cpf_cnpj)[:20]
+        Cadastro.objects.bulk_update(lote, ['busca', 'documento_busca'], batch_size=500)
+        ultimo_id = lote[-1].id
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cadastros', '0003_indices_compostos'),
+        ('core', '0004_usuario_login_minusculo'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cadastro',
+            name='busca',
+            field=models.CharField(blank=True, editable=False, max_length=500),
+        ),
+        migrations.AddField(
+            model_name='cadastro',
+            name='documento_busca',
+            field=models.CharField(blank=True, editable=False, max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name='cadastro',
+            index=models.Index(fields=['empresa', 'busca'], name='cad_emp_busca_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cadastro',
+            index=models.Index(fields=['empresa', 'documento_busca'], name='cad_emp_documento_busca_idx'),
+        ),
+        migrations.RunPython(preencher_busca, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-17 19:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cadastros', '0004_cadastro_busca'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cadastro',
+            name='foto_hash',
+            field=models.CharField(blank=True, editable=False, help_text='Miniaturas em core.imagens', max_length=64),
+        ),
+    ]
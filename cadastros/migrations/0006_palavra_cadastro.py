@@ -0,0 +1,48 @@
+# Generated by Django 5.2.8 on 2026-10-17 20:34
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+from cadastros.busca import separar_palavras
+
+
+def preencher_palavras(apps, schema_editor):
+    Cadastro = apps.get_model('cadastros', 'Cadastro')
+    PalavraCadastro = apps.get_model('cadastros', 'PalavraCadastro')
+    ultimo_id = 0
+    while True:
+        lote = list(
+            Cadastro.objects.filter(id__gt=ultimo_id).order_by('id').values_list('id', 'empresa_id', 'busca')[:2000]
+        )
+        if not lote:
+            break
+        PalavraCadastro.objects.bulk_create([
+            PalavraCadastro(empresa_id=empresa_id, cadastro_id=cadastro_id, palavra=palavra)
+            for cadastro_id, empresa_id, busca in lote
+            for palavra in separar_palavras(busca)
+        ], batch_size=2000)
+        ultimo_id = lote[-1][0]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cadastros', '0005_cadastro_foto_hash'),
+        ('core', '0005_empresa_miniaturas'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PalavraCadastro',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('palavra', models.CharField(max_length=40)),
+                ('cadastro', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='palavras', to='cadastros.cadastro')),
+                ('empresa', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.empresa', verbose_name='Empresa')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['empresa', 'palavra'], name='cad_palavra_emp_palavra_idx')],
+            },
+        ),
+        migrations.RunPython(preencher_palavras, migrations.RunPython.noop),
+    ]
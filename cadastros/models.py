@@ -1,5 +1,8 @@
 from django.db import models
-from core.models import ModeloSaaS
+from django.db.models import Exists, OuterRef
+from core.imagens import atualizar_hash
+from core.models import ModeloSaaS, ModeloSaaSManager
+from .busca import TAMANHO_BUSCA, TAMANHO_PALAVRA, normalizar_texto, separar_palavras, somente_digitos
 
 class CategoriaCliente(ModeloSaaS):
     """Ex: Sócio Ouro, Aluno Manhã, Cliente Varejo"""
@@ -70,13 +73,85 @@ class Cadastro(ModeloSaaS):
 
     situacao = models.CharField(max_length=10, choices=STATUS_CHOICES, default='ATIVO')
     foto = models.ImageField(upload_to='fotos_cadastros/', null=True, blank=True)
+    foto_hash = models.CharField(max_length=64, blank=True, editable=False, help_text="Miniaturas em core.imagens")
     observacoes = models.TextField(blank=True)
 
+    # --- Busca (preenchidos no save; ver cadastros.busca) ---
+    busca = models.CharField(max_length=TAMANHO_BUSCA, blank=True, editable=False)
+    documento_busca = models.CharField(max_length=20, blank=True, editable=False)
+
     def __str__(self):
         return self.nome 
 
+    def atualizar_busca(self):
+        """Recalcula as colunas de busca (chame antes de bulk_create/bulk_update, que não passam pelo save)"""
+        self.busca = normalizar_texto(self.nome, self.razao_social, self.email)
+        self.documento_busca = somente_digitos(self.cpf_cnpj)[:20]
+
+    def save(self, *args, **kwargs):
+        self.atualizar_busca()
+        atualizar_hash(self, 'foto', 'foto_hash', 'avatar')
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = {*update_fields, 'busca', 'documento_busca', 'foto_hash'}
+        super().save(*args, **kwargs)
+        if update_fields is None or {'nome', 'razao_social', 'email'} & set(update_fields):
+            PalavraCadastro.objects.indexar([self])
+
     class Meta:
         verbose_name = "Cadastro"
         verbose_name_plural = "Cadastros"
         ordering = ['nome']
         unique_together = [['empresa', 'cpf_cnpj']] # CPF/CNPJ único por empresa
+        indexes = [
+            # Listas de clientes/fornecedores filtradas por situação e ordenadas por nome
+            models.Index(fields=['empresa', 'papel', 'situacao', 'nome'], name='cad_emp_papel_sit_nome_idx'),
+            # Busca por prefixo de nome e de documento (cadastros.busca)
+            models.Index(fields=['empresa', 'busca'], name='cad_emp_busca_idx'),
+            models.Index(fields=['empresa', 'documento_busca'], name='cad_emp_documento_busca_idx'),
+        ]
+
+
+class PalavraCadastroManager(ModeloSaaSManager):
+
+    def indexar(self, cadastros):
+        """Refaz as palavras dos cadastros (com id, empresa_id e a coluna busca já calculada)"""
+        cadastros = list(cadastros)
+        self.filter(cadastro_id__in=[cadastro.id for cadastro in cadastros]).delete()
+        self.bulk_create([
+            self.model(empresa_id=cadastro.empresa_id, cadastro_id=cadastro.id, palavra=palavra)
+            for cadastro in cadastros
+            for palavra in separar_palavras(cadastro.busca)
+        ], batch_size=2000)
+
+    def indexar_pendentes(self, empresa_id, tamanho_lote=2000):
+        """
+        Indexa os cadastros da empresa que ainda não têm palavras. Chame depois de um
+        bulk_create de Cadastro, que não passa pelo save(). Retorna quantos foram indexados.
+        """
+        pendentes = (
+            Cadastro.objects.filter(empresa_id=empresa_id).exclude(busca='')
+            .filter(~Exists(self.filter(cadastro_id=OuterRef('pk'))))
+            .only('id', 'empresa_id', 'busca').order_by('id')
+        )
+        total, ultimo_id = 0, 0
+        while True:
+            lote = list(pendentes.filter(id__gt=ultimo_id)[:tamanho_lote])
+            if not lote:
+                return total
+            self.indexar(lote)
+            total += len(lote)
+            ultimo_id = lote[-1].id
+
+
+class PalavraCadastro(ModeloSaaS):
+    """Uma palavra da coluna busca do Cadastro: busca por começo de palavra usando índice (ver cadastros.busca)"""
+    cadastro = models.ForeignKey(Cadastro, on_delete=models.CASCADE, related_name='palavras')
+    palavra = models.CharField(max_length=TAMANHO_PALAVRA)
+
+    objects = PalavraCadastroManager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['empresa', 'palavra'], name='cad_palavra_emp_palavra_idx'),
+        ]
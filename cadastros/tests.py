@@ -1,3 +1,277 @@
-from django.test import TestCase
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from core.importacao import VALIDADE_RELATORIO, storage_relatorios
+from core.models import Empresa, Usuario
+from financeiro.tests import analisar_tabelas
+from .busca import buscar_cadastros
+from .documentos import cnpj_valido, cpf_valido, validar_documento
+from .importacao import importar_csv
+from .models import Cadastro, CategoriaCliente, PalavraCadastro
+
+
+class IndicesCadastroTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.empresas = [Empresa.objects.create(nome=f'Empresa {i}', cnpj=f'00.000.000/000{i}-00') for i in range(3)]
+        Cadastro.objects.bulk_create([
+            Cadastro(
+                empresa=empresa, nome=f'Pessoa {i:05d}', cpf_cnpj=f'{i:011d}',
+                papel=['CLI', 'FOR', 'AMB'][i % 3], situacao='ATIVO' if i % 4 else 'INATIVO',
+            )
+            for empresa in cls.empresas
+            for i in range(2000)
+        ])
+        analisar_tabelas(Cadastro)
+
+    def test_lista_de_clientes_usa_indice_empresa_papel_situacao_nome(self):
+        qs = Cadastro.objects.filter(empresa=self.empresas[0], papel='CLI', situacao='ATIVO').order_by('nome')
+        plano = qs.explain()
+        self.assertIn('cad_emp_papel_sit_nome_idx', plano, plano)
+
+
+class BuscaCadastroTests(TestCase):
+    """Busca por colunas normalizadas (sem acento, sem pontuação no documento) e por relevância"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.empresa = Empresa.objects.create(nome='Empresa Busca', cnpj='21.212.121/0001-21')
+        dados = [
+            ('João da Silva', '123.456.789-01', 'joao@exemplo.com', None),
+            ('Silvana Souza', '987.654.321-00', None, None),
+            ('Ana Silveira', '111.222.333-44', None, None),
+            ('Casa do Silva', '12.345.678/0001-90', None, None),
+            ('Maria Lopes', '12345678901', 'maria@lojasilva.com', None),
+            ('Maria Souza Lima', '222.333.444-55', None, None),
+            ('Mercado Bom Preço', '98.765.432/0001-10', None, 'Comercial Ferreira Ltda'),
+        ]
+        cls.cadastros = {
+            nome: Cadastro.objects.create(empresa=cls.empresa, nome=nome, cpf_cnpj=documento, email=email, razao_social=razao)
+            for nome, documento, email, razao in dados
+        }
+
+    def buscar(self, termo):
+        qs = Cadastro.objects.filter(empresa=self.empresa)
+        return [cadastro.nome for cadastro in buscar_cadastros(qs, termo, self.empresa)]
+
+    def test_colunas_preenchidas_no_save(self):
+        cadastro = self.cadastros['João da Silva']
+        self.assertEqual(cadastro.busca, 'joao da silva joao exemplo com')
+        self.assertEqual(cadastro.documento_busca, '12345678901')
+        self.assertEqual(
+            sorted(cadastro.palavras.values_list('palavra', flat=True)), ['com', 'da', 'exemplo', 'joao', 'silva'],
+        )
+
+        cadastro.nome = 'João Silva Júnior'
+        cadastro.save(update_fields=['nome'])
+        cadastro.refresh_from_db()
+        self.assertTrue(cadastro.busca.startswith('joao silva junior'))
+        self.assertIn('junior', cadastro.palavras.values_list('palavra', flat=True))
+        self.assertNotIn('da', cadastro.palavras.values_list('palavra', flat=True))
+
+    def test_bulk_create_indexado_depois(self):
+        novo = Cadastro(empresa=self.empresa, nome='Pedro Lote', cpf_cnpj='333.444.555-66')
+        novo.atualizar_busca()
+        Cadastro.objects.bulk_create([novo])
+        self.assertFalse(PalavraCadastro.objects.filter(cadastro__nome='Pedro Lote').exists())
+
+        self.assertEqual(PalavraCadastro.objects.indexar_pendentes(self.empresa.id), 1)
+        self.assertEqual(self.buscar('lote'), ['Pedro Lote'])
+        self.assertEqual(PalavraCadastro.objects.indexar_pendentes(self.empresa.id), 0)
+
+    def test_documento_com_ou_sem_pontuacao(self):
+        self.assertEqual(self.buscar('123.456.789-01')[:2], ['João da Silva', 'Maria Lopes'])
+        self.assertEqual(self.buscar('12345678901')[:2], ['João da Silva', 'Maria Lopes'])
+        self.assertIn('Casa do Silva', self.buscar('12.345'))
+
+    def test_ordem_prefixo_e_palavra(self):
+        # 'Silvana' começa com o termo; os outros têm uma palavra começando por ele.
+        # 'maria@lojasilva.com' só tem o termo no meio de uma palavra: fica de fora enquanto houver achados indexados
+        self.assertEqual(self.buscar('SILV'), ['Silvana Souza', 'Ana Silveira', 'Casa do Silva', 'João da Silva'])
+        self.assertEqual(self.buscar('joao silva'), ['João da Silva'])
+        self.assertEqual(self.buscar('silva joao'), ['João da Silva'])
+        self.assertEqual(self.buscar('JOÃO'), ['João da Silva'])
+
+    def test_palavra_do_meio_razao_social_e_email(self):
+        self.assertEqual(self.buscar('souza'), ['Maria Souza Lima', 'Silvana Souza'])
+        self.assertEqual(self.buscar('maria lim'), ['Maria Souza Lima'])
+        self.assertEqual(self.buscar('ferreira'), ['Mercado Bom Preço'])
+        self.assertEqual(self.buscar('comercial ltda'), ['Mercado Bom Preço'])
+        self.assertEqual(self.buscar('lojasilva'), ['Maria Lopes'])
+        self.assertEqual(self.buscar('joao@exemplo.com'), ['João da Silva'])
+
+    def test_trecho_no_meio_quando_nada_indexado_acha(self):
+        self.assertEqual(self.buscar('lva'), ['Casa do Silva', 'João da Silva', 'Maria Lopes', 'Silvana Souza'])
+        self.assertEqual(self.buscar('ouza li'), ['Maria Souza Lima'])
+        self.assertEqual(self.buscar('xyz'), [])
+
+    def test_nome_comecando_pelo_termo_vem_primeiro(self):
+        for nome, documento in (('Maria Aparecida Lopes', '555.444.333-22'), ('Maria Lopes Filha', '999.888.777-66')):
+            Cadastro.objects.create(empresa=self.empresa, nome=nome, cpf_cnpj=documento)
+        self.assertEqual(self.buscar('maria lopes'), ['Maria Lopes', 'Maria Lopes Filha', 'Maria Aparecida Lopes'])
+
+    def test_palavras_de_outra_empresa_nao_entram(self):
+        outra = Empresa.objects.create(nome='Outra', cnpj='31.313.131/0001-31')
+        Cadastro.objects.create(empresa=outra, nome='Silvio Outro', cpf_cnpj='444.555.666-77')
+        self.assertNotIn('Silvio Outro', self.buscar('silvio'))
+
+def gerar_cpf(numero):
+    """CPF válido (formatado) a partir dos 9 primeiros dígitos"""
+    base = f'{numero:09d}'
+    digitos = next(base + f'{dv:02d}' for dv in range(100) if cpf_valido(base + f'{dv:02d}'))
+    return f'{digitos[:3]}.{digitos[3:6]}.{digitos[6:9]}-{digitos[9:]}'
+
+
+class ImportacaoCadastrosTests(TestCase):
+    """Importação de clientes/fornecedores em CSV: validação em memória, lotes e relatório de erros"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.pasta = tempfile.mkdtemp()
+        cls.media = override_settings(
+            MEDIA_ROOT=os.path.join(cls.pasta, 'media'),
+            RELATORIOS_IMPORTACAO_ROOT=os.path.join(cls.pasta, 'privado'),
+        )
+        cls.media.enable()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.media.disable()
+        shutil.rmtree(cls.pasta, ignore_errors=True)
+        super().tearDownClass()
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.empresa = Empresa.objects.create(nome='Empresa Importação', cnpj='23.232.323/0001-23')
+        cls.usuario = Usuario.objects.create_user('importacao', password='x', empresa=cls.empresa)
+        cls.socio = CategoriaCliente.objects.create(empresa=cls.empresa, nome='Sócio Ouro')
+        Cadastro.objects.create(empresa=cls.empresa, nome='Já Existe', cpf_cnpj='529.982.247-25', num_registro=7)
+
+    def arquivo(self, conteudo):
+        return SimpleUploadedFile('cadastros.csv', conteudo.encode('utf-8'))
+
+    def test_digitos_verificadores(self):
+        self.assertTrue(cpf_valido('52998224725'))
+        self.assertFalse(cpf_valido('52998224724'))
+        self.assertFalse(cpf_valido('11111111111'))
+        self.assertTrue(cnpj_valido('11222333000181'))
+        self.assertFalse(cnpj_valido('11222333000180'))
+        self.assertEqual(validar_documento('11.222.333/0001-81'), ('11222333000181', 'PJ'))
+        with self.assertRaisesMessage(ValueError, "CPF inválido"):
+            validar_documento('123.456.789-00')
+
+    def test_validas_entram_e_invalidas_vao_para_o_relatorio(self):
+        conteudo = (
+            "Nome;CPF/CNPJ;E-mail;Categoria;Registro;Nascimento\n"
+            "Maria;111.444.777-35;MARIA@EXEMPLO.COM;sócio ouro;10;05/02/1990\n"
+            "Loja;11222333000181;;Varejo;;\n"
+            "Repetida;529.982.247-25;;;;\n"
+            "Dígito errado;111.444.777-36;;;;\n"
+            "Duplicada no arquivo;11144477735;;;;\n"
+            "Sem e-mail válido;123.456.789-09;nao-e-email;;7;31/02/2000\n"
+            ";;;;;\n"
+        )
+        resultado = importar_csv(self.empresa, self.arquivo(conteudo), 'CLI')
+
+        self.assertEqual((resultado.importados, resultado.erros, resultado.categorias_criadas), (2, 4, 1))
+        maria = Cadastro.objects.get(empresa=self.empresa, nome='Maria')
+        self.assertEqual((maria.cpf_cnpj, maria.email, maria.categoria, maria.num_registro), ('111.444.777-35', 'maria@exemplo.com', self.socio, 10))
+        loja = Cadastro.objects.get(empresa=self.empresa, nome='Loja')
+        self.assertEqual((loja.tipo_pessoa, loja.cpf_cnpj, loja.categoria.nome, loja.documento_busca), ('PJ', '11.222.333/0001-81', 'Varejo', '11222333000181'))
+
+        erros = dict(resultado.primeiros_erros)
+        self.assertEqual(erros[4], "CPF/CNPJ já cadastrado.")
+        self.assertIn("dígito verificador", erros[5])
+        self.assertEqual(erros[6], "CPF/CNPJ repetido no arquivo (linha 2).")
+        self.assertIn("E-mail inválido", erros[7])
+        self.assertIn("Nº de registro já cadastrado.", erros[7])
+        self.assertIn("Data inválida", erros[7])
+
+        # O relatório tem as colunas do arquivo original, para corrigir e reimportar
+        with storage_relatorios().open(resultado.relatorio) as relatorio:
+            linhas = relatorio.read().decode('utf-8-sig').splitlines()
+        self.assertEqual(linhas[0], 'Linha;Erro;Nome;CPF/CNPJ;E-mail;Categoria;Registro;Nascimento')
+        self.assertEqual(len(linhas), 5)
+        self.assertTrue(linhas[1].endswith(';Repetida;529.982.247-25;;;;'))
+
+    def test_consultas_nao_crescem_com_o_arquivo(self):
+        def csv_com(inicio, quantidade):
+            linhas = ''.join(f"Pessoa {i};{gerar_cpf(i)};Categoria {inicio}-{i % 3}\n" for i in range(inicio, inicio + quantidade))
+            return self.arquivo("nome;cpf_cnpj;categoria\n" + linhas)
+
+        # Cada arquivo traz categorias novas: mede também a criação delas
+        consultas = []
+        for inicio, quantidade in ((1000, 5), (2000, 30)):
+            with CaptureQueriesContext(connection) as capturadas:
+                importar_csv(self.empresa, csv_com(inicio, quantidade), 'CLI')
+            consultas.append(len(capturadas))
+        # (o SQLite limita as variáveis por INSERT; 30 cadastros ainda cabem num só)
+        self.assertEqual(consultas[0], consultas[1])
+        self.assertEqual(Cadastro.objects.filter(empresa=self.empresa).count(), 36)
+
+    def test_fornecedor_ignora_categoria_e_view_oferece_relatorio(self):
+        self.client.force_login(self.usuario)
+        conteudo = "Nome;CNPJ;Categoria\nFornecedor;11.444.777/0001-61;Nova\nErrado;1;\n"
+        resposta = self.client.post('/cadastros/fornecedores/importar/', {
+            'arquivo': self.arquivo(conteudo), 'delimitador': ';', 'codificacao': 'utf-8-sig',
+        })
+
+        self.assertContains(resposta, '1 linha(s) não importada(s)')
+        fornecedor = Cadastro.objects.get(empresa=self.empresa, nome='Fornecedor')
+        self.assertEqual((fornecedor.papel, fornecedor.categoria), ('FOR', None))
+        self.assertFalse(CategoriaCliente.objects.filter(nome='Nova').exists())
+
+        relatorio = self.client.get('/cadastros/importar/erros/')
+        self.assertEqual(relatorio['Content-Disposition'], 'attachment; filename="erros_importacao.csv"')
+        self.assertIn('11 ou 14 dígitos', b''.join(relatorio.streaming_content).decode('utf-8-sig'))
+
+    def importar_com_erro(self):
+        return importar_csv(self.empresa, self.arquivo("Nome;CPF/CNPJ\nErrado;1\n"), 'CLI').relatorio
+
+    def test_relatorio_fica_fora_da_media_e_so_a_empresa_baixa(self):
+        nome = self.importar_com_erro()
+        caminho = storage_relatorios().path(nome)
+        self.assertTrue(os.path.exists(caminho))
+        self.assertFalse(caminho.startswith(os.path.join(self.pasta, 'media')))
+
+        # Usuário de outra empresa com o nome do arquivo na sessão não consegue baixar
+        outra = Empresa.objects.create(nome='Outra', cnpj='34.343.434/0001-34')
+        self.client.force_login(Usuario.objects.create_user('intruso', password='x', empresa=outra))
+        sessao = self.client.session
+        sessao['relatorio_importacao'] = nome
+        sessao.save()
+        self.assertRedirects(self.client.get('/cadastros/importar/erros/'), '/cadastros/clientes/', fetch_redirect_response=False)
+
+    def test_relatorios_vencidos_e_substituidos_sao_apagados(self):
+        self.client.force_login(self.usuario)
+
+        def enviar():
+            self.client.post('/cadastros/clientes/importar/', {
+                'arquivo': self.arquivo("Nome;CPF/CNPJ\nErrado;1\n"), 'delimitador': ';', 'codificacao': 'utf-8-sig',
+            })
+
+        storage = storage_relatorios()
+        enviar()
+        primeiro = self.client.session['relatorio_importacao']
+        enviar()
+        segundo = self.client.session['relatorio_importacao']
+        self.assertFalse(storage.exists(primeiro))
+
+        # Vencido: a view recusa e a próxima importação de qualquer usuário da empresa apaga
+        vencido = (timezone.now() - VALIDADE_RELATORIO - timedelta(minutes=1)).timestamp()
+        os.utime(storage.path(segundo), (vencido, vencido))
+        self.assertRedirects(self.client.get('/cadastros/importar/erros/'), '/cadastros/clientes/', fetch_redirect_response=False)
+        terceiro = self.importar_com_erro()
+        self.assertFalse(storage.exists(segundo))
+        self.assertTrue(storage.exists(terceiro))
 
-# Create your tests here.
@@ -5,15 +5,20 @@ urlpatterns = [
     # --- CLIENTES (Sócios/Alunos) ---
     path('clientes/', views.lista_clientes, name='lista_clientes'),
     path('clientes/novo/', views.novo_cliente, name='novo_cliente'),
+    path('clientes/exportar/', views.exportar_clientes, name='exportar_clientes'),
+    path('clientes/importar/', views.importar_cadastros, {'papel': 'CLI'}, name='importar_clientes'),
 
     # --- FORNECEDORES ---
     path('fornecedores/', views.lista_fornecedores, name='lista_fornecedores'),
     path('fornecedores/novo/', views.novo_fornecedor, name='novo_fornecedor'),
+    path('fornecedores/exportar/', views.exportar_fornecedores, name='exportar_fornecedores'),
+    path('fornecedores/importar/', views.importar_cadastros, {'papel': 'FOR'}, name='importar_fornecedores'),
 
     # --- GERAL ---
     # A edição é a mesma para os dois, pois a view sabe redirecionar de volta
     path('editar/<int:id>/', views.editar_cadastro, name='editar_cadastro'),
     path('excluir/<int:id>/', views.excluir_cadastro, name='excluir_cadastro'),
+    path('importar/erros/', views.relatorio_importacao, name='relatorio_importacao'),
     
     # Rota padrão: se acessar /cadastros/, vai para clientes
     path('', views.lista_clientes, name='lista_cadastros_padrao'),
@@ -2,16 +2,20 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.db.models import Q
+from django.http import FileResponse
+from core.exportacao import iterar_por_chave, resposta_csv
+from core.importacao import ErroImportacao, descartar_relatorio, relatorio_disponivel, storage_relatorios
+from .busca import buscar_cadastros
+from .importacao import importar_csv
 from .models import Cadastro, CategoriaCliente
-from .forms import CadastroForm
+from .forms import CadastroForm, ImportacaoCadastrosForm
 
 # ==================================================
 # GESTÃO DE CLIENTES (Sócios / Alunos / Clientes)
 # ==================================================
 
-@login_required
-def lista_clientes(request):
-    # Filtra apenas quem é Cliente ou Ambos (CLI + AMB)
+def filtrar_clientes(request):
+    """Clientes ou Ambos (CLI + AMB) com os filtros da URL; usado pela lista e pela exportação"""
     qs = Cadastro.objects.filter(empresa=request.user.empresa).filter(Q(papel='CLI') | Q(papel='AMB'))
     
     # --- Filtros da URL ---
@@ -20,8 +24,8 @@ def lista_clientes(request):
     status = request.GET.get('status')
 
     if q:
-        # Busca por Nome, CPF ou Email
-        qs = qs.filter(Q(nome__icontains=q) | Q(cpf_cnpj__icontains=q) | Q(email__icontains=q))
+        # Busca por Nome, CPF ou Email (colunas normalizadas, por relevância)
+        qs = buscar_cadastros(qs, q, request.user.empresa)
     
     if categoria_id:
         qs = qs.filter(categoria_id=categoria_id)
@@ -29,17 +33,36 @@ def lista_clientes(request):
     if status:
         qs = qs.filter(situacao=status)
 
+    return qs, {'filtro_q': q, 'filtro_cat': categoria_id, 'filtro_status': status}
+
+@login_required
+def lista_clientes(request):
+    qs, filtros = filtrar_clientes(request)
+
     # Carrega categorias para o dropdown de filtro
     categorias = CategoriaCliente.objects.filter(empresa=request.user.empresa)
     
     return render(request, 'cadastros/lista_clientes.html', {
-        'cadastros': qs,
+        'cadastros': qs.select_related('categoria'),
         'categorias': categorias,
-        'filtro_q': q,
-        'filtro_cat': categoria_id,
-        'filtro_status': status
+        **filtros,
     })
 
+@login_required
+def exportar_clientes(request):
+    qs, _ = filtrar_clientes(request)
+    situacoes = dict(Cadastro.STATUS_CHOICES)
+
+    def linhas():
+        quantidade = 0
+        campos = ['nome', 'cpf_cnpj', 'email', 'celular', 'categoria__nome', 'situacao']
+        for nome, documento, email, celular, categoria, situacao in iterar_por_chave(qs, campos, 'nome'):
+            quantidade += 1
+            yield [nome, documento or '', email or '', celular or '', categoria or '', situacoes.get(situacao, situacao)]
+        yield [f'TOTAL: {quantidade} clientes', '', '', '', '', '']
+
+    return resposta_csv('clientes.csv', ['Nome', 'CPF/CNPJ', 'E-mail', 'Celular', 'Categoria', 'Situação'], linhas())
+
 @login_required
 def novo_cliente(request):
     if request.method == 'POST':
@@ -67,9 +90,8 @@ def novo_cliente(request):
 # GESTÃO DE FORNECEDORES
 # ==================================================
 
-@login_required
-def lista_fornecedores(request):
-    # Filtra apenas Fornecedores ou Ambos (FOR + AMB)
+def filtrar_fornecedores(request):
+    """Fornecedores ou Ambos (FOR + AMB) com os filtros da URL; usado pela lista e pela exportação"""
     qs = Cadastro.objects.filter(empresa=request.user.empresa).filter(Q(papel='FOR') | Q(papel='AMB'))
     
     # --- Filtros da URL ---
@@ -77,18 +99,38 @@ def lista_fornecedores(request):
     status = request.GET.get('status')
 
     if q:
-        # Busca por Nome, CPF/CNPJ ou Razão Social
-        qs = qs.filter(Q(nome__icontains=q) | Q(cpf_cnpj__icontains=q) | Q(razao_social__icontains=q))
+        # Busca por Nome, CPF/CNPJ ou Razão Social (colunas normalizadas, por relevância)
+        qs = buscar_cadastros(qs, q, request.user.empresa)
         
     if status:
         qs = qs.filter(situacao=status)
 
+    return qs, {'filtro_q': q, 'filtro_status': status}
+
+@login_required
+def lista_fornecedores(request):
+    qs, filtros = filtrar_fornecedores(request)
+
     return render(request, 'cadastros/lista_fornecedores.html', {
         'cadastros': qs,
-        'filtro_q': q,
-        'filtro_status': status
+        **filtros,
     })
 
+@login_required
+def exportar_fornecedores(request):
+    qs, _ = filtrar_fornecedores(request)
+    situacoes = dict(Cadastro.STATUS_CHOICES)
+
+    def linhas():
+        quantidade = 0
+        campos = ['nome', 'razao_social', 'cpf_cnpj', 'email', 'celular', 'situacao']
+        for nome, razao_social, documento, email, celular, situacao in iterar_por_chave(qs, campos, 'nome'):
+            quantidade += 1
+            yield [nome, razao_social or '', documento or '', email or '', celular or '', situacoes.get(situacao, situacao)]
+        yield [f'TOTAL: {quantidade} fornecedores', '', '', '', '', '']
+
+    return resposta_csv('fornecedores.csv', ['Nome', 'Razão Social', 'CPF/CNPJ', 'E-mail', 'Celular', 'Situação'], linhas())
+
 @login_required
 def novo_fornecedor(request):
     if request.method == 'POST':
@@ -151,4 +193,58 @@ def excluir_cadastro(request, id):
         cadastro.delete()
         messages.success(request, "Cadastro excluído com sucesso.")
     
-    return redirect(tipo_redirect)
\ No newline at end of file
+    return redirect(tipo_redirect)
+
+
+# ==================================================
+# IMPORTAÇÃO EM LOTE (CSV)
+# ==================================================
+
+@login_required
+def importar_cadastros(request, papel):
+    """Importa clientes (papel='CLI') ou fornecedores ('FOR') de um CSV; a URL define o papel"""
+    url_voltar = 'lista_clientes' if papel == 'CLI' else 'lista_fornecedores'
+    titulo = 'Importar Clientes' if papel == 'CLI' else 'Importar Fornecedores'
+    resultado = None
+
+    if request.method == 'POST':
+        form = ImportacaoCadastrosForm(request.POST, request.FILES)
+        if form.is_valid():
+            try:
+                resultado = importar_csv(
+                    request.user.empresa, form.cleaned_data['arquivo'], papel,
+                    delimitador=form.cleaned_data['delimitador'], codificacao=form.cleaned_data['codificacao'],
+                )
+            except ErroImportacao as erro:
+                messages.error(request, f"Arquivo não importado: {erro}")
+            else:
+                # Só o último relatório do usuário fica disponível para download; o anterior é apagado
+                descartar_relatorio(request.session.get('relatorio_importacao'))
+                request.session['relatorio_importacao'] = resultado.relatorio
+                aviso = f"{resultado.importados} cadastro(s) importado(s)."
+                if resultado.categorias_criadas:
+                    aviso += f" {resultado.categorias_criadas} categoria(s) nova(s) criada(s)."
+                messages.success(request, aviso)
+                if not resultado.erros:
+                    return redirect(url_voltar)
+    else:
+        form = ImportacaoCadastrosForm()
+
+    return render(request, 'cadastros/importar.html', {
+        'form': form,
+        'titulo': titulo,
+        'papel': papel,
+        'url_voltar': url_voltar,
+        'resultado': resultado,
+    })
+
+@login_required
+def relatorio_importacao(request):
+    """Baixa o CSV com as linhas rejeitadas na última importação do usuário"""
+    nome = request.session.get('relatorio_importacao')
+    # O nome vem da sessão, mas confere a pasta da empresa e a validade por garantia
+    if not relatorio_disponivel(nome, request.user.empresa_id):
+        messages.error(request, "Nenhum relatório de erros disponível.")
+        return redirect('lista_clientes')
+    return FileResponse(storage_relatorios().open(nome, 'rb'), as_attachment=True, filename='erros_importacao.csv', content_type='text/csv; charset=utf-8')
+
@@ -9,6 +9,11 @@ class ParametroSistemaAdmin(admin.ModelAdmin):
     list_filter = ('empresa', 'chave')
     search_fields = ('chave', 'valor')
 
+    def get_queryset(self, request):
+        if request.user.is_superuser:
+            return self.model.objects.sem_escopo()  # o superusuário enxerga todas as empresas
+        return super().get_queryset(request)
+
 # 1. Configuração para gerenciar Empresas
 @admin.register(Empresa)
 class EmpresaAdmin(admin.ModelAdmin):
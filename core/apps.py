@@ -2,4 +2,9 @@ from django.apps import AppConfig
 
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'core'
\ No newline at end of file
+    name = 'core'
+
+    def ready(self):
+        # Conecta os sinais que limpam o cache de parâmetros e de usuários da sessão
+        # e o que instala a medição de consultas em cada conexão (core.medicao)
+        from . import backends, medicao, parametros  # noqa: F401
@@ -0,0 +1,86 @@
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+from django.db.models import Q
+from django.db.models.functions import Lower
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Empresa
+
+Usuario = get_user_model()
+
+# Quanto tempo o usuário da sessão (com a empresa) fica no cache; salvar usuário ou empresa limpa antes disso
+USUARIO_CACHE_SEGUNDOS = 10 * 60
+
+
+def _chave_usuario(user_id):
+    return f'usuario_sessao:{user_id}'
+
+
+class EmpresaBackend(ModelBackend):
+    """
+    Login por usuário ou e-mail (sem diferenciar maiúsculas) e usuário da sessão
+    carregado junto com a empresa e guardado no cache: uma página autenticada típica
+    não consulta o banco para autenticar.
+    """
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        if username is None:
+            username = kwargs.get(Usuario.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+
+        usuario = self.buscar_por_login(username)
+        if usuario is None:
+            # Mesmo custo de um login existente, para não revelar pelo tempo quais usuários existem
+            Usuario().set_password(password)
+            return None
+        if usuario.check_password(password) and self.user_can_authenticate(usuario):
+            return usuario
+        return None
+
+    def buscar_por_login(self, login):
+        """
+        Usuário cujo username ou e-mail é `login` (índices em LOWER(username) e LOWER(email)).
+        O username exato tem prioridade; um e-mail repetido em vários usuários não identifica ninguém.
+        """
+        login = login.strip()
+        candidatos = list(
+            Usuario._default_manager
+            .alias(username_minusculo=Lower('username'), email_minusculo=Lower('email'))
+            .filter(Q(username_minusculo=login.lower()) | Q(email_minusculo=login.lower()))
+        )
+        exatos = [usuario for usuario in candidatos if usuario.username == login]
+        if exatos:
+            return exatos[0]
+        return candidatos[0] if len(candidatos) == 1 else None
+
+    def get_user(self, user_id):
+        chave = _chave_usuario(user_id)
+        usuario = cache.get(chave)
+        if usuario is None:
+            try:
+                usuario = Usuario._default_manager.select_related('empresa').get(pk=user_id)
+            except Usuario.DoesNotExist:
+                return None
+            cache.set(chave, usuario, USUARIO_CACHE_SEGUNDOS)
+        return usuario if self.user_can_authenticate(usuario) else None
+
+    async def aget_user(self, user_id):
+        # O ModelBackend tem uma versão própria que iria direto ao banco, sem cache nem empresa
+        return await sync_to_async(self.get_user)(user_id)
+
+
+@receiver([post_save, post_delete], sender=Usuario)
+def _usuario_alterado(sender, instance, **kwargs):
+    cache.delete(_chave_usuario(instance.pk))
+
+
+@receiver([post_save, post_delete], sender=Empresa)
+def _empresa_alterada(sender, instance, created=False, **kwargs):
+    # O usuário em cache carrega a empresa (ex: Empresa.ativo), então os usuários dela saem do cache
+    if not created:
+        ids = Usuario._default_manager.filter(empresa_id=instance.pk).values_list('pk', flat=True)
+        cache.delete_many([_chave_usuario(user_id) for user_id in ids])
@@ -0,0 +1,26 @@
+"""
+Empresa (tenant) da requisição atual.
+
+O EmpresaAtualMiddleware define a empresa do usuário logado no começo da requisição;
+os managers de ModeloSaaS leem daqui para filtrar as consultas automaticamente.
+Fora de uma requisição (shell, comandos, migrações) não há empresa e nada é filtrado.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+_empresa_atual = ContextVar('empresa_atual', default=None)
+
+
+def empresa_atual():
+    """Empresa da requisição em andamento, ou None"""
+    return _empresa_atual.get()
+
+
+@contextmanager
+def usando_empresa(empresa):
+    """Executa o bloco com `empresa` como tenant atual (usado pelo middleware, comandos e testes)"""
+    token = _empresa_atual.set(empresa)
+    try:
+        yield empresa
+    finally:
+        _empresa_atual.reset(token)
@@ -0,0 +1,61 @@
+import csv
+
+from django.db.models import Q
+from django.http import StreamingHttpResponse
+
+
+class _Eco:
+    """Pseudo-arquivo: o csv.writer devolve a linha formatada em vez de gravar"""
+
+    def write(self, valor):
+        return valor
+
+
+def resposta_csv(nome_arquivo, cabecalho, linhas):
+    """
+    CSV em streaming (separador ';' para o Excel em português).
+    `linhas` pode ser um gerador: cada linha vai para o cliente assim que é produzida.
+    """
+    escritor = csv.writer(_Eco(), delimiter=';')
+
+    def gerar():
+        yield '\ufeff'  # BOM para o Excel reconhecer UTF-8
+        yield escritor.writerow(cabecalho)
+        for linha in linhas:
+            yield escritor.writerow(linha)
+
+    resposta = StreamingHttpResponse(gerar(), content_type='text/csv; charset=utf-8')
+    resposta['Content-Disposition'] = f'attachment; filename="{nome_arquivo}"'
+    return resposta
+
+
+def iterar_por_chave(queryset, campos, campo_ordem='id', tamanho=2000):
+    """
+    Percorre o queryset ordenado por (campo_ordem, id) em lotes de `tamanho`, devolvendo tuplas de `campos`.
+
+    Cada lote é um values_list começando logo após a última linha do anterior (cursor, sem OFFSET).
+    O iterator() do Django não resolve no MySQL, cujo driver carrega o resultado inteiro na memória.
+    """
+    chaves = [campo_ordem, 'id'] if campo_ordem != 'id' else ['id']
+    consulta = queryset.order_by(*chaves).values_list(*campos, *chaves)
+    depois = Q()
+    while True:
+        lote = list(consulta.filter(depois)[:tamanho])
+        for linha in lote:
+            yield linha[:len(campos)]
+        if len(lote) < tamanho:
+            return
+        *valor, id_ = lote[-1][len(campos):]
+        if valor:
+            depois = Q(**{f'{campo_ordem}__gt': valor[0]}) | Q(**{campo_ordem: valor[0], 'id__gt': id_})
+        else:
+            depois = Q(id__gt=id_)
+
+
+def formatar_valor(valor):
+    """Decimal no formato brasileiro (1234,56)"""
+    return f"{valor or 0:.2f}".replace('.', ',')
+
+
+def formatar_data(data):
+    return data.strftime('%d/%m/%Y') if data else ''
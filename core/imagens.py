@@ -0,0 +1,120 @@
+"""
+Miniaturas das imagens enviadas (foto do cadastro, logo e banner da empresa).
+
+No upload a imagem é reduzida para alguns tamanhos fixos, em WebP e JPEG, gravados como
+miniaturas/<ab>/<sha256>_<perfil>_<largura>.<ext>. O nome vem do conteúdo: o mesmo arquivo
+enviado duas vezes (ou por duas empresas) reaproveita as mesmas miniaturas.
+O model guarda só o hash; os templates montam as URLs com a tag {% imagem_responsiva %}.
+"""
+import hashlib
+import logging
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+logger = logging.getLogger(__name__)
+
+PASTA = 'miniaturas'
+
+# perfil -> caixas (largura, altura) de cada tamanho, do menor para o maior.
+# 'recortar': preenche a caixa cortando as sobras (avatar); senão cabe dentro dela sem distorcer.
+# 'descritor': 'x' para imagens de tamanho fixo na tela (1x, 2x, 4x), 'w' para as que ocupam a largura da tela.
+PERFIS = {
+    'avatar': {'caixas': [(40, 40), (80, 80), (160, 160)], 'recortar': True, 'descritor': 'x'},
+    'logo': {'caixas': [(160, 40), (320, 80), (640, 160)], 'recortar': False, 'descritor': 'x'},
+    'banner': {'caixas': [(640, 1280), (1280, 2560), (1920, 3840)], 'recortar': False, 'descritor': 'w'},
+}
+
+FORMATOS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+
+def nome_derivada(hash_conteudo, perfil, largura, extensao):
+    return f'{PASTA}/{hash_conteudo[:2]}/{hash_conteudo}_{perfil}_{largura}.{extensao}'
+
+
+def _para_rgb(imagem):
+    """JPEG não tem transparência: compõe sobre fundo branco"""
+    if imagem.mode in ('RGBA', 'LA', 'P'):
+        imagem = imagem.convert('RGBA')
+        fundo = Image.new('RGB', imagem.size, (255, 255, 255))
+        fundo.paste(imagem, mask=imagem.getchannel('A'))
+        return fundo
+    return imagem.convert('RGB')
+
+
+def gerar_derivadas(arquivo, perfil):
+    """
+    Gera (se ainda não existirem) as miniaturas de `arquivo` no `perfil` e devolve o hash do conteúdo.
+    Arquivos que não são imagem devolvem '' e as telas usam o original.
+    """
+    arquivo.open('rb')
+    arquivo.seek(0)
+    conteudo = arquivo.read()
+    arquivo.seek(0)
+    hash_conteudo = hashlib.sha256(conteudo).hexdigest()
+
+    config = PERFIS[perfil]
+    pendentes = [
+        (caixa, extensao)
+        for caixa in config['caixas']
+        for extensao in FORMATOS
+        if not default_storage.exists(nome_derivada(hash_conteudo, perfil, caixa[0], extensao))
+    ]
+    if not pendentes:
+        return hash_conteudo
+
+    try:
+        original = Image.open(BytesIO(conteudo))
+        original = _para_rgb(ImageOps.exif_transpose(original))
+    except (UnidentifiedImageError, OSError):
+        logger.warning("Arquivo %s não é uma imagem válida; miniaturas não geradas.", arquivo.name)
+        return ''
+
+    for caixa, extensao in pendentes:
+        if config['recortar']:
+            reduzida = ImageOps.fit(original, caixa, Image.Resampling.LANCZOS)
+        else:
+            reduzida = original.copy()
+            reduzida.thumbnail(caixa, Image.Resampling.LANCZOS)
+        formato, opcoes = FORMATOS[extensao]
+        saida = BytesIO()
+        reduzida.save(saida, formato, **opcoes)
+        default_storage.save(nome_derivada(hash_conteudo, perfil, caixa[0], extensao), ContentFile(saida.getvalue()))
+    return hash_conteudo
+
+
+def atualizar_hash(instancia, campo, campo_hash, perfil):
+    """
+    Para o save() dos models: se `campo` recebeu um arquivo novo, gera as miniaturas e grava o hash;
+    se o arquivo foi removido, limpa o hash. Devolve True se o hash mudou.
+    """
+    arquivo = getattr(instancia, campo)
+    anterior = getattr(instancia, campo_hash)
+    if not arquivo:
+        novo = ''
+    elif not arquivo._committed:
+        novo = gerar_derivadas(arquivo, perfil)
+    else:
+        return False
+    setattr(instancia, campo_hash, novo)
+    return novo != anterior
+
+
+def srcset(hash_conteudo, perfil, extensao):
+    config = PERFIS[perfil]
+    menor = config['caixas'][0][0]
+    itens = []
+    for largura, _ in config['caixas']:
+        descritor = f'{largura // menor}x' if config['descritor'] == 'x' else f'{largura}w'
+        itens.append(f"{default_storage.url(nome_derivada(hash_conteudo, perfil, largura, extensao))} {descritor}")
+    return ', '.join(itens)
+
+
+def url_derivada(hash_conteudo, perfil, extensao='jpg', indice=0):
+    largura = PERFIS[perfil]['caixas'][indice][0]
+    return default_storage.url(nome_derivada(hash_conteudo, perfil, largura, extensao))
@@ -0,0 +1,114 @@
+"""
+Leitura de arquivos enviados para importação (extratos, cadastros) sem carregá-los inteiros,
+e o relatório das linhas rejeitadas, no mesmo formato das exportações (';' e BOM para o Excel).
+"""
+import codecs
+import csv
+import io
+import tempfile
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.utils import timezone
+
+# Os relatórios trazem nome, CPF/CNPJ e e-mail: ficam fora do MEDIA_ROOT e expiram
+VALIDADE_RELATORIO = timedelta(days=1)
+
+
+class ErroImportacao(ValueError):
+    """Arquivo fora do formato esperado; a mensagem já diz a linha/transação com problema"""
+
+
+def blocos_texto(arquivo, codificacao='utf-8-sig'):
+    """Texto do arquivo enviado (UploadedFile) em blocos, decodificado aos poucos"""
+    decodificador = codecs.getincrementaldecoder(codificacao)(errors='replace')
+    for bloco in arquivo.chunks():
+        texto = decodificador.decode(bloco)
+        if texto:
+            yield texto
+    texto = decodificador.decode(b'', final=True)
+    if texto:
+        yield texto
+
+
+def linhas(blocos):
+    """Linhas completas (com a quebra) a partir dos blocos de texto, para o csv.reader"""
+    resto = ''
+    for bloco in blocos:
+        partes = (resto + bloco).splitlines(keepends=True)
+        resto = partes.pop() if partes and not partes[-1].endswith(('\n', '\r')) else ''
+        yield from partes
+    if resto:
+        yield resto
+
+
+class RelatorioErros:
+    """
+    CSV com as linhas rejeitadas e o motivo, montado durante a importação num arquivo temporário
+    (fica em memória até 1 MB) e gravado no storage privado no final para o usuário baixar.
+    """
+    EXIBIR = 20  # quantas linhas a tela mostra; o resto só no arquivo
+
+    def __init__(self, cabecalho):
+        self._arquivo = tempfile.SpooledTemporaryFile(max_size=1024 * 1024)
+        self._texto = io.TextIOWrapper(self._arquivo, encoding='utf-8-sig', newline='')
+        self._escritor = csv.writer(self._texto, delimiter=';')
+        self._escritor.writerow(['Linha', 'Erro', *cabecalho])
+        self.quantidade = 0
+        self.primeiros = []
+
+    def adicionar(self, numero, erro, valores):
+        self._escritor.writerow([numero, erro, *valores])
+        self.quantidade += 1
+        if len(self.primeiros) < self.EXIBIR:
+            self.primeiros.append((numero, erro))
+
+    def salvar(self, empresa_id):
+        """Grava o relatório (se houver erros) e devolve o nome no storage, ou '' """
+        self._texto.flush()
+        self._texto.detach()
+        self._arquivo.seek(0)
+        if not self.quantidade:
+            self._arquivo.close()
+            return ''
+        limpar_relatorios_vencidos(empresa_id)
+        nome = storage_relatorios().save(f'{empresa_id}/{uuid.uuid4().hex}.csv', File(self._arquivo))
+        self._arquivo.close()
+        return nome
+
+
+def storage_relatorios():
+    """
+    Storage dos relatórios de erros, em RELATORIOS_IMPORTACAO_ROOT (fora do MEDIA_ROOT, sem URL pública):
+    só saem pela view autenticada, que confere a empresa. Montado a cada uso para respeitar override_settings.
+    """
+    return FileSystemStorage(location=settings.RELATORIOS_IMPORTACAO_ROOT)
+
+
+def relatorio_disponivel(nome, empresa_id):
+    """O relatório é da empresa, existe e ainda está na validade?"""
+    storage = storage_relatorios()
+    if not nome or not nome.startswith(f'{empresa_id}/') or not storage.exists(nome):
+        return False
+    return storage.get_modified_time(nome) > timezone.now() - VALIDADE_RELATORIO
+
+
+def descartar_relatorio(nome):
+    if nome:
+        storage_relatorios().delete(nome)
+
+
+def limpar_relatorios_vencidos(empresa_id):
+    """Apaga os relatórios da empresa que passaram da validade (sessões abandonadas não deixam lixo)"""
+    storage = storage_relatorios()
+    pasta = str(empresa_id)
+    if not storage.exists(pasta):
+        return
+    limite = timezone.now() - VALIDADE_RELATORIO
+    for arquivo in storage.listdir(pasta)[1]:
+        nome = f'{pasta}/{arquivo}'
+        if storage.get_modified_time(nome) <= limite:
+            storage.delete(nome)
@@ -0,0 +1,125 @@
+import statistics
+import time
+import tracemalloc
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+
+from core.models import Empresa, Usuario
+from financeiro.models import Conta, Lancamento
+
+from .seed_benchmark import PREFIXO_CNPJ
+
+
+def cenarios(hoje):
+    """(nome, rota, GET) medidos: cada tela no filtro padrão e as de período também com um ano inteiro"""
+    ano = {'data_inicio': (hoje - timedelta(days=365)).isoformat(), 'data_fim': hoje.isoformat()}
+    return [
+        ('fluxo_caixa', 'financeiro:fluxo_caixa', {}),
+        ('fluxo_caixa (12 meses)', 'financeiro:fluxo_caixa', {**ano, 'caixa': ''}),
+        ('relatorio_fluxo', 'financeiro:relatorio_fluxo', {}),
+        ('relatorio_fluxo (12 meses)', 'financeiro:relatorio_fluxo', {**ano, 'caixa': ''}),
+        ('relatorio_dre', 'financeiro:relatorio_dre', {}),
+        ('relatorio_dre (12 meses)', 'financeiro:relatorio_dre', ano),
+        ('relatorio_dre_sintetico', 'financeiro:relatorio_dre_sintetico', {}),
+        ('relatorio_dre_sintetico (nível 3)', 'financeiro:relatorio_dre_sintetico', {**ano, 'nivel': 3}),
+        ('lista_receber', 'financeiro:lista_receber', {}),
+        ('lista_pagar', 'financeiro:lista_pagar', {}),
+        ('dashboard', 'dashboard', {}),
+    ]
+
+
+class Command(BaseCommand):
+    help = (
+        "Mede as telas financeiras pelo Client de teste: tempo de parede (p50/máx), consultas, tempo no banco "
+        "e pico de memória (tracemalloc) por tela. Use com as empresas geradas pelo seed_benchmark."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--empresa', type=int, action='append',
+            help="ID da empresa (pode repetir; padrão: todas as geradas pelo seed_benchmark)",
+        )
+        parser.add_argument('--repeticoes', type=int, default=5, help="Requisições medidas por tela (vale a mediana)")
+        parser.add_argument('--aquecimento', type=int, default=1, help="Requisições descartadas antes de medir")
+        parser.add_argument('--tela', action='append', help="Mede só as telas com este nome (pode repetir)")
+
+    def handle(self, *args, **options):
+        if options['repeticoes'] < 1:
+            raise CommandError("--repeticoes deve ser maior que zero.")
+        empresas = Empresa.objects.order_by('id')
+        if options['empresa']:
+            empresas = empresas.filter(id__in=options['empresa'])
+        else:
+            empresas = empresas.filter(cnpj__startswith=PREFIXO_CNPJ)
+        if not empresas:
+            raise CommandError("Nenhuma empresa para medir. Rode o seed_benchmark ou informe --empresa.")
+
+        medidos = cenarios(date.today())
+        if options['tela']:
+            medidos = [cenario for cenario in medidos if cenario[0].split(' ')[0] in options['tela']]
+            if not medidos:
+                raise CommandError(f"Nenhuma tela com o nome {', '.join(options['tela'])}.")
+
+        self.stdout.write(f"Banco: {connection.vendor} ({connection.settings_dict['NAME']})")
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+            for empresa in empresas:
+                usuario = Usuario.objects.filter(empresa=empresa).order_by('id').first()
+                if usuario is None:
+                    raise CommandError(f"{empresa} não tem usuário para logar.")
+                cliente = Client()
+                cliente.force_login(usuario)
+
+                self.stdout.write(self.style.SUCCESS(
+                    f"\n{empresa} (ID {empresa.id}): {Conta.objects.filter(empresa=empresa).count()} contas, "
+                    f"{Lancamento.objects.filter(empresa=empresa).count()} lançamentos"
+                ))
+                self.stdout.write(
+                    f"{'tela':<36} {'p50 (ms)':>9} {'máx (ms)':>9} {'consultas':>9} {'banco (ms)':>10} {'pico (MiB)':>10}"
+                )
+                for nome, rota, parametros in medidos:
+                    url = reverse(rota)
+                    medida = self.medir(cliente, url, parametros, options)
+                    self.stdout.write(
+                        f"{nome:<36} {medida['p50']:>9.1f} {medida['maximo']:>9.1f} {medida['consultas']:>9} "
+                        f"{medida['banco']:>10.1f} {medida['pico'] / 2**20:>10.2f}"
+                    )
+
+    def requisitar(self, cliente, url, parametros):
+        resposta = cliente.get(url, parametros)
+        if resposta.status_code != 200:
+            raise CommandError(f"{url} respondeu {resposta.status_code}.")
+        if resposta.streaming:
+            b''.join(resposta.streaming_content)
+        return resposta
+
+    def medir(self, cliente, url, parametros, options):
+        for _ in range(options['aquecimento']):
+            self.requisitar(cliente, url, parametros)
+
+        tempos, tempos_banco, consultas = [], [], 0
+        for _ in range(options['repeticoes']):
+            with CaptureQueriesContext(connection) as capturadas:
+                inicio = time.perf_counter()
+                self.requisitar(cliente, url, parametros)
+                tempos.append((time.perf_counter() - inicio) * 1000)
+            consultas = len(capturadas)
+            tempos_banco.append(sum(float(consulta['time']) for consulta in capturadas.captured_queries) * 1000)
+
+        # Memória numa requisição à parte: o tracemalloc deixa o Python bem mais lento e distorceria os tempos
+        tracemalloc.start()
+        try:
+            self.requisitar(cliente, url, parametros)
+            _, pico = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        return {
+            'p50': statistics.median(tempos), 'maximo': max(tempos), 'consultas': consultas,
+            'banco': statistics.median(tempos_banco), 'pico': pico,
+        }
@@ -0,0 +1,53 @@
+from django.core.management.base import BaseCommand
+
+from cadastros.models import Cadastro
+from core.imagens import gerar_derivadas
+from core.models import Empresa
+
+# (model, campo da imagem, campo do hash, perfil)
+IMAGENS = [
+    (Cadastro, 'foto', 'foto_hash', 'avatar'),
+    (Empresa, 'logo', 'logo_hash', 'logo'),
+    (Empresa, 'banner', 'banner_hash', 'banner'),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Gera as miniaturas (WebP e JPEG) das fotos de cadastros e dos logos/banners de empresas "
+        "já enviados (fotos_cadastros/ e empresas/) e grava o hash de cada uma."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--todas', action='store_true',
+            help="Reprocessa também as imagens que já têm hash (ex: depois de mudar os tamanhos em core.imagens)",
+        )
+
+    def handle(self, *args, **options):
+        for model, campo, campo_hash, perfil in IMAGENS:
+            # Fora de uma requisição o manager não filtra por empresa: percorre todas
+            registros = model.objects.exclude(**{campo: ''}).exclude(**{f'{campo}__isnull': True})
+            if not options['todas']:
+                registros = registros.filter(**{campo_hash: ''})
+
+            geradas = faltando = invalidas = 0
+            for registro in registros.order_by('id').iterator(chunk_size=500):
+                arquivo = getattr(registro, campo)
+                if not arquivo.storage.exists(arquivo.name):
+                    faltando += 1
+                    self.stdout.write(self.style.WARNING(f"  {model.__name__} {registro.id}: arquivo {arquivo.name} não encontrado"))
+                    continue
+                hash_conteudo = gerar_derivadas(arquivo, perfil)
+                arquivo.close()
+                if not hash_conteudo:
+                    invalidas += 1
+                    continue
+                # save() em vez de update(): os sinais limpam o cache do usuário da sessão (que carrega a empresa)
+                setattr(registro, campo_hash, hash_conteudo)
+                registro.save(update_fields=[campo_hash])
+                geradas += 1
+
+            self.stdout.write(self.style.SUCCESS(
+                f"{model.__name__}.{campo}: {geradas} processada(s), {faltando} sem arquivo, {invalidas} inválida(s)."
+            ))
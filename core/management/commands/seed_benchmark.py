@@ -0,0 +1,278 @@
+import random
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+from itertools import accumulate
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from cadastros.models import Cadastro, CategoriaCliente, PalavraCadastro
+from core.exportacao import iterar_por_chave
+from core.models import Empresa, Usuario
+from financeiro.models import Caixa, Conta, Lancamento, PlanoDeContas, ResumoMensal, SaldoDiario
+
+PREFIXO_CNPJ = 'BENCH'
+LOTE = 5000
+
+NOMES = ['João', 'José', 'Maria', 'Ana', 'Antônio', 'Francisco', 'Cecília', 'Luís', 'Márcia', 'Gonçalo', 'Paula', 'Rafael']
+SOBRENOMES = ['Silva', 'Souza', 'Oliveira', 'Conceição', 'Araújo', 'Gonçalves', 'Ribeiro', 'Simões', 'Lopes', 'Pereira']
+EMPRESAS = ['Comércio', 'Distribuidora', 'Serviços', 'Indústria', 'Transportes', 'Tecnologia']
+CIDADES = [('São Paulo', 'SP'), ('Campinas', 'SP'), ('Belo Horizonte', 'MG'), ('Curitiba', 'PR'), ('Salvador', 'BA'), ('Recife', 'PE')]
+CAIXAS = ['Caixa Geral', 'Banco do Brasil', 'Itaú', 'Bradesco', 'Caixa Econômica', 'Nubank', 'Sicoob', 'Santander']
+CATEGORIAS = ['Plano Básico', 'Plano Premium', 'Plano Família', 'Empresarial']
+
+# (código do grupo, tipo, nome, subgrupos com nomes de exemplo das folhas)
+PLANO_MODELO = [
+    ('01', 'R', 'Receitas Operacionais', [
+        ('Mensalidades', ['Plano Básico', 'Plano Premium', 'Plano Família']),
+        ('Serviços', ['Consultoria', 'Manutenção', 'Treinamentos']),
+        ('Vendas', ['Produtos', 'Acessórios']),
+    ]),
+    ('02', 'R', 'Receitas Financeiras', [
+        ('Rendimentos', ['Aplicações', 'Juros recebidos']),
+    ]),
+    ('03', 'D', 'Despesas Administrativas', [
+        ('Pessoal', ['Salários', 'Encargos', 'Benefícios', 'Pró-labore']),
+        ('Ocupação', ['Aluguel', 'Energia', 'Água', 'Internet', 'Condomínio']),
+        ('Escritório', ['Material', 'Softwares', 'Contabilidade']),
+    ]),
+    ('04', 'D', 'Despesas Comerciais', [
+        ('Marketing', ['Anúncios', 'Eventos', 'Brindes']),
+        ('Comissões', ['Vendedores', 'Parceiros']),
+    ]),
+    ('05', 'D', 'Despesas Financeiras', [
+        ('Bancárias', ['Tarifas', 'Juros pagos', 'IOF']),
+    ]),
+]
+
+# Valores lognormais (mediana = e^mu): receitas menores e mais frequentes, despesas com cauda longa
+VALORES = {'R': (5.5, 0.9), 'D': (6.0, 1.2)}
+
+
+def pesos_acumulados(aleatorio, quantidade, alfa=1.2):
+    """Popularidade de Pareto: poucos clientes/categorias concentram a maior parte do movimento"""
+    return list(accumulate(aleatorio.paretovariate(alfa) for _ in range(quantidade)))
+
+
+def sortear_valor(aleatorio, tipo):
+    mu, sigma = VALORES[tipo]
+    return max(Decimal('1.00'), Decimal(str(round(aleatorio.lognormvariate(mu, sigma), 2))))
+
+
+def sortear_data(aleatorio, inicio, dias):
+    """Volume crescente ao longo do período (mais movimento nos meses recentes)"""
+    return inicio + timedelta(days=int(aleatorio.triangular(0, dias, dias)))
+
+
+def formatar_documento(numero, pessoa_juridica):
+    if pessoa_juridica:
+        digitos = f'{numero:014d}'
+        return f'{digitos[:2]}.{digitos[2:5]}.{digitos[5:8]}/{digitos[8:12]}-{digitos[12:]}'
+    digitos = f'{numero:011d}'
+    return f'{digitos[:3]}.{digitos[3:6]}.{digitos[6:9]}-{digitos[9:]}'
+
+
+def em_lotes(objetos, tamanho=LOTE):
+    lote = []
+    for objeto in objetos:
+        lote.append(objeto)
+        if len(lote) == tamanho:
+            yield lote
+            lote = []
+    if lote:
+        yield lote
+
+
+class Command(BaseCommand):
+    help = (
+        "Gera empresas de benchmark com cadastros, plano de contas em árvore, caixas, contas e "
+        "lançamentos de vários anos (valores lognormais, clientes com popularidade de Pareto, "
+        "inadimplência nas contas vencidas). Cada empresa ganha o usuário bench<ID> para o comando bench."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--empresas', type=int, default=1, help="Quantidade de empresas (padrão: 1)")
+        parser.add_argument('--cadastros', type=int, default=2000, help="Cadastros por empresa (padrão: 2000)")
+        parser.add_argument('--planos', type=int, default=40, help="Categorias analíticas por empresa (padrão: 40)")
+        parser.add_argument('--caixas', type=int, default=4, help="Caixas por empresa (padrão: 4)")
+        parser.add_argument('--contas', type=int, default=20_000, help="Contas a pagar/receber por empresa (padrão: 20000)")
+        parser.add_argument(
+            '--lancamentos', type=int, default=50_000,
+            help="Lançamentos avulsos por empresa, além dos gerados pelas contas pagas (padrão: 50000)",
+        )
+        parser.add_argument('--anos', type=int, default=3, help="Anos de histórico até hoje (padrão: 3)")
+        parser.add_argument('--semente', type=int, default=42, help="Semente do gerador aleatório")
+        parser.add_argument('--limpar', action='store_true', help="Exclui antes as empresas de benchmark existentes")
+
+    def handle(self, *args, **options):
+        for opcao in ['empresas', 'cadastros', 'planos', 'caixas', 'anos']:
+            if options[opcao] < 1:
+                raise CommandError(f"--{opcao} deve ser maior que zero.")
+        if options['planos'] < len(PLANO_MODELO):
+            raise CommandError(f"--planos deve ser ao menos {len(PLANO_MODELO)} (uma categoria por grupo).")
+
+        if options['limpar']:
+            # Lançamentos e contas antes: protegem caixas e planos, que só saem junto com a empresa
+            excluidas = Empresa.objects.filter(cnpj__startswith=PREFIXO_CNPJ)
+            quantidade = excluidas.count()
+            with transaction.atomic():
+                Lancamento.objects.filter(empresa__in=excluidas).delete()
+                Conta.objects.filter(empresa__in=excluidas).delete()
+                excluidas.delete()
+            self.stdout.write(f"{quantidade} empresa(s) de benchmark excluída(s).")
+
+        aleatorio = random.Random(options['semente'])
+        for n in range(options['empresas']):
+            inicio = time.perf_counter()
+            with transaction.atomic():
+                empresa = Empresa.objects.create(
+                    nome=f'Benchmark {n + 1}', cnpj=f'{PREFIXO_CNPJ}{time.time_ns() % 10**12}{n:03d}',
+                )
+                usuario = Usuario(username=f'bench{empresa.id}', empresa=empresa)
+                usuario.set_unusable_password()
+                usuario.save()
+                self.popular(empresa, aleatorio, options)
+            self.stdout.write(self.style.SUCCESS(
+                f"{empresa} (ID {empresa.id}, usuário {usuario.username}) gerada em {time.perf_counter() - inicio:.1f} s."
+            ))
+
+    def popular(self, empresa, aleatorio, options):
+        hoje = date.today()
+        inicio = hoje - timedelta(days=365 * options['anos'])
+        dias_historico = (hoje - inicio).days
+
+        caixas = [
+            Caixa.objects.create(
+                empresa=empresa, nome=CAIXAS[i] if i < len(CAIXAS) else f'Caixa {i + 1}',
+                saldo_inicial=Decimal(aleatorio.randrange(0, 50_000)),
+            )
+            for i in range(options['caixas'])
+        ]
+        peso_caixas = list(accumulate([4] + [2] * (len(caixas) - 1)))  # o primeiro concentra o movimento
+
+        planos = self.criar_plano(empresa, options['planos'])
+        clientes, fornecedores = self.criar_cadastros(empresa, aleatorio, options['cadastros'])
+        pesos = {
+            'R': (clientes, pesos_acumulados(aleatorio, len(clientes))),
+            'D': (fornecedores, pesos_acumulados(aleatorio, len(fornecedores))),
+        }
+        pesos_planos = {tipo: pesos_acumulados(aleatorio, len(ids), alfa=1.5) for tipo, ids in planos.items()}
+        # Receitas são mais frequentes que despesas
+        tipos, pesos_tipos = ['R', 'D'], [0.6, 1.0]
+
+        def contas():
+            for i in range(options['contas']):
+                tipo = aleatorio.choices(tipos, cum_weights=pesos_tipos)[0]
+                cadastros, pesos_cadastros = pesos[tipo]
+                # Vencimentos também no futuro (até 90 dias) e concentrados nos dias 5, 10, 15 e 20
+                vencimento = sortear_data(aleatorio, inicio, dias_historico + 90)
+                if aleatorio.random() < 0.6:
+                    vencimento = vencimento.replace(day=aleatorio.choice([5, 10, 15, 20]))
+                sorteio = aleatorio.random()
+                if vencimento >= hoje:
+                    status = 'CANCELADA' if sorteio < 0.05 else 'PENDENTE'
+                else:
+                    status = 'PAGA' if sorteio < 0.88 else 'PENDENTE' if sorteio < 0.96 else 'CANCELADA'
+                yield Conta(
+                    empresa=empresa, descricao=f'Conta {i + 1}', status=status, data_vencimento=vencimento,
+                    plano_de_contas_id=aleatorio.choices(planos[tipo], cum_weights=pesos_planos[tipo])[0],
+                    cadastro_id=aleatorio.choices(cadastros, cum_weights=pesos_cadastros)[0] if cadastros else None,
+                    valor=sortear_valor(aleatorio, tipo), documento=f'{i + 1:06d}',
+                )
+
+        for lote in em_lotes(contas()):
+            Conta.objects.bulk_create(lote)
+
+        def lancamentos():
+            # Contas pagas viram lançamentos, pagos de alguns dias antes a duas semanas depois do vencimento
+            pagas = Conta.objects.filter(empresa=empresa, status='PAGA')
+            campos = ['id', 'descricao', 'valor', 'data_vencimento', 'plano_de_contas_id', 'plano_de_contas__tipo']
+            for conta_id, descricao, valor, vencimento, plano_id, tipo in iterar_por_chave(pagas, campos):
+                yield Lancamento(
+                    empresa=empresa, caixa=aleatorio.choices(caixas, cum_weights=peso_caixas)[0],
+                    plano_de_contas_id=plano_id, conta_origem_id=conta_id, descricao=f'Baixa: {descricao}',
+                    data_lancamento=min(hoje, vencimento + timedelta(days=aleatorio.randint(-3, 15))),
+                    valor=valor, tipo='C' if tipo == 'R' else 'D',
+                )
+            for i in range(options['lancamentos']):
+                tipo = aleatorio.choices(tipos, cum_weights=pesos_tipos)[0]
+                yield Lancamento(
+                    empresa=empresa, caixa=aleatorio.choices(caixas, cum_weights=peso_caixas)[0],
+                    plano_de_contas_id=aleatorio.choices(planos[tipo], cum_weights=pesos_planos[tipo])[0],
+                    descricao=f'Lançamento {i + 1}', data_lancamento=sortear_data(aleatorio, inicio, dias_historico),
+                    valor=sortear_valor(aleatorio, tipo), tipo='C' if tipo == 'R' else 'D',
+                )
+
+        for lote in em_lotes(lancamentos()):
+            for lancamento in lote:
+                lancamento.normalizar_sinal()
+            Lancamento.objects.bulk_create(lote)
+
+        # Reconstruir de uma vez sai mais barato que atualizar os consolidados a cada lote
+        SaldoDiario.objects.reconstruir(empresa.id)
+        ResumoMensal.objects.reconstruir(empresa.id)
+
+    def criar_plano(self, empresa, quantidade):
+        """
+        Árvore de 3 níveis (grupo '01', subgrupo '01.01', categoria '01.01.001') com `quantidade`
+        categorias analíticas distribuídas entre os subgrupos. Devolve os ids das categorias por tipo.
+        """
+        subgrupos = [
+            (f'{raiz}.{s:02d}', tipo, nome, exemplos)
+            for raiz, tipo, _, filhos in PLANO_MODELO
+            for s, (nome, exemplos) in enumerate(filhos, start=1)
+        ]
+        planos = [PlanoDeContas(empresa=empresa, codigo=raiz, tipo=tipo, nome=nome) for raiz, tipo, nome, _ in PLANO_MODELO]
+        planos += [PlanoDeContas(empresa=empresa, codigo=codigo, tipo=tipo, nome=nome) for codigo, tipo, nome, _ in subgrupos]
+        for i in range(quantidade):
+            codigo, tipo, nome, exemplos = subgrupos[i % len(subgrupos)]
+            n = i // len(subgrupos)
+            planos.append(PlanoDeContas(
+                empresa=empresa, codigo=f'{codigo}.{n + 1:03d}', tipo=tipo,
+                nome=exemplos[n] if n < len(exemplos) else f'{nome} {n + 1}',
+            ))
+        # bulk_create não passa pelo save(): nível preenchido aqui e a árvore no final
+        for plano in planos:
+            plano.nivel = PlanoDeContas.nivel_do_codigo(plano.codigo)
+        PlanoDeContas.objects.bulk_create(planos)
+        PlanoDeContas.objects.reconstruir_arvore(empresa.id)
+
+        analiticas = {'R': [], 'D': []}
+        for plano_id, tipo in PlanoDeContas.objects.filter(empresa=empresa, nivel=3).values_list('id', 'tipo').order_by('codigo'):
+            analiticas[tipo].append(plano_id)
+        return analiticas
+
+    def criar_cadastros(self, empresa, aleatorio, quantidade):
+        """Cadastros em lote (70% clientes, 15% fornecedores, 15% ambos). Devolve os ids de clientes e de fornecedores"""
+        categorias = [CategoriaCliente.objects.create(empresa=empresa, nome=nome) for nome in CATEGORIAS]
+
+        def cadastros():
+            for i in range(quantidade):
+                papel = aleatorio.choices(['CLI', 'FOR', 'AMB'], cum_weights=[70, 85, 100])[0]
+                pessoa_juridica = papel != 'CLI' or aleatorio.random() < 0.1
+                if pessoa_juridica:
+                    nome = f'{aleatorio.choice(SOBRENOMES)} {aleatorio.choice(EMPRESAS)} {i + 1}'
+                else:
+                    nome = f'{aleatorio.choice(NOMES)} {aleatorio.choice(SOBRENOMES)} {aleatorio.choice(SOBRENOMES)}'
+                cidade, uf = aleatorio.choice(CIDADES)
+                cadastro = Cadastro(
+                    empresa=empresa, nome=nome, papel=papel, tipo_pessoa='PJ' if pessoa_juridica else 'PF',
+                    cpf_cnpj=formatar_documento(i + 1, pessoa_juridica), email=f'cadastro{i + 1}@exemplo.com.br',
+                    categoria=aleatorio.choice(categorias) if papel != 'FOR' else None,
+                    situacao='INATIVO' if aleatorio.random() < 0.1 else 'ATIVO', cidade=cidade, uf=uf,
+                )
+                cadastro.atualizar_busca()
+                yield cadastro
+
+        for lote in em_lotes(cadastros()):
+            Cadastro.objects.bulk_create(lote)
+        PalavraCadastro.objects.indexar_pendentes(empresa.id)
+
+        clientes, fornecedores = [], []
+        for cadastro_id, papel in Cadastro.objects.filter(empresa=empresa).values_list('id', 'papel').order_by('id'):
+            if papel in ('CLI', 'AMB'):
+                clientes.append(cadastro_id)
+            if papel in ('FOR', 'AMB'):
+                fornecedores.append(cadastro_id)
+        return clientes, fornecedores
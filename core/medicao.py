@@ -0,0 +1,108 @@
+"""
+Medição por requisição (ver MedicaoMiddleware): consultas SQL, tempo no banco, tempo de
+renderização dos templates e tempo da view, publicados no cabeçalho Server-Timing e numa
+linha de log 'core.medicao'.
+
+A medição da requisição fica numa ContextVar, que o asgiref copia para as threads do
+sync_to_async: o dashboard assíncrono é medido como as views síncronas. O execute_wrapper
+é instalado uma vez em cada conexão aberta e, fora de uma requisição sorteada, só lê a ContextVar.
+"""
+import logging
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass
+
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.template.backends.django import DjangoTemplates, Template
+
+logger = logging.getLogger(__name__)
+
+_medicao_atual = ContextVar('medicao_atual', default=None)
+
+
+@dataclass
+class Medicao:
+    consultas: int = 0
+    banco: float = 0.0  # segundos
+    template: float = 0.0
+    view: float = 0.0
+
+    def server_timing(self):
+        return (
+            f'db;dur={self.banco * 1000:.1f};desc="{self.consultas} consultas", '
+            f'tpl;dur={self.template * 1000:.1f}, view;dur={self.view * 1000:.1f}'
+        )
+
+    def como_dict(self):
+        return {
+            'consultas': self.consultas, 'banco_ms': round(self.banco * 1000, 1),
+            'template_ms': round(self.template * 1000, 1), 'view_ms': round(self.view * 1000, 1),
+        }
+
+
+def iniciar():
+    """Começa a medir o contexto atual. Devolve o token para encerrar()"""
+    return _medicao_atual.set(Medicao())
+
+
+def encerrar(token):
+    medicao = _medicao_atual.get()
+    _medicao_atual.reset(token)
+    return medicao
+
+
+def registrar(request, resposta, medicao):
+    """Cabeçalho Server-Timing e a linha de log (chave=valor, e os números também em `extra`)"""
+    resposta['Server-Timing'] = medicao.server_timing()
+    rota = request.resolver_match.view_name if request.resolver_match else request.path
+    empresa = getattr(request, 'empresa', None)
+    logger.info(
+        "rota=%s empresa=%s status=%s view_ms=%.1f banco_ms=%.1f consultas=%d template_ms=%.1f",
+        rota, empresa.id if empresa else '-', resposta.status_code,
+        medicao.view * 1000, medicao.banco * 1000, medicao.consultas, medicao.template * 1000,
+        extra={'medicao': {'rota': rota, 'empresa_id': empresa.id if empresa else None,
+                           'status': resposta.status_code, **medicao.como_dict()}},
+    )
+
+
+def medir_consulta(execute, sql, params, many, context):
+    medicao = _medicao_atual.get()
+    if medicao is None:
+        return execute(sql, params, many, context)
+    inicio = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        medicao.consultas += 1
+        medicao.banco += time.perf_counter() - inicio
+
+
+@receiver(connection_created)
+def instalar_medicao(sender, connection, **kwargs):
+    # A mesma conexão pode reconectar (CONN_MAX_AGE): não empilha o wrapper de novo
+    if medir_consulta not in connection.execute_wrappers:
+        connection.execute_wrappers.append(medir_consulta)
+
+
+class TemplateMedido(Template):
+
+    def render(self, context=None, request=None):
+        medicao = _medicao_atual.get()
+        if medicao is None:
+            return super().render(context, request)
+        inicio = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            medicao.template += time.perf_counter() - inicio
+
+
+class DjangoTemplatesMedidos(DjangoTemplates):
+    """Backend de templates do Django que soma o tempo de renderização na medição da requisição"""
+
+    def from_string(self, template_code):
+        return TemplateMedido(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        return TemplateMedido(super().get_template(template_name).template, self)
@@ -0,0 +1,117 @@
+import random
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.contrib import messages
+from django.contrib.auth import alogout, logout
+from django.core.exceptions import MiddlewareNotUsed
+from django.shortcuts import redirect
+
+from . import medicao
+from .contexto import usando_empresa
+
+
+class EmpresaAtualMiddleware:
+    """
+    Resolve a empresa do usuário uma vez por requisição e a deixa em request.empresa
+    e no contexto (core.contexto), de onde os managers de ModeloSaaS filtram as consultas.
+    Usuários de empresa inativa são desconectados antes de chegar à view.
+    Deve vir depois do AuthenticationMiddleware e do MessageMiddleware.
+    Funciona no WSGI e no ASGI (sem forçar as views assíncronas para uma thread).
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        empresa = self.empresa_do_usuario(request.user)
+        if empresa and not empresa.ativo:
+            logout(request)
+            return self.empresa_inativa(request)
+
+        request.empresa = empresa
+        with usando_empresa(empresa):
+            return self.get_response(request)
+
+    async def __acall__(self, request):
+        # No ASGI o usuário precisa ser carregado pela API assíncrona; fica em request.user para o resto da requisição
+        request.user = await request.auser()
+        empresa = self.empresa_do_usuario(request.user)
+        if empresa and not empresa.ativo:
+            await alogout(request)
+            return self.empresa_inativa(request)
+
+        request.empresa = empresa
+        with usando_empresa(empresa):
+            return await self.get_response(request)
+
+    @staticmethod
+    def empresa_do_usuario(usuario):
+        # O EmpresaBackend carrega o usuário já com a empresa (um SELECT só)
+        return usuario.empresa if usuario.is_authenticated else None
+
+    @staticmethod
+    def empresa_inativa(request):
+        messages.error(request, "O acesso da sua empresa está suspenso. Entre em contato com o suporte.")
+        return redirect(settings.LOGIN_URL)
+
+
+class MedicaoMiddleware:
+    """
+    Mede consultas, tempo no banco, renderização e tempo da view de uma fração das requisições
+    (settings.MEDICAO_AMOSTRAGEM, de 0 a 1; 0 desliga) e publica no cabeçalho Server-Timing e no
+    log 'core.medicao' (ver core.medicao). Deve vir depois do EmpresaAtualMiddleware, para
+    ter request.empresa, e o tempo medido é o da view e dos middlewares abaixo dele.
+    Exportações em streaming são medidas até a resposta sair da view, não até o último byte.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.amostragem = getattr(settings, 'MEDICAO_AMOSTRAGEM', 0.05)
+        if self.amostragem <= 0:
+            raise MiddlewareNotUsed
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def sortear(self):
+        return self.amostragem >= 1 or random.random() < self.amostragem
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not self.sortear():
+            return self.get_response(request)
+
+        token = medicao.iniciar()
+        inicio = time.perf_counter()
+        try:
+            resposta = self.get_response(request)
+        finally:
+            medida = medicao.encerrar(token)
+        medida.view = time.perf_counter() - inicio
+        medicao.registrar(request, resposta, medida)
+        return resposta
+
+    async def __acall__(self, request):
+        if not self.sortear():
+            return await self.get_response(request)
+
+        token = medicao.iniciar()
+        inicio = time.perf_counter()
+        try:
+            resposta = await self.get_response(request)
+        finally:
+            medida = medicao.encerrar(token)
+        medida.view = time.perf_counter() - inicio
+        medicao.registrar(request, resposta, medida)
+        return resposta
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.8 on 2026-10-17 19:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_usuario_login_minusculo'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='empresa',
+            name='banner_hash',
+            field=models.CharField(blank=True, editable=False, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='empresa',
+            name='logo_hash',
+            field=models.CharField(blank=True, editable=False, max_length=64),
+        ),
+    ]
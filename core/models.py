@@ -1,5 +1,9 @@
 from django.db import models
 from django.contrib.auth.models import AbstractUser
+from django.db.models.functions import Lower
+
+from .contexto import empresa_atual
+from .imagens import atualizar_hash
 
 # 1. A Empresa (Quem contrata o SaaS)
 class Empresa(models.Model):
@@ -8,11 +12,22 @@ class Empresa(models.Model):
     ativo = models.BooleanField(default=True)
     logo = models.ImageField(upload_to='empresas/logos/', null=True, blank=True)
     banner = models.ImageField(upload_to='empresas/banners/', null=True, blank=True, help_text="Imagem de fundo da tela inicial")
+    # Miniaturas do logo e do banner (core.imagens)
+    logo_hash = models.CharField(max_length=64, blank=True, editable=False)
+    banner_hash = models.CharField(max_length=64, blank=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     
     def __str__(self):
         return self.nome
 
+    def save(self, *args, **kwargs):
+        atualizar_hash(self, 'logo', 'logo_hash', 'logo')
+        atualizar_hash(self, 'banner', 'banner_hash', 'banner')
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = {*update_fields, 'logo_hash', 'banner_hash'}
+        super().save(*args, **kwargs)
+
 # 2. O Usuário do Sistema (Vinculado a uma empresa)
 class Usuario(AbstractUser):
     # O usuário 'admin' do Django (superuser) pode não ter empresa (null=True)
@@ -22,11 +37,36 @@ class Usuario(AbstractUser):
     # Campos extras se quiser (ex: cargo)
     cargo = models.CharField(max_length=100, blank=True)
 
-# 3. Classe Abstrata para Models SaaS
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            # Login por usuário ou e-mail sem diferenciar maiúsculas (core.backends.EmpresaBackend)
+            models.Index(Lower('username'), name='core_usuario_username_min_idx'),
+            models.Index(Lower('email'), name='core_usuario_email_min_idx'),
+        ]
+
+# 3. Manager dos Models SaaS
+# Dentro de uma requisição filtra tudo pela empresa do usuário (core.contexto), mesmo que a view esqueça.
+# Fora dela (shell, comandos, migrações) não filtra nada.
+class ModeloSaaSManager(models.Manager):
+
+    def get_queryset(self):
+        qs = super().get_queryset()
+        empresa = empresa_atual()
+        if empresa is not None:
+            qs = qs.filter(empresa_id=empresa.id)
+        return qs
+
+    def sem_escopo(self):
+        """Todas as empresas, mesmo dentro de uma requisição (admin do superusuário, manutenção)"""
+        return super().get_queryset()
+
+# 4. Classe Abstrata para Models SaaS
 # TODAS as tabelas do sistema herdarão disso.
 # Isso garante que nada seja criado sem dono.
 class ModeloSaaS(models.Model):
     empresa = models.ForeignKey(Empresa, on_delete=models.CASCADE, verbose_name="Empresa")
+
+    objects = ModeloSaaSManager()
     
     class Meta:
         abstract = True  # Isso diz ao Django: "Não crie uma tabela 'ModeloSaaS', use isso como modelo para outras"
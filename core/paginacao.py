@@ -0,0 +1,86 @@
+from dataclasses import dataclass
+
+from django.db.models import Q
+from django.utils.dateparse import parse_date
+
+
+@dataclass
+class PaginaPorChave:
+    itens: list
+    tem_mais: bool
+    tem_anterior: bool = False
+    url_proxima: str = ''
+    url_anterior: str = ''
+    url_primeira: str = ''
+
+
+def paginar_por_chave(request, queryset, campo_data, tamanho=50, decrescente=False, parametro='apos', parametro_anterior='antes'):
+    """
+    Paginação por cursor (keyset) ordenada por (campo_data, id).
+
+    Em vez de OFFSET/COUNT, o GET traz o último item da página anterior ("AAAA-MM-DD_id")
+    e a próxima página começa logo depois dele, usando o índice da data. Para voltar, o
+    GET traz o primeiro item da página atual em `parametro_anterior` e a consulta anda
+    para trás a partir dele. Busca um item a mais só para saber se há mais páginas.
+    Os demais filtros do GET são preservados nos links.
+    """
+    ordem = [f'-{campo_data}', '-id'] if decrescente else [campo_data, 'id']
+    apos = _ler_cursor(request.GET.get(parametro))
+    antes = None if apos else _ler_cursor(request.GET.get(parametro_anterior))
+
+    if antes:
+        # Lê na ordem inversa a partir do cursor e desvira a página
+        inversa = [campo.removeprefix('-') if campo.startswith('-') else f'-{campo}' for campo in ordem]
+        itens = list(queryset.filter(_depois(campo_data, *antes, not decrescente)).order_by(*inversa)[:tamanho + 1])
+        tem_anterior = len(itens) > tamanho
+        itens = itens[:tamanho][::-1]
+        tem_mais = True  # o próprio cursor vem depois desta página
+    else:
+        if apos:
+            queryset = queryset.filter(_depois(campo_data, *apos, decrescente))
+        itens = list(queryset.order_by(*ordem)[:tamanho + 1])
+        tem_mais = len(itens) > tamanho
+        itens = itens[:tamanho]
+        tem_anterior = bool(apos)
+
+    pagina = PaginaPorChave(itens=itens, tem_mais=tem_mais and bool(itens), tem_anterior=tem_anterior and bool(itens))
+    if pagina.tem_mais:
+        pagina.url_proxima = _url_com(request, {parametro: _cursor(itens[-1], campo_data), parametro_anterior: None})
+    if pagina.tem_anterior:
+        pagina.url_anterior = _url_com(request, {parametro_anterior: _cursor(itens[0], campo_data), parametro: None})
+    if apos or antes:
+        pagina.url_primeira = _url_com(request, {parametro: None, parametro_anterior: None})
+    return pagina
+
+
+def _depois(campo_data, data, id_, decrescente):
+    """Itens que vêm depois de (data, id) na ordem da lista"""
+    if decrescente:
+        return Q(**{f'{campo_data}__lt': data}) | Q(**{campo_data: data, 'id__lt': id_})
+    return Q(**{f'{campo_data}__gt': data}) | Q(**{campo_data: data, 'id__gt': id_})
+
+
+def _cursor(item, campo_data):
+    return f"{getattr(item, campo_data):%Y-%m-%d}_{item.id}"
+
+
+def _ler_cursor(valor):
+    if not valor or '_' not in valor:
+        return None
+    data, _, id_ = valor.partition('_')
+    try:
+        data = parse_date(data)
+    except ValueError:
+        return None
+    if not data or not id_.isdigit():
+        return None
+    return data, int(id_)
+
+
+def _url_com(request, valores):
+    params = request.GET.copy()
+    for parametro, valor in valores.items():
+        params.pop(parametro, None)
+        if valor:
+            params[parametro] = valor
+    return f"?{params.urlencode()}"
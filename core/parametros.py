@@ -0,0 +1,118 @@
+"""
+Parâmetros do sistema (ParametroSistema) já convertidos para o tipo certo.
+
+Todos os parâmetros da empresa são lidos numa consulta só e guardados em dois níveis:
+um dicionário no próprio processo (vale por PARAMETROS_CACHE_LOCAL segundos) e o cache
+do Django (compartilhado entre os workers). Salvar ou excluir um ParametroSistema limpa os dois.
+"""
+import time
+from decimal import Decimal, InvalidOperation
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Empresa, ParametroSistema
+
+PARAMETROS_CACHE_LOCAL = 30  # segundos
+PARAMETROS_CACHE_DJANGO = 60 * 60
+
+
+def _id(valor):
+    """IDs de registro: '0', vazio ou texto inválido significam "não configurado" (None)"""
+    valor = (valor or '').strip()
+    return int(valor) if valor.isdigit() and int(valor) > 0 else None
+
+
+def _decimal(valor):
+    try:
+        return Decimal((valor or '0').strip().replace(',', '.'))
+    except InvalidOperation:
+        return Decimal('0')
+
+
+# Chave -> (conversor, valor padrão gravado na criação)
+PARAMETROS = {
+    'CAIXA_PADRAO_ID': (_id, '0'),
+    'TAXA_JUROS_MENSAL': (_decimal, '0'),
+    'PLANO_CONTAS_MENSALIDADE_ID': (_id, '0'),
+    'PLANO_CONTAS_JUROS_ID': (_id, '0'),
+}
+
+_locais = {}  # empresa_id -> (expira_em, valores convertidos)
+
+
+def _chave_cache(empresa_id):
+    return f'parametros:{empresa_id}'
+
+
+def _brutos(empresa_id):
+    """{chave: valor em texto} do cache do Django ou, se faltar, do banco (uma consulta)"""
+    brutos = cache.get(_chave_cache(empresa_id))
+    if brutos is None:
+        brutos = dict(ParametroSistema.objects.filter(empresa_id=empresa_id).values_list('chave', 'valor'))
+        cache.set(_chave_cache(empresa_id), brutos, PARAMETROS_CACHE_DJANGO)
+    return brutos
+
+
+def valores(empresa_id):
+    """
+    Todos os parâmetros da empresa já convertidos ({'CAIXA_PADRAO_ID': 3, 'TAXA_JUROS_MENSAL': Decimal('2'), ...}).
+    Chaves sem registro no banco vêm com o valor padrão convertido.
+    """
+    agora = time.monotonic()
+    local = _locais.get(empresa_id)
+    if local and local[0] > agora:
+        return local[1]
+
+    brutos = _brutos(empresa_id)
+    convertidos = {
+        chave: converter(brutos.get(chave, padrao))
+        for chave, (converter, padrao) in PARAMETROS.items()
+    }
+    _locais[empresa_id] = (agora + PARAMETROS_CACHE_LOCAL, convertidos)
+    return convertidos
+
+
+def obter(empresa_id, chave):
+    """Valor convertido de um parâmetro (ex: obter(empresa.id, 'CAIXA_PADRAO_ID') -> int ou None)"""
+    return valores(empresa_id)[chave]
+
+
+def garantir_padroes(empresa_id):
+    """
+    Cria de uma vez os parâmetros que ainda não existem para a empresa.
+    Depois da primeira chamada o cache já tem todas as chaves e isto não consulta o banco.
+    """
+    faltando = PARAMETROS.keys() - _brutos(empresa_id).keys()
+    if not faltando:
+        return
+    ParametroSistema.objects.bulk_create(
+        [
+            ParametroSistema(empresa_id=empresa_id, chave=chave, valor=PARAMETROS[chave][1], descricao='Configuração automática')
+            for chave in sorted(faltando)
+        ],
+        ignore_conflicts=True,  # outra requisição pode ter criado no meio tempo (unique empresa + chave)
+    )
+    # Relê já aqui para as próximas requisições encontrarem o cache completo
+    invalidar(empresa_id)
+    _brutos(empresa_id)
+
+
+def invalidar(empresa_id):
+    _locais.pop(empresa_id, None)
+    cache.delete(_chave_cache(empresa_id))
+
+
+@receiver([post_save, post_delete], sender=ParametroSistema)
+def _parametro_alterado(sender, instance, **kwargs):
+    invalidar(instance.empresa_id)
+    # Uma leitura feita antes do commit pode ter guardado o valor antigo
+    transaction.on_commit(lambda: invalidar(instance.empresa_id))
+
+
+@receiver(post_save, sender=Empresa)
+def _empresa_criada(sender, instance, created, **kwargs):
+    if created:
+        invalidar(instance.id)
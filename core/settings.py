@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
 import os
+import sys
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -33,6 +34,20 @@ ALLOWED_HOSTS = []
 
 AUTH_USER_MODEL = 'core.Usuario'
 
+# Login por usuário ou e-mail; o usuário da sessão vem com a empresa e fica no cache
+AUTHENTICATION_BACKENDS = ['core.backends.EmpresaBackend']
+
+# Sessão lida do cache (gravada também no banco, para sobreviver a um restart)
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+
+# Cache em memória de cada processo. Com vários workers, aponte para um cache compartilhado
+# (Memcached/Redis) para que a limpeza ao salvar usuário, empresa ou parâmetro valha para todos.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
 LOGIN_URL = 'login'
 LOGIN_REDIRECT_URL = 'home'  # Ao logar, vai para a Home (que mostra o banner da empresa)
 LOGOUT_REDIRECT_URL = 'login' # Ao sair, volta para o login
@@ -61,6 +76,8 @@ MIDDLEWARE = [
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
+    'core.middleware.EmpresaAtualMiddleware',
+    'core.middleware.MedicaoMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
@@ -68,7 +85,8 @@ ROOT_URLCONF = 'core.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates que também mede o tempo de renderização (core.medicao)
+        'BACKEND': 'core.medicao.DjangoTemplatesMedidos',
         'DIRS': [
             os.path.join(BASE_DIR, 'templates'),
         ],
@@ -89,19 +107,32 @@ WSGI_APPLICATION = 'core.wsgi.application'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Relatórios de importação (dados pessoais): fora do MEDIA_ROOT, baixados só pela view autenticada
+RELATORIOS_IMPORTACAO_ROOT = os.path.join(BASE_DIR, 'privado', 'importacoes')
+
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.mysql',
-        'NAME': 'efinanceiro_db',  # O banco que combinamos
-        'USER': 'root',            # Seu usuário do MySQL (geralmente root)
-        'PASSWORD': '7895123',            # Sua senha do MySQL (preencha aqui)
-        'HOST': 'localhost',
-        'PORT': '3306',
+# Banco: MySQL local por padrão. DB_ENGINE=sqlite usa um arquivo SQLite (ex: seed_benchmark/bench
+# numa máquina sem MySQL); as demais variáveis DB_* sobrescrevem a conexão do MySQL.
+if os.environ.get('DB_ENGINE') == 'sqlite':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('DB_NAME') or BASE_DIR / 'db.sqlite3',
+        }
+    }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.mysql',
+            'NAME': os.environ.get('DB_NAME', 'efinanceiro_db'),  # O banco que combinamos
+            'USER': os.environ.get('DB_USER', 'root'),            # Seu usuário do MySQL (geralmente root)
+            'PASSWORD': os.environ.get('DB_PASSWORD', '7895123'),  # Sua senha do MySQL (preencha aqui)
+            'HOST': os.environ.get('DB_HOST', 'localhost'),
+            'PORT': os.environ.get('DB_PORT', '3306'),
+        }
     }
-}
 
 
 # Password validation
@@ -123,6 +154,27 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 
+# Medição por requisição (core.medicao): fração das requisições com Server-Timing e linha de log.
+# Por padrão só uma amostra de 5%; 1 mede todas (ex.: MEDICAO_AMOSTRAGEM=1 no ambiente de desenvolvimento)
+# e 0 desliga o middleware.
+MEDICAO_AMOSTRAGEM = float(os.environ.get('MEDICAO_AMOSTRAGEM', '0.05'))
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        # Uma linha por requisição medida; silenciado ao rodar os testes
+        'core.medicao': {
+            'handlers': ['console'],
+            'level': 'WARNING' if sys.argv[1:2] == ['test'] else os.environ.get('MEDICAO_LOG_NIVEL', 'INFO'),
+            'propagate': False,
+        },
+    },
+}
+
 # Internationalization
 # https://docs.djangoproject.com/en/5.2/topics/i18n/
 
@@ -0,0 +1,40 @@
+from django import template
+from django.utils.html import format_html
+
+from core.imagens import srcset, url_derivada
+
+register = template.Library()
+
+
+@register.simple_tag
+def imagem_responsiva(arquivo, hash_conteudo, perfil, classe='', alt=''):
+    """
+    <picture> com as miniaturas WebP/JPEG do perfil (core.imagens.PERFIS).
+    Sem miniaturas (arquivo antigo ainda não processado) usa o original.
+    Ex: {% imagem_responsiva c.foto c.foto_hash 'avatar' 'h-10 w-10 rounded-full' %}
+    """
+    if not arquivo:
+        return ''
+    if not hash_conteudo:
+        return format_html('<img src="{}" class="{}" alt="{}" loading="lazy">', arquivo.url, classe, alt)
+    return format_html(
+        '<picture><source type="image/webp" srcset="{}">'
+        '<img src="{}" srcset="{}" class="{}" alt="{}" loading="lazy" decoding="async"></picture>',
+        srcset(hash_conteudo, perfil, 'webp'),
+        url_derivada(hash_conteudo, perfil),
+        srcset(hash_conteudo, perfil, 'jpg'),
+        classe, alt,
+    )
+
+
+@register.simple_tag
+def url_imagem(arquivo, hash_conteudo, perfil, extensao='jpg'):
+    """
+    URL da maior miniatura do perfil (ou do original, se ainda não houver), para usar em CSS.
+    Ex: background-image: image-set(url('{% url_imagem e.banner e.banner_hash 'banner' 'webp' %}') type('image/webp'), ...)
+    """
+    if not arquivo:
+        return ''
+    if not hash_conteudo:
+        return arquivo.url
+    return url_derivada(hash_conteudo, perfil, extensao, -1)
@@ -0,0 +1,632 @@
+import shutil
+import tempfile
+from datetime import date, timedelta
+from decimal import Decimal
+from io import BytesIO, StringIO
+from unittest import mock
+
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import connection, transaction
+from django.template import Context, Template
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern, URLResolver, get_resolver, reverse
+from PIL import Image
+
+from cadastros.models import Cadastro, CategoriaCliente
+from financeiro.models import Caixa, Conta, Lancamento, PlanoDeContas, ResumoMensal, SaldoDiario
+from . import parametros
+from .imagens import PERFIS, nome_derivada
+from .contexto import empresa_atual, usando_empresa
+from .models import Empresa, ParametroSistema, Usuario
+from .paginacao import paginar_por_chave
+
+
+def popular_empresa(empresa, quantidade, inicio=None):
+    """
+    Cria cadastros, contas e lançamentos para a empresa (em lote) e reconstrói os consolidados.
+    Chamadas repetidas acrescentam mais linhas aos mesmos caixas e categorias.
+    """
+    inicio = inicio or date.today().replace(day=1) - timedelta(days=180)
+    caixas = list(Caixa.objects.filter(empresa=empresa)) or [
+        Caixa.objects.create(empresa=empresa, nome=f'Caixa {i}', saldo_inicial=Decimal(100 * i)) for i in range(3)
+    ]
+    planos = list(PlanoDeContas.objects.filter(empresa=empresa)) or [
+        PlanoDeContas.objects.create(empresa=empresa, nome=f'Plano {i}', tipo='RD'[i % 2], codigo=f'0{i % 2 + 1}.{i:02d}')
+        for i in range(8)
+    ]
+    categorias = list(CategoriaCliente.objects.filter(empresa=empresa)) or [
+        CategoriaCliente.objects.create(empresa=empresa, nome=f'Categoria {i}') for i in range(3)
+    ]
+
+    base = Cadastro.objects.filter(empresa=empresa).count()
+    cadastros = [
+        Cadastro(
+            empresa=empresa, nome=f'Pessoa {base + i:05d}', cpf_cnpj=f'{base + i:011d}',
+            papel=['CLI', 'FOR', 'AMB'][i % 3], categoria=categorias[i % len(categorias)],
+        )
+        for i in range(quantidade)
+    ]
+    for cadastro in cadastros:
+        cadastro.atualizar_busca()
+    Cadastro.objects.bulk_create(cadastros)
+    contas = Conta.objects.bulk_create([
+        Conta(
+            empresa=empresa, plano_de_contas=planos[i % len(planos)], cadastro=cadastros[i % len(cadastros)],
+            descricao=f'Conta {i}', valor=Decimal(i % 300 + 1), data_vencimento=inicio + timedelta(days=i % 200),
+            status=['PENDENTE', 'PAGA'][i % 2],
+        )
+        for i in range(quantidade)
+    ])
+    lancamentos = []
+    for i in range(quantidade * 2):
+        plano = planos[i % len(planos)]
+        valor = Decimal(i % 300 + 1)
+        lancamentos.append(Lancamento(
+            empresa=empresa, caixa=caixas[i % len(caixas)], plano_de_contas=plano,
+            conta_origem=contas[i] if i < len(contas) and contas[i].status == 'PAGA' else None,
+            data_lancamento=inicio + timedelta(days=i % 200), descricao=f'Lançamento {i}',
+            valor=valor if plano.tipo == 'R' else -valor, tipo='C' if plano.tipo == 'R' else 'D',
+        ))
+    Lancamento.objects.bulk_create(lancamentos)
+
+    SaldoDiario.objects.reconstruir(empresa.id)
+    ResumoMensal.objects.reconstruir(empresa.id)
+    return caixas, planos
+
+
+# Máximo de consultas por tela, com sessão e usuário já no cache (não consultam o banco). Não pode depender da quantidade de linhas.
+# Toda rota nova precisa declarar o seu orçamento aqui.
+# Exportações CSV contam uma consulta a cada lote de 2000 linhas (core.exportacao.iterar_por_chave).
+ORCAMENTOS = {
+    'home': 0,
+    'login': 0,
+    'logout': 0,
+    'dashboard': 4,
+    'configuracoes': 4,
+    'editar_parametro': 1,
+
+    'lista_clientes': 2,
+    'novo_cliente': 1,
+    'exportar_clientes': 1,
+    'lista_fornecedores': 1,
+    'novo_fornecedor': 0,
+    'exportar_fornecedores': 1,
+    'editar_cadastro': 2,
+    'excluir_cadastro': 2,
+    'lista_cadastros_padrao': 2,
+    'importar_clientes': 0,
+    'importar_fornecedores': 0,
+    'relatorio_importacao': 0,
+
+    'financeiro:fluxo_caixa': 6,
+    'financeiro:adicionar_lancamento': 2,
+    'financeiro:editar_lancamento': 3,
+    'financeiro:excluir_lancamento': 16,
+    'financeiro:relatorio_fluxo': 6,
+    'financeiro:relatorio_contas': 3,
+    'financeiro:relatorio_aging': 2,
+    'financeiro:relatorio_dre': 2,
+    'financeiro:relatorio_dre_sintetico': 3,
+    'financeiro:exportar_fluxo': 3,
+    'financeiro:exportar_contas': 1,
+    'financeiro:exportar_aging': 2,
+    'financeiro:importar_extrato': 3,
+    'financeiro:conciliacao': 4,
+    'financeiro:projecao_fluxo': 3,
+    'financeiro:lista_receber': 5,
+    'financeiro:nova_receita': 2,
+    'financeiro:gerar_mensalidades': 3,
+    'financeiro:lista_pagar': 4,
+    'financeiro:nova_despesa': 2,
+    'financeiro:baixar_conta': 1,
+    'financeiro:baixar_contas_lote': 0,
+    'financeiro:editar_conta': 4,
+    'financeiro:excluir_conta': 5,
+    'financeiro:lista_caixas': 1,
+    'financeiro:adicionar_caixa': 0,
+    'financeiro:editar_caixa': 1,
+    'financeiro:excluir_caixa': 2,
+    'financeiro:lista_plano_de_contas': 1,
+    'financeiro:adicionar_plano_de_contas': 0,
+    'financeiro:editar_plano_de_contas': 1,
+    'financeiro:excluir_plano_de_contas': 2,
+}
+
+
+def rotas_do_projeto(resolver=None, namespace=''):
+    """Nomes (com namespace) de todas as rotas do projeto, exceto o admin do Django"""
+    resolver = resolver or get_resolver()
+    for padrao in resolver.url_patterns:
+        if isinstance(padrao, URLResolver):
+            if padrao.app_name == 'admin':
+                continue
+            prefixo = f'{padrao.namespace}:' if padrao.namespace else ''
+            yield from rotas_do_projeto(padrao, namespace + prefixo)
+        elif isinstance(padrao, URLPattern) and padrao.name:
+            yield namespace + padrao.name
+
+
+class OrcamentoConsultasTests(TestCase):
+    """Cada tela deve rodar um número fixo de consultas, sem N+1 nas listas"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.empresa = Empresa.objects.create(nome='Empresa Orçamento', cnpj='11.111.111/0001-11')
+        cls.usuario = Usuario.objects.create_user('orcamento', password='x', empresa=cls.empresa)
+        popular_empresa(cls.empresa, 60)
+
+        cls.caixa = Caixa.objects.filter(empresa=cls.empresa).first()
+        cls.plano = PlanoDeContas.objects.filter(empresa=cls.empresa).first()
+        cls.cadastro = Cadastro.objects.filter(empresa=cls.empresa).first()
+        cls.conta = Conta.objects.filter(empresa=cls.empresa, status='PENDENTE').first()
+        cls.lancamento = Lancamento.objects.filter(empresa=cls.empresa, conta_origem__isnull=False).first()
+        cls.parametro = ParametroSistema.objects.create(empresa=cls.empresa, chave='CAIXA_PADRAO_ID', valor=str(cls.caixa.id))
+
+    def setUp(self):
+        self.client.force_login(self.usuario)
+        # Sessão e usuário ficam no cache depois da primeira requisição: mede-se a página típica
+        self.client.get(reverse('home'))
+
+    def url(self, nome):
+        argumentos = {
+            'editar_parametro': self.parametro.id,
+            'editar_cadastro': self.cadastro.id,
+            'excluir_cadastro': self.cadastro.id,
+            'financeiro:editar_lancamento': self.lancamento.id,
+            'financeiro:excluir_lancamento': self.lancamento.id,
+            'financeiro:baixar_conta': self.conta.id,
+            'financeiro:editar_conta': self.conta.id,
+            'financeiro:excluir_conta': self.conta.id,
+            'financeiro:editar_caixa': self.caixa.id,
+            'financeiro:excluir_caixa': self.caixa.id,
+            'financeiro:editar_plano_de_contas': self.plano.id,
+            'financeiro:excluir_plano_de_contas': self.plano.id,
+        }
+        if nome in argumentos:
+            return reverse(nome, kwargs={'id': argumentos[nome]})
+        return reverse(nome)
+
+    def contar_consultas(self, nome):
+        # Telas de exclusão alteram o banco: cada requisição roda num savepoint desfeito no final.
+        # O cache de parâmetros é limpo antes para medir sempre o pior caso (cache frio).
+        parametros.invalidar(self.empresa.id)
+        with transaction.atomic():
+            with CaptureQueriesContext(connection) as consultas:
+                resposta = self.client.get(self.url(nome))
+                if resposta.streaming:
+                    # Exportações só consultam o banco enquanto o conteúdo é consumido
+                    b''.join(resposta.streaming_content)
+            transaction.set_rollback(True)
+        self.assertLess(resposta.status_code, 500, nome)
+        return len(consultas)
+
+    def test_todas_as_rotas_tem_orcamento(self):
+        sem_orcamento = sorted(set(rotas_do_projeto()) - set(ORCAMENTOS))
+        self.assertEqual(sem_orcamento, [], "Declare o orçamento de consultas destas rotas em ORCAMENTOS")
+
+    def test_rotas_respeitam_orcamento_independente_do_volume(self):
+        rotas = [nome for nome in rotas_do_projeto() if nome in ORCAMENTOS]
+        antes = {nome: self.contar_consultas(nome) for nome in rotas}
+
+        # Mais linhas não podem gerar mais consultas
+        popular_empresa(self.empresa, 120)
+        depois = {nome: self.contar_consultas(nome) for nome in rotas}
+
+        for nome in rotas:
+            with self.subTest(rota=nome):
+                self.assertLessEqual(depois[nome], ORCAMENTOS[nome])
+                self.assertEqual(depois[nome], antes[nome], "Número de consultas cresce com o volume de dados")
+
+
+class PaginacaoPorChaveTests(TestCase):
+    """Cursor (data, id) nos dois sentidos, sem OFFSET nem COUNT"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.empresa = Empresa.objects.create(nome='Empresa Páginas', cnpj='56.565.656/0001-56')
+        plano = PlanoDeContas.objects.create(empresa=cls.empresa, codigo='01', nome='Receitas', tipo='R')
+        # Três vencimentos empatados no meio: o id desempata
+        vencimentos = [date(2024, 1, 1), date(2024, 1, 5), date(2024, 1, 5), date(2024, 1, 5), date(2024, 1, 9),
+                       date(2024, 1, 2), date(2024, 1, 20)]
+        Conta.objects.bulk_create([
+            Conta(empresa=cls.empresa, plano_de_contas=plano, descricao=f'Conta {i}', valor=Decimal(10), data_vencimento=vencimento)
+            for i, vencimento in enumerate(vencimentos)
+        ])
+        cls.contas = Conta.objects.filter(empresa=cls.empresa)
+
+    def paginar(self, consulta='', qs=None, **kwargs):
+        request = RequestFactory().get(f'/lista/{consulta}')
+        return paginar_por_chave(request, self.contas if qs is None else qs, 'data_vencimento', tamanho=3, **kwargs)
+
+    def ids(self, pagina):
+        return [conta.id for conta in pagina.itens]
+
+    def percorrer(self, decrescente=False):
+        """Ids das páginas indo até o fim pelo 'próximos' e voltando pelo 'anteriores'"""
+        pagina = self.paginar(decrescente=decrescente)
+        ida = [self.ids(pagina)]
+        while pagina.tem_mais:
+            pagina = self.paginar(pagina.url_proxima, decrescente=decrescente)
+            ida.append(self.ids(pagina))
+        volta = [self.ids(pagina)]
+        while pagina.tem_anterior:
+            pagina = self.paginar(pagina.url_anterior, decrescente=decrescente)
+            volta.append(self.ids(pagina))
+        return ida, volta
+
+    def test_proximas_e_anteriores_com_empates(self):
+        ordem = list(self.contas.order_by('data_vencimento', 'id').values_list('id', flat=True))
+        ida, volta = self.percorrer()
+        self.assertEqual(ida, [ordem[0:3], ordem[3:6], ordem[6:7]])
+        self.assertEqual(volta, ida[::-1])
+
+        ordem.reverse()
+        ida, volta = self.percorrer(decrescente=True)
+        self.assertEqual(ida, [ordem[0:3], ordem[3:6], ordem[6:7]])
+        self.assertEqual(volta, ida[::-1])
+
+    def test_primeira_ultima_e_vazia(self):
+        primeira = self.paginar()
+        self.assertTrue(primeira.tem_mais)
+        self.assertFalse(primeira.tem_anterior)
+        self.assertEqual((primeira.url_anterior, primeira.url_primeira), ('', ''))
+
+        ultima = self.paginar(self.paginar(primeira.url_proxima).url_proxima)
+        self.assertEqual(len(ultima.itens), 1)
+        self.assertFalse(ultima.tem_mais)
+        self.assertEqual(ultima.url_proxima, '')
+        self.assertEqual(ultima.url_primeira, '?')
+
+        vazia = self.paginar(qs=Conta.objects.none())
+        self.assertEqual((vazia.itens, vazia.tem_mais, vazia.tem_anterior), ([], False, False))
+        # Cursor depois do último item: página vazia, sem links para frente nem para trás
+        depois_do_fim = self.paginar('?apos=2030-01-01_1')
+        self.assertEqual((depois_do_fim.itens, depois_do_fim.url_proxima, depois_do_fim.url_anterior), ([], '', ''))
+
+    def test_cursor_invalido_volta_para_o_inicio(self):
+        inicio = self.ids(self.paginar())
+        for cursor in ['lixo', '2024-13-40_1', '2024-01-05_abc', '2024-01-05', '_7', '2024-01-05_-1']:
+            for parametro in ('apos', 'antes'):
+                with self.subTest(parametro=parametro, cursor=cursor):
+                    self.assertEqual(self.ids(self.paginar(f'?{parametro}={cursor}')), inicio)
+
+    def test_cursor_adulterado_so_reposiciona(self):
+        # Um id que não existe continua valendo como posição (data, id); nada além do queryset aparece
+        pagina = self.paginar('?apos=2024-01-05_0')
+        esperado = list(
+            self.contas.filter(data_vencimento__gte=date(2024, 1, 5)).order_by('data_vencimento', 'id').values_list('id', flat=True)[:3]
+        )
+        self.assertEqual(self.ids(pagina), esperado)
+        outra = Empresa.objects.create(nome='Outra', cnpj='57.575.757/0001-57')
+        self.assertEqual(self.paginar('?apos=2024-01-05_0', qs=Conta.objects.filter(empresa=outra)).itens, [])
+
+    def test_links_mantem_os_filtros(self):
+        pagina = self.paginar('?status=PENDENTE&caixa=3&data_ini=2024-01-01')
+        self.assertEqual(
+            pagina.url_proxima,
+            f'?status=PENDENTE&caixa=3&data_ini=2024-01-01&apos=2024-01-05_{pagina.itens[-1].id}',
+        )
+        segunda = self.paginar(pagina.url_proxima)
+        self.assertEqual(segunda.url_anterior, f'?status=PENDENTE&caixa=3&data_ini=2024-01-01&antes=2024-01-05_{segunda.itens[0].id}')
+        self.assertEqual(segunda.url_primeira, '?status=PENDENTE&caixa=3&data_ini=2024-01-01')
+        self.assertNotIn('antes', self.paginar(segunda.url_anterior).url_proxima)
+
+    def test_lista_pagina_com_os_filtros(self):
+        usuario = Usuario.objects.create_user('paginas', password='x', empresa=self.empresa)
+        self.client.force_login(usuario)
+        Conta.objects.bulk_create([
+            Conta(empresa=self.empresa, plano_de_contas=self.contas[0].plano_de_contas, descricao=f'Mais {i}',
+                  valor=Decimal(1), data_vencimento=date(2024, 2, 1) + timedelta(days=i))
+            for i in range(60)
+        ])
+        resposta = self.client.get(reverse('financeiro:lista_receber'), {'status': 'PENDENTE'})
+        pagina = resposta.context['pagina']
+        self.assertEqual(len(pagina.itens), 50)
+        self.assertIn('status=PENDENTE', pagina.url_proxima)
+        resposta = self.client.get(reverse('financeiro:lista_receber') + pagina.url_proxima)
+        self.assertEqual(len(resposta.context['pagina'].itens), 17)
+        self.assertTrue(resposta.context['pagina'].tem_anterior)
+
+
+class ParametrosTests(TestCase):
+    """Parâmetros tipados, lidos uma vez e invalidados ao salvar"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.empresa = Empresa.objects.create(nome='Empresa Parâmetros', cnpj='99.999.999/0001-99')
+        cls.usuario = Usuario.objects.create_user('parametros', password='x', empresa=cls.empresa)
+
+    def setUp(self):
+        parametros.invalidar(self.empresa.id)
+
+    def test_valores_tipados_com_padrao(self):
+        ParametroSistema.objects.create(empresa=self.empresa, chave='TAXA_JUROS_MENSAL', valor='2,5')
+        ParametroSistema.objects.create(empresa=self.empresa, chave='CAIXA_PADRAO_ID', valor='0')
+
+        self.assertEqual(parametros.valores(self.empresa.id), {
+            'CAIXA_PADRAO_ID': None,
+            'TAXA_JUROS_MENSAL': Decimal('2.5'),
+            'PLANO_CONTAS_MENSALIDADE_ID': None,
+            'PLANO_CONTAS_JUROS_ID': None,
+        })
+
+    def test_uma_consulta_e_invalidacao_ao_salvar(self):
+        parametro = ParametroSistema.objects.create(empresa=self.empresa, chave='CAIXA_PADRAO_ID', valor='7')
+        with self.assertNumQueries(1):
+            self.assertEqual(parametros.obter(self.empresa.id, 'CAIXA_PADRAO_ID'), 7)
+            self.assertEqual(parametros.obter(self.empresa.id, 'TAXA_JUROS_MENSAL'), Decimal('0'))
+
+        parametro.valor = '8'
+        parametro.save()
+        self.assertEqual(parametros.obter(self.empresa.id, 'CAIXA_PADRAO_ID'), 8)
+
+        parametro.delete()
+        self.assertIsNone(parametros.obter(self.empresa.id, 'CAIXA_PADRAO_ID'))
+
+    def test_configuracoes_criam_padroes_uma_vez(self):
+        self.client.force_login(self.usuario)
+        self.client.get(reverse('configuracoes'))
+        self.assertEqual(
+            sorted(ParametroSistema.objects.filter(empresa=self.empresa).values_list('chave', flat=True)),
+            sorted(parametros.PARAMETROS),
+        )
+
+        # Sessão, usuário e parâmetros vêm do cache: só sobra a listagem
+        with self.assertNumQueries(1):
+            resposta = self.client.get(reverse('configuracoes'))
+        self.assertEqual(len(resposta.context['parametros']), len(parametros.PARAMETROS))
+
+
+class EmpresaAtualTests(TestCase):
+    """Escopo automático por empresa (tenant) e bloqueio de empresas inativas"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.empresa = Empresa.objects.create(nome='Empresa A', cnpj='12.121.212/0001-12')
+        cls.outra = Empresa.objects.create(nome='Empresa B', cnpj='34.343.434/0001-34')
+        cls.usuario = Usuario.objects.create_user('tenant', password='x', empresa=cls.empresa)
+        cls.caixa = Caixa.objects.create(empresa=cls.empresa, nome='Caixa A')
+        cls.caixa_alheio = Caixa.objects.create(empresa=cls.outra, nome='Caixa B')
+
+    def test_manager_filtra_pela_empresa_atual(self):
+        self.assertEqual(Caixa.objects.count(), 2)
+        with usando_empresa(self.empresa):
+            self.assertEqual(list(Caixa.objects.all()), [self.caixa])
+            self.assertFalse(Caixa.objects.filter(id=self.caixa_alheio.id).exists())
+            self.assertEqual(Caixa.objects.sem_escopo().count(), 2)
+        self.assertIsNone(empresa_atual())
+
+    def test_requisicao_usa_a_empresa_do_usuario(self):
+        self.client.force_login(self.usuario)
+        resposta = self.client.get(reverse('financeiro:editar_caixa', kwargs={'id': self.caixa_alheio.id}))
+        self.assertEqual(resposta.status_code, 404)
+        self.assertIsNone(empresa_atual())
+
+    def test_empresa_inativa_e_desconectada(self):
+        self.client.force_login(self.usuario)
+        self.empresa.ativo = False
+        self.empresa.save()
+
+        resposta = self.client.get(reverse('dashboard'))
+        self.assertRedirects(resposta, reverse('login'), fetch_redirect_response=False)
+        self.assertNotIn('_auth_user_id', self.client.session)
+
+        resposta = self.client.post(reverse('login'), {'username': 'tenant', 'password': 'x'})
+        self.assertContains(resposta, 'suspenso')
+        self.assertNotIn('_auth_user_id', self.client.session)
+
+
+class AutenticacaoTests(TestCase):
+    """Login por usuário ou e-mail e usuário da sessão em cache"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.empresa = Empresa.objects.create(nome='Empresa Login', cnpj='56.565.656/0001-56')
+        cls.usuario = Usuario.objects.create_user('Maria', email='Maria@Exemplo.com', password='segredo', empresa=cls.empresa)
+
+    def entrar(self, login, senha='segredo'):
+        self.client.post(reverse('login'), {'username': login, 'password': senha})
+        return self.client.session.get('_auth_user_id')
+
+    def test_login_por_usuario_ou_email_sem_diferenciar_maiusculas(self):
+        for login in ('Maria', 'maria', 'maria@exemplo.com', ' MARIA@EXEMPLO.COM '):
+            with self.subTest(login=login):
+                self.assertEqual(self.entrar(login), str(self.usuario.id))
+                self.client.logout()
+        self.assertIsNone(self.entrar('maria@exemplo.com', 'errada'))
+
+    def test_email_repetido_nao_identifica_ninguem(self):
+        Usuario.objects.create_user('outra', email='maria@exemplo.com', password='segredo', empresa=self.empresa)
+        self.assertIsNone(self.entrar('maria@exemplo.com'))
+        self.assertEqual(self.entrar('Maria'), str(self.usuario.id))
+
+    def test_pagina_autenticada_sem_consultas_de_autenticacao(self):
+        self.client.force_login(self.usuario)
+        self.client.get(reverse('home'))
+        with self.assertNumQueries(0):
+            resposta = self.client.get(reverse('home'))
+        self.assertEqual(resposta.context['user'].empresa, self.empresa)
+
+        # Alterar o usuário ou a empresa limpa o cache
+        self.empresa.nome = 'Empresa Renomeada'
+        self.empresa.save()
+        with self.assertNumQueries(1):
+            resposta = self.client.get(reverse('home'))
+        self.assertEqual(resposta.context['user'].empresa.nome, 'Empresa Renomeada')
+
+
+def imagem_png(largura=300, altura=200, cor=(200, 30, 30, 128)):
+    saida = BytesIO()
+    Image.new('RGBA', (largura, altura), cor).save(saida, 'PNG')
+    return saida.getvalue()
+
+
+class MiniaturasTests(TestCase):
+    """Miniaturas WebP/JPEG geradas no upload, com nome pelo conteúdo"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.pasta = tempfile.mkdtemp()
+        cls.media = override_settings(MEDIA_ROOT=cls.pasta)
+        cls.media.enable()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.media.disable()
+        shutil.rmtree(cls.pasta, ignore_errors=True)
+        super().tearDownClass()
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.empresa = Empresa.objects.create(nome='Empresa Imagens', cnpj='45.454.545/0001-45')
+
+    def cadastro(self, nome, conteudo):
+        return Cadastro.objects.create(
+            empresa=self.empresa, nome=nome, cpf_cnpj=nome, foto=SimpleUploadedFile(f'{nome}.png', conteudo),
+        )
+
+    def test_upload_gera_miniaturas_compartilhadas(self):
+        conteudo = imagem_png()
+        primeiro = self.cadastro('um', conteudo)
+        self.assertEqual(len(primeiro.foto_hash), 64)
+        for largura, altura in PERFIS['avatar']['caixas']:
+            for extensao in ('webp', 'jpg'):
+                with default_storage.open(nome_derivada(primeiro.foto_hash, 'avatar', largura, extensao)) as arquivo:
+                    self.assertEqual(Image.open(arquivo).size, (largura, altura))
+
+        # Mesmo conteúdo, outro upload: mesmas miniaturas
+        segundo = self.cadastro('dois', conteudo)
+        self.assertEqual(segundo.foto_hash, primeiro.foto_hash)
+        self.assertNotEqual(segundo.foto.name, primeiro.foto.name)
+
+    def test_template_usa_srcset(self):
+        cadastro = self.cadastro('tres', imagem_png())
+        html = Template("{% load imagens %}{% imagem_responsiva c.foto c.foto_hash 'avatar' 'h-10' %}").render(Context({'c': cadastro}))
+        self.assertIn('type="image/webp"', html)
+        self.assertIn(f'{cadastro.foto_hash}_avatar_80.webp 2x', html)
+        self.assertIn(f'src="/media/miniaturas/{cadastro.foto_hash[:2]}/{cadastro.foto_hash}_avatar_40.jpg"', html)
+
+        # Sem hash (arquivo antigo) cai no original
+        cadastro.foto_hash = ''
+        html = Template("{% load imagens %}{% imagem_responsiva c.foto c.foto_hash 'avatar' %}").render(Context({'c': cadastro}))
+        self.assertIn(cadastro.foto.url, html)
+
+    def test_comando_processa_arquivos_existentes(self):
+        cadastro = self.cadastro('quatro', imagem_png(cor=(0, 0, 255, 255)))
+        esperado = cadastro.foto_hash
+        Cadastro.objects.filter(id=cadastro.id).update(foto_hash='')
+        self.empresa.banner = SimpleUploadedFile('banner.png', imagem_png(2000, 800))
+        self.empresa.save()
+        Empresa.objects.filter(id=self.empresa.id).update(banner_hash='')
+
+        call_command('gerar_miniaturas', stdout=StringIO())
+
+        cadastro.refresh_from_db()
+        self.empresa.refresh_from_db()
+        self.assertEqual(cadastro.foto_hash, esperado)
+        with default_storage.open(nome_derivada(self.empresa.banner_hash, 'banner', 1920, 'webp')) as arquivo:
+            self.assertEqual(Image.open(arquivo).size, (1920, 768))
+
+
+class BenchmarkTests(TestCase):
+
+    def test_seed_benchmark_gera_empresa_consistente(self):
+        saida = StringIO()
+        call_command(
+            'seed_benchmark', cadastros=60, planos=10, caixas=2, contas=300, lancamentos=200, anos=1, stdout=saida,
+        )
+
+        empresa = Empresa.objects.get(cnpj__startswith='BENCH')
+        self.assertTrue(Usuario.objects.filter(empresa=empresa, username=f'bench{empresa.id}').exists())
+        self.assertEqual(Cadastro.objects.filter(empresa=empresa).count(), 60)
+        self.assertEqual(Conta.objects.filter(empresa=empresa).count(), 300)
+        self.assertEqual(PlanoDeContas.objects.filter(empresa=empresa, nivel=3).count(), 10)
+        # Árvore montada: toda categoria analítica tem subgrupo e grupo acima
+        self.assertFalse(PlanoDeContas.objects.filter(empresa=empresa, nivel__gt=1, pai__isnull=True).exists())
+        pagas = Conta.objects.filter(empresa=empresa, status='PAGA').count()
+        self.assertEqual(Lancamento.objects.filter(empresa=empresa).count(), 200 + pagas)
+        self.assertEqual(Lancamento.objects.filter(empresa=empresa, conta_origem__isnull=False).count(), pagas)
+        self.assertFalse(Lancamento.objects.filter(empresa=empresa, tipo='D', valor__gt=0).exists())
+        self.assertEqual(SaldoDiario.objects.divergencias(empresa.id), [])
+        self.assertEqual(ResumoMensal.objects.divergencias(empresa.id), [])
+
+        # --limpar troca a empresa anterior por uma nova
+        call_command('seed_benchmark', cadastros=10, planos=10, contas=10, lancamentos=10, limpar=True, stdout=saida)
+        self.assertFalse(Empresa.objects.filter(id=empresa.id).exists())
+        self.assertEqual(Empresa.objects.filter(cnpj__startswith='BENCH').count(), 1)
+
+    def test_bench_mede_todas_as_telas(self):
+        call_command('seed_benchmark', cadastros=30, planos=10, contas=100, lancamentos=100, anos=1, stdout=StringIO())
+        saida = StringIO()
+        call_command('bench', repeticoes=1, aquecimento=0, stdout=saida)
+
+        linhas = saida.getvalue()
+        for tela in ['fluxo_caixa', 'relatorio_fluxo', 'relatorio_dre', 'relatorio_dre_sintetico',
+                     'lista_receber', 'lista_pagar', 'dashboard']:
+            self.assertIn(f'\n{tela} ', linhas)
+
+    def test_bench_sem_empresas_de_benchmark(self):
+        with self.assertRaises(CommandError):
+            call_command('bench', stdout=StringIO())
+
+
+@override_settings(MEDICAO_AMOSTRAGEM=1)
+class MedicaoTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.empresa = Empresa.objects.create(nome='Empresa Medida', cnpj='12.121.212/0001-12')
+        cls.usuario = Usuario.objects.create_user('medido', password='x', empresa=cls.empresa)
+        popular_empresa(cls.empresa, 10)
+
+    def setUp(self):
+        parametros.invalidar(self.empresa.id)
+
+    def metricas(self, resposta):
+        """{'db': (dur, consultas), 'tpl': (dur, None), 'view': (dur, None)} do cabeçalho Server-Timing"""
+        metricas = {}
+        for metrica in resposta['Server-Timing'].split(', '):
+            nome, dur, *desc = metrica.split(';')
+            metricas[nome] = (float(dur.removeprefix('dur=')), int(desc[0].split('"')[1].split()[0]) if desc else None)
+        return metricas
+
+    def test_view_sincrona_publica_cabecalho_e_log(self):
+        self.client.force_login(self.usuario)
+        with self.assertLogs('core.medicao', 'INFO') as logs:
+            resposta = self.client.get(reverse('financeiro:fluxo_caixa'))
+
+        metricas = self.metricas(resposta)
+        self.assertGreater(metricas['db'][1], 0)
+        self.assertGreater(metricas['tpl'][0], 0)
+        self.assertGreaterEqual(metricas['view'][0], metricas['tpl'][0])
+        registro = logs.records[-1]
+        self.assertIn(f'rota=financeiro:fluxo_caixa empresa={self.empresa.id} status=200', registro.getMessage())
+        self.assertEqual(registro.medicao['consultas'], metricas['db'][1])
+
+    async def test_view_assincrona_conta_consultas_das_threads(self):
+        await self.async_client.aforce_login(self.usuario)
+        resposta = await self.async_client.get(reverse('dashboard'))
+
+        metricas = self.metricas(resposta)
+        self.assertGreater(metricas['db'][1], 0)
+        self.assertGreater(metricas['tpl'][0], 0)
+
+    @override_settings(MEDICAO_AMOSTRAGEM=0.05)
+    def test_amostragem_parcial_mede_so_as_sorteadas(self):
+        self.client.force_login(self.usuario)
+        with mock.patch('core.middleware.random.random', side_effect=[0.5, 0.01]):
+            fora = self.client.get(reverse('financeiro:fluxo_caixa'))
+            sorteada = self.client.get(reverse('financeiro:fluxo_caixa'))
+        self.assertNotIn('Server-Timing', fora)
+        self.assertIn('Server-Timing', sorteada)
+
+    @override_settings(MEDICAO_AMOSTRAGEM=0)
+    def test_amostragem_zero_desliga(self):
+        self.client.force_login(self.usuario)
+        resposta = self.client.get(reverse('financeiro:fluxo_caixa'))
+        self.assertEqual(resposta.status_code, 200)
+        self.assertNotIn('Server-Timing', resposta)
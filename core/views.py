@@ -1,6 +1,7 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
+from . import parametros
 from .models import ParametroSistema
 from .forms import ParametroForm
 
@@ -8,25 +9,13 @@ from .forms import ParametroForm
 def configuracoes_sistema(request):
     empresa = request.user.empresa
     
-    # 1. Garante que os parâmetros padrão existam para esta empresa
-    parametros_padrao = [
-        'CAIXA_PADRAO_ID', 
-        'TAXA_JUROS_MENSAL', 
-        'PLANO_CONTAS_MENSALIDADE_ID',
-        'PLANO_CONTAS_JUROS_ID'
-    ]
-    
-    for chave in parametros_padrao:
-        ParametroSistema.objects.get_or_create(
-            empresa=empresa, 
-            chave=chave,
-            defaults={'valor': '0', 'descricao': 'Configuração automática'}
-        )
+    # 1. Garante que os parâmetros padrão existam para esta empresa (só grava na primeira vez)
+    parametros.garantir_padroes(empresa.id)
 
     # 2. Lista todos
-    parametros = ParametroSistema.objects.filter(empresa=empresa)
+    registros = ParametroSistema.objects.filter(empresa=empresa)
     
-    return render(request, 'core/configuracoes.html', {'parametros': parametros})
+    return render(request, 'core/configuracoes.html', {'parametros': registros})
 
 @login_required
 def editar_parametro(request, id):
@@ -0,0 +1,72 @@
+"""
+Aging (envelhecimento) das contas em aberto: quanto está a vencer e quanto está vencido
+há 1-30, 31-60, 61-90 e mais de 90 dias, por cliente/fornecedor ou por categoria.
+
+Uma consulta agrupada com somas condicionais (CASE WHEN dentro do SUM) sobre as contas
+PENDENTES; as faixas são intervalos de vencimento calculados a partir da data-base, então
+o banco só compara datas e usa o índice (empresa, status, data_vencimento).
+"""
+from datetime import date, timedelta
+
+from django.db.models import Count, DecimalField, Q, Sum, Value
+from django.db.models.functions import Coalesce
+
+from .models import Conta
+
+FAIXAS = [
+    ('a_vencer', 'A vencer'),
+    ('ate_30', '1 a 30 dias'),
+    ('ate_60', '31 a 60 dias'),
+    ('ate_90', '61 a 90 dias'),
+    ('acima_90', 'Mais de 90 dias'),
+]
+
+# Agrupamento -> campos do values() (id, rótulos)
+AGRUPAMENTOS = {
+    'cadastro': ['cadastro_id', 'cadastro__nome'],
+    'plano': ['plano_de_contas_id', 'plano_de_contas__codigo', 'plano_de_contas__nome'],
+}
+
+
+def _somas(data_base):
+    def soma(**filtro):
+        return Coalesce(
+            Sum('valor', filter=Q(**filtro) if filtro else None), Value(0),
+            output_field=DecimalField(max_digits=16, decimal_places=2),
+        )
+
+    def dias(quantidade):
+        return data_base - timedelta(days=quantidade)
+
+    return {
+        'a_vencer': soma(data_vencimento__gte=data_base),
+        'ate_30': soma(data_vencimento__lt=data_base, data_vencimento__gte=dias(30)),
+        'ate_60': soma(data_vencimento__lt=dias(30), data_vencimento__gte=dias(60)),
+        'ate_90': soma(data_vencimento__lt=dias(60), data_vencimento__gte=dias(90)),
+        'acima_90': soma(data_vencimento__lt=dias(90)),
+        'vencido': soma(data_vencimento__lt=data_base),
+        'total': soma(),
+        'quantidade': Count('id'),
+    }
+
+
+def contas_em_aberto(empresa, tipo_plano):
+    return Conta.objects.filter(empresa=empresa, status='PENDENTE', plano_de_contas__tipo=tipo_plano)
+
+
+def aging(empresa, tipo_plano, agrupar_por='cadastro', data_base=None):
+    """
+    Linhas do aging (dicionários com os campos do agrupamento, as faixas, 'vencido', 'total' e 'quantidade'),
+    dos maiores valores vencidos para os menores. Queryset: fatie para limitar a tela.
+    """
+    return (
+        contas_em_aberto(empresa, tipo_plano)
+        .values(*AGRUPAMENTOS[agrupar_por])
+        .annotate(**_somas(data_base or date.today()))
+        .order_by('-vencido', '-total', *AGRUPAMENTOS[agrupar_por][1:])
+    )
+
+
+def totais_aging(empresa, tipo_plano, data_base=None):
+    """As mesmas faixas somadas para todas as contas em aberto (linha de total)"""
+    return contas_em_aberto(empresa, tipo_plano).aggregate(**_somas(data_base or date.today()))
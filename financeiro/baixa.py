@@ -0,0 +1,86 @@
+"""
+Baixa (pagamento/recebimento) de contas, uma ou centenas por vez.
+
+As contas pendentes são travadas de uma vez, os lançamentos saem num bulk_create
+e os status mudam num único UPDATE, tudo na mesma transação.
+Recebimentos em atraso geram também um lançamento de juros (ver financeiro/juros.py).
+"""
+from django.db import transaction
+
+from core import parametros
+
+from .juros import juros_ate
+from .models import CENTAVO, Conta, Lancamento, PlanoDeContas
+
+
+def plano_juros(empresa):
+    """ID da categoria de receita configurada em PLANO_CONTAS_JUROS_ID, None se não configurada, ou ValueError"""
+    plano_id = parametros.obter(empresa.id, 'PLANO_CONTAS_JUROS_ID')
+    if not plano_id:
+        return None
+    if not PlanoDeContas.objects.filter(empresa=empresa, id=plano_id, tipo='R').exists():
+        raise ValueError(
+            "O parâmetro PLANO_CONTAS_JUROS_ID deve ser o ID de uma categoria de receita do plano de contas. "
+            "Corrija-o ou remova-o para baixar sem juros."
+        )
+    return plano_id
+
+
+def baixar_contas(empresa, ids, caixa, data_pagamento, cobrar_juros=True):
+    """
+    Baixa as contas PENDENTES de `ids` no `caixa` com a data informada.
+    Contas a receber vencidas antes do pagamento ganham um lançamento separado com os juros
+    (TAXA_JUROS_MENSAL), na categoria PLANO_CONTAS_JUROS_ID e ligado à conta por `conta_juros`;
+    sem essa categoria configurada ou com `cobrar_juros=False`, só o valor original é lançado.
+    Retorna (ids baixados, ids ignorados por já estarem pagos/cancelados ou não pertencerem à empresa).
+    ValueError se PLANO_CONTAS_JUROS_ID não for uma categoria de receita da empresa.
+    """
+    ids = {int(conta_id) for conta_id in ids}
+    plano_juros_id = plano_juros(empresa) if cobrar_juros else None
+    taxa = parametros.obter(empresa.id, 'TAXA_JUROS_MENSAL') if plano_juros_id else 0
+
+    with transaction.atomic():
+        # Trava só as linhas de contas (sem join) para duas baixas simultâneas não pagarem a mesma conta
+        pendentes = list(
+            Conta.objects.select_for_update()
+            .filter(empresa=empresa, id__in=ids, status='PENDENTE')
+            .annotate(juros=juros_ate(data_pagamento, taxa))
+            .order_by('id')
+            .values_list('id', 'descricao', 'valor', 'plano_de_contas_id', 'juros')
+        )
+        tipos = dict(
+            PlanoDeContas.objects.filter(id__in={conta[3] for conta in pendentes}).values_list('id', 'tipo')
+        )
+
+        # R (Receita) -> C (Crédito); D (Despesa) -> D (Débito)
+        Lancamento.objects.criar_em_lote([
+            Lancamento(
+                empresa=empresa,
+                caixa=caixa,
+                plano_de_contas_id=plano_id,
+                conta_origem_id=conta_id,
+                descricao=f"Baixa: {descricao}",
+                data_lancamento=data_pagamento,
+                valor=valor,
+                tipo='C' if tipos[plano_id] == 'R' else 'D',
+            )
+            for conta_id, descricao, valor, plano_id, _ in pendentes
+        ] + [
+            Lancamento(
+                empresa=empresa,
+                caixa=caixa,
+                plano_de_contas_id=plano_juros_id,
+                conta_juros_id=conta_id,
+                descricao=f"Juros: {descricao}",
+                data_lancamento=data_pagamento,
+                valor=juros.quantize(CENTAVO),
+                tipo='C',
+            )
+            for conta_id, descricao, valor, plano_id, juros in pendentes
+            if juros and tipos[plano_id] == 'R'
+        ])
+
+        baixados = [conta[0] for conta in pendentes]
+        Conta.objects.filter(id__in=baixados).update(status='PAGA')
+
+    return baixados, sorted(ids - set(baixados))
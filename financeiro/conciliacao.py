@@ -0,0 +1,197 @@
+"""
+Conciliação bancária: casa lançamentos do caixa sem conta de origem (ex: vindos do extrato)
+com as contas a pagar/receber PENDENTES.
+
+1. Documento: mesmo tipo, mesmo valor e mesmo nº de documento (dicionário por chave).
+2. Valor + data: mesmo tipo e valor, vencimento até `janela` dias da data do lançamento.
+   As contas de cada valor ficam ordenadas por vencimento e a janela sai por bisect;
+   entre várias candidatas ganha a de nome do cliente/fornecedor mais presente na
+   descrição do lançamento e, depois, a de vencimento mais próximo.
+
+Só são lidas as contas com vencimento perto do período dos lançamentos, não todo o histórico
+pendente: até `janela` dias depois do último e, antes do primeiro, `janela` dias (ou
+`janela_documento`, maior, para o critério por documento, que aceita boletos pagos com atraso).
+Nada é comparado par a par: ordenar e indexar é O(n log n) e cada lançamento só olha as
+contas do seu valor dentro da janela. O resultado são sugestões; conciliar() grava as confirmadas.
+"""
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import date, timedelta
+
+from django.db import transaction
+
+from cadastros.busca import normalizar_texto
+
+from .models import Conta, Lancamento, atualizar_consolidados, estornar
+
+JANELA_DIAS = 5
+JANELA_DOCUMENTO_DIAS = 90
+
+POR_DOCUMENTO = 'DOCUMENTO'
+POR_VALOR_DATA = 'VALOR_DATA'
+
+
+@dataclass
+class Sugestao:
+    lancamento: dict  # id, data_lancamento, descricao, valor, tipo, documento, caixa__nome
+    conta: dict  # id, data_vencimento, descricao, valor, documento, cadastro__nome
+    criterio: str
+    dias: int  # data do lançamento - vencimento
+    similaridade: float  # 0 a 1, palavras do nome do cadastro presentes na descrição do lançamento
+    empate: bool = False  # outra conta da janela tinha a mesma pontuação (conferir antes de confirmar)
+
+
+def _centavos(valor):
+    return int(round(abs(valor) * 100))
+
+
+def _documento(valor):
+    return normalizar_texto(valor).replace(' ', '')
+
+
+def _palavras(texto):
+    return frozenset(normalizar_texto(texto).split())
+
+
+def _similaridade(descricao, nome):
+    """
+    Fração das palavras do nome que aparecem na descrição do lançamento (0 a 1).
+    O histórico do banco costuma ser o nome com prefixos ("PIX RECEBIDO MARIA SOUZA"),
+    então a presença das palavras pesa mais que a semelhança do texto inteiro.
+    """
+    if not descricao or not nome:
+        return 0.0
+    return round(len(nome & descricao) / len(nome), 2)
+
+
+def sugerir(empresa, lancamentos, janela=JANELA_DIAS, janela_documento=JANELA_DOCUMENTO_DIAS):
+    """
+    Sugestões de conciliação para os `lancamentos` (queryset do fluxo) contra as contas pendentes da empresa.
+    Cada lançamento e cada conta aparecem no máximo uma vez. Duas consultas, qualquer que seja o volume.
+    """
+    lancamentos = list(
+        lancamentos.filter(empresa=empresa, conta_origem__isnull=True)
+        .order_by('data_lancamento', 'id')
+        .values('id', 'tipo', 'valor', 'data_lancamento', 'documento', 'descricao', 'caixa__nome')
+    )
+    datas = [lancamento['data_lancamento'] for lancamento in lancamentos] or [date.today()]
+    primeiro_dia = datas[0] - timedelta(days=max(janela, janela_documento))
+    ultimo_dia = datas[-1] + timedelta(days=janela)
+
+    # R (Receita) é paga com crédito (C); D (Despesa) com débito (D)
+    contas = {
+        conta['id']: conta
+        for conta in Conta.objects.filter(
+            empresa=empresa, status='PENDENTE', data_vencimento__gte=primeiro_dia, data_vencimento__lte=ultimo_dia,
+        )
+        .order_by('data_vencimento', 'id')
+        .values('id', 'plano_de_contas__tipo', 'valor', 'data_vencimento', 'documento', 'descricao', 'cadastro__nome')
+    }
+    por_documento = defaultdict(list)
+    por_valor = defaultdict(list)  # (tipo, centavos) -> [(vencimento, id)] em ordem
+    nomes = {}
+    for conta in contas.values():
+        chave = ('C' if conta['plano_de_contas__tipo'] == 'R' else 'D', _centavos(conta['valor']))
+        nomes[conta['id']] = _palavras(conta['cadastro__nome'])
+        por_valor[chave].append((conta['data_vencimento'].toordinal(), conta['id']))
+        if conta['documento'] and _documento(conta['documento']):
+            por_documento[chave + (_documento(conta['documento']),)].append(conta['id'])
+
+    usadas = set()
+    sugestoes = []
+    pendentes = []
+
+    # 1. Documento + valor
+    for lancamento in lancamentos:
+        chave = (lancamento['tipo'], _centavos(lancamento['valor']))
+        data = lancamento['data_lancamento']
+        candidatas = por_documento.get(chave + (_documento(lancamento['documento']),)) if lancamento['documento'] else None
+        candidatas = [
+            conta_id for conta_id in candidatas or []
+            if conta_id not in usadas and (data - contas[conta_id]['data_vencimento']).days <= janela_documento
+        ]
+        if not candidatas:
+            pendentes.append(lancamento)
+            continue
+        conta_id = min(candidatas, key=lambda conta_id: abs((data - contas[conta_id]['data_vencimento']).days))
+        usadas.add(conta_id)
+        sugestoes.append(Sugestao(
+            lancamento, contas[conta_id], POR_DOCUMENTO, (data - contas[conta_id]['data_vencimento']).days,
+            _similaridade(_palavras(lancamento['descricao']), nomes[conta_id]),
+        ))
+
+    # 2. Valor + janela de datas
+    for lancamento in pendentes:
+        fila = por_valor.get((lancamento['tipo'], _centavos(lancamento['valor'])))
+        if not fila:
+            continue
+        dia = lancamento['data_lancamento'].toordinal()
+        inicio = bisect_left(fila, (dia - janela,))
+        fim = bisect_right(fila, (dia + janela, float('inf')))
+        palavras = _palavras(lancamento['descricao'])
+        pontuadas = sorted(
+            (-_similaridade(palavras, nomes[conta_id]), abs(dia - vencimento), conta_id)
+            for vencimento, conta_id in fila[inicio:fim]
+            if conta_id not in usadas
+        )
+        if not pontuadas:
+            continue
+        similaridade, _, conta_id = pontuadas[0]
+        empate = len(pontuadas) > 1 and pontuadas[1][:2] == pontuadas[0][:2]
+        usadas.add(conta_id)
+        sugestoes.append(Sugestao(
+            lancamento, contas[conta_id], POR_VALOR_DATA, dia - contas[conta_id]['data_vencimento'].toordinal(),
+            -similaridade, empate,
+        ))
+
+    return sugestoes
+
+
+def conciliar(empresa, pares):
+    """
+    Grava os pares (lancamento_id, conta_id) confirmados: o lançamento passa a apontar para a conta
+    (e herda a categoria dela se não tiver) e a conta vira PAGA, tudo em lote.
+    Pares que deixaram de valer (conta já paga, lançamento já vinculado, valor/tipo diferente) são ignorados.
+    Devolve a quantidade conciliada.
+    """
+    pares = {int(lancamento_id): int(conta_id) for lancamento_id, conta_id in pares}
+    if not pares:
+        return 0
+
+    with transaction.atomic():
+        contas = {
+            conta_id: (tipo_plano, valor, plano_id)
+            for conta_id, tipo_plano, valor, plano_id in Conta.objects.select_for_update()
+            .filter(empresa=empresa, id__in=pares.values(), status='PENDENTE')
+            .values_list('id', 'plano_de_contas__tipo', 'valor', 'plano_de_contas_id')
+        }
+        lancamentos = Lancamento.objects.select_for_update().filter(
+            empresa=empresa, id__in=pares.keys(), conta_origem__isnull=True,
+        )
+
+        alterados = []
+        movimentos = []
+        for lancamento in lancamentos:
+            conta = contas.pop(pares[lancamento.id], None)
+            if conta is None:
+                continue
+            tipo_plano, valor, plano_id = conta
+            if lancamento.tipo != ('C' if tipo_plano == 'R' else 'D') or _centavos(lancamento.valor) != _centavos(valor):
+                contas[pares[lancamento.id]] = conta
+                continue
+            lancamento.conta_origem_id = pares[lancamento.id]
+            if lancamento.plano_de_contas_id is None:
+                # A categoria entra nos consolidados (ResumoMensal por plano): estorna o movimento antigo
+                movimentos.append(estornar(lancamento.movimento()))
+                lancamento.plano_de_contas_id = plano_id
+                movimentos.append(lancamento.movimento())
+            alterados.append(lancamento)
+
+        Lancamento.objects.bulk_update(alterados, ['conta_origem', 'plano_de_contas'])
+        Conta.objects.filter(id__in=[lancamento.conta_origem_id for lancamento in alterados]).update(status='PAGA')
+        atualizar_consolidados(movimentos)
+
+    for lancamento in alterados:
+        lancamento._movimento_original = lancamento.movimento()
+    return len(alterados)
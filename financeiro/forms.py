@@ -1,5 +1,10 @@
+from decimal import Decimal
+
 from django import forms
+from cadastros.models import CategoriaCliente
 from .models import Conta, Lancamento, Caixa, PlanoDeContas
+from .importacao import FORMATOS_CHOICES, OFX, LayoutCSV
+from .parcelamento import SISTEMAS_CHOICES, SIMPLES
 
 # --- FORMULÁRIO DE CAIXA / BANCO ---
 class CaixaForm(forms.ModelForm):
@@ -57,7 +62,8 @@ class ContaForm(forms.ModelForm):
     # --- CAMPOS EXTRAS PARA PARCELAMENTO (Não salvos no banco) ---
     gerar_parcelas = forms.BooleanField(required=False, label="Parcelar este lançamento?", widget=forms.CheckboxInput(attrs={'class': 'h-4 w-4 text-blue-600 focus:ring-blue-500 border-gray-300 rounded'}))
     qtd_parcelas = forms.IntegerField(required=False, min_value=2, max_value=60, label="Qtd. Parcelas", initial=2)
-    taxa_juros = forms.DecimalField(required=False, min_value=0, max_value=100, label="Juros Total (%)", initial=0, help_text="Acréscimo sobre o total")
+    taxa_juros = forms.DecimalField(required=False, min_value=0, max_value=100, label="Juros (%)", initial=0, help_text="Simples: acréscimo sobre o total. Price/SAC: taxa ao mês")
+    sistema_amortizacao = forms.ChoiceField(required=False, choices=SISTEMAS_CHOICES, initial=SIMPLES, label="Sistema")
 
     class Meta:
         model = Conta
@@ -131,4 +137,110 @@ class LancamentoManualForm(forms.ModelForm):
         
         if user:
             self.fields['caixa'].queryset = Caixa.objects.filter(empresa=user.empresa)
-            self.fields['plano_de_contas'].queryset = PlanoDeContas.objects.filter(empresa=user.empresa)
\ No newline at end of file
+            self.fields['plano_de_contas'].queryset = PlanoDeContas.objects.filter(empresa=user.empresa)
+
+
+# --- FORMULÁRIO DE IMPORTAÇÃO DE EXTRATO (OFX/CSV) ---
+class ImportacaoExtratoForm(forms.Form):
+    caixa = forms.ModelChoiceField(queryset=Caixa.objects.none(), label="Conta / Caixa")
+    formato = forms.ChoiceField(choices=FORMATOS_CHOICES, initial=OFX)
+    arquivo = forms.FileField(label="Arquivo do extrato")
+    plano_de_contas = forms.ModelChoiceField(
+        queryset=PlanoDeContas.objects.none(), required=False, label="Categoria (opcional)",
+        help_text="Aplicada a todos os lançamentos importados; sem categoria, classifique depois no fluxo.",
+    )
+
+    # Layout do CSV (ignorado no OFX)
+    coluna_data = forms.CharField(initial=LayoutCSV.coluna_data, required=False)
+    coluna_descricao = forms.CharField(initial=LayoutCSV.coluna_descricao, required=False)
+    coluna_valor = forms.CharField(initial=LayoutCSV.coluna_valor, required=False)
+    coluna_documento = forms.CharField(initial=LayoutCSV.coluna_documento, required=False)
+    delimitador = forms.ChoiceField(choices=[(';', 'Ponto e vírgula (;)'), (',', 'Vírgula (,)'), ('TAB', 'Tabulação')], initial=';')
+    formato_data = forms.ChoiceField(choices=[('%d/%m/%Y', 'DD/MM/AAAA'), ('%d/%m/%y', 'DD/MM/AA'), ('%Y-%m-%d', 'AAAA-MM-DD')])
+    separador_decimal = forms.ChoiceField(choices=[(',', 'Vírgula (1.234,56)'), ('.', 'Ponto (1,234.56)')])
+    codificacao = forms.ChoiceField(choices=[('utf-8-sig', 'UTF-8'), ('cp1252', 'Windows (ANSI)')])
+    linhas_ignoradas = forms.IntegerField(min_value=0, initial=0, required=False, label="Linhas antes do cabeçalho")
+
+    def __init__(self, *args, **kwargs):
+        user = kwargs.pop('user', None)
+        super().__init__(*args, **kwargs)
+
+        for field in self.fields.values():
+            field.widget.attrs['class'] = 'w-full px-3 py-2 border border-gray-300 rounded-md focus:outline-none focus:ring-2 focus:ring-blue-500'
+
+        if user:
+            self.fields['caixa'].queryset = Caixa.objects.filter(empresa=user.empresa)
+            self.fields['plano_de_contas'].queryset = PlanoDeContas.objects.filter(empresa=user.empresa).order_by('codigo')
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if cleaned_data.get('formato') != OFX:
+            for campo in ('coluna_data', 'coluna_valor'):
+                if not cleaned_data.get(campo):
+                    self.add_error(campo, "Obrigatório para CSV.")
+        return cleaned_data
+
+    def layout_csv(self):
+        dados = self.cleaned_data
+        return LayoutCSV(
+            coluna_data=dados['coluna_data'],
+            coluna_descricao=dados['coluna_descricao'],
+            coluna_valor=dados['coluna_valor'],
+            coluna_documento=dados['coluna_documento'],
+            delimitador='\t' if dados['delimitador'] == 'TAB' else dados['delimitador'],
+            formato_data=dados['formato_data'],
+            separador_decimal=dados['separador_decimal'],
+            codificacao=dados['codificacao'],
+            linhas_ignoradas=dados['linhas_ignoradas'] or 0,
+        )
+
+
+# --- FORMULÁRIO DE GERAÇÃO DE MENSALIDADES ---
+class GeracaoMensalidadesForm(forms.Form):
+    competencia = forms.DateField(
+        label="Competência", input_formats=['%Y-%m', '%m/%Y'],
+        widget=forms.DateInput(format='%Y-%m', attrs={'type': 'month'}),
+    )
+    dia_vencimento = forms.IntegerField(min_value=1, max_value=31, initial=10, label="Dia do vencimento")
+    valor_padrao = forms.DecimalField(
+        required=False, min_value=Decimal('0.01'), max_digits=12, decimal_places=2, label="Valor padrão",
+        help_text="Para clientes sem categoria ou de categoria sem valor próprio.",
+    )
+    categorias = forms.ModelMultipleChoiceField(
+        queryset=CategoriaCliente.objects.none(), required=False, widget=forms.CheckboxSelectMultiple,
+        label="Cobrar só as categorias", help_text="Nenhuma marcada = todos os clientes ativos.",
+    )
+
+    def __init__(self, *args, **kwargs):
+        user = kwargs.pop('user', None)
+        super().__init__(*args, **kwargs)
+
+        if user:
+            self.fields['categorias'].queryset = CategoriaCliente.objects.filter(empresa=user.empresa).order_by('nome')
+        self._categorias = list(self.fields['categorias'].queryset)
+        # Um valor por categoria (opcional)
+        for categoria in self._categorias:
+            self.fields[f'valor_categoria_{categoria.id}'] = forms.DecimalField(
+                required=False, min_value=Decimal('0.01'), max_digits=12, decimal_places=2, label=categoria.nome,
+            )
+
+        for nome, field in self.fields.items():
+            if nome != 'categorias':
+                field.widget.attrs['class'] = 'w-full px-3 py-2 border border-gray-300 rounded-md focus:outline-none focus:ring-2 focus:ring-blue-500'
+
+    def campos_valor_categoria(self):
+        """(campo de valor, checkbox do filtro) de cada categoria, na mesma ordem, para a tela"""
+        return list(zip([self[f'valor_categoria_{categoria.id}'] for categoria in self._categorias], self['categorias']))
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if not cleaned_data.get('valor_padrao') and not any(self.valores_categoria().values()):
+            raise forms.ValidationError("Informe o valor padrão ou o valor de ao menos uma categoria.")
+        return cleaned_data
+
+    def valores_categoria(self):
+        return {
+            categoria.id: self.cleaned_data.get(f'valor_categoria_{categoria.id}')
+            for categoria in self._categorias
+            if self.cleaned_data.get(f'valor_categoria_{categoria.id}')
+        }
@@ -0,0 +1,275 @@
+"""
+Importação de extratos bancários (OFX e CSV) para o fluxo de caixa de um Caixa.
+
+Os arquivos são lidos em blocos por geradores (ler_ofx / ler_csv) e as transações são
+gravadas em lotes com Lancamento.objects.criar_em_lote, que atualiza os consolidados uma
+vez por lote. A memória fica limitada ao tamanho do lote, qualquer que seja o arquivo.
+
+Cada transação recebe uma impressão digital (hash de data, valor, descrição, documento e,
+no OFX, o FITID do banco). Antes de gravar um lote, as impressões que o caixa já tem são
+descartadas: importar de novo o mesmo extrato, ou um extrato de período sobreposto, não duplica nada.
+"""
+import csv
+import hashlib
+import re
+from collections import Counter
+from dataclasses import dataclass
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+
+from django.db import transaction
+
+from cadastros.busca import normalizar_texto
+from core.importacao import ErroImportacao, blocos_texto, linhas
+
+from .models import CENTAVO, Caixa, Lancamento
+
+TAMANHO_LOTE = 1000
+
+OFX = 'OFX'
+CSV = 'CSV'
+
+FORMATOS_CHOICES = [
+    (OFX, 'OFX (Money / Internet Banking)'),
+    (CSV, 'CSV (planilha do banco)'),
+]
+
+
+@dataclass
+class TransacaoExtrato:
+    data: date
+    valor: Decimal  # com sinal: positivo entrou no caixa, negativo saiu
+    descricao: str
+    documento: str = ''
+    identificador: str = ''  # FITID do OFX (único por conta no banco); o CSV não tem
+
+
+@dataclass
+class LayoutCSV:
+    """Como ler o CSV de um banco. Colunas pelo nome no cabeçalho (sem diferenciar acentos) ou pelo número (1, 2...)"""
+    coluna_data: str = 'Data'
+    coluna_descricao: str = 'Descrição'
+    coluna_valor: str = 'Valor'
+    coluna_documento: str = ''
+    delimitador: str = ';'
+    formato_data: str = '%d/%m/%Y'
+    separador_decimal: str = ','
+    codificacao: str = 'utf-8-sig'
+    linhas_ignoradas: int = 0  # linhas antes do cabeçalho (título, agência/conta...)
+
+
+@dataclass
+class ResultadoImportacao:
+    importados: int = 0
+    duplicados: int = 0
+    ignorados: int = 0  # valor zero (linhas informativas do banco)
+    data_inicio: date = None
+    data_fim: date = None
+
+
+# ==========================================================
+# LEITURA DOS ARQUIVOS
+# ==========================================================
+
+def _codificacao_ofx(arquivo):
+    """Codificação declarada no cabeçalho do OFX: UTF-8 ou, por padrão, Windows-1252 (CHARSET:1252)"""
+    arquivo.seek(0)
+    inicio = arquivo.read(1024).upper().replace(b' ', b'')
+    arquivo.seek(0)
+    utf8 = b'ENCODING:UTF-8' in inicio or b'ENCODING="UTF-8"' in inicio
+    return 'utf-8-sig' if utf8 else 'cp1252'
+
+
+_TAG_OFX = re.compile(r'<(/?)([A-Za-z0-9.]+)>([^<]*)')
+
+
+def _tags_ofx(blocos):
+    """(fechamento, TAG, valor) de cada tag; um bloco só é processado até o último '<' completo"""
+    resto = ''
+    for bloco in blocos:
+        resto += bloco
+        corte = resto.rfind('<')
+        if corte > 0:
+            yield from _TAG_OFX.findall(resto[:corte])
+            resto = resto[corte:]
+    yield from _TAG_OFX.findall(resto)
+
+
+def _data_ofx(valor):
+    """'20240131', '20240131120000[-3:BRT]' -> date(2024, 1, 31)"""
+    return date(int(valor[:4]), int(valor[4:6]), int(valor[6:8]))
+
+
+def _transacao_ofx(campos, numero):
+    try:
+        data = _data_ofx(campos['DTPOSTED'])
+    except (KeyError, ValueError):
+        raise ErroImportacao(f"Transação {numero}: data (DTPOSTED) ausente ou inválida.")
+    try:
+        valor = Decimal(campos['TRNAMT'].replace(',', '.'))
+    except (KeyError, InvalidOperation):
+        raise ErroImportacao(f"Transação {numero}: valor (TRNAMT) ausente ou inválido.")
+    return TransacaoExtrato(
+        data=data,
+        valor=valor,
+        descricao=campos.get('MEMO') or campos.get('NAME') or campos.get('TRNTYPE', ''),
+        documento=campos.get('CHECKNUM') or campos.get('REFNUM', ''),
+        identificador=campos.get('FITID', ''),
+    )
+
+
+def ler_ofx(arquivo):
+    """
+    Transações (<STMTTRN>) de um OFX 1.x (SGML, tags sem fechamento) ou 2.x (XML).
+    Lê por tags em vez de montar a árvore do documento, então o tamanho do arquivo não pesa na memória.
+    """
+    campos = None
+    numero = 0
+    for fechamento, tag, valor in _tags_ofx(blocos_texto(arquivo, _codificacao_ofx(arquivo))):
+        tag = tag.upper()
+        if tag == 'STMTTRN':
+            if fechamento and campos is not None:
+                numero += 1
+                yield _transacao_ofx(campos, numero)
+                campos = None
+            elif not fechamento:
+                campos = {}
+        elif campos is not None and not fechamento:
+            campos[tag] = valor.strip()
+
+
+def _indice_coluna(cabecalho, coluna):
+    """Posição da coluna pelo número (1 = primeira) ou pelo nome no cabeçalho"""
+    coluna = (coluna or '').strip()
+    if not coluna:
+        return None
+    if coluna.isdigit():
+        return int(coluna) - 1
+    nomes = [normalizar_texto(nome) for nome in cabecalho]
+    try:
+        return nomes.index(normalizar_texto(coluna))
+    except ValueError:
+        raise ErroImportacao(f"Coluna '{coluna}' não encontrada no cabeçalho ({'; '.join(cabecalho)}).")
+
+
+def _valor_csv(texto, separador_decimal):
+    """'-1.234,56', 'R$ 1.234,56 D', '(10,00)' -> Decimal com sinal"""
+    texto = texto.upper().replace('R$', '').replace(' ', '').strip()
+    negativo = texto.startswith('(') and texto.endswith(')')
+    texto = texto.strip('()')
+    if texto.endswith(('D', 'C')):
+        negativo = negativo or texto.endswith('D')
+        texto = texto[:-1]
+    milhar = '.' if separador_decimal == ',' else ','
+    valor = Decimal(texto.replace(milhar, '').replace(separador_decimal, '.'))
+    return -abs(valor) if negativo else valor
+
+
+def ler_csv(arquivo, layout):
+    """Transações do CSV de um banco conforme o `layout` (LayoutCSV), linha a linha"""
+    texto = linhas(blocos_texto(arquivo, layout.codificacao))
+    leitor = csv.reader(islice(texto, layout.linhas_ignoradas, None), delimiter=layout.delimitador)
+
+    cabecalho = next(leitor, None)
+    if not cabecalho:
+        raise ErroImportacao("Arquivo vazio.")
+    i_data = _indice_coluna(cabecalho, layout.coluna_data)
+    i_valor = _indice_coluna(cabecalho, layout.coluna_valor)
+    i_descricao = _indice_coluna(cabecalho, layout.coluna_descricao)
+    i_documento = _indice_coluna(cabecalho, layout.coluna_documento)
+    if i_data is None or i_valor is None:
+        raise ErroImportacao("Informe as colunas de data e de valor.")
+
+    for linha in leitor:
+        numero = leitor.line_num + layout.linhas_ignoradas
+
+        def coluna(indice):
+            return linha[indice].strip() if indice is not None and indice < len(linha) else ''
+
+        data_texto, valor_texto = coluna(i_data), coluna(i_valor)
+        if not data_texto and not valor_texto:
+            continue  # linhas em branco, rodapés e subtotais sem data
+        try:
+            data = datetime.strptime(data_texto, layout.formato_data).date()
+        except ValueError:
+            raise ErroImportacao(f"Linha {numero}: data inválida '{data_texto}' (formato {layout.formato_data}).")
+        try:
+            valor = _valor_csv(valor_texto, layout.separador_decimal)
+        except InvalidOperation:
+            raise ErroImportacao(f"Linha {numero}: valor inválido '{valor_texto}'.")
+        yield TransacaoExtrato(data=data, valor=valor, descricao=coluna(i_descricao), documento=coluna(i_documento))
+
+
+# ==========================================================
+# GRAVAÇÃO
+# ==========================================================
+
+def _chave(transacao):
+    """Identidade da transação, estável entre exportações do mesmo extrato (caixa e espaços da descrição não importam)"""
+    valor = transacao.valor.quantize(CENTAVO)
+    if transacao.identificador:
+        return f'ofx|{transacao.identificador}|{transacao.data.isoformat()}|{valor}'
+    return f'{transacao.data.isoformat()}|{valor}|{normalizar_texto(transacao.descricao)}|{transacao.documento}'
+
+
+def _gravar_lote(caixa, lote, plano_de_contas, ocorrencias, resultado):
+    novos = {}
+    for transacao in lote:
+        chave = _chave(transacao)
+        # Duas tarifas iguais no mesmo dia são transações diferentes: a 2ª ocorrência entra na impressão
+        resumo = hashlib.sha256(chave.encode()).digest()[:16]  # só o necessário para contar, não a chave inteira
+        ocorrencias[resumo] += 1
+        novos[hashlib.sha256(f'{chave}|{ocorrencias[resumo]}'.encode()).hexdigest()] = transacao
+
+    existentes = set(
+        Lancamento.objects.filter(caixa=caixa, impressao_digital__in=list(novos))
+        .values_list('impressao_digital', flat=True)
+    )
+    lancamentos = [
+        Lancamento(
+            empresa_id=caixa.empresa_id,
+            caixa=caixa,
+            plano_de_contas=plano_de_contas,
+            data_lancamento=transacao.data,
+            descricao=(transacao.descricao or 'Importado do extrato')[:255],
+            documento=transacao.documento[:50] or None,
+            valor=transacao.valor.quantize(CENTAVO),
+            tipo='C' if transacao.valor > 0 else 'D',
+            impressao_digital=impressao,
+        )
+        for impressao, transacao in novos.items()
+        if impressao not in existentes
+    ]
+    Lancamento.objects.criar_em_lote(lancamentos, tamanho_lote=len(lancamentos) or 1)
+
+    resultado.importados += len(lancamentos)
+    resultado.duplicados += len(novos) - len(lancamentos)
+    for lancamento in lancamentos:
+        if resultado.data_inicio is None or lancamento.data_lancamento < resultado.data_inicio:
+            resultado.data_inicio = lancamento.data_lancamento
+        if resultado.data_fim is None or lancamento.data_lancamento > resultado.data_fim:
+            resultado.data_fim = lancamento.data_lancamento
+
+
+def importar_extrato(caixa, transacoes, plano_de_contas=None, tamanho_lote=TAMANHO_LOTE):
+    """
+    Grava as `transacoes` (ex: ler_ofx(arquivo)) no `caixa`, `tamanho_lote` por vez, pulando as já importadas.
+    O arquivo entra inteiro ou nada entra: um ErroImportacao no meio desfaz os lotes anteriores.
+    """
+    resultado = ResultadoImportacao()
+    ocorrencias = Counter()
+    transacoes = iter(transacoes)
+
+    with transaction.atomic():
+        # Trava o caixa: duas importações simultâneas do mesmo extrato não passam juntas pela checagem de repetidos
+        list(Caixa.objects.select_for_update().filter(pk=caixa.pk).values_list('pk'))
+        while True:
+            lote = list(islice(transacoes, tamanho_lote))
+            if not lote:
+                break
+            validas = [transacao for transacao in lote if transacao.valor]
+            resultado.ignorados += len(lote) - len(validas)
+            if validas:
+                _gravar_lote(caixa, validas, plano_de_contas, ocorrencias, resultado)
+    return resultado
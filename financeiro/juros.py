@@ -0,0 +1,78 @@
+"""
+Juros de atraso das contas a receber, calculados pelo banco como anotação do queryset.
+
+juros = valor x TAXA_JUROS_MENSAL% x dias de atraso / 30 (pró-rata, mês comercial), arredondado
+a centavos; só contas PENDENTES vencidas antes da data de referência. A lista, o relatório e o
+dashboard anotam o mesmo cálculo (nenhuma consulta a mais por linha) e a baixa usa a data do
+pagamento como referência para lançar os juros em separado (PLANO_CONTAS_JUROS_ID).
+"""
+from datetime import date
+from decimal import Decimal
+
+from django.db.models import Case, DateField, DecimalField, F, Func, IntegerField, Value, When
+from django.db.models.functions import Cast, Round
+
+from core import parametros
+
+CAMPO_VALOR = DecimalField(max_digits=14, decimal_places=2)
+
+
+class DiasEntre(Func):
+    """
+    Dias de `inicio` até `fim` (fim - inicio). No SQLite vem como REAL (ex: 12.0), o que mantém
+    real a divisão dos juros; para exibir, use Cast(..., IntegerField()).
+    """
+    output_field = IntegerField()
+    template = '(%(expressions)s)'  # PostgreSQL: date - date já é inteiro
+    arg_joiner = ' - '
+
+    def __init__(self, fim, inicio, **extra):
+        super().__init__(fim, inicio, **extra)
+
+    def as_mysql(self, compiler, connection, **extra_context):
+        return self.as_sql(compiler, connection, template='DATEDIFF(%(expressions)s)', arg_joiner=', ', **extra_context)
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        return self.as_sql(
+            compiler, connection,
+            template='(julianday(%(expressions)s))', arg_joiner=') - julianday(', **extra_context
+        )
+
+
+def juros_ate(data_referencia, taxa_mensal):
+    """Expressão dos juros de cada conta do queryset até `data_referencia` (0 se não está atrasada)"""
+    if not taxa_mensal:
+        return Value(Decimal('0.00'), output_field=CAMPO_VALOR)
+    referencia = Value(data_referencia, output_field=DateField())
+    return Case(
+        When(
+            status='PENDENTE', data_vencimento__lt=data_referencia,
+            then=Round(
+                F('valor') * DiasEntre(referencia, F('data_vencimento')) * Value(Decimal(taxa_mensal)) / Value(3000),
+                2, output_field=CAMPO_VALOR,
+            ),
+        ),
+        default=Value(Decimal('0.00')),
+        output_field=CAMPO_VALOR,
+    )
+
+
+def com_juros(contas, empresa_id, data_referencia=None):
+    """
+    Anota `dias_atraso`, `juros` e `valor_atualizado` (valor + juros) nas contas, com a taxa
+    do parâmetro TAXA_JUROS_MENSAL da empresa e a data de referência (padrão: hoje).
+    """
+    data_referencia = data_referencia or date.today()
+    taxa = parametros.obter(empresa_id, 'TAXA_JUROS_MENSAL')
+    return contas.annotate(
+        dias_atraso=Case(
+            When(
+                status='PENDENTE', data_vencimento__lt=data_referencia,
+                then=Cast(DiasEntre(Value(data_referencia, output_field=DateField()), F('data_vencimento')), IntegerField()),
+            ),
+            default=Value(0),
+            output_field=IntegerField(),
+        ),
+        juros=juros_ate(data_referencia, taxa),
+        valor_atualizado=F('valor') + F('juros'),
+    )
@@ -0,0 +1,70 @@
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.models import Empresa
+from financeiro.mensalidades import gerar_mensalidades
+
+
+def _competencia(texto):
+    try:
+        return datetime.strptime(texto, '%Y-%m').date()
+    except ValueError:
+        raise CommandError(f"Competência inválida '{texto}' (use AAAA-MM).")
+
+
+def _valor_categoria(texto):
+    categoria_id, _, valor = texto.partition('=')
+    try:
+        return int(categoria_id), Decimal(valor.replace(',', '.'))
+    except (ValueError, InvalidOperation):
+        raise CommandError(f"Valor de categoria inválido '{texto}' (use ID=VALOR, ex: 3=150.00).")
+
+
+class Command(BaseCommand):
+    help = (
+        "Gera as mensalidades (contas a receber) da competência para os clientes ativos. "
+        "Pode ser rodado de novo no mesmo mês: só cria as que faltam."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--empresa', type=int, required=True, help="ID da empresa")
+        parser.add_argument('--competencia', help="Mês cobrado, AAAA-MM (padrão: mês atual)")
+        parser.add_argument('--dia', type=int, default=10, help="Dia do vencimento (padrão: 10)")
+        parser.add_argument('--valor', help="Valor padrão da mensalidade")
+        parser.add_argument(
+            '--categoria-valor', action='append', default=[], metavar='ID=VALOR',
+            help="Valor para os clientes de uma categoria (pode repetir)",
+        )
+        parser.add_argument(
+            '--categoria', type=int, action='append', metavar='ID',
+            help="Cobra só os clientes desta categoria (pode repetir; padrão: todos)",
+        )
+
+    def handle(self, *args, **options):
+        empresa = Empresa.objects.filter(id=options['empresa']).first()
+        if empresa is None:
+            raise CommandError(f"Empresa {options['empresa']} não encontrada.")
+        if not 1 <= options['dia'] <= 31:
+            raise CommandError("O dia do vencimento deve estar entre 1 e 31.")
+
+        competencia = _competencia(options['competencia']) if options['competencia'] else date.today().replace(day=1)
+        valores_categoria = dict(_valor_categoria(texto) for texto in options['categoria_valor'])
+        if not options['valor'] and not valores_categoria:
+            raise CommandError("Informe --valor ou ao menos um --categoria-valor.")
+
+        try:
+            resultado = gerar_mensalidades(
+                empresa, competencia, options['dia'], options['valor'], valores_categoria, options['categoria'],
+            )
+        except (ValueError, InvalidOperation) as erro:
+            raise CommandError(str(erro))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{empresa}: {resultado.criadas} mensalidade(s) de {competencia:%m/%Y} gerada(s), total R$ {resultado.total:.2f}."
+        ))
+        if resultado.existentes:
+            self.stdout.write(f"  {resultado.existentes} cliente(s) já tinham a mensalidade desta competência.")
+        if resultado.sem_valor:
+            self.stdout.write(self.style.WARNING(f"  {resultado.sem_valor} cliente(s) sem valor para a categoria ficaram sem cobrança."))
@@ -0,0 +1,51 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.models import Empresa
+from financeiro.models import SaldoDiario, ResumoMensal
+
+
+class Command(BaseCommand):
+    help = (
+        "Reconstrói os consolidados financeiros (SaldoDiario e ResumoMensal) a partir dos lançamentos "
+        "ou verifica se estão consistentes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--empresa', type=int, help="ID da empresa (padrão: todas)")
+        parser.add_argument(
+            '--verificar', action='store_true',
+            help="Apenas compara os consolidados gravados com os lançamentos, sem alterar nada",
+        )
+
+    def handle(self, *args, **options):
+        empresas = Empresa.objects.order_by('id')
+        if options['empresa']:
+            empresas = empresas.filter(id=options['empresa'])
+            if not empresas.exists():
+                raise CommandError(f"Empresa {options['empresa']} não encontrada.")
+
+        com_problema = 0
+        for empresa in empresas:
+            if options['verificar']:
+                saldos = SaldoDiario.objects.divergencias(empresa.id)
+                resumo = ResumoMensal.objects.divergencias(empresa.id)
+                if saldos or resumo:
+                    com_problema += 1
+                    self.stdout.write(self.style.ERROR(
+                        f"{empresa}: {len(saldos)} divergência(s) no saldo diário, {len(resumo)} no resumo mensal"
+                    ))
+                    for caixa_id, data, esperado, gravado in saldos[:20]:
+                        self.stdout.write(f"  saldo caixa {caixa_id} em {data}: esperado {esperado}, gravado {gravado}")
+                    for chave, esperado, gravado in resumo[:20]:
+                        self.stdout.write(f"  resumo {chave}: esperado {esperado}, gravado {gravado}")
+                else:
+                    self.stdout.write(self.style.SUCCESS(f"{empresa}: consolidados consistentes."))
+            else:
+                dias = SaldoDiario.objects.reconstruir(empresa.id)
+                linhas = ResumoMensal.objects.reconstruir(empresa.id)
+                self.stdout.write(self.style.SUCCESS(
+                    f"{empresa}: {dias} saldo(s) diário(s) e {linhas} linha(s) de resumo mensal recalculados."
+                ))
+
+        if com_problema:
+            raise CommandError(f"{com_problema} empresa(s) com consolidados divergentes. Rode sem --verificar para reconstruir.")
@@ -0,0 +1,112 @@
+"""
+Geração de mensalidades em lote: uma conta a receber por cliente ATIVO (papel CLI ou AMB)
+para a competência (mês), na categoria do parâmetro PLANO_CONTAS_MENSALIDADE_ID.
+
+Os clientes que já têm a mensalidade da competência são lidos numa consulta e ficam de fora;
+o resto entra com bulk_create em lotes, numa transação só. Gerações da mesma empresa são
+feitas uma de cada vez (trava na linha da empresa), então a leitura dos já cobrados vale até
+o fim e criadas/total saem da diferença antes/depois na competência. A constraint única
+(cadastro, competencia) com ignore_conflicts fica como rede de segurança.
+"""
+import calendar
+from dataclasses import dataclass
+from datetime import date
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, Sum
+
+from cadastros.models import Cadastro
+from core import parametros
+from core.models import Empresa
+
+from .models import CENTAVO, Conta, PlanoDeContas
+
+TAMANHO_LOTE = 1000
+
+
+@dataclass
+class ResultadoMensalidades:
+    criadas: int = 0
+    existentes: int = 0  # clientes que já tinham a mensalidade da competência
+    sem_valor: int = 0  # categoria sem valor definido e nenhum valor padrão
+    total: Decimal = Decimal('0')  # soma só das criadas
+
+
+def data_vencimento(competencia, dia):
+    """Dia `dia` do mês da competência (31 vira o último dia em meses mais curtos)"""
+    return date(competencia.year, competencia.month, min(dia, calendar.monthrange(competencia.year, competencia.month)[1]))
+
+
+def plano_mensalidade(empresa):
+    """Categoria de receita configurada em PLANO_CONTAS_MENSALIDADE_ID, ou ValueError"""
+    plano = PlanoDeContas.objects.filter(
+        empresa=empresa, id=parametros.obter(empresa.id, 'PLANO_CONTAS_MENSALIDADE_ID'), tipo='R',
+    ).first()
+    if plano is None:
+        raise ValueError(
+            "Configure o parâmetro PLANO_CONTAS_MENSALIDADE_ID com o ID de uma categoria de receita do plano de contas."
+        )
+    return plano
+
+
+def gerar_mensalidades(empresa, competencia, dia_vencimento, valor_padrao=None, valores_categoria=None,
+                       categorias=None, tamanho_lote=TAMANHO_LOTE):
+    """
+    Gera as mensalidades da competência (qualquer data do mês cobrado).
+
+    valores_categoria: {categoria_id: valor}; clientes sem categoria ou de categoria sem valor pagam `valor_padrao`
+    (se ele também faltar, o cliente é contado em `sem_valor` e fica sem cobrança).
+    categorias: ids das categorias a cobrar (None = todos os clientes ativos).
+    Pode ser rodada de novo para a mesma competência: só cria o que falta.
+    """
+    plano = plano_mensalidade(empresa)
+    competencia = competencia.replace(day=1)
+    vencimento = data_vencimento(competencia, dia_vencimento)
+    valores = {int(categoria_id): Decimal(valor) for categoria_id, valor in (valores_categoria or {}).items() if valor}
+    valor_padrao = Decimal(valor_padrao) if valor_padrao else None
+
+    clientes = Cadastro.objects.filter(empresa=empresa, papel__in=['CLI', 'AMB'], situacao='ATIVO')
+    if categorias is not None:
+        clientes = clientes.filter(categoria_id__in=categorias)
+
+    resultado = ResultadoMensalidades()
+    mensalidades = Conta.objects.filter(empresa=empresa, competencia=competencia, cadastro__isnull=False)
+    with transaction.atomic():
+        # Uma geração por empresa de cada vez: a segunda espera e já enxerga o que a primeira criou
+        list(Empresa.objects.select_for_update().filter(pk=empresa.pk).values_list('pk'))
+        antes = mensalidades.aggregate(quantidade=Count('id'), total=Sum('valor'))
+        cobrados = set(mensalidades.values_list('cadastro_id', flat=True))
+        tentadas = 0
+        lote = []
+        for cadastro_id, categoria_id in clientes.order_by('id').values_list('id', 'categoria_id').iterator(chunk_size=tamanho_lote):
+            if cadastro_id in cobrados:
+                resultado.existentes += 1
+                continue
+            valor = valores.get(categoria_id, valor_padrao)
+            if not valor:
+                resultado.sem_valor += 1
+                continue
+            lote.append(Conta(
+                empresa=empresa,
+                cadastro_id=cadastro_id,
+                plano_de_contas=plano,
+                descricao=f"Mensalidade {competencia:%m/%Y}",
+                documento=f"MENS-{competencia:%Y%m}",
+                valor=valor.quantize(CENTAVO),
+                data_vencimento=vencimento,
+                competencia=competencia,
+            ))
+            tentadas += 1
+            if len(lote) >= tamanho_lote:
+                Conta.objects.bulk_create(lote, ignore_conflicts=True)
+                lote = []
+        if lote:
+            Conta.objects.bulk_create(lote, ignore_conflicts=True)
+
+        # Com ignore_conflicts o banco não diz quantas entraram: as ignoradas contam como existentes
+        depois = mensalidades.aggregate(quantidade=Count('id'), total=Sum('valor'))
+        resultado.criadas = depois['quantidade'] - antes['quantidade']
+        resultado.total = (depois['total'] or 0) - (antes['total'] or 0)
+        resultado.existentes += tentadas - resultado.criadas
+    return resultado
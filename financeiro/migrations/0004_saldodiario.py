@@ -0,0 +1,59 @@
+# Generated by Django 5.2.8 on 2026-10-17 19:17
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+def popular_saldos(apps, schema_editor):
+    Lancamento = apps.get_model('financeiro', 'Lancamento')
+    SaldoDiario = apps.get_model('financeiro', 'SaldoDiario')
+
+    totais = (
+        Lancamento.objects.values('empresa_id', 'caixa_id', 'data_lancamento')
+        .annotate(total=Sum('valor'))
+        .order_by('empresa_id', 'caixa_id', 'data_lancamento')
+    )
+    caixa_atual, acumulado, lote = None, 0, []
+    for linha in totais.iterator(chunk_size=2000):
+        if linha['caixa_id'] != caixa_atual:
+            caixa_atual, acumulado = linha['caixa_id'], 0
+        acumulado += linha['total']
+        lote.append(SaldoDiario(
+            empresa_id=linha['empresa_id'], caixa_id=linha['caixa_id'], data=linha['data_lancamento'],
+            movimento=linha['total'], saldo_acumulado=acumulado,
+        ))
+        if len(lote) >= 1000:
+            SaldoDiario.objects.bulk_create(lote)
+            lote = []
+    if lote:
+        SaldoDiario.objects.bulk_create(lote)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_parametrosistema'),
+        ('financeiro', '0003_alter_planodecontas_unique_together'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SaldoDiario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('data', models.DateField()),
+                ('movimento', models.DecimalField(decimal_places=2, default=0, help_text='Soma dos lançamentos do dia', max_digits=14)),
+                ('saldo_acumulado', models.DecimalField(decimal_places=2, default=0, help_text='Soma dos lançamentos até o fim do dia (sem o saldo inicial do caixa)', max_digits=16)),
+                ('caixa', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='saldos_diarios', to='financeiro.caixa')),
+                ('empresa', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.empresa', verbose_name='Empresa')),
+            ],
+            options={
+                'verbose_name': 'Saldo Diário',
+                'verbose_name_plural': 'Saldos Diários',
+                'ordering': ['caixa', 'data'],
+                'unique_together': {('empresa', 'caixa', 'data')},
+            },
+        ),
+        migrations.RunPython(popular_saldos, migrations.RunPython.noop),
+    ]
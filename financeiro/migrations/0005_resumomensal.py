@@ -0,0 +1,59 @@
+# Generated by Django 5.2.8 on 2026-10-17 19:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncMonth
+
+
+def popular_resumo(apps, schema_editor):
+    Lancamento = apps.get_model('financeiro', 'Lancamento')
+    ResumoMensal = apps.get_model('financeiro', 'ResumoMensal')
+
+    totais = (
+        Lancamento.objects.annotate(mes=TruncMonth('data_lancamento'))
+        .values('empresa_id', 'mes', 'plano_de_contas_id', 'caixa_id', 'tipo')
+        .annotate(soma=Sum('valor'), qtd=Count('id'))
+        .order_by()
+    )
+    ResumoMensal.objects.bulk_create(
+        [
+            ResumoMensal(
+                empresa_id=linha['empresa_id'], mes=linha['mes'], plano_de_contas_id=linha['plano_de_contas_id'],
+                caixa_id=linha['caixa_id'], tipo=linha['tipo'], total=linha['soma'], quantidade=linha['qtd'],
+            )
+            for linha in totais.iterator(chunk_size=2000)
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_parametrosistema'),
+        ('financeiro', '0004_saldodiario'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumoMensal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mes', models.DateField(help_text='Primeiro dia do mês')),
+                ('tipo', models.CharField(choices=[('C', 'Receita (Crédito-Entrada)'), ('D', 'Despesa (Débito-Saída)')], max_length=1)),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('quantidade', models.IntegerField(default=0)),
+                ('caixa', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='financeiro.caixa')),
+                ('empresa', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.empresa', verbose_name='Empresa')),
+                ('plano_de_contas', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='financeiro.planodecontas')),
+            ],
+            options={
+                'verbose_name': 'Resumo Mensal',
+                'verbose_name_plural': 'Resumos Mensais',
+                'ordering': ['mes'],
+                'unique_together': {('empresa', 'mes', 'plano_de_contas', 'caixa', 'tipo')},
+            },
+        ),
+        migrations.RunPython(popular_resumo, migrations.RunPython.noop),
+    ]
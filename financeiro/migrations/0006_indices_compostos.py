@@ -0,0 +1,27 @@
+# Generated by Django 5.2.8 on 2026-10-17 19:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cadastros', '0003_indices_compostos'),
+        ('core', '0003_parametrosistema'),
+        ('financeiro', '0005_resumomensal'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='conta',
+            index=models.Index(fields=['empresa', 'status', 'data_vencimento'], name='fin_conta_emp_status_venc_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='lancamento',
+            index=models.Index(fields=['empresa', 'data_lancamento', 'caixa'], name='fin_lanc_emp_data_caixa_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='lancamento',
+            index=models.Index(fields=['empresa', 'plano_de_contas', 'data_lancamento'], name='fin_lanc_emp_plano_data_idx'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.8 on 2026-10-17 19:26
+
+from django.db import migrations, models
+
+
+def popular_raiz_e_nivel(apps, schema_editor):
+    PlanoDeContas = apps.get_model('financeiro', 'PlanoDeContas')
+    planos = list(PlanoDeContas.objects.only('id', 'codigo'))
+    for plano in planos:
+        codigo = (plano.codigo or '').strip()
+        plano.codigo_raiz = codigo.split('.')[0] if '.' in codigo else codigo[:2]
+        plano.nivel = codigo.count('.') + 1 if codigo else 0
+    PlanoDeContas.objects.bulk_update(planos, ['codigo_raiz', 'nivel'], batch_size=500)
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_parametrosistema'),
+        ('financeiro', '0006_indices_compostos'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='planodecontas',
+            name='codigo_raiz',
+            field=models.CharField(blank=True, editable=False, help_text='Primeiro nível do código. Ex: 01', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='planodecontas',
+            name='nivel',
+            field=models.PositiveSmallIntegerField(default=0, editable=False, help_text='Profundidade no plano. Ex: 01.02 = 2'),
+        ),
+        migrations.AddIndex(
+            model_name='planodecontas',
+            index=models.Index(fields=['empresa', 'codigo_raiz', 'nivel'], name='fin_plano_emp_raiz_nivel_idx'),
+        ),
+        migrations.RunPython(popular_raiz_e_nivel, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.8 on 2026-10-17 19:28
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def construir_arvore(apps, schema_editor):
+    PlanoDeContas = apps.get_model('financeiro', 'PlanoDeContas')
+    empresas = PlanoDeContas.objects.values_list('empresa_id', flat=True).distinct()
+    for empresa_id in empresas:
+        planos = sorted(
+            PlanoDeContas.objects.filter(empresa_id=empresa_id).only('id', 'codigo', 'nivel'),
+            key=lambda plano: (plano.nivel, plano.codigo),
+        )
+        por_codigo = {plano.codigo.strip(): plano for plano in planos if plano.codigo.strip()}
+        caminhos = {}
+        for plano in planos:
+            pai = None
+            partes = plano.codigo.strip().split('.')
+            for n in range(len(partes) - 1, 0, -1):
+                pai = por_codigo.get('.'.join(partes[:n]))
+                if pai:
+                    break
+            plano.pai_id = pai.id if pai else None
+            plano.caminho = caminhos[plano.id] = (caminhos[pai.id] if pai else '') + f'{plano.id}/'
+        PlanoDeContas.objects.bulk_update(planos, ['pai', 'caminho'], batch_size=500)
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_parametrosistema'),
+        ('financeiro', '0007_plano_codigo_raiz'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='planodecontas',
+            name='caminho',
+            field=models.CharField(blank=True, editable=False, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='planodecontas',
+            name='pai',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='filhos', to='financeiro.planodecontas'),
+        ),
+        migrations.AddIndex(
+            model_name='planodecontas',
+            index=models.Index(fields=['empresa', 'caminho'], name='fin_plano_emp_caminho_idx'),
+        ),
+        migrations.RunPython(construir_arvore, migrations.RunPython.noop),
+    ]
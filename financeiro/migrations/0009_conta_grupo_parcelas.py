@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-17 19:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('financeiro', '0008_plano_arvore'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='conta',
+            name='grupo_parcelas',
+            field=models.UUIDField(blank=True, db_index=True, editable=False, null=True),
+        ),
+    ]
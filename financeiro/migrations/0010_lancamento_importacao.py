@@ -0,0 +1,27 @@
+# Generated by Django 5.2.8 on 2026-10-17 19:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('financeiro', '0009_conta_grupo_parcelas'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='lancamento',
+            name='documento',
+            field=models.CharField(blank=True, max_length=50, null=True, verbose_name='Nº Doc (Banco)'),
+        ),
+        migrations.AddField(
+            model_name='lancamento',
+            name='impressao_digital',
+            field=models.CharField(blank=True, editable=False, max_length=64, null=True),
+        ),
+        migrations.AlterUniqueTogether(
+            name='lancamento',
+            unique_together={('caixa', 'impressao_digital')},
+        ),
+    ]
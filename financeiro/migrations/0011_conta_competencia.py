@@ -0,0 +1,24 @@
+# Generated by Django 5.2.8 on 2026-10-17 20:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cadastros', '0005_cadastro_foto_hash'),
+        ('core', '0005_empresa_miniaturas'),
+        ('financeiro', '0010_lancamento_importacao'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='conta',
+            name='competencia',
+            field=models.DateField(blank=True, editable=False, null=True, verbose_name='Competência'),
+        ),
+        migrations.AddConstraint(
+            model_name='conta',
+            constraint=models.UniqueConstraint(fields=('cadastro', 'competencia'), name='fin_conta_mensalidade_unica'),
+        ),
+    ]
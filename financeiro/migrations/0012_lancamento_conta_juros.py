@@ -0,0 +1,19 @@
+# Generated by Django 5.2.8 on 2026-10-17 20:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('financeiro', '0011_conta_competencia'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='lancamento',
+            name='conta_juros',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='lancamentos_juros', to='financeiro.conta'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.8 on 2026-10-17 20:21
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('financeiro', '0012_lancamento_conta_juros'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='resumomensal',
+            name='plano_de_contas',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='financeiro.planodecontas'),
+        ),
+    ]
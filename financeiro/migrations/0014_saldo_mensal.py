@@ -0,0 +1,69 @@
+# Generated by Django 5.2.8 on 2026-10-17 20:23
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def popular_pontos_de_controle(apps, schema_editor):
+    """Ponto de controle de cada mês com movimento = saldo acumulado do último dia gravado no mês"""
+    SaldoDiario = apps.get_model('financeiro', 'SaldoDiario')
+    SaldoMensal = apps.get_model('financeiro', 'SaldoMensal')
+
+    fechamentos = {}
+    dias = SaldoDiario.objects.values_list('empresa_id', 'caixa_id', 'data', 'saldo_acumulado').order_by('caixa_id', 'data')
+    for empresa_id, caixa_id, data, saldo in dias.iterator(chunk_size=2000):
+        fechamentos[(empresa_id, caixa_id, data.replace(day=1))] = saldo
+    SaldoMensal.objects.bulk_create([
+        SaldoMensal(empresa_id=empresa_id, caixa_id=caixa_id, mes=mes, saldo_final=saldo)
+        for (empresa_id, caixa_id, mes), saldo in fechamentos.items()
+    ], batch_size=1000)
+
+
+def popular_saldo_acumulado(apps, schema_editor):
+    """Volta: saldo acumulado de cada dia = soma dos movimentos do caixa até ele"""
+    SaldoDiario = apps.get_model('financeiro', 'SaldoDiario')
+
+    caixa_atual, acumulado, lote = None, 0, []
+    for dia in SaldoDiario.objects.order_by('caixa_id', 'data').iterator(chunk_size=2000):
+        if dia.caixa_id != caixa_atual:
+            caixa_atual, acumulado = dia.caixa_id, 0
+        acumulado += dia.movimento
+        dia.saldo_acumulado = acumulado
+        lote.append(dia)
+        if len(lote) >= 1000:
+            SaldoDiario.objects.bulk_update(lote, ['saldo_acumulado'])
+            lote = []
+    if lote:
+        SaldoDiario.objects.bulk_update(lote, ['saldo_acumulado'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_empresa_miniaturas'),
+        ('financeiro', '0013_resumo_plano_set_null'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SaldoMensal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mes', models.DateField(help_text='Primeiro dia do mês')),
+                ('saldo_final', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('caixa', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='saldos_mensais', to='financeiro.caixa')),
+                ('empresa', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.empresa', verbose_name='Empresa')),
+            ],
+            options={
+                'verbose_name': 'Saldo Mensal',
+                'verbose_name_plural': 'Saldos Mensais',
+                'ordering': ['caixa', 'mes'],
+                'unique_together': {('empresa', 'caixa', 'mes')},
+            },
+        ),
+        migrations.RunPython(popular_pontos_de_controle, popular_saldo_acumulado),
+        migrations.RemoveField(
+            model_name='saldodiario',
+            name='saldo_acumulado',
+        ),
+    ]
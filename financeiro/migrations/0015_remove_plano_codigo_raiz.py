@@ -0,0 +1,26 @@
+# Generated by Django 5.2.8 on 2026-10-17 20:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('financeiro', '0014_saldo_mensal'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='planodecontas',
+            name='fin_plano_emp_raiz_nivel_idx',
+        ),
+        migrations.RemoveField(
+            model_name='planodecontas',
+            name='codigo_raiz',
+        ),
+        migrations.AlterField(
+            model_name='planodecontas',
+            name='nivel',
+            field=models.PositiveSmallIntegerField(default=0, editable=False, help_text='Partes do código. Ex: 01.02 = 2'),
+        ),
+    ]
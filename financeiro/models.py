@@ -1,7 +1,54 @@
-from django.db import models
-from core.models import ModeloSaaS
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import models, transaction
+from django.db.models import Count, F, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, TruncMonth
+from django.db.models.signals import pre_delete
+from django.dispatch import receiver
+from django.utils.dateparse import parse_date
+from core.models import ModeloSaaS, ModeloSaaSManager
 from cadastros.models import Cadastro
 
+class PlanoDeContasManager(ModeloSaaSManager):
+
+    def reconstruir_arvore(self, empresa_id):
+        """
+        Recalcula pai e caminho de todo o plano da empresa a partir dos códigos
+        (o pai de '01.02.001' é o '01.02' ou, se não existir, o '01').
+        Uma leitura e um bulk_update só dos que mudaram; o plano de uma empresa é pequeno.
+        """
+        planos = sorted(
+            self.filter(empresa_id=empresa_id).only('id', 'codigo', 'nivel', 'pai_id', 'caminho'),
+            key=lambda plano: (plano.nivel, plano.codigo),
+        )
+        por_codigo = {plano.codigo.strip(): plano for plano in planos if plano.codigo.strip()}
+        caminhos = {}
+        alterados = []
+        for plano in planos:
+            pai = None
+            partes = plano.codigo.strip().split('.')
+            for n in range(len(partes) - 1, 0, -1):
+                pai = por_codigo.get('.'.join(partes[:n]))
+                if pai:
+                    break
+            # Pais têm nível menor, então já estão em `caminhos`
+            caminho = (caminhos[pai.id] if pai else '') + f'{plano.id}/'
+            caminhos[plano.id] = caminho
+            pai_id = pai.id if pai else None
+            if plano.pai_id != pai_id or plano.caminho != caminho:
+                plano.pai_id, plano.caminho = pai_id, caminho
+                alterados.append(plano)
+        self.bulk_update(alterados, ['pai', 'caminho'], batch_size=500)
+        return len(alterados)
+
+    def subarvore(self, plano):
+        """O plano e todos os seus descendentes, numa consulta (prefixo do caminho)"""
+        return self.filter(empresa_id=plano.empresa_id, caminho__startswith=plano.caminho)
+
+
 class PlanoDeContas(ModeloSaaS):
     TIPO_CHOICES = [
         ('R', 'Receita'),
@@ -11,15 +58,60 @@ class PlanoDeContas(ModeloSaaS):
     nome = models.CharField(max_length=100)
     tipo = models.CharField(max_length=1, choices=TIPO_CHOICES)
     codigo = models.CharField(max_length=20, blank=True, help_text="Ex: 1.01")
+
+    # Derivado do código (preenchido no save); ordena a reconstrução da árvore, pais antes dos filhos
+    nivel = models.PositiveSmallIntegerField(default=0, editable=False, help_text="Partes do código. Ex: 01.02 = 2")
+
+    # Árvore: pai direto e caminho materializado com os ids desde a raiz (ex: '3/17/45/')
+    pai = models.ForeignKey('self', on_delete=models.SET_NULL, null=True, blank=True, editable=False, related_name='filhos')
+    caminho = models.CharField(max_length=255, blank=True, editable=False)
+
+    objects = PlanoDeContasManager()
     
     def __str__(self):
         return f"{self.codigo} - {self.nome}" if self.codigo else self.nome
 
+    @staticmethod
+    def nivel_do_codigo(codigo):
+        codigo = (codigo or '').strip()
+        return codigo.count('.') + 1 if codigo else 0
+
+    @staticmethod
+    def ids_no_caminho(caminho):
+        """'3/17/45/' -> [3, 17, 45]: ids da raiz até o plano"""
+        return [int(parte) for parte in (caminho or '').split('/') if parte]
+
+    def ids_do_caminho(self):
+        """Ids da raiz até o próprio plano"""
+        return self.ids_no_caminho(self.caminho)
+
+    def save(self, *args, **kwargs):
+        self.nivel = self.nivel_do_codigo(self.codigo)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'codigo' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'nivel'}
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            # Código novo ou alterado pode mudar o pai deste plano e de outros
+            if update_fields is None or 'codigo' in update_fields:
+                PlanoDeContas.objects.reconstruir_arvore(self.empresa_id)
+                self.refresh_from_db(fields=['pai', 'caminho'])
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            resultado = super().delete(*args, **kwargs)
+            PlanoDeContas.objects.reconstruir_arvore(self.empresa_id)
+        return resultado
+
     class Meta:
         verbose_name = "Plano de Contas"
         verbose_name_plural = "Planos de Contas"
         ordering = ['codigo', 'nome']
         unique_together = [['empresa', 'codigo']]
+        indexes = [
+            # Subárvore por prefixo do caminho
+            models.Index(fields=['empresa', 'caminho'], name='fin_plano_emp_caminho_idx'),
+        ]
 
 
 class Caixa(ModeloSaaS):
@@ -48,6 +140,10 @@ class Conta(ModeloSaaS):
     
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='PENDENTE')
     documento = models.CharField(max_length=50, blank=True, null=True, verbose_name="Nº Doc / Parcela")
+    # Parcelas geradas juntas compartilham o mesmo grupo (ver financeiro/parcelamento.py)
+    grupo_parcelas = models.UUIDField(null=True, blank=True, editable=False, db_index=True)
+    # Mensalidades geradas em lote (ver financeiro/mensalidades.py): 1º dia do mês cobrado
+    competencia = models.DateField(null=True, blank=True, editable=False, verbose_name="Competência")
 
     observacoes = models.TextField(blank=True)
     
@@ -56,6 +152,33 @@ class Conta(ModeloSaaS):
     def __str__(self):
         return f"{self.descricao} - {self.data_vencimento}"
 
+    class Meta:
+        indexes = [
+            # Listas de contas a pagar/receber, vencidas e o dashboard
+            models.Index(fields=['empresa', 'status', 'data_vencimento'], name='fin_conta_emp_status_venc_idx'),
+        ]
+        constraints = [
+            # Uma mensalidade por cliente e competência: rodar a geração de novo não duplica
+            models.UniqueConstraint(fields=['cadastro', 'competencia'], name='fin_conta_mensalidade_unica'),
+        ]
+
+
+class LancamentoManager(ModeloSaaSManager):
+
+    def criar_em_lote(self, lancamentos, tamanho_lote=500):
+        """
+        bulk_create que mantém as regras do save(): sinal do valor pelo tipo e
+        consolidados (SaldoDiario/ResumoMensal) atualizados uma vez para o lote inteiro.
+        """
+        for lancamento in lancamentos:
+            lancamento.normalizar_sinal()
+        with transaction.atomic():
+            criados = self.bulk_create(lancamentos, batch_size=tamanho_lote)
+            atualizar_consolidados([lancamento.movimento() for lancamento in criados])
+        for lancamento in criados:
+            lancamento._movimento_original = lancamento.movimento()
+        return criados
+
 
 class Lancamento(ModeloSaaS):
     """
@@ -72,6 +195,10 @@ class Lancamento(ModeloSaaS):
     
     # Se veio de uma conta a pagar/receber, vinculamos aqui
     conta_origem = models.OneToOneField(Conta, on_delete=models.SET_NULL, null=True, blank=True, related_name="lancamento_caixa")
+    # Juros de atraso cobrados na baixa (financeiro/baixa.py): saem junto quando a baixa é estornada
+    conta_juros = models.ForeignKey(
+        Conta, on_delete=models.SET_NULL, null=True, blank=True, editable=False, related_name="lancamentos_juros",
+    )
     
     # ATENÇÃO: O nome do campo é 'data_lancamento'
     data_lancamento = models.DateField(verbose_name="Data do Movimento")
@@ -80,16 +207,498 @@ class Lancamento(ModeloSaaS):
     valor = models.DecimalField(max_digits=12, decimal_places=2)
     tipo = models.CharField(max_length=1, choices=TIPO_CHOICES)
 
-    def save(self, *args, **kwargs):
+    # Importação de extrato (ver financeiro/importacao.py): nº do documento no banco e
+    # a impressão digital da transação, que impede importar a mesma linha duas vezes no caixa
+    documento = models.CharField(max_length=50, blank=True, null=True, verbose_name="Nº Doc (Banco)")
+    impressao_digital = models.CharField(max_length=64, null=True, blank=True, editable=False)
+
+    objects = LancamentoManager()
+
+    # Campos que afetam os consolidados (SaldoDiario e ResumoMensal), na ordem do "movimento"
+    CAMPOS_MOVIMENTO = ['empresa_id', 'caixa_id', 'plano_de_contas_id', 'tipo', 'data_lancamento', 'valor']
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instancia = super().from_db(db, field_names, values)
+        # Guarda como o lançamento está no banco para calcular a diferença ao salvar/excluir
+        instancia._movimento_original = instancia.movimento()
+        return instancia
+
+    def movimento(self):
+        """
+        (empresa, caixa, plano, tipo, data, valor, quantidade) atual, usado para atualizar os consolidados.
+        None se algum campo não foi carregado (only/defer).
+        """
+        if any(campo not in self.__dict__ for campo in self.CAMPOS_MOVIMENTO):
+            return None
+        return tuple(getattr(self, campo) for campo in self.CAMPOS_MOVIMENTO) + (1,)
+
+    def _movimento_no_banco(self):
+        if self._state.adding or not self.pk:
+            return None
+        if getattr(self, '_movimento_original', None) is not None:
+            return self._movimento_original
+        valores = Lancamento.objects.filter(pk=self.pk).values_list(*self.CAMPOS_MOVIMENTO).first()
+        return valores + (1,) if valores else None
+
+    def normalizar_sinal(self):
+        # Datas podem chegar como texto (ex: POST da baixa de conta)
+        self.data_lancamento = self._meta.get_field('data_lancamento').to_python(self.data_lancamento)
+
         # Garante que despesas (D) sejam negativas e Receitas (C) positivas
         if self.tipo == 'D' and self.valor > 0:
             self.valor = self.valor * -1
         elif self.tipo == 'C' and self.valor < 0:
             self.valor = self.valor * -1
-        super().save(*args, **kwargs)
+
+    def save(self, *args, **kwargs):
+        self.normalizar_sinal()
+
+        with transaction.atomic():
+            anterior = self._movimento_no_banco()
+            super().save(*args, **kwargs)
+            atual = self.movimento()
+            movimentos = [atual]
+            if anterior:
+                movimentos.append(estornar(anterior))
+            atualizar_consolidados(movimentos)
+        self._movimento_original = atual
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            anterior = self._movimento_no_banco()
+            resultado = super().delete(*args, **kwargs)
+            if anterior:
+                atualizar_consolidados([estornar(anterior)])
+        self._movimento_original = None
+        return resultado
 
     def __str__(self):
         return f"{self.data_lancamento} - {self.descricao} ({self.valor})"
 
     class Meta:
-        ordering = ['-data_lancamento']
\ No newline at end of file
+        ordering = ['-data_lancamento']
+        indexes = [
+            # Fluxo de caixa / relatórios por período (com ou sem caixa)
+            models.Index(fields=['empresa', 'data_lancamento', 'caixa'], name='fin_lanc_emp_data_caixa_idx'),
+            # DRE e filtros por categoria
+            models.Index(fields=['empresa', 'plano_de_contas', 'data_lancamento'], name='fin_lanc_emp_plano_data_idx'),
+        ]
+        # Lançamentos manuais ficam com NULL, que não conflita com nada
+        unique_together = [['caixa', 'impressao_digital']]
+
+
+CENTAVO = Decimal('0.01')
+
+
+def _como_data(valor):
+    return parse_date(valor) if isinstance(valor, str) else valor
+
+
+def _inicio_mes(data):
+    return data.replace(day=1)
+
+
+def _proximo_mes(data):
+    return (data.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def estornar(movimento):
+    """Movimento que desfaz o informado (mesma chave, valor e quantidade com sinal trocado)"""
+    return movimento[:5] + (-movimento[5], -movimento[6])
+
+
+def atualizar_consolidados(movimentos):
+    """
+    Aplica uma lista de movimentos (ver Lancamento.movimento) no SaldoDiario e no ResumoMensal.
+    Caminhos em lote (bulk_create/update) devem chamar isto uma vez com todos os movimentos.
+    """
+    movimentos = [m for m in movimentos if m]
+    if not movimentos:
+        return
+
+    with transaction.atomic():
+        # Trava os caixas envolvidos para serializar atualizações concorrentes dos consolidados
+        caixas_ids = sorted({m[1] for m in movimentos})
+        list(Caixa.objects.select_for_update().filter(pk__in=caixas_ids).order_by('pk').values_list('pk'))
+
+        SaldoDiario.objects.aplicar_movimentos(movimentos)
+        ResumoMensal.objects.aplicar_movimentos(movimentos)
+
+
+class SaldoDiarioManager(ModeloSaaSManager):
+
+    def aplicar_movimentos(self, movimentos):
+        """
+        Atualiza o movimento dos dias e os pontos de controle mensais (SaldoMensal).
+        Movimentos do mesmo caixa/dia e caixa/mês são somados antes de ir ao banco.
+        Um lançamento retroativo muda só o seu dia e os pontos dos meses seguintes
+        (um UPDATE), não cada dia posterior do caixa.
+        Use atualizar_consolidados(), que também trava os caixas.
+        """
+        deltas_dia = defaultdict(Decimal)
+        deltas_mes = defaultdict(Decimal)
+        for empresa_id, caixa_id, _, _, data, valor, _ in movimentos:
+            deltas_dia[(empresa_id, caixa_id, data)] += Decimal(valor)
+            deltas_mes[(empresa_id, caixa_id, _inicio_mes(data))] += Decimal(valor)
+
+        for (empresa_id, caixa_id, data), delta in sorted(deltas_dia.items()):
+            if not delta:
+                continue
+            chave = dict(empresa_id=empresa_id, caixa_id=caixa_id, data=data)
+            if not self.filter(**chave).update(movimento=F('movimento') + delta):
+                self.create(movimento=delta, **chave)
+
+        for (empresa_id, caixa_id, mes), delta in sorted(deltas_mes.items()):
+            if not delta:
+                continue
+            pontos = SaldoMensal.objects.filter(empresa_id=empresa_id, caixa_id=caixa_id)
+            if not pontos.filter(mes=mes).update(saldo_final=F('saldo_final') + delta):
+                anterior = pontos.filter(mes__lt=mes).order_by('-mes').values_list('saldo_final', flat=True).first()
+                SaldoMensal.objects.create(
+                    empresa_id=empresa_id, caixa_id=caixa_id, mes=mes, saldo_final=(anterior or 0) + delta,
+                )
+            pontos.filter(mes__gt=mes).update(saldo_final=F('saldo_final') + delta)
+
+    def saldo_ate(self, empresa, data):
+        """
+        Expressão para anotar um queryset de Caixa: soma dos lançamentos do caixa até o fim de `data`
+        (sem o saldo inicial). Último ponto de controle antes do mês + os dias do mês até a data,
+        no máximo 31 linhas, qualquer que seja o tamanho do histórico.
+        """
+        data = _como_data(data)
+        mes = _inicio_mes(data)
+        ponto = SaldoMensal.objects.filter(
+            empresa=empresa, caixa=OuterRef('pk'), mes__lt=mes,
+        ).order_by('-mes').values('saldo_final')[:1]
+        dias = (
+            self.filter(empresa=empresa, caixa=OuterRef('pk'), data__gte=mes, data__lte=data)
+            .order_by().values('caixa').annotate(soma=Sum('movimento')).values('soma')
+        )
+        campo = models.DecimalField(max_digits=16, decimal_places=2)
+        return (
+            Coalesce(Subquery(ponto), Value(0), output_field=campo)
+            + Coalesce(Subquery(dias), Value(0), output_field=campo)
+        )
+
+    def _saldos_do_razao(self, empresa_id):
+        """Gera (caixa_id, data, movimento, saldo_acumulado) direto dos lançamentos, em ordem"""
+        totais = (
+            Lancamento.objects.filter(empresa_id=empresa_id)
+            .values('caixa_id', 'data_lancamento')
+            .annotate(total=Sum('valor'))
+            .order_by('caixa_id', 'data_lancamento')
+        )
+        caixa_atual, acumulado = None, Decimal(0)
+        for linha in totais.iterator(chunk_size=2000):
+            if linha['caixa_id'] != caixa_atual:
+                caixa_atual, acumulado = linha['caixa_id'], Decimal(0)
+            movimento = linha['total'].quantize(CENTAVO)
+            acumulado += movimento
+            yield linha['caixa_id'], linha['data_lancamento'], movimento, acumulado
+
+    def reconstruir(self, empresa_id, tamanho_lote=1000):
+        """
+        Apaga e recria os movimentos diários e os pontos de controle mensais da empresa a partir do razão.
+        Retorna quantos dias foram gravados.
+        """
+        total = 0
+        with transaction.atomic():
+            self.filter(empresa_id=empresa_id).delete()
+            SaldoMensal.objects.filter(empresa_id=empresa_id).delete()
+            dias, fechamentos = [], {}
+            for caixa_id, data, movimento, acumulado in self._saldos_do_razao(empresa_id):
+                dias.append(self.model(empresa_id=empresa_id, caixa_id=caixa_id, data=data, movimento=movimento))
+                fechamentos[(caixa_id, _inicio_mes(data))] = acumulado  # o último dia do mês fica
+                if len(dias) >= tamanho_lote:
+                    self.bulk_create(dias)
+                    total += len(dias)
+                    dias = []
+            if dias:
+                self.bulk_create(dias)
+                total += len(dias)
+            SaldoMensal.objects.bulk_create([
+                SaldoMensal(empresa_id=empresa_id, caixa_id=caixa_id, mes=mes, saldo_final=saldo)
+                for (caixa_id, mes), saldo in fechamentos.items()
+            ], batch_size=tamanho_lote)
+        return total
+
+    def divergencias(self, empresa_id):
+        """
+        Compara os movimentos diários e os pontos de controle gravados com o razão (Lancamento).
+        Retorna lista de (caixa_id, data, esperado, gravado) onde cada lado é (movimento, saldo_acumulado);
+        o saldo gravado é o que as telas leem: ponto de controle do mês anterior + dias do mês.
+        Pontos de controle errados aparecem com a data do último dia do mês e movimento None.
+        """
+        esperados = {
+            (caixa_id, data): (movimento, acumulado)
+            for caixa_id, data, movimento, acumulado in self._saldos_do_razao(empresa_id)
+        }
+        datas_por_caixa = defaultdict(list)
+        for caixa_id, data in esperados:  # já vem ordenado por caixa e data
+            datas_por_caixa[caixa_id].append(data)
+
+        def acumulado_esperado(caixa_id, data):
+            # Saldo no fim de `data` = último dia com movimento até ela
+            datas = datas_por_caixa[caixa_id]
+            posicao = bisect_right(datas, data)
+            return esperados[(caixa_id, datas[posicao - 1])][1] if posicao else Decimal(0)
+
+        problemas = []
+        pontos = defaultdict(list)
+        for caixa_id, mes, saldo in SaldoMensal.objects.filter(empresa_id=empresa_id).values_list(
+            'caixa_id', 'mes', 'saldo_final',
+        ).order_by('caixa_id', 'mes'):
+            pontos[caixa_id].append((mes, saldo))
+            fim_do_mes = _proximo_mes(mes) - timedelta(days=1)
+            esperado = acumulado_esperado(caixa_id, fim_do_mes)
+            if saldo != esperado:
+                problemas.append((caixa_id, fim_do_mes, (None, esperado), (None, saldo)))
+
+        # Mês com movimento sem ponto de controle: as leituras dos meses seguintes usariam um ponto antigo
+        meses_com_ponto = {(caixa_id, mes) for caixa_id, lista in pontos.items() for mes, _ in lista}
+        for caixa_id, datas in datas_por_caixa.items():
+            saldo_mes_anterior = Decimal(0)
+            for mes in sorted({_inicio_mes(data) for data in datas}):
+                saldo_fim = acumulado_esperado(caixa_id, _proximo_mes(mes) - timedelta(days=1))
+                if saldo_fim != saldo_mes_anterior and (caixa_id, mes) not in meses_com_ponto:
+                    problemas.append((caixa_id, _proximo_mes(mes) - timedelta(days=1), (None, saldo_fim), None))
+                saldo_mes_anterior = saldo_fim
+
+        encontrados = set()
+        caixa_atual = mes_atual = None
+        gravados = self.filter(empresa_id=empresa_id).values_list('caixa_id', 'data', 'movimento').order_by('caixa_id', 'data')
+        for caixa_id, data, movimento in gravados.iterator(chunk_size=2000):
+            if (caixa_id, _inicio_mes(data)) != (caixa_atual, mes_atual):
+                caixa_atual, mes_atual = caixa_id, _inicio_mes(data)
+                lista = pontos[caixa_id]
+                posicao = bisect_left(lista, (mes_atual,))
+                saldo = lista[posicao - 1][1] if posicao else Decimal(0)
+            saldo += movimento
+            chave = (caixa_id, data)
+            encontrados.add(chave)
+            esperado = (esperados[chave][0] if chave in esperados else Decimal(0), acumulado_esperado(caixa_id, data))
+            if (movimento, saldo) != esperado:
+                problemas.append((caixa_id, data, esperado, (movimento, saldo)))
+
+        for chave in esperados.keys() - encontrados:
+            if esperados[chave][0]:
+                problemas.append(chave + (esperados[chave], None))
+        return sorted(problemas, key=lambda p: (p[0], p[1]))
+
+
+class SaldoDiario(ModeloSaaS):
+    """
+    Movimento consolidado por caixa e dia, mantido a cada gravação de Lancamento.
+    Junto com os pontos de controle mensais (SaldoMensal), o saldo de abertura de um
+    período sai de "ponto do mês anterior + dias do mês" (ver SaldoDiarioManager.saldo_ate)
+    em vez de somar todo o histórico de lançamentos.
+    """
+    caixa = models.ForeignKey(Caixa, on_delete=models.CASCADE, related_name='saldos_diarios')
+    data = models.DateField()
+    movimento = models.DecimalField(max_digits=14, decimal_places=2, default=0, help_text="Soma dos lançamentos do dia")
+
+    objects = SaldoDiarioManager()
+
+    def __str__(self):
+        return f"{self.caixa_id} - {self.data}: {self.movimento}"
+
+    class Meta:
+        verbose_name = "Saldo Diário"
+        verbose_name_plural = "Saldos Diários"
+        ordering = ['caixa', 'data']
+        unique_together = [['empresa', 'caixa', 'data']]
+
+
+class SaldoMensal(ModeloSaaS):
+    """
+    Ponto de controle do saldo diário: soma dos lançamentos do caixa até o fim do mês
+    (sem o saldo inicial). Existe para os meses com movimento; mantido pelo SaldoDiarioManager.
+    """
+    caixa = models.ForeignKey(Caixa, on_delete=models.CASCADE, related_name='saldos_mensais')
+    mes = models.DateField(help_text="Primeiro dia do mês")
+    saldo_final = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+
+    def __str__(self):
+        return f"{self.caixa_id} - {self.mes:%m/%Y}: {self.saldo_final}"
+
+    class Meta:
+        verbose_name = "Saldo Mensal"
+        verbose_name_plural = "Saldos Mensais"
+        ordering = ['caixa', 'mes']
+        unique_together = [['empresa', 'caixa', 'mes']]
+
+
+class ResumoMensalManager(ModeloSaaSManager):
+
+    def aplicar_movimentos(self, movimentos):
+        """Atualiza o cubo mensal. Use atualizar_consolidados(), que também trava os caixas."""
+        deltas = defaultdict(lambda: [Decimal(0), 0])
+        for empresa_id, caixa_id, plano_id, tipo, data, valor, quantidade in movimentos:
+            chave = (empresa_id, _inicio_mes(data), plano_id, caixa_id, tipo)
+            deltas[chave][0] += Decimal(valor)
+            deltas[chave][1] += quantidade
+
+        for (empresa_id, mes, plano_id, caixa_id, tipo), (total, quantidade) in sorted(deltas.items(), key=lambda item: str(item[0])):
+            if not total and not quantidade:
+                continue
+            chave = dict(empresa_id=empresa_id, mes=mes, plano_de_contas_id=plano_id, caixa_id=caixa_id, tipo=tipo)
+            atualizados = self.filter(**chave).update(
+                total=F('total') + total,
+                quantidade=F('quantidade') + quantidade,
+            )
+            if not atualizados:
+                self.create(total=total, quantidade=quantidade, **chave)
+
+    def mover_para_sem_plano(self, plano):
+        """
+        Soma as linhas do plano nas linhas sem plano (mesmo mês, caixa e tipo) e as apaga.
+        Chamado antes de excluir um plano: os lançamentos dele ficam com plano NULL (SET_NULL)
+        e o resumo precisa acompanhar, ou a DRE e o fluxo deixam de bater com o razão.
+        """
+        linhas = list(self.filter(empresa_id=plano.empresa_id, plano_de_contas=plano).values_list(
+            'caixa_id', 'tipo', 'mes', 'total', 'quantidade',
+        ))
+        if not linhas:
+            return
+        with transaction.atomic():
+            caixas_ids = sorted({linha[0] for linha in linhas})
+            list(Caixa.objects.select_for_update().filter(pk__in=caixas_ids).order_by('pk').values_list('pk'))
+            self.aplicar_movimentos([
+                (plano.empresa_id, caixa_id, None, tipo, mes, total, quantidade)
+                for caixa_id, tipo, mes, total, quantidade in linhas
+            ])
+            self.filter(empresa_id=plano.empresa_id, plano_de_contas=plano).delete()
+
+    def somar(self, empresa, data_inicio, data_fim, campos=(), **filtros):
+        """
+        Total dos lançamentos entre data_inicio e data_fim (inclusive), agrupado por `campos`.
+
+        Campos e filtros usam nomes que existem tanto em Lancamento quanto aqui
+        (tipo, caixa, plano_de_contas, plano_de_contas__codigo...); 'mes' agrupa por mês.
+        Meses inteiros são lidos do resumo e só as pontas parciais vão aos lançamentos.
+        Retorna lista de dicts com os campos, 'total' e 'quantidade', ordenada pelos campos.
+        """
+        data_inicio, data_fim = _como_data(data_inicio), _como_data(data_fim)
+        campos = list(campos)
+        grupos = defaultdict(lambda: [Decimal(0), 0])
+        if not data_inicio or not data_fim or data_inicio > data_fim:
+            return []
+
+        # [primeiro_mes, fim_meses) = meses inteiros dentro do período
+        primeiro_mes = data_inicio if data_inicio.day == 1 else _proximo_mes(data_inicio)
+        ultimo_dia_do_mes = _proximo_mes(data_fim) - timedelta(days=1)
+        fim_meses = _proximo_mes(data_fim) if data_fim == ultimo_dia_do_mes else _inicio_mes(data_fim)
+        dia_seguinte_fim = data_fim + timedelta(days=1)
+
+        pontas = []
+        if primeiro_mes < fim_meses:
+            resumo = self.filter(empresa=empresa, mes__gte=primeiro_mes, mes__lt=fim_meses, **filtros)
+            for linha in resumo.values(*campos).annotate(soma=Sum('total'), qtd=Sum('quantidade')).order_by():
+                grupo = grupos[tuple(linha[c] for c in campos)]
+                grupo[0] += linha['soma']
+                grupo[1] += linha['qtd']
+            if data_inicio < primeiro_mes:
+                pontas.append((data_inicio, primeiro_mes))
+            if fim_meses < dia_seguinte_fim:
+                pontas.append((fim_meses, dia_seguinte_fim))
+        else:
+            pontas.append((data_inicio, dia_seguinte_fim))
+
+        if pontas:
+            periodo = Q()
+            for inicio, fim in pontas:
+                periodo |= Q(data_lancamento__gte=inicio, data_lancamento__lt=fim)
+            brutos = Lancamento.objects.filter(periodo, empresa=empresa, **filtros)
+            if 'mes' in campos:
+                brutos = brutos.annotate(mes=TruncMonth('data_lancamento'))
+            for linha in brutos.values(*campos).annotate(soma=Sum('valor'), qtd=Count('id')).order_by():
+                grupo = grupos[tuple(linha[c] for c in campos)]
+                grupo[0] += linha['soma']
+                grupo[1] += linha['qtd']
+
+        resultado = [
+            dict(zip(campos, chave), total=total.quantize(CENTAVO), quantidade=quantidade)
+            for chave, (total, quantidade) in grupos.items()
+            if quantidade  # grupos que ficaram zerados após edições/exclusões
+        ]
+        return sorted(resultado, key=lambda linha: [(linha[c] is None, linha[c]) for c in campos])
+
+    def _resumo_do_razao(self, empresa_id):
+        return (
+            Lancamento.objects.filter(empresa_id=empresa_id)
+            .annotate(mes=TruncMonth('data_lancamento'))
+            .values('mes', 'plano_de_contas_id', 'caixa_id', 'tipo')
+            .annotate(soma=Sum('valor'), qtd=Count('id'))
+            .order_by()
+        )
+
+    def reconstruir(self, empresa_id, tamanho_lote=1000):
+        """Apaga e recria o resumo mensal da empresa a partir do razão. Retorna quantas linhas foram gravadas."""
+        with transaction.atomic():
+            self.filter(empresa_id=empresa_id).delete()
+            linhas = [
+                self.model(
+                    empresa_id=empresa_id, mes=linha['mes'], plano_de_contas_id=linha['plano_de_contas_id'],
+                    caixa_id=linha['caixa_id'], tipo=linha['tipo'], total=linha['soma'].quantize(CENTAVO), quantidade=linha['qtd'],
+                )
+                for linha in self._resumo_do_razao(empresa_id).iterator(chunk_size=2000)
+            ]
+            self.bulk_create(linhas, batch_size=tamanho_lote)
+        return len(linhas)
+
+    def divergencias(self, empresa_id):
+        """
+        Compara o resumo gravado com o razão.
+        Retorna lista de ((mes, plano_id, caixa_id, tipo), esperado, gravado) onde cada lado é (total, quantidade).
+        """
+        esperados = {
+            (linha['mes'], linha['plano_de_contas_id'], linha['caixa_id'], linha['tipo']): (linha['soma'].quantize(CENTAVO), linha['qtd'])
+            for linha in self._resumo_do_razao(empresa_id).iterator(chunk_size=2000)
+        }
+        gravados = defaultdict(lambda: (Decimal(0), 0))
+        for mes, plano_id, caixa_id, tipo, total, quantidade in self.filter(empresa_id=empresa_id).values_list(
+            'mes', 'plano_de_contas_id', 'caixa_id', 'tipo', 'total', 'quantidade'
+        ).iterator(chunk_size=2000):
+            chave = (mes, plano_id, caixa_id, tipo)
+            gravados[chave] = (gravados[chave][0] + total, gravados[chave][1] + quantidade)
+
+        problemas = []
+        for chave in esperados.keys() | gravados.keys():
+            esperado = esperados.get(chave, (Decimal(0), 0))
+            if gravados[chave] != esperado:
+                problemas.append((chave, esperado, gravados[chave]))
+        return sorted(problemas, key=lambda p: str(p[0]))
+
+
+class ResumoMensal(ModeloSaaS):
+    """
+    Cubo mensal dos lançamentos: total e quantidade por mês, plano de contas, caixa e tipo.
+    Mantido junto com o SaldoDiario; alimenta o dashboard e a DRE.
+    """
+    mes = models.DateField(help_text="Primeiro dia do mês")
+    # Como no Lancamento: excluir o plano não apaga o movimento (ver mover_para_sem_plano)
+    plano_de_contas = models.ForeignKey(PlanoDeContas, on_delete=models.SET_NULL, null=True, blank=True)
+    caixa = models.ForeignKey(Caixa, on_delete=models.CASCADE)
+    tipo = models.CharField(max_length=1, choices=Lancamento.TIPO_CHOICES)
+    total = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    quantidade = models.IntegerField(default=0)
+
+    objects = ResumoMensalManager()
+
+    def __str__(self):
+        return f"{self.mes:%m/%Y} - {self.tipo}: {self.total}"
+
+    class Meta:
+        verbose_name = "Resumo Mensal"
+        verbose_name_plural = "Resumos Mensais"
+        ordering = ['mes']
+        unique_together = [['empresa', 'mes', 'plano_de_contas', 'caixa', 'tipo']]
+
+
+@receiver(pre_delete, sender=PlanoDeContas)
+def mover_resumo_do_plano_excluido(sender, instance, origin=None, **kwargs):
+    # Na exclusão da empresa inteira (CASCADE) o resumo sai junto: nada a mover
+    modelo_origem = origin.model if isinstance(origin, models.QuerySet) else type(origin)
+    if modelo_origem is PlanoDeContas:
+        ResumoMensal.objects.mover_para_sem_plano(instance)
@@ -0,0 +1,117 @@
+"""
+Motor de parcelamento de contas a pagar/receber.
+
+Calcula o cronograma inteiro de uma vez (valores em centavos exatos, diferença de
+arredondamento na última parcela) e grava todas as parcelas num único bulk_create.
+"""
+import calendar
+import uuid
+from datetime import date
+from decimal import Decimal, ROUND_DOWN, ROUND_HALF_UP
+
+from django.db import transaction
+
+from .models import CENTAVO, Conta
+
+SIMPLES = 'SIMPLES'
+PRICE = 'PRICE'
+SAC = 'SAC'
+
+SISTEMAS_CHOICES = [
+    (SIMPLES, 'Simples (acréscimo % sobre o total)'),
+    (PRICE, 'Price (parcelas iguais, juros % ao mês)'),
+    (SAC, 'SAC (amortização constante, juros % ao mês)'),
+]
+
+
+def add_months(source_date, months):
+    """Adiciona meses a uma data corretamente (ex: 31/01 + 1 mês -> 28/02)"""
+    month = source_date.month - 1 + months
+    year = source_date.year + month // 12
+    month = month % 12 + 1
+    day = min(source_date.day, calendar.monthrange(year, month)[1])
+    return date(year, month, day)
+
+
+def _centavos(valor):
+    return Decimal(valor).quantize(CENTAVO, rounding=ROUND_HALF_UP)
+
+
+def _dividir(total, qtd):
+    """Divide em `qtd` partes de centavos exatos; a sobra do arredondamento vai para a última"""
+    parte = (total / qtd).quantize(CENTAVO, rounding=ROUND_DOWN)
+    return [parte] * (qtd - 1) + [total - parte * (qtd - 1)]
+
+
+def calcular_parcelas(valor, qtd, taxa=0, sistema=SIMPLES):
+    """
+    Valores das `qtd` parcelas de `valor`.
+
+    SIMPLES: `taxa` é o acréscimo total (%) sobre o valor, dividido igualmente.
+    PRICE:   `taxa` é o juro mensal (%); parcelas iguais (tabela Price).
+    SAC:     `taxa` é o juro mensal (%); amortização constante e juros sobre o saldo.
+    Em PRICE e SAC a última parcela quita exatamente o saldo devedor.
+    """
+    valor = _centavos(valor)
+    taxa = Decimal(taxa or 0) / 100
+    if qtd < 1:
+        raise ValueError("A quantidade de parcelas deve ser maior que zero.")
+
+    if sistema == SIMPLES or not taxa:
+        return _dividir(_centavos(valor * (1 + taxa)), qtd)
+
+    if sistema == PRICE:
+        prestacao = _centavos(valor * taxa / (1 - (1 + taxa) ** -qtd))
+        amortizacoes = None
+    elif sistema == SAC:
+        prestacao = None
+        amortizacoes = _dividir(valor, qtd)
+    else:
+        raise ValueError(f"Sistema de amortização desconhecido: {sistema}")
+
+    parcelas = []
+    saldo = valor
+    for numero in range(qtd):
+        juros = _centavos(saldo * taxa)
+        if numero == qtd - 1:
+            amortizacao = saldo
+        elif amortizacoes:
+            amortizacao = amortizacoes[numero]
+        else:
+            amortizacao = prestacao - juros
+        parcelas.append(amortizacao + juros)
+        saldo -= amortizacao
+    return parcelas
+
+
+def gerar_cronograma(valor, qtd, primeiro_vencimento, taxa=0, sistema=SIMPLES):
+    """Lista de (número, vencimento, valor) das parcelas, com vencimentos mensais a partir do primeiro"""
+    return [
+        (numero, add_months(primeiro_vencimento, numero - 1), parcela)
+        for numero, parcela in enumerate(calcular_parcelas(valor, qtd, taxa, sistema), start=1)
+    ]
+
+
+def criar_parcelas(modelo, qtd, taxa=0, sistema=SIMPLES):
+    """
+    Grava as parcelas da conta `modelo` (não salva; valor e vencimento são os da 1ª parcela/total)
+    numa única transação com um bulk_create. Retorna (grupo, parcelas criadas).
+    """
+    grupo = uuid.uuid4()
+    prefixo = grupo.hex[:8].upper()
+    campos = {
+        campo.attname: getattr(modelo, campo.attname)
+        for campo in Conta._meta.concrete_fields
+        if not campo.primary_key and campo.name not in ('valor', 'data_vencimento', 'documento', 'grupo_parcelas')
+    }
+    cronograma = gerar_cronograma(modelo.valor, qtd, modelo.data_vencimento, taxa, sistema)
+    parcelas = [
+        Conta(
+            **campos, valor=parcela, data_vencimento=vencimento,
+            documento=f"{prefixo}-{numero}/{qtd}", grupo_parcelas=grupo,
+        )
+        for numero, vencimento, parcela in cronograma
+    ]
+    with transaction.atomic():
+        Conta.objects.bulk_create(parcelas)
+    return grupo, parcelas
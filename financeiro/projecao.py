@@ -0,0 +1,109 @@
+"""
+Projeção do fluxo de caixa: saldo atual dos caixas + contas PENDENTES pelo vencimento, dia a dia.
+
+Três consultas agrupadas, qualquer que seja o volume: o saldo de cada caixa até hoje (SaldoDiario/SaldoMensal),
+os lançamentos já gravados com data futura e as contas pendentes somadas por dia e tipo. O saldo
+projetado é a soma acumulada (itertools.accumulate) dos totais de cada dia do horizonte.
+Contas vencidas entram no primeiro dia (recebidas/pagas hoje), salvo se a simulação as excluir.
+"""
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from decimal import Decimal
+from itertools import accumulate
+
+from django.db.models import Case, DateField, F, Q, Sum, Value, When
+
+from .models import Caixa, Conta, SaldoDiario
+
+DIAS_PADRAO = 90
+DIAS_MAXIMO = 365
+
+
+@dataclass
+class DiaProjetado:
+    data: date
+    entradas: Decimal  # contas a receber
+    saidas: Decimal  # contas a pagar (positivo)
+    lancados: Decimal  # lançamentos já gravados com data futura (com sinal)
+    saldo: Decimal = Decimal('0')
+
+    @property
+    def movimento(self):
+        return self.entradas - self.saidas + self.lancados
+
+
+@dataclass
+class Projecao:
+    saldo_atual: Decimal
+    caixas: list  # (nome, saldo) de cada caixa hoje
+    dias: list = field(default_factory=list)  # DiaProjetado de hoje até o fim do horizonte
+    primeiro_negativo: DiaProjetado = None
+    menor_saldo: DiaProjetado = None
+
+    @property
+    def total_entradas(self):
+        return sum((dia.entradas for dia in self.dias), Decimal('0'))
+
+    @property
+    def total_saidas(self):
+        return sum((dia.saidas for dia in self.dias), Decimal('0'))
+
+
+def saldos_dos_caixas(empresa, ate):
+    """(nome, saldo) de cada caixa no fim do dia `ate`: saldo inicial + lançamentos até a data"""
+    caixas = Caixa.objects.filter(empresa=empresa).annotate(
+        saldo=F('saldo_inicial') + SaldoDiario.objects.saldo_ate(empresa, ate),
+    ).order_by('nome')
+    return [(nome, saldo) for nome, saldo in caixas.values_list('nome', 'saldo')]
+
+
+def projetar(empresa, dias=DIAS_PADRAO, receber_atrasadas=True, pagar_atrasadas=True, hoje=None):
+    """
+    Projeção de `hoje` até `hoje + dias`.
+    receber_atrasadas/pagar_atrasadas=False simulam que as contas vencidas não serão recebidas/pagas.
+    """
+    hoje = hoje or date.today()
+    dias = max(1, min(int(dias), DIAS_MAXIMO))
+    fim = hoje + timedelta(days=dias)
+
+    caixas = saldos_dos_caixas(empresa, hoje)
+    projecao = Projecao(saldo_atual=sum((saldo for _, saldo in caixas), Decimal('0')), caixas=caixas)
+
+    contas = Conta.objects.filter(empresa=empresa, status='PENDENTE', data_vencimento__lte=fim)
+    if not receber_atrasadas:
+        contas = contas.exclude(Q(plano_de_contas__tipo='R') & Q(data_vencimento__lt=hoje))
+    if not pagar_atrasadas:
+        contas = contas.exclude(Q(plano_de_contas__tipo='D') & Q(data_vencimento__lt=hoje))
+    por_dia = (
+        contas.annotate(dia=Case(
+            When(data_vencimento__lt=hoje, then=Value(hoje)), default=F('data_vencimento'), output_field=DateField(),
+        ))
+        .values('dia', 'plano_de_contas__tipo')
+        .annotate(total=Sum('valor'))
+        .order_by()
+    )
+    lancados = (
+        SaldoDiario.objects.filter(empresa=empresa, data__gt=hoje, data__lte=fim)
+        .values('data')
+        .annotate(total=Sum('movimento'))
+        .order_by()
+    )
+
+    zero = Decimal('0')
+    projecao.dias = [DiaProjetado(hoje + timedelta(days=i), zero, zero, zero) for i in range(dias + 1)]
+    for linha in por_dia:
+        dia = projecao.dias[(linha['dia'] - hoje).days]
+        if linha['plano_de_contas__tipo'] == 'R':
+            dia.entradas += linha['total']
+        else:
+            dia.saidas += linha['total']
+    for linha in lancados:
+        projecao.dias[(linha['data'] - hoje).days].lancados += linha['total']
+
+    saldos = accumulate((dia.movimento for dia in projecao.dias), initial=projecao.saldo_atual)
+    next(saldos)  # o próprio saldo atual
+    for dia, saldo in zip(projecao.dias, saldos):
+        dia.saldo = saldo
+    projecao.primeiro_negativo = next((dia for dia in projecao.dias if dia.saldo < 0), None)
+    projecao.menor_saldo = min(projecao.dias, key=lambda dia: dia.saldo)
+    return projecao
@@ -1,3 +1,1309 @@
+from datetime import date, timedelta
+from decimal import Decimal
+from io import StringIO
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncMonth
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core import parametros
+from core.exportacao import iterar_por_chave
+from cadastros.models import Cadastro, CategoriaCliente
+from core.models import Empresa, ParametroSistema, Usuario
+from .aging import aging, totais_aging
+from .baixa import baixar_contas
+from .conciliacao import POR_DOCUMENTO, POR_VALOR_DATA, conciliar, sugerir
+from .importacao import ErroImportacao, LayoutCSV, importar_extrato, ler_csv, ler_ofx
+from .juros import com_juros
+from .mensalidades import gerar_mensalidades
+from .models import Caixa, Conta, Lancamento, PlanoDeContas, ResumoMensal, SaldoDiario, SaldoMensal
+from .parcelamento import PRICE, SAC, SIMPLES, calcular_parcelas, criar_parcelas, gerar_cronograma
+from .projecao import projetar
+from .views import calcular_saldo_anterior
+
+
+def analisar_tabelas(*modelos):
+    """Atualiza as estatísticas do planejador depois de popular as tabelas"""
+    with connection.cursor() as cursor:
+        if connection.vendor == 'mysql':
+            cursor.execute('ANALYZE TABLE ' + ', '.join(m._meta.db_table for m in modelos))
+        elif connection.vendor == 'sqlite':
+            cursor.execute('ANALYZE')
+
+
+class IndicesCompostosTests(TestCase):
+    """O planejador deve usar os índices compostos nas consultas principais (via EXPLAIN)"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.empresas = [Empresa.objects.create(nome=f'Empresa {i}', cnpj=f'00.000.000/000{i}-00') for i in range(3)]
+        inicio = date(2023, 1, 1)
+        lancamentos, contas = [], []
+        for empresa in cls.empresas:
+            caixas = [Caixa.objects.create(empresa=empresa, nome=f'Caixa {i}') for i in range(3)]
+            planos = [
+                PlanoDeContas.objects.create(empresa=empresa, nome=f'Plano {i}', tipo='RD'[i % 2], codigo=f'0{i % 2 + 1}.{i:02d}')
+                for i in range(10)
+            ]
+            for i in range(1500):
+                plano = planos[i % len(planos)]
+                lancamentos.append(Lancamento(
+                    empresa=empresa, caixa=caixas[i % len(caixas)], plano_de_contas=plano,
+                    data_lancamento=inicio + timedelta(days=i % 730), descricao=f'Lançamento {i}',
+                    valor=Decimal(i % 300 + 1), tipo='C' if plano.tipo == 'R' else 'D',
+                ))
+                contas.append(Conta(
+                    empresa=empresa, plano_de_contas=plano, descricao=f'Conta {i}', valor=Decimal(i % 300 + 1),
+                    data_vencimento=inicio + timedelta(days=i % 730), status=['PENDENTE', 'PAGA', 'CANCELADA'][i % 3],
+                ))
+        Lancamento.objects.bulk_create(lancamentos)
+        Conta.objects.bulk_create(contas)
+        analisar_tabelas(Lancamento, Conta)
+
+        cls.empresa = cls.empresas[0]
+        cls.plano = PlanoDeContas.objects.filter(empresa=cls.empresa).first()
+
+    def assertUsaIndice(self, queryset, indice):
+        plano = queryset.explain()
+        self.assertIn(indice, plano, f"Índice {indice} não usado. EXPLAIN:\n{plano}")
+
+    def test_fluxo_por_periodo_usa_indice_empresa_data(self):
+        qs = Lancamento.objects.filter(
+            empresa=self.empresa, data_lancamento__gte=date(2023, 3, 1), data_lancamento__lt=date(2023, 4, 1),
+        )
+        self.assertUsaIndice(qs, 'fin_lanc_emp_data_caixa_idx')
+
+    def test_lancamentos_por_categoria_usam_indice_empresa_plano_data(self):
+        qs = Lancamento.objects.filter(
+            empresa=self.empresa, plano_de_contas=self.plano,
+            data_lancamento__gte=date(2023, 1, 1), data_lancamento__lt=date(2024, 1, 1),
+        )
+        self.assertUsaIndice(qs, 'fin_lanc_emp_plano_data_idx')
+
+    def test_contas_pendentes_vencidas_usam_indice_empresa_status_vencimento(self):
+        qs = Conta.objects.filter(
+            empresa=self.empresa, status='PENDENTE', data_vencimento__lt=date(2023, 6, 1),
+        ).order_by('data_vencimento')
+        self.assertUsaIndice(qs, 'fin_conta_emp_status_venc_idx')
+
+
+class DreSinteticoTests(TestCase):
+    """DRE sintético consolidado pela árvore do plano de contas (pai/caminho)"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.empresa = Empresa.objects.create(nome='Empresa DRE', cnpj='22.222.222/0001-22')
+        cls.usuario = Usuario.objects.create_user('dre', password='x', empresa=cls.empresa)
+        caixa = Caixa.objects.create(empresa=cls.empresa, nome='Caixa')
+        planos = {
+            codigo: PlanoDeContas.objects.create(empresa=cls.empresa, codigo=codigo, nome=nome, tipo=tipo)
+            for codigo, nome, tipo in [
+                ('01', 'Receitas Operacionais', 'R'),
+                ('01.01', 'Mensalidades', 'R'),
+                ('01.02.001', 'Eventos', 'R'),
+                ('02.01', 'Aluguel', 'D'),
+                ('', 'Sem código', 'D'),
+            ]
+        }
+        for codigo, valor, tipo in [('01.01', 100, 'C'), ('01.02.001', 50, 'C'), ('02.01', 30, 'D'), ('', 5, 'D')]:
+            Lancamento.objects.create(
+                empresa=cls.empresa, caixa=caixa, plano_de_contas=planos[codigo], tipo=tipo,
+                valor=Decimal(valor), data_lancamento=date(2024, 3, 10), descricao=codigo,
+            )
+        cls.planos = planos
+
+    def test_save_grava_nivel(self):
+        self.assertEqual(self.planos['01.02.001'].nivel, 3)
+        self.assertEqual(self.planos['01'].nivel, 1)
+        self.assertEqual(self.planos[''].nivel, 0)
+
+        plano = self.planos['02.01']
+        plano.codigo = '03.01.02'
+        plano.save(update_fields=['codigo'])
+        plano.refresh_from_db()
+        self.assertEqual(plano.nivel, 3)
+
+    def dre(self, **filtros):
+        self.client.force_login(self.usuario)
+        return self.client.get('/financeiro/relatorios/dre/sintetico/', {
+            'data_inicio': '2024-01-01', 'data_fim': '2024-12-31', **filtros,
+        })
+
+    def test_relatorio_agrupa_pelas_raizes_da_arvore(self):
+        resposta = self.dre()
+
+        # '01.02.001' não tem o '01.02' cadastrado: sobe direto para o '01'.
+        # '02.01' não tem o '02': é raiz e aparece com o próprio nome, nunca um grupo sem plano
+        self.assertEqual(resposta.context['receitas'], {'01': {'nome': 'Receitas Operacionais', 'total': Decimal('150.00')}})
+        self.assertEqual(resposta.context['despesas'], {
+            '02.01': {'nome': 'Aluguel', 'total': Decimal('-30.00')},
+            'OUTROS': {'nome': 'Sem código', 'total': Decimal('-5.00')},
+        })
+        self.assertEqual(resposta.context['resultado'], Decimal('115.00'))
+
+    def test_relatorio_consolida_no_nivel_pedido(self):
+        resposta = self.dre(nivel='2')
+
+        self.assertEqual(resposta.context['receitas'], {
+            '01.01': {'nome': 'Mensalidades', 'total': Decimal('100.00')},
+            '01.02.001': {'nome': 'Eventos', 'total': Decimal('50.00')},
+        })
+        self.assertEqual(list(resposta.context['niveis']), [1, 2])
+
+        # Com o grupo intermediário cadastrado, o mesmo lançamento passa a somar nele
+        PlanoDeContas.objects.create(empresa=self.empresa, codigo='01.02', nome='Outras Receitas', tipo='R')
+        resposta = self.dre(nivel='2')
+        self.assertEqual(resposta.context['receitas']['01.02'], {'nome': 'Outras Receitas', 'total': Decimal('50.00')})
+        self.assertEqual(list(resposta.context['niveis']), [1, 2, 3])
+        self.assertEqual(self.dre(nivel='3').context['receitas']['01.02.001']['total'], Decimal('50.00'))
+
+
+class ArvorePlanoDeContasTests(TestCase):
+    """Pai e caminho materializado mantidos a partir do código"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.empresa = Empresa.objects.create(nome='Empresa Árvore', cnpj='33.333.333/0001-33')
+        cls.usuario = Usuario.objects.create_user('arvore', password='x', empresa=cls.empresa)
+
+    def criar(self, codigo, empresa=None):
+        return PlanoDeContas.objects.create(empresa=empresa or self.empresa, codigo=codigo, nome=f'Plano {codigo}', tipo='R')
+
+    def test_pai_e_caminho_seguem_o_codigo(self):
+        raiz = self.criar('01')
+        neto = self.criar('01.02.001')
+        self.assertEqual(neto.pai, raiz)
+        self.assertEqual(neto.caminho, f'{raiz.id}/{neto.id}/')
+
+        # Grupo intermediário criado depois passa a ser o pai
+        filho = self.criar('01.02')
+        neto.refresh_from_db()
+        self.assertEqual(neto.pai, filho)
+        self.assertEqual(neto.caminho, f'{raiz.id}/{filho.id}/{neto.id}/')
+        self.assertEqual(neto.ids_do_caminho(), [raiz.id, filho.id, neto.id])
+
+        # Excluir o intermediário religa ao avô
+        filho.delete()
+        neto.refresh_from_db()
+        self.assertEqual((neto.pai, neto.caminho), (raiz, f'{raiz.id}/{neto.id}/'))
+
+    def test_subarvore_em_uma_consulta(self):
+        raiz = self.criar('01')
+        codigos = ['01.01', '01.01.001', '01.02']
+        for codigo in codigos:
+            self.criar(codigo)
+        self.criar('02')
+        self.criar('02.01')
+
+        with self.assertNumQueries(1):
+            subarvore = sorted(PlanoDeContas.objects.subarvore(raiz).values_list('codigo', flat=True))
+        self.assertEqual(subarvore, ['01'] + codigos)
+
+    def test_filtro_de_categoria_inclui_subcategorias(self):
+        caixa = Caixa.objects.create(empresa=self.empresa, nome='Caixa')
+        grupo = self.criar('01')
+        for codigo, valor in [('01.01', 10), ('01.02.001', 20), ('02', 40)]:
+            Lancamento.objects.create(
+                empresa=self.empresa, caixa=caixa, plano_de_contas=self.criar(codigo), tipo='C',
+                valor=Decimal(valor), data_lancamento=date(2024, 2, 1), descricao=codigo,
+            )
+
+        self.client.force_login(self.usuario)
+        resposta = self.client.get('/financeiro/fluxo/', {
+            'caixa': '', 'categoria': grupo.id, 'data_inicio': '2024-02-01', 'data_fim': '2024-02-29',
+        })
+        self.assertEqual(resposta.context['total_periodo'], Decimal('30'))
+
+        resposta = self.client.get('/financeiro/fluxo/', {
+            'caixa': '', 'categoria': grupo.id, 'data_inicio': '2024-03-01', 'data_fim': '2024-03-31',
+        })
+        self.assertEqual(resposta.context['saldo_anterior'], Decimal('30'))
+
+    def test_consultas_do_dre_nao_crescem_com_a_profundidade(self):
+        consultas = []
+        for profundidade in range(1, 6):
+            empresa = Empresa.objects.create(nome=f'Profundidade {profundidade}', cnpj=f'44.444.444/000{profundidade}-44')
+            usuario = Usuario.objects.create_user(f'profundidade{profundidade}', password='x', empresa=empresa)
+            caixa = Caixa.objects.create(empresa=empresa, nome='Caixa')
+            # Três ramos com `profundidade` níveis, um lançamento por plano
+            codigos = ['01', '02', '03']
+            for _ in range(profundidade - 1):
+                codigos += [f'{codigo}.01' for codigo in codigos[-3:]]
+            for codigo in codigos:
+                plano = self.criar(codigo, empresa)
+                Lancamento.objects.create(
+                    empresa=empresa, caixa=caixa, plano_de_contas=plano, tipo='C',
+                    valor=Decimal(1), data_lancamento=date(2024, 5, 10), descricao=codigo,
+                )
+
+            self.client.force_login(usuario)
+            with CaptureQueriesContext(connection) as capturadas:
+                resposta = self.client.get('/financeiro/relatorios/dre/sintetico/', {
+                    'data_inicio': '2024-01-01', 'data_fim': '2024-12-31', 'nivel': profundidade,
+                })
+            self.assertEqual(resposta.context['total_receitas'], Decimal(len(codigos)))
+            consultas.append(len(capturadas))
+
+        self.assertEqual(len(set(consultas)), 1, consultas)
+
+
+class ParcelamentoTests(TestCase):
+    """Cronograma de parcelas em centavos exatos, gravado num único bulk_create"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.empresa = Empresa.objects.create(nome='Empresa Parcelas', cnpj='55.555.555/0001-55')
+        cls.usuario = Usuario.objects.create_user('parcelas', password='x', empresa=cls.empresa)
+        cls.plano = PlanoDeContas.objects.create(empresa=cls.empresa, codigo='01.01', nome='Mensalidades', tipo='R')
+
+    def test_simples_distribui_centavos_com_sobra_na_ultima(self):
+        self.assertEqual(calcular_parcelas(Decimal('100'), 3), [Decimal('33.33'), Decimal('33.33'), Decimal('33.34')])
+        parcelas = calcular_parcelas(Decimal('100'), 3, taxa=Decimal('10'))
+        self.assertEqual(parcelas, [Decimal('36.66'), Decimal('36.66'), Decimal('36.68')])
+        self.assertEqual(sum(parcelas), Decimal('110.00'))
+
+    def test_price_e_sac_quitam_o_saldo(self):
+        self.assertEqual(
+            calcular_parcelas(Decimal('1000'), 3, taxa=Decimal('1'), sistema=PRICE),
+            [Decimal('340.02'), Decimal('340.02'), Decimal('340.03')],
+        )
+        self.assertEqual(
+            calcular_parcelas(Decimal('1000'), 3, taxa=Decimal('1'), sistema=SAC),
+            [Decimal('343.33'), Decimal('340.00'), Decimal('336.67')],
+        )
+        # Sem juros os dois sistemas equivalem ao simples
+        self.assertEqual(calcular_parcelas(Decimal('10'), 3, sistema=PRICE), calcular_parcelas(Decimal('10'), 3))
+
+    def test_vencimentos_mensais_respeitam_fim_de_mes(self):
+        cronograma = gerar_cronograma(Decimal('90'), 3, date(2024, 1, 31))
+        self.assertEqual([vencimento for _, vencimento, _ in cronograma], [date(2024, 1, 31), date(2024, 2, 29), date(2024, 3, 31)])
+
+    def test_criar_parcelas_em_um_insert(self):
+        modelo = Conta(empresa=self.empresa, plano_de_contas=self.plano, descricao='Curso', valor=Decimal('1000'), data_vencimento=date(2024, 1, 10))
+        with self.assertNumQueries(3):  # savepoint, insert, release
+            grupo, parcelas = criar_parcelas(modelo, 12, taxa=Decimal('2'), sistema=PRICE)
+
+        gravadas = Conta.objects.filter(grupo_parcelas=grupo).order_by('data_vencimento')
+        self.assertEqual(gravadas.count(), 12)
+        self.assertEqual(gravadas[0].documento, f'{grupo.hex[:8].upper()}-1/12')
+        self.assertEqual(sum(parcela.valor for parcela in gravadas), sum(parcela.valor for parcela in parcelas))
+
+    def test_view_gera_parcelas_e_mostra_o_grupo(self):
+        self.client.force_login(self.usuario)
+        resposta = self.client.post('/financeiro/contas/receber/nova/', {
+            'descricao': 'Curso', 'plano_de_contas': self.plano.id, 'valor': '100.00', 'data_vencimento': '2024-01-10',
+            'gerar_parcelas': 'on', 'qtd_parcelas': 3, 'taxa_juros': '0', 'sistema_amortizacao': SIMPLES,
+        })
+        grupo = Conta.objects.get(documento__endswith='-1/3').grupo_parcelas
+        self.assertRedirects(resposta, f'/financeiro/contas/receber/?grupo={grupo}', fetch_redirect_response=False)
+
+        resposta = self.client.get(resposta.url)
+        self.assertEqual([conta.valor for conta in resposta.context['contas']], [Decimal('33.33'), Decimal('33.33'), Decimal('33.34')])
+
+
+class BaixaEmLoteTests(TestCase):
+    """Baixa de várias contas numa transação, com lançamentos em lote"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.empresa = Empresa.objects.create(nome='Empresa Baixa', cnpj='66.666.666/0001-66')
+        cls.usuario = Usuario.objects.create_user('baixa', password='x', empresa=cls.empresa)
+        cls.caixa = Caixa.objects.create(empresa=cls.empresa, nome='Banco')
+        cls.receita = PlanoDeContas.objects.create(empresa=cls.empresa, codigo='01', nome='Receitas', tipo='R')
+        cls.despesa = PlanoDeContas.objects.create(empresa=cls.empresa, codigo='02', nome='Despesas', tipo='D')
+
+    def criar_contas(self, quantidade, plano=None, status='PENDENTE'):
+        return Conta.objects.bulk_create([
+            Conta(
+                empresa=self.empresa, plano_de_contas=plano or self.receita, descricao=f'Conta {i}',
+                valor=Decimal('10.50'), data_vencimento=date(2024, 4, 1), status=status,
+            )
+            for i in range(quantidade)
+        ])
+
+    def test_baixa_cria_lancamentos_e_ignora_pagas(self):
+        receitas = self.criar_contas(3)
+        despesas = self.criar_contas(2, plano=self.despesa)
+        paga = self.criar_contas(1, status='PAGA')[0]
+        ids = [conta.id for conta in receitas + despesas + [paga]]
+
+        baixadas, ignoradas = baixar_contas(self.empresa, ids, self.caixa, date(2024, 4, 5))
+
+        self.assertEqual(sorted(baixadas), sorted(conta.id for conta in receitas + despesas))
+        self.assertEqual(ignoradas, [paga.id])
+        self.assertFalse(Conta.objects.filter(id__in=baixadas).exclude(status='PAGA').exists())
+        self.assertEqual(
+            sorted(Lancamento.objects.filter(conta_origem__in=baixadas).values_list('valor', flat=True)),
+            [Decimal('-10.50')] * 2 + [Decimal('10.50')] * 3,
+        )
+        self.assertEqual(SaldoDiario.objects.divergencias(self.empresa.id), [])
+        self.assertEqual(ResumoMensal.objects.divergencias(self.empresa.id), [])
+
+        # Segunda baixa das mesmas contas não gera nada
+        self.assertEqual(baixar_contas(self.empresa, ids, self.caixa, date(2024, 4, 6)), ([], sorted(ids)))
+
+    def test_consultas_nao_crescem_com_a_quantidade(self):
+        # A primeira baixa do dia cria as linhas dos consolidados; as seguintes só atualizam
+        baixar_contas(self.empresa, [conta.id for conta in self.criar_contas(1)], self.caixa, date(2024, 4, 5))
+        consultas = []
+        # (o SQLite limita as variáveis por INSERT; 60 linhas ainda cabem num só)
+        for quantidade in (5, 60):
+            ids = [conta.id for conta in self.criar_contas(quantidade)]
+            with CaptureQueriesContext(connection) as capturadas:
+                baixar_contas(self.empresa, ids, self.caixa, date(2024, 4, 5))
+            consultas.append(len(capturadas))
+        self.assertEqual(consultas[0], consultas[1])
+
+    def test_view_informa_ignoradas(self):
+        pendente, paga = self.criar_contas(1)[0], self.criar_contas(1, status='PAGA')[0]
+        outra_empresa = Empresa.objects.create(nome='Outra', cnpj='77.777.777/0001-77')
+        alheia = Conta.objects.create(
+            empresa=outra_empresa, descricao='Alheia', valor=1, data_vencimento=date(2024, 4, 1),
+            plano_de_contas=PlanoDeContas.objects.create(empresa=outra_empresa, codigo='01', nome='R', tipo='R'),
+        )
+
+        self.client.force_login(self.usuario)
+        resposta = self.client.post('/financeiro/contas/baixar-lote/', {
+            'contas': [pendente.id, paga.id, alheia.id], 'caixa': self.caixa.id,
+            'data_pagamento': '2024-04-05', 'tipo_lista': 'receber', 'voltar': '/financeiro/contas/receber/?status=PENDENTE',
+        }, follow=True)
+
+        self.assertRedirects(resposta, '/financeiro/contas/receber/?status=PENDENTE')
+        mensagens = [str(mensagem) for mensagem in resposta.context['messages']]
+        self.assertIn('1 conta(s) baixada(s) com sucesso!', mensagens)
+        self.assertIn(f'2 conta(s) ignorada(s) por já estarem baixadas ou canceladas: #{paga.id}, #{alheia.id}', mensagens)
+        alheia.refresh_from_db()
+        self.assertEqual(alheia.status, 'PENDENTE')
+
+
+class ExportacaoCsvTests(TestCase):
+    """Exportações em CSV respeitam os filtros da tela e são lidas em lotes"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.empresa = Empresa.objects.create(nome='Empresa Exportação', cnpj='88.888.888/0001-88')
+        cls.usuario = Usuario.objects.create_user('exportacao', password='x', empresa=cls.empresa)
+        cls.caixa = Caixa.objects.create(empresa=cls.empresa, nome='Banco', saldo_inicial=Decimal('100.00'))
+        cls.receita = PlanoDeContas.objects.create(empresa=cls.empresa, codigo='01', nome='Receitas', tipo='R')
+        cls.despesa = PlanoDeContas.objects.create(empresa=cls.empresa, codigo='02', nome='Despesas', tipo='D')
+
+        Lancamento.objects.create(
+            empresa=cls.empresa, caixa=cls.caixa, plano_de_contas=cls.receita, descricao='Antes do período',
+            data_lancamento=date(2024, 2, 28), valor=Decimal('50.00'), tipo='C',
+        )
+        # Vários lançamentos no mesmo dia: o cursor precisa desempatar pelo id
+        for dia, valor, plano, tipo in [(1, '10.00', cls.receita, 'C'), (1, '3.50', cls.despesa, 'D'),
+                                        (1, '7.25', cls.receita, 'C'), (15, '20.00', cls.despesa, 'D')]:
+            Lancamento.objects.create(
+                empresa=cls.empresa, caixa=cls.caixa, plano_de_contas=plano, descricao=f'Dia {dia} {valor}',
+                data_lancamento=date(2024, 3, dia), valor=Decimal(valor), tipo=tipo,
+            )
+
+    def setUp(self):
+        self.client.force_login(self.usuario)
+
+    def linhas_csv(self, resposta):
+        self.assertEqual(resposta['Content-Type'], 'text/csv; charset=utf-8')
+        conteudo = b''.join(resposta.streaming_content).decode('utf-8').lstrip('\ufeff')
+        return [linha.split(';') for linha in conteudo.splitlines()]
+
+    def test_fluxo_com_saldo_acumulado(self):
+        resposta = self.client.get('/financeiro/fluxo/exportar/', {
+            'data_inicio': '2024-03-01', 'data_fim': '2024-03-31', 'caixa': self.caixa.id,
+        })
+        linhas = self.linhas_csv(resposta)
+
+        self.assertEqual(linhas[1][1], 'SALDO ANTERIOR')
+        self.assertEqual(linhas[1][-1], '150,00')
+        self.assertEqual([linha[1] for linha in linhas[2:6]], ['Dia 1 10.00', 'Dia 1 3.50', 'Dia 1 7.25', 'Dia 15 20.00'])
+        self.assertEqual([linha[-1] for linha in linhas[2:6]], ['160,00', '156,50', '163,75', '143,75'])
+        self.assertEqual(linhas[2][0], '01/03/2024')
+        self.assertEqual(linhas[-3][-2], '17,25')
+        self.assertEqual(linhas[-2][-2], '-23,50')
+        self.assertEqual(linhas[-1][-1], '143,75')
+
+    def test_lotes_pequenos_nao_perdem_nem_repetem_linhas(self):
+        lancamentos = Lancamento.objects.filter(empresa=self.empresa)
+        esperado = list(lancamentos.order_by('data_lancamento', 'id').values_list('descricao', flat=True))
+        for tamanho in (1, 2, 3, 100):
+            with self.subTest(tamanho=tamanho):
+                lidos = [linha[0] for linha in iterar_por_chave(lancamentos, ['descricao'], 'data_lancamento', tamanho)]
+                self.assertEqual(lidos, esperado)
+
+    def test_contas_respeitam_filtros(self):
+        Conta.objects.bulk_create([
+            Conta(empresa=self.empresa, plano_de_contas=self.receita, descricao='Aberta', valor=Decimal('12.30'),
+                  data_vencimento=date(2024, 3, 10), status='PENDENTE'),
+            Conta(empresa=self.empresa, plano_de_contas=self.receita, descricao='Quitada', valor=Decimal('5.00'),
+                  data_vencimento=date(2024, 3, 5), status='PAGA'),
+            Conta(empresa=self.empresa, plano_de_contas=self.despesa, descricao='Despesa', valor=Decimal('9.00'),
+                  data_vencimento=date(2024, 3, 1), status='PENDENTE'),
+        ])
+        resposta = self.client.get('/financeiro/contas/exportar/', {'tipo_lista': 'receber', 'status': 'PENDENTE'})
+        linhas = self.linhas_csv(resposta)
+
+        self.assertEqual([linha[3] for linha in linhas[1:-1]], ['Aberta'])
+        self.assertEqual(linhas[1][5], '12,30')
+        self.assertEqual(linhas[-1][1:6], ['TOTAL (1 contas)', '', '', '', '12,30'])
+
+
+OFX_EXEMPLO = """OFXHEADER:100
+DATA:OFXSGML
+VERSION:102
+ENCODING:USASCII
+CHARSET:1252
+
+<OFX>
+<BANKMSGSRSV1><STMTTRNRS><STMTRS>
+<BANKTRANLIST>
+<DTSTART>20240301
+<DTEND>20240331
+<STMTTRN>
+<TRNTYPE>CREDIT
+<DTPOSTED>20240301120000[-3:BRT]
+<TRNAMT>1500.00
+<FITID>A1
+<MEMO>PIX RECEBIDO CLIENTE
+</STMTTRN>
+<STMTTRN>
+<TRNTYPE>DEBIT
+<DTPOSTED>20240305
+<TRNAMT>-35.90
+<FITID>A2
+<CHECKNUM>778
+<MEMO>TARIFA PACOTE SERVIÇOS
+</STMTTRN>
+</BANKTRANLIST>
+</STMTRS></STMTTRNRS></BANKMSGSRSV1>
+</OFX>
+"""
+
+
+class ImportacaoExtratoTests(TestCase):
+    """Extratos OFX/CSV entram no fluxo do caixa em lotes, sem duplicar reimportações"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.empresa = Empresa.objects.create(nome='Empresa Extrato', cnpj='12.121.212/0001-12')
+        cls.usuario = Usuario.objects.create_user('extrato', password='x', empresa=cls.empresa)
+        cls.caixa = Caixa.objects.create(empresa=cls.empresa, nome='Banco')
+        cls.outro_caixa = Caixa.objects.create(empresa=cls.empresa, nome='Outro Banco')
+
+    def arquivo(self, conteudo, nome='extrato.ofx'):
+        # OFX dos bancos costuma vir em Windows-1252 (CHARSET:1252); o CSV aqui em UTF-8
+        return SimpleUploadedFile(nome, conteudo.encode('cp1252' if nome.endswith('.ofx') else 'utf-8'))
+
+    def test_ofx_com_sinal_e_documento(self):
+        resultado = importar_extrato(self.caixa, ler_ofx(self.arquivo(OFX_EXEMPLO)))
+
+        self.assertEqual((resultado.importados, resultado.duplicados), (2, 0))
+        self.assertEqual((resultado.data_inicio, resultado.data_fim), (date(2024, 3, 1), date(2024, 3, 5)))
+        lancamentos = list(Lancamento.objects.filter(caixa=self.caixa).order_by('data_lancamento')
+                           .values_list('tipo', 'valor', 'descricao', 'documento'))
+        self.assertEqual(lancamentos, [
+            ('C', Decimal('1500.00'), 'PIX RECEBIDO CLIENTE', None),
+            ('D', Decimal('-35.90'), 'TARIFA PACOTE SERVIÇOS', '778'),
+        ])
+        self.assertEqual(SaldoDiario.objects.divergencias(self.empresa.id), [])
+        self.assertEqual(ResumoMensal.objects.divergencias(self.empresa.id), [])
+
+    def test_reimportacao_ignora_repetidos_so_no_mesmo_caixa(self):
+        importar_extrato(self.caixa, ler_ofx(self.arquivo(OFX_EXEMPLO)))
+        de_novo = importar_extrato(self.caixa, ler_ofx(self.arquivo(OFX_EXEMPLO)))
+        outro = importar_extrato(self.outro_caixa, ler_ofx(self.arquivo(OFX_EXEMPLO)))
+
+        self.assertEqual((de_novo.importados, de_novo.duplicados), (0, 2))
+        self.assertEqual(outro.importados, 2)
+        self.assertEqual(Lancamento.objects.filter(caixa=self.caixa).count(), 2)
+
+    def test_csv_com_layout_do_banco(self):
+        conteudo = (
+            "Extrato Conta Corrente\n"
+            "Data;Histórico;Documento;Valor (R$)\n"
+            "01/03/2024;Tarifa;;10,00 D\n"
+            "01/03/2024;Tarifa;;10,00 D\n"
+            "02/03/2024;\"Depósito; loja\";123;1.234,56\n"
+            ";Saldo do dia;;\n"
+            "03/03/2024;Estorno;;0,00\n"
+        )
+        layout = LayoutCSV(coluna_descricao='historico', coluna_valor='Valor (R$)', coluna_documento='3', linhas_ignoradas=1)
+
+        resultado = importar_extrato(self.caixa, ler_csv(self.arquivo(conteudo, 'extrato.csv'), layout), tamanho_lote=2)
+        # Mesmo arquivo em outra exportação: maiúsculas e espaços da descrição não importam
+        reexportado = conteudo.replace('Tarifa', 'TARIFA ').replace('Depósito; loja', 'DEPOSITO  LOJA')
+        de_novo = importar_extrato(self.caixa, ler_csv(self.arquivo(reexportado, 'extrato.csv'), layout))
+
+        # As duas tarifas iguais no mesmo dia são lançamentos diferentes
+        self.assertEqual((resultado.importados, resultado.ignorados), (3, 1))
+        self.assertEqual((de_novo.importados, de_novo.duplicados), (0, 3))
+        self.assertEqual(
+            sorted(Lancamento.objects.filter(caixa=self.caixa).values_list('valor', flat=True)),
+            [Decimal('-10.00'), Decimal('-10.00'), Decimal('1234.56')],
+        )
+        self.assertEqual(SaldoDiario.objects.divergencias(self.empresa.id), [])
+
+    def test_erro_no_meio_nao_importa_nada(self):
+        conteudo = "Data;Descrição;Valor\n01/03/2024;Ok;5,00\n31/02/2024;Data ruim;5,00\n"
+        with self.assertRaisesMessage(ErroImportacao, "Linha 3: data inválida '31/02/2024'"):
+            importar_extrato(self.caixa, ler_csv(self.arquivo(conteudo, 'extrato.csv'), LayoutCSV()), tamanho_lote=1)
+        self.assertFalse(Lancamento.objects.filter(caixa=self.caixa).exists())
+
+    def test_consultas_por_lote_nao_crescem_com_o_tamanho(self):
+        def extrato(dia, quantidade):
+            linhas = ''.join(f"{dia:02d}/03/2024;Item {i};{i + 1},00\n" for i in range(quantidade))
+            return self.arquivo("Data;Descrição;Valor\n" + linhas, 'extrato.csv')
+
+        importar_extrato(self.caixa, ler_csv(extrato(1, 1), LayoutCSV()))
+        consultas = []
+        # (o SQLite limita as variáveis por INSERT; 60 linhas ainda cabem num só)
+        for dia, quantidade in ((2, 5), (3, 60)):
+            with CaptureQueriesContext(connection) as capturadas:
+                importar_extrato(self.caixa, ler_csv(extrato(dia, quantidade), LayoutCSV()))
+            consultas.append(len(capturadas))
+        self.assertEqual(consultas[0], consultas[1])
+
+    def test_view_importa_e_abre_o_fluxo_do_periodo(self):
+        self.client.force_login(self.usuario)
+        resposta = self.client.post('/financeiro/fluxo/importar/', {
+            'caixa': self.caixa.id, 'formato': 'OFX', 'arquivo': self.arquivo(OFX_EXEMPLO),
+            'delimitador': ';', 'formato_data': '%d/%m/%Y', 'separador_decimal': ',', 'codificacao': 'utf-8-sig',
+        })
+
+        self.assertRedirects(
+            resposta, f'/financeiro/fluxo/?caixa={self.caixa.id}&data_inicio=2024-03-01&data_fim=2024-03-05',
+            fetch_redirect_response=False,
+        )
+        self.assertEqual(Lancamento.objects.filter(caixa=self.caixa).count(), 2)
+
+
+class ConciliacaoTests(TestCase):
+    """Lançamentos sem conta casados com contas pendentes: documento, depois valor + data e nome"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.empresa = Empresa.objects.create(nome='Empresa Conciliação', cnpj='34.343.434/0001-34')
+        cls.usuario = Usuario.objects.create_user('conciliacao', password='x', empresa=cls.empresa)
+        cls.caixa = Caixa.objects.create(empresa=cls.empresa, nome='Banco')
+        cls.receita = PlanoDeContas.objects.create(empresa=cls.empresa, codigo='01', nome='Mensalidades', tipo='R')
+        cls.despesa = PlanoDeContas.objects.create(empresa=cls.empresa, codigo='02', nome='Fornecedores', tipo='D')
+        cls.joao = Cadastro.objects.create(empresa=cls.empresa, nome='João Pereira', cpf_cnpj='1')
+        cls.maria = Cadastro.objects.create(empresa=cls.empresa, nome='Maria Souza', cpf_cnpj='2')
+
+    def conta(self, valor, vencimento, plano=None, documento=None, cadastro=None):
+        return Conta.objects.create(
+            empresa=self.empresa, plano_de_contas=plano or self.receita, descricao=f'Conta {valor}',
+            valor=Decimal(valor), data_vencimento=vencimento, documento=documento, cadastro=cadastro,
+        )
+
+    def lancamento(self, valor, data, tipo='C', documento=None, descricao='Extrato'):
+        return Lancamento.objects.create(
+            empresa=self.empresa, caixa=self.caixa, data_lancamento=data, descricao=descricao,
+            valor=Decimal(valor), tipo=tipo, documento=documento,
+        )
+
+    def pares(self, sugestoes):
+        return {(s.lancamento['id'], s.conta['id'], s.criterio) for s in sugestoes}
+
+    def test_contas_fora_da_janela_nao_sao_lidas(self):
+        antiga = self.conta('100.00', date(2023, 1, 10))
+        antiga_com_documento = self.conta('100.00', date(2023, 6, 1), documento='NF-9')
+        na_janela = self.conta('100.00', date(2024, 3, 6))
+        lancamentos = [
+            self.lancamento('100.00', date(2024, 3, 10), documento='NF-9'),
+            self.lancamento('100.00', date(2024, 3, 11)),
+            self.lancamento('100.00', date(2024, 3, 12)),
+        ]
+
+        with CaptureQueriesContext(connection) as capturadas:
+            sugestoes = sugerir(self.empresa, Lancamento.objects.filter(id__in=[l.id for l in lancamentos]))
+
+        self.assertEqual({s.conta['id'] for s in sugestoes}, {na_janela.id})
+        # A consulta das contas tem limite inferior: o histórico antigo nem sai do banco
+        sql_contas = next(consulta['sql'] for consulta in capturadas.captured_queries if 'financeiro_conta' in consulta['sql'])
+        self.assertIn('"data_vencimento" >=', sql_contas)
+        self.assertFalse({antiga.id, antiga_com_documento.id} & {s.conta['id'] for s in sugestoes})
+
+    def test_documento_antes_de_valor_e_data(self):
+        por_data = self.conta('100.00', date(2024, 3, 10))
+        por_documento = self.conta('100.00', date(2024, 2, 1), documento='NF-123')
+        com_documento = self.lancamento('100.00', date(2024, 3, 10), documento='nf 123')
+        sem_documento = self.lancamento('100.00', date(2024, 3, 12))
+
+        sugestoes = sugerir(self.empresa, Lancamento.objects.all())
+
+        self.assertEqual(self.pares(sugestoes), {
+            (com_documento.id, por_documento.id, POR_DOCUMENTO),
+            (sem_documento.id, por_data.id, POR_VALOR_DATA),
+        })
+
+    def test_janela_tipo_e_nome_desempatam(self):
+        fora_da_janela = self.conta('50.00', date(2024, 3, 1))
+        despesa = self.conta('50.00', date(2024, 3, 20), plano=self.despesa)
+        de_joao = self.conta('50.00', date(2024, 3, 19), cadastro=self.joao)
+        de_maria = self.conta('50.00', date(2024, 3, 21), cadastro=self.maria)
+        pix = self.lancamento('50.00', date(2024, 3, 20), descricao='PIX RECEBIDO MARIA SOUZA')
+
+        (sugestao,) = sugerir(self.empresa, Lancamento.objects.all(), janela=5)
+
+        self.assertEqual((sugestao.lancamento['id'], sugestao.conta['id'], sugestao.dias), (pix.id, de_maria.id, -1))
+        self.assertEqual(sugestao.similaridade, 1)
+        self.assertFalse(sugestao.empate)
+        self.assertNotIn(sugestao.conta['id'], (fora_da_janela.id, despesa.id, de_joao.id))
+
+    def test_empate_fica_marcado(self):
+        self.conta('30.00', date(2024, 3, 9))
+        self.conta('30.00', date(2024, 3, 11))
+        self.lancamento('30.00', date(2024, 3, 10))
+        (sugestao,) = sugerir(self.empresa, Lancamento.objects.all())
+        self.assertTrue(sugestao.empate)
+
+    def test_conciliar_vincula_paga_e_mantem_consolidados(self):
+        conta = self.conta('80.00', date(2024, 3, 5))
+        lancamento = self.lancamento('80.00', date(2024, 3, 6))
+        outra = self.conta('80.00', date(2024, 3, 5))
+        ja_paga = self.conta('80.00', date(2024, 3, 5))
+        Conta.objects.filter(id=ja_paga.id).update(status='PAGA')
+        segundo = self.lancamento('80.00', date(2024, 3, 6))
+
+        self.assertEqual(conciliar(self.empresa, [(lancamento.id, conta.id), (segundo.id, ja_paga.id)]), 1)
+
+        lancamento.refresh_from_db()
+        conta.refresh_from_db()
+        self.assertEqual((lancamento.conta_origem_id, lancamento.plano_de_contas_id, conta.status), (conta.id, self.receita.id, 'PAGA'))
+        self.assertEqual(Conta.objects.get(id=outra.id).status, 'PENDENTE')
+        self.assertEqual(SaldoDiario.objects.divergencias(self.empresa.id), [])
+        self.assertEqual(ResumoMensal.objects.divergencias(self.empresa.id), [])
+
+    def test_consultas_nao_crescem_com_a_quantidade(self):
+        consultas = []
+        for inicio, quantidade in ((1, 5), (100, 200)):
+            for i in range(inicio, inicio + quantidade):
+                self.conta(f'{i}.00', date(2024, 3, 1) + timedelta(days=i % 20))
+            Lancamento.objects.criar_em_lote([
+                Lancamento(empresa=self.empresa, caixa=self.caixa, data_lancamento=date(2024, 3, 2) + timedelta(days=i % 20),
+                           descricao='Extrato', valor=Decimal(i), tipo='C')
+                for i in range(inicio, inicio + quantidade)
+            ])
+            with CaptureQueriesContext(connection) as capturadas:
+                sugestoes = sugerir(self.empresa, Lancamento.objects.filter(conta_origem__isnull=True))
+            consultas.append(len(capturadas))
+            self.assertEqual(len(sugestoes), quantidade)
+            conciliar(self.empresa, [(s.lancamento['id'], s.conta['id']) for s in sugestoes])
+        self.assertEqual(consultas[0], consultas[1])
+        self.assertFalse(Conta.objects.filter(empresa=self.empresa, status='PENDENTE').exists())
+
+    def test_view_confirma_marcadas(self):
+        conta = self.conta('45.00', date(2024, 3, 5))
+        lancamento = self.lancamento('45.00', date(2024, 3, 5))
+        self.client.force_login(self.usuario)
+        filtros = {'caixa': self.caixa.id, 'data_inicio': '2024-03-01', 'data_fim': '2024-03-31'}
+
+        resposta = self.client.get('/financeiro/fluxo/conciliacao/', filtros)
+        self.assertContains(resposta, f'value="{lancamento.id}:{conta.id}"')
+
+        resposta = self.client.post(f'/financeiro/fluxo/conciliacao/?caixa={self.caixa.id}', {'pares': [f'{lancamento.id}:{conta.id}', 'x:1']})
+        self.assertRedirects(resposta, f'/financeiro/fluxo/conciliacao/?caixa={self.caixa.id}', fetch_redirect_response=False)
+        self.assertEqual(Conta.objects.get(id=conta.id).status, 'PAGA')
+
+
+class MensalidadesTests(TestCase):
+    """Geração em lote das mensalidades: uma por cliente ativo e competência, valor pela categoria"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.empresa = Empresa.objects.create(nome='Empresa Mensalidades', cnpj='45.454.545/0001-45')
+        cls.usuario = Usuario.objects.create_user('mensalidades', password='x', empresa=cls.empresa)
+        cls.plano = PlanoDeContas.objects.create(empresa=cls.empresa, codigo='01', nome='Mensalidades', tipo='R')
+        ParametroSistema.objects.create(empresa=cls.empresa, chave='PLANO_CONTAS_MENSALIDADE_ID', valor=str(cls.plano.id))
+        cls.ouro = CategoriaCliente.objects.create(empresa=cls.empresa, nome='Sócio Ouro')
+        cls.prata = CategoriaCliente.objects.create(empresa=cls.empresa, nome='Sócio Prata')
+
+    def setUp(self):
+        parametros.invalidar(self.empresa.id)
+
+    def cliente(self, nome, categoria=None, papel='CLI', situacao='ATIVO'):
+        return Cadastro.objects.create(
+            empresa=self.empresa, nome=nome, cpf_cnpj=nome, categoria=categoria, papel=papel, situacao=situacao,
+        )
+
+    def test_valor_por_categoria_e_idempotente(self):
+        ouro = self.cliente('Ana', self.ouro)
+        ambos = self.cliente('Bia', papel='AMB')
+        self.cliente('Fornecedor', papel='FOR')
+        self.cliente('Inativo', self.ouro, situacao='INATIVO')
+
+        resultado = gerar_mensalidades(self.empresa, date(2024, 2, 15), 31, '80', {self.ouro.id: '150'})
+
+        self.assertEqual((resultado.criadas, resultado.existentes, resultado.total), (2, 0, Decimal('230.00')))
+        contas = {conta.cadastro_id: conta for conta in Conta.objects.filter(empresa=self.empresa)}
+        self.assertEqual(set(contas), {ouro.id, ambos.id})
+        self.assertEqual(contas[ouro.id].valor, Decimal('150.00'))
+        self.assertEqual(contas[ambos.id].valor, Decimal('80.00'))
+        self.assertEqual(contas[ouro.id].data_vencimento, date(2024, 2, 29))
+        self.assertEqual(contas[ouro.id].competencia, date(2024, 2, 1))
+        self.assertEqual(contas[ouro.id].plano_de_contas, self.plano)
+
+        # Rodar de novo só cria a do cliente novo
+        novo = self.cliente('Carla', self.prata)
+        resultado = gerar_mensalidades(self.empresa, date(2024, 2, 1), 31, '80', {self.ouro.id: '150'})
+        self.assertEqual((resultado.criadas, resultado.existentes, resultado.total), (1, 2, Decimal('80.00')))
+        self.assertEqual(Conta.objects.filter(empresa=self.empresa, cadastro=novo).count(), 1)
+
+    def test_rodar_de_novo_a_mesma_competencia_nao_cria_nada(self):
+        self.cliente('Ana', self.ouro)
+        self.cliente('Bia')
+        gerar_mensalidades(self.empresa, date(2024, 5, 1), 10, '80', {self.ouro.id: '150'})
+
+        resultado = gerar_mensalidades(self.empresa, date(2024, 5, 20), 10, '80', {self.ouro.id: '150'})
+
+        self.assertEqual((resultado.criadas, resultado.existentes, resultado.total), (0, 2, Decimal('0')))
+        self.assertEqual(Conta.objects.filter(empresa=self.empresa).count(), 2)
+
+    def test_tela_informa_as_existentes(self):
+        self.cliente('Ana', self.ouro)
+        self.client.force_login(self.usuario)
+        dados = {'competencia': '2024-04', 'dia_vencimento': '5', 'valor_padrao': '80'}
+        self.client.post(reverse('financeiro:gerar_mensalidades'), dados)
+
+        resposta = self.client.post(reverse('financeiro:gerar_mensalidades'), dados, follow=True)
+
+        mensagens = [str(mensagem) for mensagem in resposta.context['messages']]
+        self.assertIn('0 mensalidade(s) de 04/2024 gerada(s), total R$ 0.00.', mensagens)
+        self.assertIn('1 cliente(s) já tinham a mensalidade desta competência.', mensagens)
+
+    def test_filtro_de_categoria_e_sem_valor(self):
+        self.cliente('Ana', self.ouro)
+        self.cliente('Bia', self.prata)
+        self.cliente('Sem Categoria')
+
+        resultado = gerar_mensalidades(self.empresa, date(2024, 3, 1), 10, None, {self.ouro.id: '150'}, [self.ouro.id, self.prata.id])
+
+        self.assertEqual((resultado.criadas, resultado.sem_valor), (1, 1))
+        self.assertEqual(Conta.objects.get(empresa=self.empresa).cadastro.nome, 'Ana')
+
+    def test_exige_plano_configurado(self):
+        ParametroSistema.objects.filter(empresa=self.empresa).update(valor='0')
+        parametros.invalidar(self.empresa.id)
+        with self.assertRaises(ValueError):
+            gerar_mensalidades(self.empresa, date(2024, 3, 1), 10, '80')
+
+    def test_consultas_nao_crescem_com_os_clientes(self):
+        def consultas(competencia):
+            parametros.invalidar(self.empresa.id)
+            with CaptureQueriesContext(connection) as contexto:
+                gerar_mensalidades(self.empresa, competencia, 10, '80')
+            return len(contexto)
+
+        self.cliente('Primeiro')
+        poucos = consultas(date(2024, 1, 1))
+        for numero in range(25):
+            self.cliente(f'Cliente {numero}')
+        self.assertEqual(consultas(date(2024, 2, 1)), poucos)
+
+    def test_tela_gera_e_leva_para_a_lista(self):
+        self.cliente('Ana', self.ouro)
+        self.client.force_login(self.usuario)
+
+        resposta = self.client.post(reverse('financeiro:gerar_mensalidades'), {
+            'competencia': '2024-04', 'dia_vencimento': '5', 'valor_padrao': '',
+            f'valor_categoria_{self.ouro.id}': '99.90', 'categorias': [self.ouro.id],
+        })
+
+        self.assertRedirects(resposta, f"{reverse('financeiro:lista_receber')}?data_ini=2024-04-05&data_fim=2024-04-05", fetch_redirect_response=False)
+        self.assertEqual(Conta.objects.get(empresa=self.empresa).valor, Decimal('99.90'))
+
+
+class JurosAtrasoTests(TestCase):
+    """Juros de atraso calculados pelo banco (lista/relatório) e lançados em separado na baixa"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.empresa = Empresa.objects.create(nome='Empresa Juros', cnpj='56.565.656/0001-56')
+        cls.usuario = Usuario.objects.create_user('juros', password='x', empresa=cls.empresa)
+        cls.caixa = Caixa.objects.create(empresa=cls.empresa, nome='Banco')
+        cls.receita = PlanoDeContas.objects.create(empresa=cls.empresa, codigo='01', nome='Mensalidades', tipo='R')
+        cls.despesa = PlanoDeContas.objects.create(empresa=cls.empresa, codigo='02', nome='Fornecedores', tipo='D')
+        cls.plano_juros = PlanoDeContas.objects.create(empresa=cls.empresa, codigo='03', nome='Juros Recebidos', tipo='R')
+        ParametroSistema.objects.create(empresa=cls.empresa, chave='TAXA_JUROS_MENSAL', valor='2,5')
+        ParametroSistema.objects.create(empresa=cls.empresa, chave='PLANO_CONTAS_JUROS_ID', valor=str(cls.plano_juros.id))
+
+    def setUp(self):
+        parametros.invalidar(self.empresa.id)
+
+    def conta(self, valor, vencimento, plano=None, status='PENDENTE'):
+        return Conta.objects.create(
+            empresa=self.empresa, plano_de_contas=plano or self.receita, descricao='Mensalidade',
+            valor=Decimal(valor), data_vencimento=vencimento, status=status,
+        )
+
+    def test_anotacao_pro_rata(self):
+        atrasada = self.conta('300.00', date(2024, 3, 1))
+        centavos = self.conta('10.00', date(2024, 3, 1))
+        a_vencer = self.conta('300.00', date(2024, 3, 20))
+        paga = self.conta('300.00', date(2024, 3, 1), status='PAGA')
+
+        contas = {conta.id: conta for conta in com_juros(Conta.objects.filter(empresa=self.empresa), self.empresa.id, date(2024, 3, 13))}
+
+        # 300 x 2,5% x 12/30 = 3,00; 10 x 2,5% x 12/30 = 0,10
+        self.assertEqual((contas[atrasada.id].dias_atraso, contas[atrasada.id].juros), (12, Decimal('3.00')))
+        self.assertEqual(contas[atrasada.id].valor_atualizado, Decimal('303.00'))
+        self.assertEqual(contas[centavos.id].juros, Decimal('0.10'))
+        for conta_id in (a_vencer.id, paga.id):
+            self.assertEqual((contas[conta_id].dias_atraso, contas[conta_id].juros), (0, 0))
+
+    def test_baixa_lanca_juros_em_separado(self):
+        atrasada = self.conta('300.00', date(2024, 3, 1))
+        em_dia = self.conta('100.00', date(2024, 3, 20))
+        despesa = self.conta('50.00', date(2024, 3, 1), plano=self.despesa)
+
+        baixar_contas(self.empresa, [atrasada.id, em_dia.id, despesa.id], self.caixa, date(2024, 3, 13))
+
+        juros = Lancamento.objects.get(empresa=self.empresa, plano_de_contas=self.plano_juros)
+        self.assertEqual((juros.valor, juros.tipo, juros.conta_origem_id), (Decimal('3.00'), 'C', None))
+        self.assertEqual(juros.conta_juros_id, atrasada.id)
+        self.assertEqual(Lancamento.objects.get(conta_origem=atrasada).valor, Decimal('300.00'))
+        self.assertEqual(Lancamento.objects.filter(empresa=self.empresa).count(), 4)
+        self.assertEqual(ResumoMensal.objects.divergencias(self.empresa.id), [])
+
+    def test_baixa_sem_plano_de_juros_lanca_so_o_valor(self):
+        ParametroSistema.objects.filter(empresa=self.empresa, chave='PLANO_CONTAS_JUROS_ID').update(valor='0')
+        parametros.invalidar(self.empresa.id)
+        atrasada = self.conta('300.00', date(2024, 3, 1))
+
+        baixar_contas(self.empresa, [atrasada.id], self.caixa, date(2024, 3, 13))
+
+        self.assertEqual(list(Lancamento.objects.filter(empresa=self.empresa).values_list('valor', flat=True)), [Decimal('300.00')])
+
+    def test_estorno_da_baixa_remove_os_juros(self):
+        atrasada = self.conta('300.00', date(2024, 3, 1))
+        baixar_contas(self.empresa, [atrasada.id], self.caixa, date(2024, 3, 13))
+        principal = Lancamento.objects.get(conta_origem=atrasada)
+
+        self.client.force_login(self.usuario)
+        self.client.get(reverse('financeiro:excluir_lancamento', args=[principal.id]))
+
+        atrasada.refresh_from_db()
+        self.assertEqual(atrasada.status, 'PENDENTE')
+        self.assertFalse(Lancamento.objects.filter(empresa=self.empresa).exists())
+
+        # Baixar de novo lança os juros uma vez só
+        baixar_contas(self.empresa, [atrasada.id], self.caixa, date(2024, 3, 13))
+        self.assertEqual(
+            sorted(Lancamento.objects.filter(empresa=self.empresa).values_list('valor', flat=True)),
+            [Decimal('3.00'), Decimal('300.00')],
+        )
+        self.assertEqual(SaldoDiario.objects.divergencias(self.empresa.id), [])
+        self.assertEqual(ResumoMensal.objects.divergencias(self.empresa.id), [])
+
+    def test_plano_de_juros_invalido_impede_a_baixa(self):
+        outra = Empresa.objects.create(nome='Outra', cnpj='57.575.757/0001-57')
+        plano_alheio = PlanoDeContas.objects.create(empresa=outra, codigo='01', nome='Juros', tipo='R')
+        atrasada = self.conta('300.00', date(2024, 3, 1))
+
+        for plano_id in (plano_alheio.id, self.despesa.id, 999999):
+            ParametroSistema.objects.filter(empresa=self.empresa, chave='PLANO_CONTAS_JUROS_ID').update(valor=str(plano_id))
+            parametros.invalidar(self.empresa.id)
+            with self.assertRaises(ValueError):
+                baixar_contas(self.empresa, [atrasada.id], self.caixa, date(2024, 3, 13))
+
+        # Na tela vira mensagem de erro, não 500, e a conta continua pendente
+        self.client.force_login(self.usuario)
+        resposta = self.client.post(
+            reverse('financeiro:baixar_conta', args=[atrasada.id]),
+            {'caixa': self.caixa.id, 'data_pagamento': '2024-03-13'}, follow=True,
+        )
+        self.assertContains(resposta, 'PLANO_CONTAS_JUROS_ID')
+        atrasada.refresh_from_db()
+        self.assertEqual(atrasada.status, 'PENDENTE')
+        self.assertFalse(Lancamento.objects.filter(empresa=self.empresa).exists())
+
+    def test_lista_mostra_valor_atualizado(self):
+        self.conta('300.00', date.today() - timedelta(days=12))
+        self.client.force_login(self.usuario)
+
+        resposta = self.client.get(reverse('financeiro:lista_receber'))
+
+        self.assertEqual(resposta.context['total_valor'], Decimal('300.00'))
+        self.assertEqual(resposta.context['total_atualizado'], Decimal('303.00'))
+        self.assertContains(resposta, 'R$ 303,00')
+
+
+class ProjecaoFluxoTests(TestCase):
+    """Saldo projetado dia a dia: saldo dos caixas + contas pendentes pelo vencimento"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.empresa = Empresa.objects.create(nome='Empresa Projeção', cnpj='67.676.767/0001-67')
+        cls.usuario = Usuario.objects.create_user('projecao', password='x', empresa=cls.empresa)
+        cls.receita = PlanoDeContas.objects.create(empresa=cls.empresa, codigo='01', nome='Receitas', tipo='R')
+        cls.despesa = PlanoDeContas.objects.create(empresa=cls.empresa, codigo='02', nome='Despesas', tipo='D')
+        cls.hoje = date(2024, 5, 10)
+        banco = Caixa.objects.create(empresa=cls.empresa, nome='Banco', saldo_inicial=Decimal('100.00'))
+        Caixa.objects.create(empresa=cls.empresa, nome='Cofre', saldo_inicial=Decimal('50.00'))
+        for data, valor, tipo in [(date(2024, 5, 1), '200.00', 'C'), (date(2024, 5, 12), '30.00', 'C')]:
+            Lancamento.objects.create(
+                empresa=cls.empresa, caixa=banco, data_lancamento=data, descricao='Lançamento',
+                valor=Decimal(valor), tipo=tipo,
+            )
+
+    def conta(self, valor, vencimento, plano, status='PENDENTE'):
+        return Conta.objects.create(
+            empresa=self.empresa, plano_de_contas=plano, descricao='Conta',
+            valor=Decimal(valor), data_vencimento=vencimento, status=status,
+        )
+
+    def test_saldo_acumulado_e_primeiro_negativo(self):
+        self.conta('40.00', date(2024, 5, 2), self.receita)  # vencida: entra hoje
+        self.conta('500.00', date(2024, 5, 15), self.despesa)
+        self.conta('100.00', date(2024, 5, 20), self.receita)
+        self.conta('999.00', date(2024, 5, 15), self.despesa, status='PAGA')
+        self.conta('999.00', date(2024, 7, 1), self.despesa)  # fora do horizonte
+
+        projecao = projetar(self.empresa, 30, hoje=self.hoje)
+
+        self.assertEqual(projecao.saldo_atual, Decimal('350.00'))
+        self.assertEqual(projecao.caixas, [('Banco', Decimal('300.00')), ('Cofre', Decimal('50.00'))])
+        self.assertEqual(len(projecao.dias), 31)
+        saldos = {dia.data: dia.saldo for dia in projecao.dias}
+        self.assertEqual(saldos[date(2024, 5, 10)], Decimal('390.00'))
+        self.assertEqual(saldos[date(2024, 5, 12)], Decimal('420.00'))  # lançamento já gravado para o dia 12
+        self.assertEqual(saldos[date(2024, 5, 15)], Decimal('-80.00'))
+        self.assertEqual(saldos[date(2024, 6, 9)], Decimal('20.00'))
+        self.assertEqual(projecao.primeiro_negativo.data, date(2024, 5, 15))
+        self.assertEqual((projecao.total_entradas, projecao.total_saidas), (Decimal('140.00'), Decimal('500.00')))
+
+    def test_simulacao_sem_atrasadas(self):
+        self.conta('40.00', date(2024, 5, 2), self.receita)
+        self.conta('10.00', date(2024, 5, 2), self.despesa)
+
+        sem_receber = projetar(self.empresa, 5, receber_atrasadas=False, hoje=self.hoje)
+        sem_pagar = projetar(self.empresa, 5, pagar_atrasadas=False, hoje=self.hoje)
+
+        self.assertEqual(sem_receber.dias[0].saldo, Decimal('340.00'))
+        self.assertEqual(sem_pagar.dias[0].saldo, Decimal('390.00'))
+
+    def test_consultas_nao_crescem_com_as_contas(self):
+        def consultas():
+            with CaptureQueriesContext(connection) as contexto:
+                projetar(self.empresa, 60, hoje=self.hoje)
+            return len(contexto)
+
+        poucas = consultas()
+        for dia in range(1, 30):
+            self.conta('10.00', self.hoje + timedelta(days=dia), self.receita if dia % 2 else self.despesa)
+        self.assertEqual(consultas(), poucas)
+
+
+class AgingTests(TestCase):
+    """Contas em aberto por faixa de atraso, numa consulta agrupada"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.empresa = Empresa.objects.create(nome='Empresa Aging', cnpj='78.787.878/0001-78')
+        cls.usuario = Usuario.objects.create_user('aging', password='x', empresa=cls.empresa)
+        cls.receita = PlanoDeContas.objects.create(empresa=cls.empresa, codigo='01', nome='Mensalidades', tipo='R')
+        cls.despesa = PlanoDeContas.objects.create(empresa=cls.empresa, codigo='02', nome='Fornecedores', tipo='D')
+        cls.ana = Cadastro.objects.create(empresa=cls.empresa, nome='Ana', cpf_cnpj='1')
+        cls.bia = Cadastro.objects.create(empresa=cls.empresa, nome='Bia', cpf_cnpj='2')
+        cls.base = date(2024, 6, 30)
+        contas = [
+            (cls.ana, '10.00', 0, 'PENDENTE'),    # vence hoje: a vencer
+            (cls.ana, '20.00', 1, 'PENDENTE'),    # 1 dia
+            (cls.ana, '30.00', 30, 'PENDENTE'),   # 30 dias
+            (cls.ana, '40.00', 31, 'PENDENTE'),   # 31 dias
+            (cls.bia, '50.00', 90, 'PENDENTE'),   # 90 dias
+            (cls.bia, '60.00', 91, 'PENDENTE'),   # 91 dias
+            (cls.bia, '999.00', 91, 'PAGA'),
+        ]
+        for cadastro, valor, atraso, status in contas:
+            Conta.objects.create(
+                empresa=cls.empresa, plano_de_contas=cls.receita, cadastro=cadastro, descricao='Conta',
+                valor=Decimal(valor), data_vencimento=cls.base - timedelta(days=atraso), status=status,
+            )
+        Conta.objects.create(
+            empresa=cls.empresa, plano_de_contas=cls.despesa, descricao='Fornecedor',
+            valor=Decimal('70.00'), data_vencimento=cls.base - timedelta(days=5),
+        )
+
+    def test_faixas_por_cadastro(self):
+        linhas = {linha['cadastro__nome']: linha for linha in aging(self.empresa, 'R', 'cadastro', self.base)}
+
+        faixas = ['a_vencer', 'ate_30', 'ate_60', 'ate_90', 'acima_90']
+        self.assertEqual([linhas['Ana'][faixa] for faixa in faixas], [10, 50, 40, 0, 0])
+        self.assertEqual([linhas['Bia'][faixa] for faixa in faixas], [0, 0, 0, 50, 60])
+        self.assertEqual((linhas['Bia']['vencido'], linhas['Bia']['quantidade']), (110, 2))
+        # Maior valor vencido primeiro
+        self.assertEqual([linha['cadastro__nome'] for linha in aging(self.empresa, 'R', 'cadastro', self.base)], ['Bia', 'Ana'])
+
+        totais = totais_aging(self.empresa, 'R', self.base)
+        self.assertEqual((totais['total'], totais['vencido'], totais['quantidade']), (210, 200, 6))
+
+    def test_por_categoria_e_contas_a_pagar(self):
+        linha, = aging(self.empresa, 'D', 'plano', self.base)
+
+        self.assertEqual((linha['plano_de_contas__nome'], linha['ate_30'], linha['total']), ('Fornecedores', 70, 70))
+
+    def test_csv_em_streaming(self):
+        self.client.force_login(self.usuario)
+
+        resposta = self.client.get(reverse('financeiro:exportar_aging'), {'tipo': 'R', 'data_base': '2024-06-30'})
+
+        self.assertTrue(resposta.streaming)
+        linhas = b''.join(resposta.streaming_content).decode('utf-8-sig').splitlines()
+        self.assertEqual(linhas[1:], [
+            'Bia;2;0,00;0,00;0,00;50,00;60,00;110,00;110,00',
+            'Ana;4;10,00;50,00;40,00;0,00;0,00;90,00;100,00',
+            'TOTAL;6;10,00;50,00;40,00;50,00;60,00;200,00;210,00',
+        ])
+
+
+class SaldoDiarioTests(TestCase):
+    """Movimento diário e pontos de controle mensais mantidos a cada gravação de lançamento"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.empresa = Empresa.objects.create(nome='Empresa Saldos', cnpj='34.343.434/0001-34')
+        cls.banco = Caixa.objects.create(empresa=cls.empresa, nome='Banco', saldo_inicial=Decimal('1000.00'))
+        cls.cofre = Caixa.objects.create(empresa=cls.empresa, nome='Cofre', saldo_inicial=Decimal('50.00'))
+        cls.receita = PlanoDeContas.objects.create(empresa=cls.empresa, codigo='01', nome='Receitas', tipo='R')
+        cls.despesa = PlanoDeContas.objects.create(empresa=cls.empresa, codigo='02', nome='Despesas', tipo='D')
+
+    def lancar(self, data, valor, tipo='C', caixa=None):
+        return Lancamento.objects.create(
+            empresa=self.empresa, caixa=caixa or self.banco, plano_de_contas=self.receita if tipo == 'C' else self.despesa,
+            descricao='Teste', data_lancamento=data, valor=Decimal(valor), tipo=tipo,
+        )
+
+    def dias(self, caixa=None):
+        return dict(SaldoDiario.objects.filter(caixa=caixa or self.banco).values_list('data', 'movimento'))
+
+    def pontos(self, caixa=None):
+        return dict(SaldoMensal.objects.filter(caixa=caixa or self.banco).values_list('mes', 'saldo_final'))
+
+    def test_criar_editar_e_excluir(self):
+        janeiro = self.lancar(date(2025, 1, 10), '100.00')
+        self.lancar(date(2025, 1, 10), '30.00', tipo='D')
+        self.lancar(date(2025, 3, 5), '20.00')
+
+        self.assertEqual(self.dias(), {date(2025, 1, 10): Decimal('70.00'), date(2025, 3, 5): Decimal('20.00')})
+        self.assertEqual(self.pontos(), {date(2025, 1, 1): Decimal('70.00'), date(2025, 3, 1): Decimal('90.00')})
+
+        # Retroativo num mês sem ponto: nasce com o saldo do anterior e empurra os seguintes
+        self.lancar(date(2024, 12, 31), '5.00')
+        self.assertEqual(self.pontos()[date(2024, 12, 1)], Decimal('5.00'))
+        self.assertEqual(self.pontos()[date(2025, 3, 1)], Decimal('95.00'))
+
+        # Edição: muda valor, mês e caixa de uma vez
+        janeiro.valor, janeiro.data_lancamento, janeiro.caixa = Decimal('40.00'), date(2025, 2, 1), self.cofre
+        janeiro.save()
+        self.assertEqual(self.dias()[date(2025, 1, 10)], Decimal('-30.00'))
+        self.assertEqual(self.pontos(), {
+            date(2024, 12, 1): Decimal('5.00'), date(2025, 1, 1): Decimal('-25.00'), date(2025, 3, 1): Decimal('-5.00'),
+        })
+        self.assertEqual(self.dias(self.cofre), {date(2025, 2, 1): Decimal('40.00')})
+        self.assertEqual(self.pontos(self.cofre), {date(2025, 2, 1): Decimal('40.00')})
+
+        janeiro.delete()
+        self.assertEqual(self.pontos(self.cofre), {date(2025, 2, 1): Decimal('0.00')})
+        self.assertEqual(SaldoDiario.objects.divergencias(self.empresa.id), [])
+
+    def test_retroativo_nao_reescreve_os_dias_seguintes(self):
+        consultas = []
+        for quantidade in (5, 60):
+            caixa = Caixa.objects.create(empresa=self.empresa, nome=f'Caixa {quantidade}')
+            Lancamento.objects.criar_em_lote([
+                Lancamento(
+                    empresa=self.empresa, caixa=caixa, plano_de_contas=self.receita, descricao=f'Dia {i}',
+                    data_lancamento=date(2025, 1, 1) + timedelta(days=i), valor=Decimal('1.00'), tipo='C',
+                )
+                for i in range(quantidade)
+            ])
+            with CaptureQueriesContext(connection) as capturadas:
+                self.lancar(date(2025, 1, 1), '10.00', caixa=caixa)
+            consultas.append([consulta['sql'] for consulta in capturadas.captured_queries])
+        self.assertEqual(len(consultas[0]), len(consultas[1]))
+        self.assertEqual(SaldoDiario.objects.divergencias(self.empresa.id), [])
+
+    def test_criar_em_lote(self):
+        Lancamento.objects.criar_em_lote([
+            Lancamento(
+                empresa=self.empresa, caixa=caixa, plano_de_contas=self.receita, descricao='Lote',
+                data_lancamento=data, valor=Decimal('10.00'), tipo='C',
+            )
+            for caixa in (self.banco, self.cofre)
+            for data in (date(2025, 1, 31), date(2025, 2, 1), date(2025, 2, 1))
+        ])
+
+        self.assertEqual(self.dias(), {date(2025, 1, 31): Decimal('10.00'), date(2025, 2, 1): Decimal('20.00')})
+        self.assertEqual(self.pontos(self.cofre), {date(2025, 1, 1): Decimal('10.00'), date(2025, 2, 1): Decimal('30.00')})
+        self.assertEqual(SaldoDiario.objects.divergencias(self.empresa.id), [])
+
+    def test_saldo_anterior_igual_a_soma_do_razao(self):
+        inicio = date(2024, 11, 20)
+        for i in range(0, 160, 7):
+            self.lancar(inicio + timedelta(days=i), f'{i + 3}.25', tipo='CD'[i % 3 == 0], caixa=(self.banco, self.cofre)[i % 2])
+
+        for data in (date(2024, 11, 1), date(2024, 12, 1), date(2025, 1, 15), date(2025, 2, 28), date(2025, 3, 1), date(2026, 1, 1)):
+            for caixa in (None, self.banco, self.cofre):
+                lancamentos = Lancamento.objects.filter(empresa=self.empresa, data_lancamento__lt=data)
+                caixas = Caixa.objects.filter(empresa=self.empresa)
+                if caixa:
+                    lancamentos, caixas = lancamentos.filter(caixa=caixa), caixas.filter(id=caixa.id)
+                esperado = sum(lancamentos.values_list('valor', flat=True)) + sum(caixas.values_list('saldo_inicial', flat=True))
+                with self.subTest(data=data, caixa=caixa):
+                    self.assertEqual(
+                        calcular_saldo_anterior(self.empresa, data, caixa.id if caixa else None), esperado,
+                    )
+
+    def test_recalcular_saldos_verifica_e_corrige(self):
+        self.lancar(date(2025, 1, 10), '100.00')
+        self.lancar(date(2025, 2, 10), '50.00')
+        SaldoMensal.objects.filter(caixa=self.banco, mes=date(2025, 1, 1)).update(saldo_final=Decimal('1.00'))
+        SaldoDiario.objects.filter(caixa=self.banco, data=date(2025, 2, 10)).delete()
+
+        saida = StringIO()
+        with self.assertRaises(CommandError):
+            call_command('recalcular_saldos', empresa=self.empresa.id, verificar=True, stdout=saida)
+        self.assertIn('divergência(s) no saldo diário', saida.getvalue())
+
+        call_command('recalcular_saldos', empresa=self.empresa.id, stdout=StringIO())
+        self.assertEqual(self.pontos(), {date(2025, 1, 1): Decimal('100.00'), date(2025, 2, 1): Decimal('150.00')})
+        saida = StringIO()
+        call_command('recalcular_saldos', empresa=self.empresa.id, verificar=True, stdout=saida)
+        self.assertIn('consolidados consistentes', saida.getvalue())
+
+
+class ResumoMensalTests(TestCase):
+    """Cubo mensal (ResumoMensal) mantido a cada gravação de lançamento"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.empresa = Empresa.objects.create(nome='Empresa Resumo', cnpj='45.454.545/0001-45')
+        cls.caixa = Caixa.objects.create(empresa=cls.empresa, nome='Banco')
+        cls.receita = PlanoDeContas.objects.create(empresa=cls.empresa, codigo='01', nome='Receitas', tipo='R')
+        cls.despesa = PlanoDeContas.objects.create(empresa=cls.empresa, codigo='02', nome='Despesas', tipo='D')
+
+    def lancar(self, data, valor, plano=None, caixa=None, tipo='C'):
+        return Lancamento.objects.create(
+            empresa=self.empresa, caixa=caixa or self.caixa, plano_de_contas=plano or self.receita,
+            descricao='Teste', data_lancamento=data, valor=Decimal(valor), tipo=tipo,
+        )
+
+    def test_excluir_plano_move_o_resumo_para_sem_plano(self):
+        avulso = PlanoDeContas.objects.create(empresa=self.empresa, codigo='03', nome='Avulso', tipo='R')
+        self.lancar(date(2025, 3, 10), '5.00', plano=avulso)
+        self.lancar(date(2025, 3, 12), '7.00', plano=avulso)
+        Lancamento.objects.create(
+            empresa=self.empresa, caixa=self.caixa, plano_de_contas=None, descricao='Sem plano',
+            data_lancamento=date(2025, 3, 15), valor=Decimal('1.00'), tipo='C',
+        )
+
+        avulso.delete()
+
+        self.assertEqual(Lancamento.objects.filter(empresa=self.empresa, plano_de_contas=None).count(), 3)
+        self.assertEqual(ResumoMensal.objects.divergencias(self.empresa.id), [])
+        self.assertEqual(
+            ResumoMensal.objects.somar(self.empresa, date(2025, 3, 1), date(2025, 3, 31), campos=['plano_de_contas']),
+            [{'plano_de_contas': None, 'total': Decimal('13.00'), 'quantidade': 3}],
+        )
+        # Uma linha só por mês/caixa/tipo sem plano: o próximo lançamento não soma em dobro
+        self.assertEqual(ResumoMensal.objects.filter(empresa=self.empresa, plano_de_contas=None).count(), 1)
+
+    def somar_no_razao(self, data_inicio, data_fim, campos=(), **filtros):
+        brutos = Lancamento.objects.filter(
+            empresa=self.empresa, data_lancamento__gte=data_inicio, data_lancamento__lte=data_fim, **filtros,
+        ).annotate(mes=TruncMonth('data_lancamento'))
+        if campos:
+            linhas = brutos.values(*campos).annotate(total=Sum('valor'), quantidade=Count('id')).order_by()
+        else:
+            linhas = [brutos.aggregate(total=Sum('valor'), quantidade=Count('id'))]
+        resultado = [
+            dict(linha, total=linha['total'].quantize(Decimal('0.01')))
+            for linha in linhas if linha['quantidade']
+        ]
+        return sorted(resultado, key=lambda linha: [(linha[c] is None, linha[c]) for c in campos])
+
+    def test_somar_combina_meses_inteiros_e_pontas(self):
+        cofre = Caixa.objects.create(empresa=self.empresa, nome='Cofre')
+        for i, dia in enumerate((date(2025, 1, 1), date(2025, 1, 15), date(2025, 1, 31), date(2025, 2, 1),
+                                 date(2025, 2, 28), date(2025, 3, 10), date(2025, 4, 1), date(2025, 4, 30))):
+            self.lancar(dia, f'{10 + i}.50')
+            self.lancar(dia, f'-{3 + i}.25', plano=self.despesa, caixa=cofre, tipo='D')
+
+        periodos = [
+            (date(2025, 1, 1), date(2025, 4, 30)),   # só meses inteiros
+            (date(2025, 1, 15), date(2025, 4, 1)),   # pontas parciais nos dois lados
+            (date(2025, 1, 16), date(2025, 2, 28)),  # primeira ponta parcial, último mês inteiro
+            (date(2025, 2, 1), date(2025, 3, 9)),    # primeiro mês inteiro, última ponta parcial
+            (date(2025, 3, 5), date(2025, 3, 20)),   # dentro de um mês só
+            (date(2025, 1, 31), date(2025, 2, 1)),   # virada de mês, sem mês inteiro
+        ]
+        agrupamentos = [(), ['tipo'], ['mes'], ['plano_de_contas', 'caixa']]
+        for data_inicio, data_fim in periodos:
+            for campos in agrupamentos:
+                with self.subTest(inicio=data_inicio, fim=data_fim, campos=campos):
+                    self.assertEqual(
+                        ResumoMensal.objects.somar(self.empresa, data_inicio, data_fim, campos=campos),
+                        self.somar_no_razao(data_inicio, data_fim, campos),
+                    )
+            with self.subTest(inicio=data_inicio, fim=data_fim, filtro='caixa'):
+                self.assertEqual(
+                    ResumoMensal.objects.somar(self.empresa, data_inicio, data_fim, campos=['mes'], caixa=cofre),
+                    self.somar_no_razao(data_inicio, data_fim, ['mes'], caixa=cofre),
+                )
+
+    def test_edicao_move_o_lancamento_entre_linhas(self):
+        cofre = Caixa.objects.create(empresa=self.empresa, nome='Cofre')
+        lancamento = self.lancar(date(2025, 5, 20), '80.00')
+
+        def linhas():
+            return list(ResumoMensal.objects.filter(empresa=self.empresa).exclude(quantidade=0).values_list(
+                'mes', 'plano_de_contas', 'caixa', 'total', 'quantidade',
+            ))
+
+        self.assertEqual(linhas(), [(date(2025, 5, 1), self.receita.id, self.caixa.id, Decimal('80.00'), 1)])
+
+        outra_receita = PlanoDeContas.objects.create(empresa=self.empresa, codigo='04', nome='Outras', tipo='R')
+        lancamento.plano_de_contas = outra_receita
+        lancamento.save()
+        self.assertEqual(linhas(), [(date(2025, 5, 1), outra_receita.id, self.caixa.id, Decimal('80.00'), 1)])
+
+        lancamento.caixa = cofre
+        lancamento.save()
+        self.assertEqual(linhas(), [(date(2025, 5, 1), outra_receita.id, cofre.id, Decimal('80.00'), 1)])
+
+        lancamento.data_lancamento, lancamento.valor = date(2025, 6, 2), Decimal('90.00')
+        lancamento.save()
+        self.assertEqual(linhas(), [(date(2025, 6, 1), outra_receita.id, cofre.id, Decimal('90.00'), 1)])
+        self.assertEqual(ResumoMensal.objects.divergencias(self.empresa.id), [])
+
+        lancamento.delete()
+        self.assertEqual(linhas(), [])
+        self.assertEqual(ResumoMensal.objects.somar(self.empresa, date(2025, 6, 1), date(2025, 6, 30)), [])
+
+    def test_divergencias_e_reconstruir(self):
+        self.lancar(date(2025, 7, 1), '10.00')
+        self.lancar(date(2025, 7, 2), '15.00')
+        self.lancar(date(2025, 8, 3), '-4.00', plano=self.despesa, tipo='D')
+        self.assertEqual(ResumoMensal.objects.divergencias(self.empresa.id), [])
+
+        # Alterações que não passam pelo save(): o resumo fica para trás
+        Lancamento.objects.filter(empresa=self.empresa, data_lancamento=date(2025, 7, 2)).update(valor=Decimal('20.00'))
+        ResumoMensal.objects.filter(empresa=self.empresa, tipo='D').delete()
+
+        self.assertEqual(ResumoMensal.objects.divergencias(self.empresa.id), [
+            ((date(2025, 7, 1), self.receita.id, self.caixa.id, 'C'), (Decimal('30.00'), 2), (Decimal('25.00'), 2)),
+            ((date(2025, 8, 1), self.despesa.id, self.caixa.id, 'D'), (Decimal('-4.00'), 1), (Decimal(0), 0)),
+        ])
 
-# Create your tests here.
+        self.assertEqual(ResumoMensal.objects.reconstruir(self.empresa.id), 2)
+        self.assertEqual(ResumoMensal.objects.divergencias(self.empresa.id), [])
+        self.assertEqual(
+            ResumoMensal.objects.somar(self.empresa, date(2025, 7, 1), date(2025, 8, 31), campos=['tipo']),
+            [{'tipo': 'C', 'total': Decimal('30.00'), 'quantidade': 2}, {'tipo': 'D', 'total': Decimal('-4.00'), 'quantidade': 1}],
+        )
@@ -14,12 +14,28 @@ urlpatterns = [
     # RELATÓRIO
     path('fluxo/relatorio/', views.relatorio_fluxo, name='relatorio_fluxo'),
     path('contas/relatorio/', views.relatorio_contas, name='relatorio_contas'),
+    path('contas/aging/', views.relatorio_aging, name='relatorio_aging'),
     path('relatorios/dre/', views.relatorio_dre, name='relatorio_dre'),
     path('relatorios/dre/sintetico/', views.relatorio_dre_sintetico, name='relatorio_dre_sintetico'),
+
+    # EXPORTAÇÃO CSV
+    path('fluxo/exportar/', views.exportar_fluxo, name='exportar_fluxo'),
+    path('contas/exportar/', views.exportar_contas, name='exportar_contas'),
+    path('contas/aging/exportar/', views.exportar_aging, name='exportar_aging'),
+
+    # IMPORTAÇÃO DE EXTRATO
+    path('fluxo/importar/', views.importar_extrato_bancario, name='importar_extrato'),
+
+    # CONCILIAÇÃO BANCÁRIA
+    path('fluxo/conciliacao/', views.conciliacao_bancaria, name='conciliacao'),
+
+    # PROJEÇÃO DO FLUXO
+    path('fluxo/projecao/', views.projecao_fluxo, name='projecao_fluxo'),
         
     # RECEBER (NOVO)
     path('contas/receber/', views.lista_contas_receber, name='lista_receber'),
     path('contas/receber/nova/', views.nova_receita, name='nova_receita'), # Atalho para criar
+    path('contas/receber/mensalidades/', views.gerar_mensalidades_view, name='gerar_mensalidades'),
     
     # PAGAR (NOVO)
     path('contas/pagar/', views.lista_contas_pagar, name='lista_pagar'),
@@ -27,6 +43,7 @@ urlpatterns = [
 
     # AÇÕES COMUNS (Editar/Baixar/Excluir servem para ambos)
     path('contas/baixar/<int:id>/', views.baixar_conta, name='baixar_conta'),
+    path('contas/baixar-lote/', views.baixar_contas_lote, name='baixar_contas_lote'),
     path('contas/editar/<int:id>/', views.editar_conta, name='editar_conta'),
     path('contas/excluir/<int:id>/', views.excluir_conta, name='excluir_conta'),
 
@@ -1,26 +1,73 @@
-from datetime import date
+from datetime import date, timedelta
 from django.shortcuts import render, redirect, get_object_or_404
+from django.urls import reverse
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.db.models import Sum
+from django.db import transaction
+from django.db.models import Sum, Q
 from django.utils.dateparse import parse_date
+from django.utils.http import url_has_allowed_host_and_scheme
 
 # Imports dos Modelos e Formulários
-from .models import Conta, Lancamento, Caixa, PlanoDeContas
-from .forms import ContaForm, LancamentoManualForm, CaixaForm, PlanoContasForm
-from core.models import ParametroSistema
+from .models import Conta, Lancamento, Caixa, PlanoDeContas, SaldoDiario, ResumoMensal
+from .forms import ContaForm, LancamentoManualForm, CaixaForm, PlanoContasForm, ImportacaoExtratoForm, GeracaoMensalidadesForm
+from .aging import AGRUPAMENTOS, FAIXAS, aging, totais_aging
+from .baixa import baixar_contas
+from .conciliacao import JANELA_DIAS, POR_DOCUMENTO, conciliar, sugerir
+from .importacao import ErroImportacao, OFX, importar_extrato, ler_csv, ler_ofx
+from .juros import com_juros
+from .mensalidades import data_vencimento, gerar_mensalidades
+from .parcelamento import criar_parcelas, SIMPLES
+from .projecao import DIAS_PADRAO, projetar
+from core.exportacao import formatar_data, formatar_valor, iterar_por_chave, resposta_csv
+from core import parametros
+from core.paginacao import paginar_por_chave
 from decimal import Decimal
-import calendar
 import random
+import uuid
 
 
-def add_months(source_date, months):
-    """Adiciona meses a uma data corretamente (ex: 31/01 + 1 mês -> 28/02)"""
-    month = source_date.month - 1 + months
-    year = source_date.year + month // 12
-    month = month % 12 + 1
-    day = min(source_date.day, calendar.monthrange(year, month)[1])
-    return date(year, month, day)
+def filtro_categoria(empresa, categoria_id):
+    """Filtro de lançamentos/contas pela categoria e todas as suas subcategorias (subárvore do plano)"""
+    caminho = PlanoDeContas.objects.filter(empresa=empresa, id=categoria_id).values_list('caminho', flat=True).first()
+    if not caminho:
+        return {'plano_de_contas_id': categoria_id}
+    return {'plano_de_contas__caminho__startswith': caminho}
+
+
+def filtrar_grupo_parcelas(contas, grupo):
+    """Restringe às parcelas de um grupo; ignora valores que não são UUID"""
+    try:
+        return contas.filter(grupo_parcelas=uuid.UUID(grupo)) if grupo else contas
+    except ValueError:
+        return contas
+
+
+def calcular_saldo_anterior(empresa, data_inicio, caixa_id=None, categoria_id=None):
+    """
+    Saldo de abertura (tudo antes de data_inicio).
+    Sem filtro de categoria usa o ponto de controle mensal + os dias do mês de cada caixa
+    (SaldoDiario.objects.saldo_ate, uma query só); com categoria usa o ResumoMensal,
+    pois o saldo diário não separa categorias.
+    """
+    vespera = parse_date(str(data_inicio)) - timedelta(days=1)
+    if categoria_id:
+        # Saldo Inicial de banco é zero (banco não tem categoria)
+        filtros = filtro_categoria(empresa, categoria_id)
+        if caixa_id:
+            filtros['caixa_id'] = caixa_id
+        totais = ResumoMensal.objects.somar(empresa, date(1900, 1, 1), vespera, **filtros)
+        return sum(linha['total'] for linha in totais)
+
+    caixas = Caixa.objects.filter(empresa=empresa)
+    if caixa_id:
+        caixas = caixas.filter(id=caixa_id)
+
+    totais = caixas.annotate(
+        movimentado_ate=SaldoDiario.objects.saldo_ate(empresa, vespera)
+    ).aggregate(inicial=Sum('saldo_inicial'), movimentado=Sum('movimentado_ate'))
+
+    return (totais['inicial'] or 0) + (totais['movimentado'] or 0)
 
 # ==========================================================
 # 1. GESTÃO DE CAIXAS (BANCOS)
@@ -124,99 +171,106 @@ def excluir_plano_de_contas(request, id):
 # 3. CONTAS A PAGAR E RECEBER (SEPARADAS COM FILTROS)
 # ==========================================================
 
-@login_required
-def lista_contas_receber(request):
-    """Lista apenas contas onde o Plano de Contas é TIPO RECEITA"""
-    # Base Query
-    contas = Conta.objects.filter(empresa=request.user.empresa, plano_de_contas__tipo='R')
-
-    # --- FILTROS DE BUSCA ---
-    data_ini = request.GET.get('data_ini')
-    data_fim = request.GET.get('data_fim')
-    cliente_nome = request.GET.get('cliente')
-    status = request.GET.get('status')
-    categoria_id = request.GET.get('categoria') # NOVO
-
-    if data_ini and data_fim:
-        contas = contas.filter(data_vencimento__range=[data_ini, data_fim])
+def filtrar_contas(request, tipo_plano):
+    """
+    Contas de Receita (R) ou Despesa (D) com os filtros do GET (usados pela lista, relatório e exportação).
+    Retorna (queryset, filtros) para manter os campos preenchidos na tela.
+    """
+    def limpar(valor):
+        return valor if valor and valor != 'None' else None
+
+    filtros = {
+        'data_ini': limpar(request.GET.get('data_ini')),
+        'data_fim': limpar(request.GET.get('data_fim')),
+        'nome': limpar(request.GET.get('cliente')),
+        'status': limpar(request.GET.get('status')),
+        'categoria': limpar(request.GET.get('categoria')),
+    }
+    contas = Conta.objects.filter(empresa=request.user.empresa, plano_de_contas__tipo=tipo_plano)
+
+    if filtros['data_ini'] and filtros['data_fim']:
+        contas = contas.filter(data_vencimento__range=[filtros['data_ini'], filtros['data_fim']])
     
-    if cliente_nome:
-        contas = contas.filter(cadastro__nome__icontains=cliente_nome)
+    if filtros['nome']:
+        contas = contas.filter(cadastro__nome__icontains=filtros['nome'])
 
-    if status:
-        if status == 'ATRASADA':
+    if filtros['status']:
+        if filtros['status'] == 'ATRASADA':
             contas = contas.filter(status='PENDENTE', data_vencimento__lt=date.today())
         else:
-            contas = contas.filter(status=status)
+            contas = contas.filter(status=filtros['status'])
 
-    # Filtro por Categoria (NOVO)
-    if categoria_id:
-        contas = contas.filter(plano_de_contas_id=categoria_id)
+    # Filtro por Categoria (inclui as subcategorias)
+    if filtros['categoria']:
+        contas = contas.filter(**filtro_categoria(request.user.empresa, filtros['categoria']))
+
+    # Parcelas de um mesmo parcelamento (link após gerar as parcelas)
+    contas = filtrar_grupo_parcelas(contas, request.GET.get('grupo'))
+    return contas, filtros
+
+@login_required
+def lista_contas_receber(request):
+    """Lista apenas contas onde o Plano de Contas é TIPO RECEITA"""
+    # Base Query com os filtros de busca
+    contas, filtros = filtrar_contas(request, 'R')
+    # Valor atualizado com os juros de atraso até hoje, calculado pelo banco
+    contas = com_juros(contas.select_related('cadastro', 'plano_de_contas'), request.user.empresa_id)
 
     # Dados para os Dropdowns
     caixas = Caixa.objects.filter(empresa=request.user.empresa)
     # Carrega apenas categorias de RECEITA para o filtro
     categorias = PlanoDeContas.objects.filter(empresa=request.user.empresa, tipo='R').order_by('nome')
     
+    # Totais do filtro inteiro numa consulta; a lista é paginada por vencimento
+    totais = contas.aggregate(valor=Sum('valor'), atualizado=Sum('valor_atualizado'))
+    pagina = paginar_por_chave(request, contas, 'data_vencimento')
+
     return render(request, 'financeiro/contas_lista.html', {
-        'contas': contas.order_by('data_vencimento'), 
+        'contas': pagina.itens,
+        'pagina': pagina,
+        'total_valor': totais['valor'] or 0,
+        'total_atualizado': totais['atualizado'] or 0,
         'caixas': caixas,
         'categorias': categorias, # Envia para o template
         'titulo': 'Contas a Receber',
         'tipo_lista': 'receber',
         
         # Mantém filtros preenchidos
-        'filtro_data_ini': data_ini,
-        'filtro_data_fim': data_fim,
-        'filtro_nome': cliente_nome,
-        'filtro_status': status,
-        'filtro_categoria': categoria_id # NOVO
+        'filtro_data_ini': filtros['data_ini'],
+        'filtro_data_fim': filtros['data_fim'],
+        'filtro_nome': filtros['nome'],
+        'filtro_status': filtros['status'],
+        'filtro_categoria': filtros['categoria'],
     })
 
 @login_required
 def lista_contas_pagar(request):
     """Lista apenas contas onde o Plano de Contas é TIPO DESPESA"""
-    # Base Query
-    contas = Conta.objects.filter(empresa=request.user.empresa, plano_de_contas__tipo='D')
-
-    # --- FILTROS DE BUSCA ---
-    data_ini = request.GET.get('data_ini')
-    data_fim = request.GET.get('data_fim')
-    fornecedor_nome = request.GET.get('cliente')
-    status = request.GET.get('status')
-    categoria_id = request.GET.get('categoria') # NOVO
-
-    if data_ini and data_fim:
-        contas = contas.filter(data_vencimento__range=[data_ini, data_fim])
-    
-    if fornecedor_nome:
-        contas = contas.filter(cadastro__nome__icontains=fornecedor_nome)
-
-    if status:
-        if status == 'ATRASADA':
-            contas = contas.filter(status='PENDENTE', data_vencimento__lt=date.today())
-        else:
-            contas = contas.filter(status=status)
-
-    # Filtro por Categoria (NOVO)
-    if categoria_id:
-        contas = contas.filter(plano_de_contas_id=categoria_id)
+    # Base Query com os filtros de busca
+    contas, filtros = filtrar_contas(request, 'D')
+    contas = contas.select_related('cadastro', 'plano_de_contas')
 
     caixas = Caixa.objects.filter(empresa=request.user.empresa)
     # Carrega apenas categorias de DESPESA para o filtro
     categorias = PlanoDeContas.objects.filter(empresa=request.user.empresa, tipo='D').order_by('nome')
     
+    # Total do filtro inteiro numa consulta; a lista é paginada por vencimento
+    total_valor = contas.aggregate(Sum('valor'))['valor__sum'] or 0
+    pagina = paginar_por_chave(request, contas, 'data_vencimento')
+
     return render(request, 'financeiro/contas_lista.html', {
-        'contas': contas.order_by('data_vencimento'), 
+        'contas': pagina.itens,
+        'pagina': pagina,
+        'total_valor': total_valor,
         'caixas': caixas,
         'categorias': categorias,
         'titulo': 'Contas a Pagar',
         'tipo_lista': 'pagar',
-        'filtro_data_ini': data_ini,
-        'filtro_data_fim': data_fim,
-        'filtro_nome': fornecedor_nome,
-        'filtro_status': status,
-        'filtro_categoria': categoria_id
+        'filtro_data_ini': filtros['data_ini'],
+        'filtro_data_fim': filtros['data_fim'],
+        'filtro_nome': filtros['nome'],
+        'filtro_status': filtros['status'],
+        'filtro_categoria': filtros['categoria'],
     })
 
 # ==========================================================
@@ -226,41 +280,23 @@ def processar_lancamento_conta(request, form, tipo_redirect):
     """Lógica comum para salvar Receita ou Despesa com parcelamento"""
     dados = form.cleaned_data
     
-    # Dados base
-    descricao_original = dados['descricao']
-    valor_original = dados['valor']
-    vencimento_inicial = dados['data_vencimento']
-    gerar_parcelas = dados.get('gerar_parcelas')
-    
-    if gerar_parcelas:
-        qtd = dados['qtd_parcelas']
-        juros = dados.get('taxa_juros') or Decimal(0)
-        
-        acrescimo = valor_original * (juros / Decimal(100))
-        valor_total = valor_original + acrescimo
-        valor_parcela = valor_total / qtd
-        
-        # Gera um número aleatório de 4 dígitos para agrupar as parcelas (Ex: 1234)
-        grupo_parcela = random.randint(1000, 9999) 
-        
-        # Cria as parcelas
-        for i in range(qtd):
-            nova_conta = form.save(commit=False)
-            nova_conta.pk = None
-            nova_conta.empresa = request.user.empresa
-            
-            # Formata: Descrição (Parcela X/Y)
-            nova_conta.descricao = f"{descricao_original}"
-            
-            # Formata: 1234-1/3
-            nova_conta.documento = f"{grupo_parcela}-{i+1}/{qtd}"
-            
-            nova_conta.valor = valor_parcela
-            nova_conta.data_vencimento = add_months(vencimento_inicial, i)
-            
-            nova_conta.save()
-            
-        messages.success(request, f"{qtd} parcelas geradas com sucesso! (Doc: {grupo_parcela})")
+    if dados.get('gerar_parcelas'):
+        # Cronograma inteiro calculado de uma vez e gravado numa única transação
+        modelo = form.save(commit=False)
+        modelo.empresa = request.user.empresa
+        grupo, parcelas = criar_parcelas(
+            modelo,
+            dados['qtd_parcelas'],
+            taxa=dados.get('taxa_juros') or Decimal(0),
+            sistema=dados.get('sistema_amortizacao') or SIMPLES,
+        )
+        total = sum(parcela.valor for parcela in parcelas)
+        messages.success(
+            request,
+            f"{len(parcelas)} parcelas geradas com sucesso! Total R$ {total:.2f} (Doc: {parcelas[0].documento.split('-')[0]})",
+        )
+        # Mostra só as parcelas recém-criadas
+        return redirect(f"{reverse(tipo_redirect)}?grupo={grupo}")
     else:
         # Salva normal
         conta = form.save(commit=False)
@@ -332,7 +368,8 @@ def excluir_conta(request, id):
 
 @login_required
 def baixar_conta(request, id):
-    conta = get_object_or_404(Conta, id=id, empresa=request.user.empresa)
+    conta = get_object_or_404(Conta.objects.select_related('plano_de_contas'), id=id, empresa=request.user.empresa)
+    rota_lista = 'financeiro:lista_receber' if conta.plano_de_contas.tipo == 'R' else 'financeiro:lista_pagar'
     
     if request.method == 'POST':
         caixa_id = request.POST.get('caixa')
@@ -340,45 +377,75 @@ def baixar_conta(request, id):
         
         if not caixa_id or not data_pagamento:
             messages.error(request, "Preencha todos os campos da baixa.")
-            return redirect('financeiro:lista_receber' if conta.plano_de_contas.tipo == 'R' else 'financeiro:lista_pagar')
+            return redirect(rota_lista)
 
         caixa = get_object_or_404(Caixa, id=caixa_id, empresa=request.user.empresa)
 
-        # Mapeia o tipo do Plano (R/D) para o tipo do Lançamento (C/D)
-        # R (Receita) -> C (Crédito)
-        # D (Despesa) -> D (Débito)
-        tipo_lancamento = 'C' if conta.plano_de_contas.tipo == 'R' else 'D'
-
-        Lancamento.objects.create(
-            empresa=request.user.empresa,
-            caixa=caixa,
-            plano_de_contas=conta.plano_de_contas,
-            conta_origem=conta,
-            descricao=f"Baixa: {conta.descricao}",
-            data_lancamento=data_pagamento,
-            valor=conta.valor,
-            tipo=tipo_lancamento
-        )
-
-        conta.status = 'PAGA'
-        conta.save()
-        
-        messages.success(request, "Baixa realizada com sucesso!")
-        
-        if conta.plano_de_contas.tipo == 'R':
-            return redirect('financeiro:lista_receber')
+        # Mesmo caminho da baixa em lote (trava a conta e ignora se já estiver paga)
+        try:
+            baixadas, _ = baixar_contas(request.user.empresa, [conta.id], caixa, data_pagamento)
+        except ValueError as erro:
+            messages.error(request, str(erro))
+            return redirect(rota_lista)
+        if baixadas:
+            messages.success(request, "Baixa realizada com sucesso!")
         else:
-            return redirect('financeiro:lista_pagar')
+            messages.error(request, "Esta conta já foi baixada ou cancelada.")
+        return redirect(rota_lista)
     
     return redirect('financeiro:lista_receber')
 
+@login_required
+def baixar_contas_lote(request):
+    """Baixa várias contas selecionadas na lista com o mesmo caixa e data"""
+    voltar = request.POST.get('voltar', '')
+    if not url_has_allowed_host_and_scheme(voltar, allowed_hosts={request.get_host()}):
+        voltar = reverse('financeiro:lista_pagar' if request.POST.get('tipo_lista') == 'pagar' else 'financeiro:lista_receber')
+
+    if request.method != 'POST':
+        return redirect(voltar)
+
+    ids = [conta_id for conta_id in request.POST.getlist('contas') if conta_id.isdigit()]
+    caixa_id = request.POST.get('caixa')
+    try:
+        data_pagamento = parse_date(request.POST.get('data_pagamento') or '')
+    except ValueError:
+        data_pagamento = None
+
+    if not ids:
+        messages.error(request, "Selecione ao menos uma conta para baixar.")
+        return redirect(voltar)
+    if not caixa_id or not data_pagamento:
+        messages.error(request, "Preencha todos os campos da baixa.")
+        return redirect(voltar)
+
+    caixa = get_object_or_404(Caixa, id=caixa_id, empresa=request.user.empresa)
+    try:
+        baixadas, ignoradas = baixar_contas(request.user.empresa, ids, caixa, data_pagamento)
+    except ValueError as erro:
+        messages.error(request, str(erro))
+        return redirect(voltar)
+
+    if baixadas:
+        messages.success(request, f"{len(baixadas)} conta(s) baixada(s) com sucesso!")
+    if ignoradas:
+        messages.warning(
+            request,
+            f"{len(ignoradas)} conta(s) ignorada(s) por já estarem baixadas ou canceladas: "
+            + ", ".join(f"#{conta_id}" for conta_id in ignoradas),
+        )
+    return redirect(voltar)
+
 
 # ==========================================================
 # 4. FLUXO DE CAIXA E RELATÓRIOS
 # ==========================================================
 
-@login_required
-def fluxo_caixa(request):
+def filtros_fluxo(request):
+    """
+    Período, caixa e categoria do fluxo de caixa a partir do GET (tela e exportação).
+    Na primeira carga (sem 'caixa' na URL) usa o caixa padrão da empresa.
+    """
     # 1. Definição das Datas
     hoje = date.today()
     inicio_mes = hoje.replace(day=1)
@@ -403,84 +470,75 @@ def fluxo_caixa(request):
     else:
         # CENÁRIO B: Primeira carga da página (sem filtros na URL)
         # Tenta pegar o padrão do sistema
-        try:
-            param = ParametroSistema.objects.get(empresa=request.user.empresa, chave='CAIXA_PADRAO_ID')
-            if param.valor and param.valor.isdigit():
-                caixa_id = int(param.valor)
-        except ParametroSistema.DoesNotExist:
-            caixa_id = None
+        caixa_id = parametros.obter(request.user.empresa_id, 'CAIXA_PADRAO_ID')
 
     # 3. Definição da Categoria
-    categoria_id_str = request.GET.get('categoria')
+    categoria_id = request.GET.get('categoria')
 
-    # =======================================================
-    # CÁLCULO DO SALDO ANTERIOR (Onde estava o erro provável)
-    # =======================================================
-    
-    # A. Saldo Inicial do Cadastro (Dinheiro que "nasceu" na conta)
-    saldo_inicial_cadastro = 0
-    
-    # Se tem filtro de categoria, Saldo Inicial de banco é zero (banco não tem categoria)
-    if not categoria_id_str:
-        if caixa_id:
-            # BUSCA ESPECÍFICA: Pega só deste caixa
-            caixa_obj = Caixa.objects.filter(id=caixa_id, empresa=request.user.empresa).first()
-            if caixa_obj:
-                saldo_inicial_cadastro = caixa_obj.saldo_inicial
-        else:
-            # GERAL: Soma todos os caixas da empresa
-            saldo_inicial_cadastro = Caixa.objects.filter(empresa=request.user.empresa).aggregate(Sum('saldo_inicial'))['saldo_inicial__sum'] or 0
+    return {'data_inicio': data_inicio, 'data_fim': data_fim, 'caixa_id': caixa_id, 'categoria_id': categoria_id}
 
-    # B. Movimentações Passadas (Tudo antes da data_inicio)
-    movimentos_anteriores = Lancamento.objects.filter(
-        empresa=request.user.empresa,
-        data_lancamento__lt=data_inicio # Menor que data de início
+
+def lancamentos_do_fluxo(empresa, filtros):
+    """Movimentações do período conforme filtros_fluxo()"""
+    lancamentos = Lancamento.objects.filter(
+        empresa=empresa,
+        data_lancamento__range=[filtros['data_inicio'], filtros['data_fim']]
     )
+
+    if filtros['caixa_id']:
+        lancamentos = lancamentos.filter(caixa_id=filtros['caixa_id'])
     
-    # Filtros obrigatórios no histórico
-    if caixa_id:
-        movimentos_anteriores = movimentos_anteriores.filter(caixa_id=caixa_id)
-    
-    if categoria_id_str:
-        movimentos_anteriores = movimentos_anteriores.filter(plano_de_contas_id=categoria_id_str)
+    if filtros['categoria_id']:
+        lancamentos = lancamentos.filter(**filtro_categoria(empresa, filtros['categoria_id']))
+    return lancamentos
+
 
-    # Soma do histórico
-    total_anteriores = movimentos_anteriores.aggregate(Sum('valor'))['valor__sum'] or 0
+@login_required
+def fluxo_caixa(request):
+    filtros = filtros_fluxo(request)
+    data_inicio, data_fim = filtros['data_inicio'], filtros['data_fim']
+    caixa_id, categoria_id_str = filtros['caixa_id'], filtros['categoria_id']
 
-    # ===> SALDO ANTERIOR FINAL
-    saldo_anterior = saldo_inicial_cadastro + total_anteriores
+    # =======================================================
+    # CÁLCULO DO SALDO ANTERIOR
+    # =======================================================
+    # Saldo inicial do(s) caixa(s) + último saldo diário antes da data_inicio
+    saldo_anterior = calcular_saldo_anterior(request.user.empresa, data_inicio, caixa_id, categoria_id_str)
 
 
     # =======================================================
     # MOVIMENTAÇÕES DO PERÍODO (TABELA)
     # =======================================================
-    lancamentos = Lancamento.objects.filter(
-        empresa=request.user.empresa,
-        data_lancamento__range=[data_inicio, data_fim]
-    )
+    lancamentos = lancamentos_do_fluxo(request.user.empresa, filtros)
 
-    if caixa_id:
-        lancamentos = lancamentos.filter(caixa_id=caixa_id)
-    
-    if categoria_id_str:
-        lancamentos = lancamentos.filter(plano_de_contas_id=categoria_id_str)
-
-    lancamentos = lancamentos.order_by('-data_lancamento')
-    
-    # Totais do Período
-    total_periodo = lancamentos.aggregate(Sum('valor'))['valor__sum'] or 0
+    # Totais do Período (uma consulta sobre o período inteiro, não só a página)
+    totais = lancamentos.aggregate(
+        total=Sum('valor'),
+        entradas=Sum('valor', filter=Q(tipo='C')),
+        saidas=Sum('valor', filter=Q(tipo='D')),
+    )
+    total_periodo = totais['total'] or 0
     
     # ===> SALDO FINAL
     saldo_final = saldo_anterior + total_periodo
 
+    # Página atual (mais recentes primeiro), já com caixa e categoria de cada linha
+    pagina = paginar_por_chave(
+        request, lancamentos.select_related('caixa', 'plano_de_contas'), 'data_lancamento', decrescente=True,
+    )
+
     # Contexto
     caixas = Caixa.objects.filter(empresa=request.user.empresa)
     categorias = PlanoDeContas.objects.filter(empresa=request.user.empresa).order_by('nome')
 
     return render(request, 'financeiro/fluxo_lista.html', {
-        'lancamentos': lancamentos, 
+        'lancamentos': pagina.itens,
+        'pagina': pagina,
         'saldo_anterior': saldo_anterior,
         'saldo_final': saldo_final,
+        'total_periodo': total_periodo,
+        'total_entradas': totais['entradas'] or 0,
+        'total_saidas': totais['saidas'] or 0,
         'caixas': caixas,
         'categorias': categorias,
         'caixa_selecionado_id': str(caixa_id) if caixa_id else '',
@@ -520,16 +578,19 @@ def editar_lancamento(request, id):
 def excluir_lancamento(request, id):
     lancamento = get_object_or_404(Lancamento, id=id, empresa=request.user.empresa)
     
-    # Se for baixa de conta, retorna a conta para PENDENTE
-    if lancamento.conta_origem:
-        conta = lancamento.conta_origem
-        conta.status = 'PENDENTE'
-        conta.save()
-        aviso_extra = " A conta original voltou para 'Pendente'."
-    else:
-        aviso_extra = ""
+    with transaction.atomic():
+        # Se for baixa de conta, retorna a conta para PENDENTE e estorna os juros cobrados na baixa
+        if lancamento.conta_origem:
+            conta = lancamento.conta_origem
+            conta.status = 'PENDENTE'
+            conta.save()
+            for juros in conta.lancamentos_juros.all():
+                juros.delete()
+            aviso_extra = " A conta original voltou para 'Pendente'."
+        else:
+            aviso_extra = ""
 
-    lancamento.delete()
+        lancamento.delete()
     messages.success(request, f"Lançamento excluído.{aviso_extra}")
     return redirect('financeiro:fluxo_caixa')
 
@@ -559,44 +620,14 @@ def relatorio_fluxo(request):
     else:
         # Se não veio no filtro, tenta o padrão APENAS se o usuário não pediu "Todos" explicitamente
         # Aqui assumimos que se veio vazio na URL, tenta o padrão.
-        try:
-            param = ParametroSistema.objects.get(empresa=request.user.empresa, chave='CAIXA_PADRAO_ID')
-            if param.valor and param.valor.isdigit():
-                caixa_id = int(param.valor)
-                caixa_selecionado = Caixa.objects.filter(id=caixa_id, empresa=request.user.empresa).first()
-        except ParametroSistema.DoesNotExist:
-            pass
+        caixa_id = parametros.obter(request.user.empresa_id, 'CAIXA_PADRAO_ID')
+        if caixa_id:
+            caixa_selecionado = Caixa.objects.filter(id=caixa_id, empresa=request.user.empresa).first()
 
     # =======================================================
-    # 3. CÁLCULO DO SALDO ANTERIOR (A CORREÇÃO)
+    # 3. CÁLCULO DO SALDO ANTERIOR
     # =======================================================
-    saldo_inicial_cadastro = 0
-    
-    # Se não tem filtro de categoria, considera o saldo de abertura do banco
-    if not categoria_id_str:
-        if caixa_id:
-            if caixa_selecionado:
-                saldo_inicial_cadastro = caixa_selecionado.saldo_inicial
-        else:
-            # Soma de todos os caixas
-            saldo_inicial_cadastro = Caixa.objects.filter(empresa=request.user.empresa).aggregate(Sum('saldo_inicial'))['saldo_inicial__sum'] or 0
-
-    # Movimentações anteriores à data de início
-    movimentos_anteriores = Lancamento.objects.filter(
-        empresa=request.user.empresa,
-        data_lancamento__lt=data_inicio_str
-    )
-    
-    if caixa_id:
-        movimentos_anteriores = movimentos_anteriores.filter(caixa_id=caixa_id)
-    
-    if categoria_id_str:
-        movimentos_anteriores = movimentos_anteriores.filter(plano_de_contas_id=categoria_id_str)
-
-    total_anteriores = movimentos_anteriores.aggregate(Sum('valor'))['valor__sum'] or 0
-    
-    # ===> SALDO ANTERIOR REAL
-    saldo_anterior = saldo_inicial_cadastro + total_anteriores
+    saldo_anterior = calcular_saldo_anterior(request.user.empresa, data_inicio_str, caixa_id, categoria_id_str)
 
 
     # =======================================================
@@ -611,15 +642,19 @@ def relatorio_fluxo(request):
         lancamentos = lancamentos.filter(caixa_id=caixa_id)
     
     if categoria_id_str:
-        lancamentos = lancamentos.filter(plano_de_contas_id=categoria_id_str)
+        lancamentos = lancamentos.filter(**filtro_categoria(request.user.empresa, categoria_id_str))
 
     # Listas detalhadas
-    receitas = lancamentos.filter(tipo='C').order_by('data_lancamento')
-    despesas = lancamentos.filter(tipo='D').order_by('data_lancamento')
+    receitas = lancamentos.filter(tipo='C').select_related('plano_de_contas').order_by('data_lancamento')
+    despesas = lancamentos.filter(tipo='D').select_related('plano_de_contas').order_by('data_lancamento')
 
-    # Totais do Período
-    total_receitas = receitas.aggregate(Sum('valor'))['valor__sum'] or 0
-    total_despesas = despesas.aggregate(Sum('valor'))['valor__sum'] or 0
+    # Totais do Período (receitas e despesas numa consulta só)
+    totais = lancamentos.aggregate(
+        receitas=Sum('valor', filter=Q(tipo='C')),
+        despesas=Sum('valor', filter=Q(tipo='D')),
+    )
+    total_receitas = totais['receitas'] or 0
+    total_despesas = totais['despesas'] or 0
     resultado_periodo = total_receitas + total_despesas
     
     # ===> SALDO FINAL REAL
@@ -650,41 +685,29 @@ def relatorio_contas(request):
     tipo_lista = request.GET.get('tipo_lista', 'receber')
     tipo_plano = 'R' if tipo_lista == 'receber' else 'D'
     
-    contas = Conta.objects.filter(empresa=request.user.empresa, plano_de_contas__tipo=tipo_plano)
-
-    # Helper para limpar strings
-    def clean_val(val):
-        return val if val and val != 'None' else None
-
-    data_ini = clean_val(request.GET.get('data_ini'))
-    data_fim = clean_val(request.GET.get('data_fim'))
-    nome = clean_val(request.GET.get('cliente'))
-    status = clean_val(request.GET.get('status'))
-    categoria_id = clean_val(request.GET.get('categoria')) # NOVO
-
-    if data_ini and data_fim:
-        contas = contas.filter(data_vencimento__range=[data_ini, data_fim])
-    
-    if nome:
-        contas = contas.filter(cadastro__nome__icontains=nome)
-
-    if status:
-        if status == 'ATRASADA':
-            contas = contas.filter(status='PENDENTE', data_vencimento__lt=date.today())
-        else:
-            contas = contas.filter(status=status)
-
-    # Filtro Categoria no Relatório
-    if categoria_id:
-        contas = contas.filter(plano_de_contas_id=categoria_id)
+    contas, filtros = filtrar_contas(request, tipo_plano)
+    contas = contas.select_related('cadastro', 'plano_de_contas')
+    data_ini, data_fim, status = filtros['data_ini'], filtros['data_fim'], filtros['status']
 
     contas = contas.order_by('data_vencimento')
-    total_valor = contas.aggregate(Sum('valor'))['valor__sum'] or 0
+    data_juros = None
+    if tipo_plano == 'R':
+        # Juros de atraso até a data escolhida (padrão: hoje)
+        try:
+            data_juros = parse_date(request.GET.get('juros_ate') or '') or date.today()
+        except ValueError:
+            data_juros = date.today()
+        contas = com_juros(contas, request.user.empresa_id, data_juros)
+        totais = contas.aggregate(valor=Sum('valor'), atualizado=Sum('valor_atualizado'))
+    else:
+        totais = contas.aggregate(valor=Sum('valor'), atualizado=Sum('valor'))
     titulo_relatorio = "Relatório de Contas a Receber" if tipo_lista == 'receber' else "Relatório de Contas a Pagar"
 
     return render(request, 'financeiro/relatorio_contas_impresso.html', {
         'contas': contas,
-        'total_valor': total_valor,
+        'total_valor': totais['valor'] or 0,
+        'total_atualizado': totais['atualizado'] or 0,
+        'data_juros': data_juros,
         'titulo_relatorio': titulo_relatorio,
         'empresa': request.user.empresa,
         'data_ini': parse_date(data_ini) if data_ini else None,
@@ -704,29 +727,19 @@ def relatorio_dre(request):
     data_inicio = parse_date(data_inicio_str)
     data_fim = parse_date(data_fim_str)
 
-    # 2. Busca Lançamentos
-    lancamentos = Lancamento.objects.filter(
-        empresa=request.user.empresa,
-        data_lancamento__range=[data_inicio_str, data_fim_str],
-        plano_de_contas__isnull=False
+    # 2. Total por Categoria (meses inteiros vêm do ResumoMensal)
+    totais = ResumoMensal.objects.somar(
+        request.user.empresa, data_inicio, data_fim,
+        campos=['tipo', 'plano_de_contas__codigo', 'plano_de_contas__nome'],
+        plano_de_contas__isnull=False,
     )
 
-    # 3. Agrupamento (Total por Categoria)
-    from django.db.models import Sum
-    
-    # Receitas
-    receitas = lancamentos.filter(tipo='C').values(
-        'plano_de_contas__codigo', 'plano_de_contas__nome'
-    ).annotate(total=Sum('valor')).order_by('plano_de_contas__codigo')
-
-    total_receitas = lancamentos.filter(tipo='C').aggregate(Sum('valor'))['valor__sum'] or 0
-
-    # Despesas
-    despesas = lancamentos.filter(tipo='D').values(
-        'plano_de_contas__codigo', 'plano_de_contas__nome'
-    ).annotate(total=Sum('valor')).order_by('plano_de_contas__codigo')
+    # 3. Separação Receitas / Despesas
+    receitas = [item for item in totais if item['tipo'] == 'C']
+    despesas = [item for item in totais if item['tipo'] == 'D']
 
-    total_despesas = lancamentos.filter(tipo='D').aggregate(Sum('valor'))['valor__sum'] or 0
+    total_receitas = sum(item['total'] for item in receitas)
+    total_despesas = sum(item['total'] for item in despesas)
 
     # 4. Resultado (Lucro ou Prejuízo)
     resultado = total_receitas + total_despesas
@@ -754,48 +767,54 @@ def relatorio_dre_sintetico(request):
     data_inicio = parse_date(data_inicio_str)
     data_fim = parse_date(data_fim_str)
 
-    # 2. Busca
-    lancamentos = Lancamento.objects.filter(
-        empresa=request.user.empresa,
-        data_lancamento__range=[data_inicio_str, data_fim_str],
-        plano_de_contas__isnull=False
+    # Nível de consolidação na árvore do plano (1 = raízes, 2 = seus filhos...). Um código sem o grupo
+    # intermediário cadastrado (ex: '01.02.001' sem '01.02') é filho direto do '01' e sobe um nível
+    try:
+        nivel = max(int(request.GET.get('nivel') or 1), 1)
+    except ValueError:
+        nivel = 1
+
+    # 2. Total por Categoria e caminho na árvore, numa passada só (meses inteiros vêm do ResumoMensal)
+    totais = ResumoMensal.objects.somar(
+        request.user.empresa, data_inicio, data_fim,
+        campos=['tipo', 'plano_de_contas', 'plano_de_contas__caminho'],
+        plano_de_contas__isnull=False,
     )
 
-    # 3. Agrupamento Manual (Soma por Código Pai)
+    # 3. O grupo de cada categoria é o ancestral dela no nível pedido (o caminho guarda os ids desde a raiz);
+    #    códigos e nomes dos grupos numa única consulta
+    profundidade_maxima = 1
+    for item in totais:
+        ids = PlanoDeContas.ids_no_caminho(item['plano_de_contas__caminho']) or [item['plano_de_contas']]
+        item['grupo'] = ids[min(nivel, len(ids)) - 1]
+        profundidade_maxima = max(profundidade_maxima, len(ids))
+    planos_grupos = {
+        plano_id: (codigo, nome)
+        for plano_id, codigo, nome in PlanoDeContas.objects.filter(
+            empresa=request.user.empresa, id__in={item['grupo'] for item in totais},
+        ).values_list('id', 'codigo', 'nome')
+    }
+    nivel_maximo = max(profundidade_maxima, nivel)
+
     grupos_receitas = {}
     grupos_despesas = {}
 
     total_rec = 0
     total_desp = 0
 
-    for l in lancamentos:
-        # Pega o primeiro nível do código (ex: '01.02.001' -> pega '01')
-        # Se seu código não usa ponto (ex: 101001), ajuste o slice (ex: l.plano_de_contas.codigo[:2])
-        codigo_pai = l.plano_de_contas.codigo.split('.')[0] if '.' in l.plano_de_contas.codigo else l.plano_de_contas.codigo[:2]
-        
+    for item in totais:
+        codigo, nome = planos_grupos[item['grupo']]
         # Garante um fallback se o código for vazio
-        if not codigo_pai: 
-            codigo_pai = 'OUTROS'
-
-        # Lógica para Receitas (C)
-        if l.tipo == 'C':
-            if codigo_pai not in grupos_receitas:
-                nome_pai_obj = PlanoDeContas.objects.filter(empresa=request.user.empresa, codigo=codigo_pai).first()
-                nome_grupo = nome_pai_obj.nome if nome_pai_obj else f'GRUPO {codigo_pai}'
-                grupos_receitas[codigo_pai] = {'nome': nome_grupo, 'total': 0}
-            
-            grupos_receitas[codigo_pai]['total'] += l.valor
-            total_rec += l.valor
-            
-        # Lógica para Despesas (D)
-        elif l.tipo == 'D':
-            if codigo_pai not in grupos_despesas:
-                nome_pai_obj = PlanoDeContas.objects.filter(empresa=request.user.empresa, codigo=codigo_pai).first()
-                nome_grupo = nome_pai_obj.nome if nome_pai_obj else f'GRUPO {codigo_pai}'
-                grupos_despesas[codigo_pai] = {'nome': nome_grupo, 'total': 0}
-            
-            grupos_despesas[codigo_pai]['total'] += l.valor # Soma valor negativo
-            total_desp += l.valor
+        pai = codigo or 'OUTROS'
+        grupos = grupos_receitas if item['tipo'] == 'C' else grupos_despesas
+        if pai not in grupos:
+            grupos[pai] = {'nome': nome, 'total': 0}
+        grupos[pai]['total'] += item['total'] # Despesas somam valor negativo
+
+        if item['tipo'] == 'C':
+            total_rec += item['total']
+        else:
+            total_desp += item['total']
 
     # 4. Ordenação (Para aparecer 01, 02, 03 na ordem)
     # Transforma dicionário em lista de tuplas ordenadas
@@ -812,5 +831,269 @@ def relatorio_dre_sintetico(request):
         'total_receitas': total_rec,
         'total_despesas': total_desp,
         'resultado': resultado,
+        'nivel': nivel,
+        'niveis': range(1, nivel_maximo + 1),
         'empresa': request.user.empresa,
-    })
\ No newline at end of file
+    })
+
+# ==========================================================
+# 5. EXPORTAÇÃO CSV (STREAMING)
+# ==========================================================
+
+@login_required
+def exportar_fluxo(request):
+    """Fluxo de caixa em CSV com os mesmos filtros da tela e saldo acumulado linha a linha"""
+    empresa = request.user.empresa
+    filtros = filtros_fluxo(request)
+    saldo_anterior = calcular_saldo_anterior(empresa, filtros['data_inicio'], filtros['caixa_id'], filtros['categoria_id'])
+    lancamentos = lancamentos_do_fluxo(empresa, filtros)
+    tipos = dict(Lancamento.TIPO_CHOICES)
+
+    def linhas():
+        saldo = saldo_anterior
+        entradas = saidas = 0
+        yield ['', 'SALDO ANTERIOR', '', '', '', '', formatar_valor(saldo)]
+        campos = ['data_lancamento', 'descricao', 'plano_de_contas__nome', 'caixa__nome', 'tipo', 'valor']
+        for data, descricao, categoria, caixa, tipo, valor in iterar_por_chave(lancamentos, campos, 'data_lancamento'):
+            saldo += valor
+            if tipo == 'C':
+                entradas += valor
+            else:
+                saidas += valor
+            yield [formatar_data(data), descricao, categoria or '', caixa, tipos.get(tipo, tipo), formatar_valor(valor), formatar_valor(saldo)]
+        yield ['', 'TOTAL ENTRADAS', '', '', '', formatar_valor(entradas), '']
+        yield ['', 'TOTAL SAÍDAS', '', '', '', formatar_valor(saidas), '']
+        yield ['', 'SALDO FINAL', '', '', '', '', formatar_valor(saldo)]
+
+    return resposta_csv(
+        f"fluxo_{filtros['data_inicio']}_{filtros['data_fim']}.csv",
+        ['Data', 'Descrição', 'Categoria', 'Caixa', 'Tipo', 'Valor', 'Saldo'],
+        linhas(),
+    )
+
+@login_required
+def exportar_contas(request):
+    """Contas a Pagar/Receber em CSV com os mesmos filtros da lista"""
+    tipo_lista = request.GET.get('tipo_lista', 'receber')
+    contas, _ = filtrar_contas(request, 'R' if tipo_lista == 'receber' else 'D')
+    situacoes = dict(Conta.STATUS_CHOICES)
+
+    def linhas():
+        total = 0
+        quantidade = 0
+        campos = ['data_vencimento', 'cadastro__nome', 'documento', 'descricao', 'plano_de_contas__nome', 'valor', 'status']
+        for vencimento, cadastro, documento, descricao, categoria, valor, status in iterar_por_chave(contas, campos, 'data_vencimento'):
+            total += valor
+            quantidade += 1
+            yield [formatar_data(vencimento), cadastro or '', documento or '', descricao, categoria, formatar_valor(valor), situacoes.get(status, status)]
+        yield ['', f'TOTAL ({quantidade} contas)', '', '', '', formatar_valor(total), '']
+
+    return resposta_csv(
+        f"contas_a_{tipo_lista}.csv",
+        ['Vencimento', 'Cliente/Fornecedor', 'Documento', 'Descrição', 'Categoria', 'Valor', 'Status'],
+        linhas(),
+    )
+
+
+# ==========================================================
+# 6. IMPORTAÇÃO DE EXTRATO BANCÁRIO (OFX/CSV)
+# ==========================================================
+
+@login_required
+def importar_extrato_bancario(request):
+    if request.method == 'POST':
+        form = ImportacaoExtratoForm(request.POST, request.FILES, user=request.user)
+        if form.is_valid():
+            dados = form.cleaned_data
+            caixa = dados['caixa']
+            if dados['formato'] == OFX:
+                transacoes = ler_ofx(dados['arquivo'])
+            else:
+                transacoes = ler_csv(dados['arquivo'], form.layout_csv())
+            try:
+                resultado = importar_extrato(caixa, transacoes, dados['plano_de_contas'])
+            except ErroImportacao as erro:
+                messages.error(request, f"Extrato não importado: {erro}")
+                return render(request, 'financeiro/importar_extrato.html', {'form': form})
+
+            aviso = f"{resultado.importados} lançamento(s) importado(s) em {caixa}."
+            if resultado.duplicados:
+                aviso += f" {resultado.duplicados} já tinham sido importados e foram ignorados."
+            messages.success(request, aviso)
+            if not resultado.importados:
+                return redirect('financeiro:fluxo_caixa')
+            return redirect(
+                f"{reverse('financeiro:fluxo_caixa')}?caixa={caixa.id}"
+                f"&data_inicio={resultado.data_inicio}&data_fim={resultado.data_fim}"
+            )
+    else:
+        caixa_padrao = parametros.obter(request.user.empresa_id, 'CAIXA_PADRAO_ID')
+        form = ImportacaoExtratoForm(user=request.user, initial={'caixa': caixa_padrao})
+    return render(request, 'financeiro/importar_extrato.html', {'form': form})
+
+
+# ==========================================================
+# 7. CONCILIAÇÃO BANCÁRIA
+# ==========================================================
+
+@login_required
+def conciliacao_bancaria(request):
+    """Sugere contas pendentes para os lançamentos do período sem conta de origem; o POST grava as marcadas"""
+    empresa = request.user.empresa
+
+    if request.method == 'POST':
+        pares = [
+            par.split(':') for par in request.POST.getlist('pares')
+            if par.count(':') == 1 and par.replace(':', '').isdigit()
+        ]
+        if not pares:
+            messages.error(request, "Marque ao menos uma sugestão para conciliar.")
+        else:
+            conciliadas = conciliar(empresa, pares)
+            messages.success(request, f"{conciliadas} lançamento(s) conciliado(s); as contas foram marcadas como pagas.")
+            if conciliadas < len(pares):
+                messages.warning(request, f"{len(pares) - conciliadas} sugestão(ões) ignorada(s): conta ou lançamento já foi alterado.")
+        return redirect(f"{reverse('financeiro:conciliacao')}?{request.GET.urlencode()}")
+
+    filtros = filtros_fluxo(request)
+    try:
+        janela = max(0, min(int(request.GET.get('janela') or JANELA_DIAS), 60))
+    except ValueError:
+        janela = JANELA_DIAS
+
+    sugestoes = sugerir(empresa, lancamentos_do_fluxo(empresa, filtros), janela)
+    return render(request, 'financeiro/conciliacao.html', {
+        'sugestoes': sugestoes,
+        'por_documento': POR_DOCUMENTO,
+        'caixas': Caixa.objects.filter(empresa=empresa),
+        'caixa_selecionado_id': str(filtros['caixa_id']) if filtros['caixa_id'] else '',
+        'data_inicio': filtros['data_inicio'],
+        'data_fim': filtros['data_fim'],
+        'janela': janela,
+    })
+
+
+
+# ==========================================================
+# 8. MENSALIDADES (GERAÇÃO EM LOTE)
+# ==========================================================
+
+@login_required
+def gerar_mensalidades_view(request):
+    empresa = request.user.empresa
+    if request.method == 'POST':
+        form = GeracaoMensalidadesForm(request.POST, user=request.user)
+        if form.is_valid():
+            dados = form.cleaned_data
+            try:
+                resultado = gerar_mensalidades(
+                    empresa, dados['competencia'], dados['dia_vencimento'], dados['valor_padrao'],
+                    form.valores_categoria(), [categoria.id for categoria in dados['categorias']] or None,
+                )
+            except ValueError as erro:
+                messages.error(request, str(erro))
+                return render(request, 'financeiro/gerar_mensalidades.html', {'form': form})
+
+            competencia = dados['competencia']
+            messages.success(
+                request,
+                f"{resultado.criadas} mensalidade(s) de {competencia:%m/%Y} gerada(s), total R$ {resultado.total:.2f}.",
+            )
+            if resultado.existentes:
+                messages.warning(request, f"{resultado.existentes} cliente(s) já tinham a mensalidade desta competência.")
+            if resultado.sem_valor:
+                messages.warning(request, f"{resultado.sem_valor} cliente(s) sem valor definido para a categoria ficaram sem cobrança.")
+            vencimento = data_vencimento(competencia, dados['dia_vencimento'])
+            return redirect(f"{reverse('financeiro:lista_receber')}?data_ini={vencimento}&data_fim={vencimento}")
+    else:
+        form = GeracaoMensalidadesForm(user=request.user, initial={'competencia': date.today().replace(day=1)})
+    return render(request, 'financeiro/gerar_mensalidades.html', {'form': form})
+
+
+# ==========================================================
+# 9. PROJEÇÃO DO FLUXO DE CAIXA
+# ==========================================================
+
+@login_required
+def projecao_fluxo(request):
+    """Saldo projetado dia a dia com as contas pendentes; as opções simulam atrasadas que não entram"""
+    try:
+        dias = int(request.GET.get('dias') or DIAS_PADRAO)
+    except ValueError:
+        dias = DIAS_PADRAO
+    receber_atrasadas = not request.GET.get('sem_receber_atrasadas')
+    pagar_atrasadas = not request.GET.get('sem_pagar_atrasadas')
+
+    projecao = projetar(request.user.empresa, dias, receber_atrasadas, pagar_atrasadas)
+
+    return render(request, 'financeiro/projecao.html', {
+        'projecao': projecao,
+        'dias': len(projecao.dias) - 1,
+        'receber_atrasadas': receber_atrasadas,
+        'pagar_atrasadas': pagar_atrasadas,
+        'grafico_labels': [dia.data.strftime('%d/%m') for dia in projecao.dias],
+        'grafico_saldo': [float(dia.saldo) for dia in projecao.dias],
+    })
+
+
+# ==========================================================
+# 10. AGING (CONTAS EM ABERTO POR FAIXA DE ATRASO)
+# ==========================================================
+
+AGING_LINHAS_TELA = 200
+
+
+def filtros_aging(request):
+    """Tipo (R/D), agrupamento e data-base do aging a partir do GET (tela e exportação)"""
+    tipo_plano = 'D' if request.GET.get('tipo') == 'D' else 'R'
+    agrupar_por = request.GET.get('agrupar') if request.GET.get('agrupar') in AGRUPAMENTOS else 'cadastro'
+    try:
+        data_base = parse_date(request.GET.get('data_base') or '') or date.today()
+    except ValueError:
+        data_base = date.today()
+    return tipo_plano, agrupar_por, data_base
+
+
+@login_required
+def relatorio_aging(request):
+    empresa = request.user.empresa
+    tipo_plano, agrupar_por, data_base = filtros_aging(request)
+
+    linhas = list(aging(empresa, tipo_plano, agrupar_por, data_base)[:AGING_LINHAS_TELA + 1])
+    return render(request, 'financeiro/aging.html', {
+        'linhas': linhas[:AGING_LINHAS_TELA],
+        'mais_linhas': len(linhas) > AGING_LINHAS_TELA,
+        'totais': totais_aging(empresa, tipo_plano, data_base),
+        'faixas': FAIXAS,
+        'tipo': tipo_plano,
+        'agrupar': agrupar_por,
+        'data_base': data_base,
+    })
+
+
+@login_required
+def exportar_aging(request):
+    """Aging completo em CSV (todas as linhas), com os mesmos filtros da tela"""
+    empresa = request.user.empresa
+    tipo_plano, agrupar_por, data_base = filtros_aging(request)
+    campos = [campo for campo, _ in FAIXAS] + ['vencido', 'total']
+
+    # Uma linha agrupada por cliente/categoria: cabe na memória, e o iterator() não economizaria
+    # nada no MySQL (o driver carrega o resultado inteiro) nem serve para paginar por chave
+    agrupadas = list(aging(empresa, tipo_plano, agrupar_por, data_base))
+
+    def linhas():
+        for linha in agrupadas:
+            if agrupar_por == 'plano':
+                rotulo = f"{linha['plano_de_contas__codigo']} - {linha['plano_de_contas__nome']}"
+            else:
+                rotulo = linha['cadastro__nome'] or 'Sem cadastro'
+            yield [rotulo, linha['quantidade'], *(formatar_valor(linha[campo]) for campo in campos)]
+        totais = totais_aging(empresa, tipo_plano, data_base)
+        yield ['TOTAL', totais['quantidade'], *(formatar_valor(totais[campo]) for campo in campos)]
+
+    return resposta_csv(
+        f"aging_{'receber' if tipo_plano == 'R' else 'pagar'}_{data_base:%Y%m%d}.csv",
+        ['Categoria' if agrupar_por == 'plano' else 'Cliente/Fornecedor', 'Contas', *(rotulo for _, rotulo in FAIXAS), 'Total Vencido', 'Total'],
+        linhas(),
+    )
@@ -1,7 +1,14 @@
 from django import forms
+from django.core.exceptions import ValidationError
 from django.contrib.auth.forms import AuthenticationForm
 
 class CustomLoginForm(AuthenticationForm):
+    error_messages = {
+        **AuthenticationForm.error_messages,
+        'invalid_login': "Usuário ou senha incorretos.",
+        'empresa_inativa': "O acesso da sua empresa está suspenso. Entre em contato com o suporte.",
+    }
+
     username = forms.CharField(widget=forms.TextInput(attrs={
         'class': 'w-full px-4 py-3 rounded-lg bg-gray-50 border border-gray-300 focus:border-blue-500 focus:bg-white focus:outline-none transition duration-200',
         'placeholder': 'Seu usuário ou e-mail'
@@ -9,4 +16,10 @@ class CustomLoginForm(AuthenticationForm):
     password = forms.CharField(widget=forms.PasswordInput(attrs={
         'class': 'w-full px-4 py-3 rounded-lg bg-gray-50 border border-gray-300 focus:border-blue-500 focus:bg-white focus:outline-none transition duration-200',
         'placeholder': 'Sua senha secreta'
-    }))
\ No newline at end of file
+    }))
+
+    def confirm_login_allowed(self, user):
+        super().confirm_login_allowed(user)
+        # Barra já no login quem é de empresa inativa (o middleware desconecta quem já estava logado)
+        if user.empresa_id and not user.empresa.ativo:
+            raise ValidationError(self.error_messages['empresa_inativa'], code='empresa_inativa')
@@ -0,0 +1,71 @@
+import asyncio
+import statistics
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import AsyncClient, Client
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from core.models import Usuario
+
+
+def percentil(tempos, p):
+    ordenados = sorted(tempos)
+    return ordenados[min(len(ordenados) - 1, int(len(ordenados) * p / 100))]
+
+
+class Command(BaseCommand):
+    help = (
+        "Mede a latência do dashboard (p50/p95/máx em ms) para um usuário, pelo caminho WSGI (Client) "
+        "e pelo ASGI (AsyncClient). Use num banco com volume parecido com o de produção."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('usuario', help="username do usuário logado nas requisições")
+        parser.add_argument('--repeticoes', type=int, default=200)
+        parser.add_argument('--aquecimento', type=int, default=10, help="Requisições descartadas antes de medir")
+
+    def handle(self, *args, **options):
+        usuario = Usuario.objects.filter(username=options['usuario']).first()
+        if usuario is None:
+            raise CommandError(f"Usuário {options['usuario']} não encontrado.")
+
+        url = reverse('dashboard')
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+            cliente = Client()
+            cliente.force_login(usuario)
+            self.relatorio('WSGI', self.medir_sync(cliente, url, options))
+
+            cliente_async = AsyncClient()
+            cliente_async.cookies = cliente.cookies
+            self.relatorio('ASGI', asyncio.run(self.medir_async(cliente_async, url, options)))
+
+    def medir_sync(self, cliente, url, options):
+        tempos = []
+        for n in range(options['aquecimento'] + options['repeticoes']):
+            inicio = time.perf_counter()
+            resposta = cliente.get(url)
+            if n >= options['aquecimento']:
+                tempos.append((time.perf_counter() - inicio) * 1000)
+            if resposta.status_code != 200:
+                raise CommandError(f"Dashboard respondeu {resposta.status_code}.")
+        return tempos
+
+    async def medir_async(self, cliente, url, options):
+        tempos = []
+        for n in range(options['aquecimento'] + options['repeticoes']):
+            inicio = time.perf_counter()
+            resposta = await cliente.get(url)
+            if n >= options['aquecimento']:
+                tempos.append((time.perf_counter() - inicio) * 1000)
+            if resposta.status_code != 200:
+                raise CommandError(f"Dashboard respondeu {resposta.status_code}.")
+        return tempos
+
+    def relatorio(self, nome, tempos):
+        self.stdout.write(
+            f"{nome}: {len(tempos)} requisições | p50 {statistics.median(tempos):.1f} ms | "
+            f"p95 {percentil(tempos, 95):.1f} ms | máx {max(tempos):.1f} ms"
+        )
@@ -1,3 +1,53 @@
+from datetime import date
+from decimal import Decimal
+
 from django.test import TestCase
+from django.urls import reverse
+
+from core.models import Empresa, Usuario
+from financeiro.models import Caixa, Lancamento, PlanoDeContas
+from .views import meses_do_grafico
+
+
+class DashboardTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.empresa = Empresa.objects.create(nome='Empresa Painel', cnpj='78.787.878/0001-78')
+        cls.usuario = Usuario.objects.create_user('painel', password='x', empresa=cls.empresa)
+        caixa = Caixa.objects.create(empresa=cls.empresa, nome='Banco')
+        receita = PlanoDeContas.objects.create(empresa=cls.empresa, codigo='01', nome='Receitas', tipo='R')
+        Lancamento.objects.create(
+            empresa=cls.empresa, caixa=caixa, plano_de_contas=receita, descricao='Venda',
+            data_lancamento=date.today(), valor=Decimal('150.00'), tipo='C',
+        )
+
+    def test_meses_do_grafico_sem_pular_nem_repetir(self):
+        self.assertEqual(meses_do_grafico(date(2024, 3, 31)), [
+            date(2023, 10, 1), date(2023, 11, 1), date(2023, 12, 1),
+            date(2024, 1, 1), date(2024, 2, 1), date(2024, 3, 1),
+        ])
+        self.assertEqual(meses_do_grafico(date(2024, 1, 15), 2), [date(2023, 12, 1), date(2024, 1, 1)])
+
+    def test_dashboard_wsgi(self):
+        self.client.force_login(self.usuario)
+        resposta = self.client.get(reverse('dashboard'))
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(resposta.context['receita_mensal'], Decimal('150.00'))
+        self.assertEqual(resposta.context['grafico_receita'][-1], 150.0)
+
+    async def test_dashboard_asgi(self):
+        await self.async_client.aforce_login(self.usuario)
+        resposta = await self.async_client.get(reverse('dashboard'))
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(resposta.context['receita_mensal'], Decimal('150.00'))
+        self.assertEqual(len(resposta.context['grafico_labels']), 6)
 
-# Create your tests here.
+    def test_dashboard_sem_empresa(self):
+        self.client.force_login(Usuario.objects.create_superuser('admin', password='x'))
+        resposta = self.client.get(reverse('dashboard'))
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(resposta.context['total_clientes'], 0)
+        self.assertEqual(resposta.context['receita_mensal'], 0)
+        self.assertEqual(resposta.context['contas_atrasadas'], [])
+        self.assertEqual(resposta.context['grafico_receita'], [0.0] * 6)
@@ -1,10 +1,14 @@
 from django.shortcuts import render
 from django.contrib.auth.decorators import login_required
-from django.db.models import Sum, Q
+from django.db.models import Count, Q
 from django.utils import timezone
-from datetime import timedelta
+from asgiref.sync import sync_to_async
+from datetime import date
+import asyncio
+import calendar
 from cadastros.models import Cadastro
-from financeiro.models import Lancamento, Conta
+from financeiro.juros import com_juros
+from financeiro.models import Conta, ResumoMensal
 
 # ==========================================
 # LANDING PAGE (Tela Inicial)
@@ -17,93 +21,74 @@ def home(request):
 # ==========================================
 # DASHBOARD (Painel Principal)
 # ==========================================
-@login_required
-def dashboard(request):
-    empresa = request.user.empresa
-    hoje = timezone.now().date()
-    mes_atual = hoje.month
-    ano_atual = hoje.year
+def meses_do_grafico(hoje, quantidade=6):
+    """Primeiro dia de cada um dos últimos `quantidade` meses (inclui o atual), do mais antigo ao atual"""
+    meses = []
+    for i in range(quantidade - 1, -1, -1):
+        ano_ref, mes_ref = divmod(hoje.year * 12 + hoje.month - 1 - i, 12)
+        meses.append(date(ano_ref, mes_ref + 1, 1))
+    return meses
 
-    # 1. DADOS DE CADASTROS
-    # Filtra apenas quem é Cliente (CLI) ou Ambos (AMB)
-    qs_clientes = Cadastro.objects.filter(
-        empresa=empresa
-    ).filter(Q(papel='CLI') | Q(papel='AMB'))
 
-    total_clientes = qs_clientes.count()
-    ativos = qs_clientes.filter(situacao='ATIVO').count()
-    
-    # 2. DADOS FINANCEIROS (REALIZADO / FLUXO)
-    # Soma apenas o que foi BAIXADO/PAGO neste mês
-    
-    # Receitas (Créditos)
-    receita_mensal = Lancamento.objects.filter(
-        empresa=empresa,
-        tipo='C', 
-        data_lancamento__month=mes_atual,
-        data_lancamento__year=ano_atual
-    ).aggregate(Sum('valor'))['valor__sum'] or 0
+@login_required
+async def dashboard(request):
+    """
+    View assíncrona: no ASGI o loop de eventos fica livre enquanto o banco responde. As consultas
+    do ORM passam pelo sync_to_async, que usa uma thread só, então rodam uma depois da outra;
+    o ganho está em serem poucas (agregações condicionais e o ResumoMensal). No WSGI o Django a
+    executa como uma view comum.
+    """
+    empresa = request.empresa
+    hoje = timezone.now().date()
+    inicio_mes = hoje.replace(day=1)
+    meses_grafico = meses_do_grafico(hoje)
+    fim_mes = hoje.replace(day=calendar.monthrange(hoje.year, hoje.month)[1])
 
-    # Despesas (Débitos) - Vem negativo do banco
-    despesa_mensal_raw = Lancamento.objects.filter(
-        empresa=empresa,
-        tipo='D', 
-        data_lancamento__month=mes_atual,
-        data_lancamento__year=ano_atual
-    ).aggregate(Sum('valor'))['valor__sum'] or 0
+    # 1. DADOS DE CADASTROS - Cliente (CLI) ou Ambos (AMB), total e ativos numa consulta
+    async def contagem_clientes():
+        return await Cadastro.objects.filter(empresa=empresa).filter(Q(papel='CLI') | Q(papel='AMB')).aaggregate(
+            total=Count('id'), ativos=Count('id', filter=Q(situacao='ATIVO')),
+        )
 
-    # Saldo Real (Soma direta pois despesa é negativa)
-    saldo_mes = receita_mensal + despesa_mensal_raw
+    # 2. DADOS FINANCEIROS (REALIZADO) - últimos 6 meses do ResumoMensal numa consulta
+    async def totais_por_mes():
+        linhas = await sync_to_async(ResumoMensal.objects.somar)(empresa, meses_grafico[0], fim_mes, campos=['mes', 'tipo'])
+        return {(linha['mes'], linha['tipo']): linha['total'] for linha in linhas}
 
-    # 3. LISTAS DE ALERTA
-    ultimos_pagamentos = Lancamento.objects.filter(
-        empresa=empresa, 
-        tipo='C'
-    ).order_by('-data_lancamento')[:5]
+    # 3. LISTA DE ALERTA - contas a receber vencidas, com os juros de atraso até hoje
+    async def contas_atrasadas():
+        qs = Conta.objects.filter(
+            empresa=empresa,
+            plano_de_contas__tipo='R', # Só queremos saber de receber
+            status='PENDENTE',
+            data_vencimento__lt=hoje
+        ).select_related('cadastro').order_by('data_vencimento')
+        # com_juros lê a taxa dos parâmetros (cache/banco), por isso roda fora do loop de eventos
+        qs = await sync_to_async(com_juros)(qs, empresa.id, hoje)
+        return [conta async for conta in qs[:5]]
 
-    contas_atrasadas = Conta.objects.filter(
-        empresa=empresa,
-        plano_de_contas__tipo='R', # Só queremos saber de receber
-        status='PENDENTE',
-        data_vencimento__lt=hoje
-    ).order_by('data_vencimento')[:5]
+    if empresa is None:
+        # Usuário sem empresa (ex: superusuário do admin): painel zerado
+        contagem, totais, atrasadas = {'total': 0, 'ativos': 0}, {}, []
+    else:
+        contagem, totais, atrasadas = await asyncio.gather(contagem_clientes(), totais_por_mes(), contas_atrasadas())
 
-    # 4. DADOS PARA O GRÁFICO (Últimos 6 meses)
-    labels_grafico = []
-    dados_receita = []
-    dados_despesa = []
-    
-    for i in range(5, -1, -1):
-        data_ref = hoje.replace(day=1) - timedelta(days=i*30)
-        mes_ref = data_ref.month
-        ano_ref = data_ref.year
-        
-        labels_grafico.append(f"{mes_ref:02d}/{ano_ref}")
-        
-        r = Lancamento.objects.filter(
-            empresa=empresa, tipo='C', 
-            data_lancamento__month=mes_ref, data_lancamento__year=ano_ref
-        ).aggregate(Sum('valor'))['valor__sum'] or 0
-        
-        d = Lancamento.objects.filter(
-            empresa=empresa, tipo='D', 
-            data_lancamento__month=mes_ref, data_lancamento__year=ano_ref
-        ).aggregate(Sum('valor'))['valor__sum'] or 0
-        
-        dados_receita.append(float(r))
-        dados_despesa.append(abs(float(d)))
+    # Receitas (Créditos) e Despesas (Débitos, negativas no banco) do mês
+    receita_mensal = totais.get((inicio_mes, 'C'), 0)
+    despesa_mensal_raw = totais.get((inicio_mes, 'D'), 0)
 
     context = {
-        'total_clientes': total_clientes,
-        'ativos': ativos,
+        'total_clientes': contagem['total'],
+        'ativos': contagem['ativos'],
         'receita_mensal': receita_mensal,
         'despesa_mensal': abs(despesa_mensal_raw),
-        'saldo': saldo_mes,
-        'ultimos_pagamentos': ultimos_pagamentos,
-        'contas_atrasadas': contas_atrasadas,
-        'grafico_labels': labels_grafico,
-        'grafico_receita': dados_receita,
-        'grafico_despesa': dados_despesa,
+        'saldo': receita_mensal + despesa_mensal_raw,
+        'contas_atrasadas': atrasadas,
+        # 4. DADOS PARA O GRÁFICO (Últimos 6 meses)
+        'grafico_labels': [f"{mes_ref.month:02d}/{mes_ref.year}" for mes_ref in meses_grafico],
+        'grafico_receita': [float(totais.get((mes_ref, 'C'), 0)) for mes_ref in meses_grafico],
+        'grafico_despesa': [abs(float(totais.get((mes_ref, 'D'), 0))) for mes_ref in meses_grafico],
     }
-    
-    return render(request, 'web/dashboard.html', context)
\ No newline at end of file
+
+    # O template usa o request.user (preguiçoso e síncrono): renderiza fora do event loop
+    return await sync_to_async(render)(request, 'web/dashboard.html', context)